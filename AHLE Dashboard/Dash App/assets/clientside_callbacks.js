@@ -0,0 +1,88 @@
+/*
+Clientside callbacks for the GBADs dashboards.
+
+These are the callbacks that only look up static tables: dependent dropdown
+options and "Reset to Default" slider values. They run in the browser so
+changing a selection does not need a round trip to the server. The tables are
+built in Python and shipped once with the layout in the dcc.Store with
+id 'clientside-lookups'; its data is the last argument of each function.
+
+Registered in Python with, e.g.
+    gbadsDash.clientside_callback(
+        ClientsideFunction(namespace='gbads' ,function_name='region_options'),
+        Output('select-region-poultry','options'),
+        Input('Region-country-alignment-poultry','value'),
+        State('clientside-lookups','data'),
+    )
+*/
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    gbads: {
+
+        // ---------------------------------------------------------------------
+        // Region and country dropdowns (poultry and swine)
+        // ---------------------------------------------------------------------
+        // Region options for the region-country alignment
+        region_options: function(region_country, lookups) {
+            const options = lookups.region_options[region_country];
+            return options === undefined ? window.dash_clientside.no_update : options;
+        },
+
+        // Country options for the alignment and region
+        // Region 'All', or an unknown alignment, gives all countries for the species.
+        // A region not listed for the alignment gives that alignment's last region, as before.
+        country_options_poultry: function(region_country, region, lookups) {
+            return window.dash_clientside.gbads._country_options(region_country, region, lookups, 'poultry');
+        },
+        country_options_swine: function(region_country, region, lookups) {
+            return window.dash_clientside.gbads._country_options(region_country, region, lookups, 'swine');
+        },
+        _country_options: function(region_country, region, lookups, species) {
+            const by_region = lookups.country_options[region_country];
+            if (by_region === undefined || region === 'All') {
+                return lookups.all_country_options[species];
+            }
+            const options = by_region.regions[region];
+            return options === undefined ? by_region.regions[by_region.other] : options;
+        },
+
+        // ---------------------------------------------------------------------
+        // Reset to Default buttons
+        // ---------------------------------------------------------------------
+        reset_achievablepct_poultry: function(reset, lookups) {
+            return lookups.defaults.achievable_pct_poultry;
+        },
+        reset_daysonfeed_swine: function(reset, lookups) {
+            return lookups.defaults.dof_swine;
+        },
+
+        // ---------------------------------------------------------------------
+        // Ethiopia case study hierarchy dropdowns
+        // ---------------------------------------------------------------------
+        ecs_top_lvl_title: function(graph) {
+            return graph === 'Single Year' ? 'Top Level' : 'Segmentation';
+        },
+
+        // Options for a drilldown dropdown, disabling those selected at higher levels
+        // Arguments: graph, then the higher level selections, then lookups.
+        // Returns [options, dropdown style, title style]. Option 'None' is never disabled.
+        ecs_dd_options: function() {
+            const args = Array.prototype.slice.call(arguments);
+            const graph = args[0];
+            const lookups = args[args.length - 1];
+            const higher = args.slice(1, -1);
+            const over_time = (graph === 'Over Time');
+            const options = lookups.ecs_hierarchy_dd_attr_options.map(function(d) {
+                const disabled = over_time || (d.value !== 'None' && higher.indexOf(d.value) >= 0);
+                return Object.assign({}, d, {disabled: disabled});
+            });
+            const display_style = {display: over_time ? 'none' : 'block'};
+            return [options, display_style, display_style];
+        },
+
+        // First drilldown also resets its value
+        ecs_dd1_options: function(graph, top_lvl_hierarchy, lookups) {
+            const result = window.dash_clientside.gbads.ecs_dd_options(graph, top_lvl_hierarchy, lookups);
+            return [result[0], 'production_system', result[1], result[2]];
+        },
+    }
+});
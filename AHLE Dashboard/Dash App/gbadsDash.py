@@ -17,16 +17,23 @@ from pathlib import Path
 import inspect
 import requests
 import io
+import base64
 
 print(f"[{dt.datetime.now().strftime('%Y%m%d_%H%M%S.%f')[:19]}] Starting {__name__}")
 print(f"[{dt.datetime.now().strftime('%Y%m%d_%H%M%S.%f')[:19]}] cwd = {os.getcwd()}")
 print(f"[{dt.datetime.now().strftime('%Y%m%d_%H%M%S.%f')[:19]}] {sys.path[:2] = }")
 print(f"[{dt.datetime.now().strftime('%Y%m%d_%H%M%S.%f')[:19]}] {sys.version = }")
 
+# Modules shared with the pipelines, e.g. _pert_uncertainty and _breed_standards, are in pipeline_common at the top of the repository.
+# The Docker image keeps the same layout (see Dockerfile).
+PIPELINE_COMMON_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())) ,'pipeline_common')
+if PIPELINE_COMMON_FOLDER not in sys.path:
+    sys.path.insert(0 ,PIPELINE_COMMON_FOLDER)
+
 # Third party packages (ie, those installed with pip )
 # NO NEED to import Dash or JupyterDash here.  That is done within fa.instantiate_app
 
-from dash import html, dcc, Input, Output, State, dash_table, ctx
+from dash import html, dcc, Input, Output, State, dash_table, ctx, ClientsideFunction
 import dash_bootstrap_components as dbc  # Allows easy access to all bootstrap themes
 import dash_daq as daq
 import dash_auth
@@ -41,7 +48,17 @@ from flask import Flask, redirect
 # private (fa) libraries
 import lib.fa_dash_utils as fa
 import lib.bod_calcs as bod
+import _breed_standards as brd     # In pipeline_common, shared with the Major Producers scripts
 import lib.ga_ahle_calcs as ga
+import lib.geo_index as geo
+import lib.callback_metrics as cbm
+import lib.figure_templates as figt
+import lib.paged_tables as tbl
+import lib.data_export as exp
+import lib.background_jobs as bgj
+import lib.http_transport as ht
+import lib.data_snapshots as snap
+import lib.warm_start as warm
 
 #### PARAMETERS
 prod                         = False   # Use when testing/dev mode to remove auth
@@ -57,6 +74,38 @@ external_stylesheets=[dbc.themes.BOOTSTRAP]
 flask_server, app = fa.instantiate_app(app_title, external_stylesheets) # dont change name "flask_server".  Gunicorn expects to find it
 gbadsDash = app  # an alias for app; the app name used within this program
 
+# Time every callback and report percentiles at /metrics/callbacks (local requests only)
+# Set DASH_CALLBACK_LOG to a file name to also write one line of JSON per callback call
+# Callback time is split into building figures (functions marked @cbm.figure_function) and other calculations.
+# Set DASH_TIME_FIGURES=1 to also count plotly calls outside those functions as figures.
+# This patches plotly for the whole process, so it is off by default.
+cbm.instrument_app(
+    gbadsDash
+    ,LOG_FILE=os.environ.get('DASH_CALLBACK_LOG')
+    ,SLOW_MS=float(os.environ.get('DASH_CALLBACK_SLOW_MS' ,2000))
+    ,TIME_FIGURES=os.environ.get('DASH_TIME_FIGURES') == '1'
+)
+
+# Serve large data tables page by page from the server, with CSV export of the whole table
+tbl.register_paging(gbadsDash)
+
+# Stream datasets as CSV or Parquet from /export/<name>.csv or .parquet
+exp.register_export(gbadsDash)
+
+# Run the heaviest callbacks as background jobs, at most DASH_MAX_JOBS at a time in this process,
+# so they do not hold the server's request threads. Job counts and run times at /metrics/jobs (local requests only)
+# Each job runs against one version of the data (see Data reloading in section 3), and results are kept per version.
+bgj.register_jobs(
+    gbadsDash
+    ,MAX_JOBS=int(os.environ.get('DASH_MAX_JOBS' ,2))
+    ,JOB_CONTEXT=snap.pinned
+    ,cache_by=[snap.data_version]
+)
+
+# Answer the first requests for the default views from responses computed when the server starts
+# (see returnApp() in section 6). Warm-up time at /metrics/warmup (local requests only)
+warm.register_warm_up(gbadsDash)
+
 if prod:
     ## USERNAMES AND PASSWORDS
     # Keep this out of source code repository - save in a file or a database
@@ -163,51 +212,11 @@ else:
     ECS_PROGRAM_OUTPUT_FOLDER = os.path.join(GBADsLiverpool, Ethiopia_Workspace, "Program outputs")
     GA_DATA_FOLDER = os.path.join(GBADsLiverpool, Global_Agg_Workspace, "Data")
 
-# -----------------------------------------------------------------------------
-# Poultry
-# -----------------------------------------------------------------------------
-# Main table
-gbads_chickens_merged_fordash = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'gbads_chickens_merged_fordash.pkl.gz'))
-
-# Breed Standards
-poultrybreedstd_ross308 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poultrybreedstd_ross308.pkl.gz'))
-poultrybreedstd_ross708 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poultrybreedstd_ross708.pkl.gz'))
-poultrybreedstd_cobb500 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poultrybreedstd_cobb500.pkl.gz'))
-poultrybreedstd_vencobb400 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poultrybreedstd_vencobb400.pkl.gz'))
-poultrybreedstd_liverpool_model = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poultrybreedstd_liverpool_model.pkl.gz'))
-
-# -----------------------------------------------------------------------------
-# Swine
-# -----------------------------------------------------------------------------
-# Main table
-gbads_pigs_merged_fordash = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'gbads_pigs_merged_fordash.pkl.gz'))
-
-# Breed Standards
-swinebreedstd_pic_growthandfeed = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'swinebreedstd_pic_growthandfeed.pkl.gz'))
-swinebreedstd_liverpool_model3 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'swinebreedstd_liverpool_model3.pkl.gz'))
+# Breed standards are read with the pipeline outputs below, as data.breedstd
 
 # -----------------------------------------------------------------------------
 # Ethiopia Case Study
 # -----------------------------------------------------------------------------
-# Compartmental model results summary
-ecs_ahle_summary = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_summary.csv'))
-## Using alternative data which summarizes results from age/sex specific scenarios
-ahle_all_scensmry = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_scensmry.csv'))
-
-# Compartmental model results summary with AHLE calculated
-# for stacked bar
-ecs_ahle_summary2 = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_summary2.csv'))
-
-# Attribution Summary
-# ecs_ahle_all_withattr = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_withattr.csv'))
-## Using data with disease-specific attribution
-ecs_ahle_all_withattr = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_withattr_disease.csv'))
-
-# JR 2023-4-19: added regional results. Testing with Nationl level (should be same as before).
-# ahle_all_scensmry = ahle_all_scensmry.query("region == 'National'").copy()
-ecs_ahle_summary2 = ecs_ahle_summary2.query("region == 'National'")
-# ecs_ahle_all_withattr = ecs_ahle_all_withattr.query("region == 'National'")
-
 # Ethiopia geojson files from S3
 # Regional level
 url = 'https://gbads-data-repo.s3.ca-central-1.amazonaws.com/shape-files/eth_admbnda_adm1_csa_bofedb_2021.geojson'
@@ -217,11 +226,6 @@ geojson_ecs = r.json()
 # Alternative: read from local copy
 # geojson_ecs = gpd.read_file(os.path.join(DASH_DATA_FOLDER ,'eth_admbnda_adm1_csa_bofedb_2021.geojson'))
 
-# Expert opinion files
-ecs_expertattr_smallrum = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'attribution_experts_smallruminants.csv'))
-ecs_expertattr_cattle = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'attribution_experts_cattle.csv'))
-ecs_expertattr_poultry = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'attribution_experts_chickens.csv'))
-
 # Economic data is very simple. From Dashboard WEI 08082023.xlsx shared by Tom Marsh
 wei_ethiopia_raw = pd.DataFrame({
     'species':'Cattle and Small Ruminants'
@@ -235,33 +239,32 @@ wei_ethiopia_raw = pd.DataFrame({
 # -----------------------------------------------------------------------------
 # Global Aggregate
 # -----------------------------------------------------------------------------
-# Biomass FAOSTAT
-ga_countries_biomass = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'world_ahle_abt_fordash.pkl.gz'))
-
+# Biomass FAOSTAT, read with the pipeline outputs below
 # Drop unnecessary columns
-ga_countries_biomass = ga_countries_biomass.drop(columns=['producing_animals_eggs_hd',
-                                                          'producing_animals_hides_hd',
-                                                          'producing_animals_meat_hd',
-                                                          'producing_animals_milk_hd',
-                                                          'producing_animals_wool_hd',
-                                                          'output_live_hd',
-                                                          'output_total_hd',
-                                                          # 'output_live_biomass_kg',
-                                                          # 'output_total_biomass_kg',
-                                                          'output_value_live_2010usd',
-                                                          'output_value_total_2010usd',
-                                                          'output_value_meatlive_2010usd',
-                                                          'producer_price_milk_usdpertonne_cnst2010',
-                                                          'producer_price_wool_usdpertonne_cnst2010',
-                                                          'producer_price_meat_live_usdpertonne_cnst2010',
-                                                          'producer_price_eggs_usdpertonne_cnst2010',
-                                                          'producer_price_meat_usdpertonne_cnst2010',
-                                                          'production_eggs_kgperkgbm',
-                                                          'production_hides_kgperkgbm',
-                                                          'production_meat_kgperkgbm',
-                                                          'production_milk_kgperkgbm',
-                                                          'production_wool_kgperkgbm',
-                                                          ])
+ga_drop_columns = [
+    'producing_animals_eggs_hd',
+    'producing_animals_hides_hd',
+    'producing_animals_meat_hd',
+    'producing_animals_milk_hd',
+    'producing_animals_wool_hd',
+    'output_live_hd',
+    'output_total_hd',
+    # 'output_live_biomass_kg',
+    # 'output_total_biomass_kg',
+    'output_value_live_2010usd',
+    'output_value_total_2010usd',
+    'output_value_meatlive_2010usd',
+    'producer_price_milk_usdpertonne_cnst2010',
+    'producer_price_wool_usdpertonne_cnst2010',
+    'producer_price_meat_live_usdpertonne_cnst2010',
+    'producer_price_eggs_usdpertonne_cnst2010',
+    'producer_price_meat_usdpertonne_cnst2010',
+    'production_eggs_kgperkgbm',
+    'production_hides_kgperkgbm',
+    'production_meat_kgperkgbm',
+    'production_milk_kgperkgbm',
+    'production_wool_kgperkgbm',
+]
 
 # Drop species
 drop_species = ['Camels',
@@ -269,9 +272,6 @@ drop_species = ['Camels',
                 'Buffaloes',
                 'Ducks']
 
-_drop_species = (ga_countries_biomass['species'].isin(drop_species))
-ga_countries_biomass = ga_countries_biomass.loc[~ _drop_species]
-
 
 # Drop countries
 # Thin the regions with many countries
@@ -433,36 +433,167 @@ drop_countries = [
     # ,'Zimbabwe'
 ]
 drop_countries_upper = [i.upper() for i in drop_countries]
-_drop_countries = (ga_countries_biomass['country'].str.upper().isin(drop_countries_upper))
-ga_countries_biomass = ga_countries_biomass.loc[~ _drop_countries]
-
-# Keep history only to 2015
-# ga_countries_biomass = ga_countries_biomass.loc[ga_countries_biomass['year'] >= 2015]
 
-# Drop missing values from species
-ga_countries_biomass['species'].replace('', np.nan, inplace=True)
-ga_countries_biomass.dropna(subset=['species'], inplace=True)
+# WOAH and FAO region-country mapping
+# These alignments are not in the data. The geography index for each is built from these lists
+# in read_pipeline_data(). A country can be in more than one region.
+ga_woah_region_countries = {
+    "Africa":["Ethiopia"]
+    ,"Americas":["Brazil" ,"United States of America"]
+    ,"Asia, Far East and Oceania":["India" ,"United States of America"]
+    ,"Europe":["France" ,"Germany" ,"Italy" ,"Netherlands" ,"Poland" ,"United Kingdom"]
+    ,"Middle East":["TEST"]
+}
+ga_fao_region_countries = {
+    "Africa":["Ethiopia"]
+    ,"Asia":["India"]
+    ,"Europe and Central Asia":["France" ,"Germany" ,"Italy" ,"Netherlands" ,"Poland" ,"United Kingdom"]
+    ,"Latin America and the Caribbean":["Brazil"]
+    ,"Near East and North Africa":["TEST"]
+    ,"South West Pacific":["France" ,"United States of America"]
+}
 
 # -----------------------------------------------------------------------------
-# Antimicrobial Usage
+# Pipeline outputs
 # -----------------------------------------------------------------------------
-amu2018_combined_tall = pd.read_csv(os.path.join(DASH_DATA_FOLDER, "amu2018_combined_tall.csv"))
-
-# Create region labels with number of countries reporting
-# amu2018_combined_tall["region_with_countries_reporting"] = \
-#     amu2018_combined_tall['region'] + " (" + round(amu2018_combined_tall['number_of_countries'] ,0).astype(int).astype(str) + ")"
-
-# Create region labels with proportion of biomass represented in countries reporting
-amu2018_combined_tall["region_with_countries_reporting"] = \
-    amu2018_combined_tall['region'] \
-        + " (" + round(amu2018_combined_tall['number_of_countries'] ,0).astype(int).astype(str) \
-        + " | " + round(amu2018_combined_tall['biomass_prpn_reporting'] * 100 ,1).astype(str) + "%)"
+# Files written by the Ethiopia, Global Aggregate, Major Producers and AMU pipelines.
+# They are read here at startup and again whenever a pipeline publishes a new version
+# (see Data reloading below), so everything derived from them is also built here.
+# Returns a dictionary {data name: value}, which the app holds in a snap.DataHolder (see below).
+def read_pipeline_data(DATA_FOLDER):
+    # Breed standards {label: data frame}, labels as in _breed_standards.BREED_STANDARD_FILES
+    # Loading through _breed_standards also builds the interpolated growth curves used by bod_calcs
+    breedstd = brd.load_breed_standards(DATA_FOLDER)
+
+    # Poultry and swine main tables
+    gbads_chickens_merged_fordash = pd.read_pickle(os.path.join(DATA_FOLDER ,'gbads_chickens_merged_fordash.pkl.gz'))
+    gbads_pigs_merged_fordash = pd.read_pickle(os.path.join(DATA_FOLDER ,'gbads_pigs_merged_fordash.pkl.gz'))
+
+    # -------------------------------------------------------------------------
+    # Ethiopia Case Study
+    # -------------------------------------------------------------------------
+    # Compartmental model results summary
+    ecs_ahle_summary = pd.read_csv(os.path.join(DATA_FOLDER ,'ahle_all_summary.csv'))
+    ## Using alternative data which summarizes results from age/sex specific scenarios
+    ahle_all_scensmry = pd.read_csv(os.path.join(DATA_FOLDER ,'ahle_all_scensmry.csv'))
+
+    # Compartmental model results summary with AHLE calculated
+    # for stacked bar
+    ecs_ahle_summary2 = pd.read_csv(os.path.join(DATA_FOLDER ,'ahle_all_summary2.csv'))
+
+    # Attribution Summary
+    # ecs_ahle_all_withattr = pd.read_csv(os.path.join(DATA_FOLDER ,'ahle_all_withattr.csv'))
+    ## Using data with disease-specific attribution
+    ecs_ahle_all_withattr = pd.read_csv(os.path.join(DATA_FOLDER ,'ahle_all_withattr_disease.csv'))
+
+    # JR 2023-4-19: added regional results. Testing with Nationl level (should be same as before).
+    # ahle_all_scensmry = ahle_all_scensmry.query("region == 'National'").copy()
+    ecs_ahle_summary2 = ecs_ahle_summary2.query("region == 'National'")
+    # ecs_ahle_all_withattr = ecs_ahle_all_withattr.query("region == 'National'")
+
+    # Expert opinion files
+    ecs_expertattr_smallrum = pd.read_csv(os.path.join(DATA_FOLDER ,'attribution_experts_smallruminants.csv'))
+    ecs_expertattr_cattle = pd.read_csv(os.path.join(DATA_FOLDER ,'attribution_experts_cattle.csv'))
+    ecs_expertattr_poultry = pd.read_csv(os.path.join(DATA_FOLDER ,'attribution_experts_chickens.csv'))
+
+    # -------------------------------------------------------------------------
+    # Global Aggregate
+    # -------------------------------------------------------------------------
+    # Biomass FAOSTAT
+    ga_countries_biomass = pd.read_pickle(os.path.join(DATA_FOLDER ,'world_ahle_abt_fordash.pkl.gz'))
+    ga_countries_biomass = ga_countries_biomass.drop(columns=ga_drop_columns)
+
+    _drop_species = (ga_countries_biomass['species'].isin(drop_species))
+    ga_countries_biomass = ga_countries_biomass.loc[~ _drop_species]
+
+    _drop_countries = (ga_countries_biomass['country'].str.upper().isin(drop_countries_upper))
+    ga_countries_biomass = ga_countries_biomass.loc[~ _drop_countries]
+
+    # Keep history only to 2015
+    # ga_countries_biomass = ga_countries_biomass.loc[ga_countries_biomass['year'] >= 2015]
+
+    # Drop missing values from species
+    ga_countries_biomass['species'].replace('', np.nan, inplace=True)
+    ga_countries_biomass.dropna(subset=['species'], inplace=True)
+
+    # Income group
+    # Rename Overall to more descriptive
+    ga_countries_biomass['incomegroup'] = ga_countries_biomass['incomegroup'].replace(
+        {'L': 'Low',
+         'LM':'Lower Middle',
+         'UM':'Upper Middle',
+         'H':'High',
+         'UNK':'Unassigned',
+         'NaN':'Unassigned'
+         })
+
+    # replacing na values in college with No college
+    ga_countries_biomass['incomegroup'].fillna("Unassigned", inplace = True)
+
+    # World Bank regions
+    ga_countries_biomass['region_label'] = ga_countries_biomass['region'].replace({'EAP': 'East Asia & Pacific',
+                                                                             'ECA':'Europe & Central Asia',
+                                                                             'LAC':'Latin America & the Caribbean',
+                                                                             'MENA':'Middle East & North Africa',
+                                                                             'NA':'North America',
+                                                                             'SA':'South Asia',
+                                                                             'SSA':'Sub-Saharan Africa'})
+
+    # Number rows from zero, as the tables in the callbacks are after merging with the antimicrobial data,
+    # so the geography index below can filter them by row position
+    ga_countries_biomass = ga_countries_biomass.reset_index(drop=True)
+
+    # Geography index for each region-country alignment: region -> income group -> country, with the
+    # species and years available for each. Cascading dropdowns and filters look up the current selections in it.
+    # The region level is called region_label in all three. For WOAH and FAO it is a region from the lists above.
+    ga_geo_index = {
+        'World Bank':geo.build_geo_index(ga_countries_biomass)
+        ,'WOAH':geo.build_geo_index(ga_countries_biomass ,REGIONS=ga_woah_region_countries)
+        ,'FAO':geo.build_geo_index(ga_countries_biomass ,REGIONS=ga_fao_region_countries)
+    }
 
-amu_combined_regional = pd.read_csv(os.path.join(DASH_DATA_FOLDER, "amu_combined_regional.csv"))
-# amu_uncertainty_data = pd.read_csv(os.path.join(DASH_DATA_FOLDER, "amu_uncertainty_data.csv"))
+    # -------------------------------------------------------------------------
+    # Antimicrobial Usage
+    # -------------------------------------------------------------------------
+    amu2018_combined_tall = pd.read_csv(os.path.join(DATA_FOLDER, "amu2018_combined_tall.csv"))
+
+    # Create region labels with number of countries reporting
+    # amu2018_combined_tall["region_with_countries_reporting"] = \
+    #     amu2018_combined_tall['region'] + " (" + round(amu2018_combined_tall['number_of_countries'] ,0).astype(int).astype(str) + ")"
+
+    # Create region labels with proportion of biomass represented in countries reporting
+    amu2018_combined_tall["region_with_countries_reporting"] = \
+        amu2018_combined_tall['region'] \
+            + " (" + round(amu2018_combined_tall['number_of_countries'] ,0).astype(int).astype(str) \
+            + " | " + round(amu2018_combined_tall['biomass_prpn_reporting'] * 100 ,1).astype(str) + "%)"
+
+    amu_combined_regional = pd.read_csv(os.path.join(DATA_FOLDER, "amu_combined_regional.csv"))
+    # amu_uncertainty_data = pd.read_csv(os.path.join(DATA_FOLDER, "amu_uncertainty_data.csv"))
+
+    # Antimicrobial resistance data
+    amr_withsmry = pd.read_csv(os.path.join(DATA_FOLDER, "amr_withsmry.csv"))
+
+    return {
+        'breedstd':breedstd
+        ,'gbads_chickens_merged_fordash':gbads_chickens_merged_fordash
+        ,'gbads_pigs_merged_fordash':gbads_pigs_merged_fordash
+        ,'ecs_ahle_summary':ecs_ahle_summary
+        ,'ahle_all_scensmry':ahle_all_scensmry
+        ,'ecs_ahle_summary2':ecs_ahle_summary2
+        ,'ecs_ahle_all_withattr':ecs_ahle_all_withattr
+        ,'ecs_expertattr_smallrum':ecs_expertattr_smallrum
+        ,'ecs_expertattr_cattle':ecs_expertattr_cattle
+        ,'ecs_expertattr_poultry':ecs_expertattr_poultry
+        ,'ga_countries_biomass':ga_countries_biomass
+        ,'ga_geo_index':ga_geo_index
+        ,'amu2018_combined_tall':amu2018_combined_tall
+        ,'amu_combined_regional':amu_combined_regional
+        ,'amr_withsmry':amr_withsmry
+    }
 
-# Antimicrobial resistance data
-amr_withsmry = pd.read_csv(os.path.join(DASH_DATA_FOLDER, "amr_withsmry.csv"))
+# Pipelines publish their outputs as versioned snapshots of the data folder. Read the current one.
+# The callbacks read it as attributes of data, e.g. data.ga_countries_biomass.
+data = snap.DataHolder(read_pipeline_data(snap.current_folder(DASH_DATA_FOLDER)))
 
 # =============================================================================
 #### User options and defaults
@@ -593,15 +724,8 @@ metric_options = [
 # -----------------------------------------------------------------------------
 # Poultry
 # -----------------------------------------------------------------------------
-country_options_poultry = []
-for i in np.sort(gbads_chickens_merged_fordash['country'].unique()) :
-   country_shortname = country_shortnames[i]
-   compound_label = f"{i} ({country_shortname})"
-   str(country_options_poultry.append({'label':compound_label,'value':(i)}))
-
-year_options_poultry = []
-for i in np.sort(gbads_chickens_merged_fordash['year'].unique()) :
-   str(year_options_poultry.append({'label':i,'value':(i)}))
+country_options_poultry = []   # Filled from the data by refresh_data_options() below
+year_options_poultry = []   # Filled from the data by refresh_data_options() below
 
 # Global defaults for sliders
 # Most sliders will default to a value based on data for the selected country and year
@@ -629,32 +753,14 @@ poultry_lookup_breed_from_country = {
    ,'United States of America':'Cobb 500'
 }
 
-# Breed data lookup
-# Keys must match values in poultry_lookup_breed_from_country
-# Values must be data frames imported above
-poultry_lookup_breed_df = {
-   'Cobb 500':poultrybreedstd_cobb500
-   ,'Ross 308':poultrybreedstd_ross308
-   ,'Ross 708':poultrybreedstd_ross708
-   ,'Venncobb 400':poultrybreedstd_vencobb400
-}
+# Breed data lookup: data.breedstd
+# Values in poultry_lookup_breed_from_country must be keys there
 
 # -----------------------------------------------------------------------------
 # Swine
 # -----------------------------------------------------------------------------
-country_options_swine = []
-for i in np.sort(gbads_pigs_merged_fordash['country'].unique()) :
-   country_shortname = country_shortnames[i]
-   compound_label = f"{i} ({country_shortname})"
-   # Update March 2025: removing Denmark to avoid inconsistencies with the AMU Case Study dashboard
-   if country_shortname == 'DNK':
-       continue     # Go to next iteration of loop without adding this
-   else:
-       str(country_options_swine.append({'label':compound_label,'value':(i)}))
-
-year_options_swine = []
-for i in np.sort(gbads_pigs_merged_fordash['year'].unique()):
-   str(year_options_swine.append({'label':i,'value':(i)}))
+country_options_swine = []   # Filled from the data by refresh_data_options() below
+year_options_swine = []   # Filled from the data by refresh_data_options() below
 
 # Global defaults for sliders
 # Most sliders will default to a value based on data for the selected country and year
@@ -684,12 +790,8 @@ swine_lookup_breed_from_country = {
    ,'United States of America':'PIC'
 }
 
-# Breed data lookup
-# Keys must match values in swine_lookup_breed_from_country
-# Values must be data frames imported above
-swine_lookup_breed_df = {
-   'PIC':swinebreedstd_pic_growthandfeed
-}
+# Breed data lookup: data.breedstd
+# Values in swine_lookup_breed_from_country must be keys there
 # =============================================================================
 #### Global Aggregate options
 # =============================================================================
@@ -699,39 +801,18 @@ ecs_display_options = [{'label': i, 'value': i, 'disabled': False} for i in ["Di
                                                                             ]]
 
 # Species
-ga_species_options = []
-for i in ga_countries_biomass['species'].unique():
-    str(ga_species_options.append({'label':i,'value':(i)}))
+ga_species_options = []   # Filled from the data by refresh_data_options() below
 
-country_options_ga = [{'label': "All", 'value': "All", 'disabled': False}]
-for i in ga_countries_biomass['country'].unique():
-    str(country_options_ga.append({'label':i,'value':(i)}))
+country_options_ga = []   # Filled from the data by refresh_data_options() below
 
 # Income group
-# Rename Overall to more descriptive
-ga_countries_biomass['incomegroup'] = ga_countries_biomass['incomegroup'].replace(
-    {'L': 'Low',
-     'LM':'Lower Middle',
-     'UM':'Upper Middle',
-     'H':'High',
-     'UNK':'Unassigned',
-     'NaN':'Unassigned'
-     })
-
-# replacing na values in college with No college
-ga_countries_biomass['incomegroup'].fillna("Unassigned", inplace = True)
-
-incomegrp_options_ga = [{'label': "All", 'value': "All"}]
-for i in ga_countries_biomass['incomegroup'].unique():
-    str(incomegrp_options_ga.append({'label':i,'value':(i)}))
+incomegrp_options_ga = []   # Filled from the data by refresh_data_options() below
 
 # Mortality rate
 mortality_rate_options_ga = [{'label': f'{i*100: .0f}%', 'value': i, 'disabled': True} for i in list(np.array(range(1, 11)) / 100)]
 
 # Year
-year_options_ga = []
-for i in np.sort(ga_countries_biomass['year'].unique()):
-   str(year_options_ga.append({'label':i,'value':(i)}))
+year_options_ga = []   # Filled from the data by refresh_data_options() below
 
 # AHLE elements
 # Values here must match item names defined in prep_ahle_forwaterfall_ga()
@@ -782,23 +863,7 @@ WOAH_region_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in [
                                                                                "Europe",
                                                                                "Middle East"
                                                                                ]]
-# WOAH region-country mapping
-WOAH_africa_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["Ethiopia"]]
-
-WOAH_americas_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["Brazil",
-                                                                                 "United States of America"]]
-
-WOAH_asia_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["India",
-                                                                             "United States of America"]]
-
-WOAH_europe_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["France",
-                                                                               "Germany",
-                                                                               "Italy",
-                                                                               "Netherlands",
-                                                                               "Poland",
-                                                                               "United Kingdom"]]
-
-WOAH_me_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["TEST"]]
+# WOAH region-country mapping: ga_woah_region_countries, in the geography index (ga_geo_index)
 
 
 # FAO regions
@@ -807,87 +872,76 @@ fao_region_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["
                                                                                "Asia",
                                                                                "Europe and Central Asia",
                                                                                "Latin America and the Caribbean",
-                                                                               "Near East and North Africa"
+                                                                               "Near East and North Africa",
                                                                                "South West Pacific"
                                                                                ]]
 
-# FAO region-country mapping
-fao_africa_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["Ethiopia"]]
-
-fao_asia_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["India"]]
-
-fao_eca_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["France",
-                                                                            "Germany",
-                                                                            "Italy",
-                                                                            "Netherlands",
-                                                                            "Poland",
-                                                                            "United Kingdom"]]
-
-fao_lac_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["Brazil"]]
-
-fao_ena_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["TEST"]]
-
-
-fao_swp_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["France",
-                                                                            "United States of America"]]
+# FAO region-country mapping: ga_fao_region_countries, in the geography index (ga_geo_index)
 
 # World Bank regions
-ga_countries_biomass['region_label'] = ga_countries_biomass['region'].replace({'EAP': 'East Asia & Pacific',
-                                                                         'ECA':'Europe & Central Asia',
-                                                                         'LAC':'Latin America & the Caribbean',
-                                                                         'MENA':'Middle East & North Africa',
-                                                                         'NA':'North America',
-                                                                         'SA':'South Asia',
-                                                                         'SSA':'Sub-Saharan Africa'})
-
-wb_region_options_ga = [{'label': "All", 'value': "All"}]
-for i in ga_countries_biomass['region_label'].unique():
-    str(wb_region_options_ga.append({'label':i,'value':(i)}))
+wb_region_options_ga = []   # Filled from the data by refresh_data_options() below
 
 # World Bank region-country mapping
 # Pulled from World Bank site (https://datahelpdesk.worldbank.org/knowledgebase/articles/906519-world-bank-country-and-lending-groups)
+# Geography index (ga_geo_index) is built in read_pipeline_data(), one for each alignment
+
+# Geography index for the selected region-country alignment. World Bank if none is selected.
+def ga_geo_index_for(region_country):
+    return data.ga_geo_index.get(region_country ,data.ga_geo_index['World Bank'])
+
+# -----------------------------------------------------------------------------
+# Options from the data
+# -----------------------------------------------------------------------------
+# The option lists above that depend on the data are filled here. They are rebuilt in place
+# when the data is reloaded, so the layout, the clientside lookups and the callbacks, which all
+# refer to these lists, show the countries and years of the new data.
+def refresh_data_options():
+    # Poultry
+    country_options_poultry[:] = [
+        {'label':f"{i} ({country_shortnames.get(i ,i)})" ,'value':i}
+        for i in np.sort(data.gbads_chickens_merged_fordash['country'].unique())
+    ]
+    year_options_poultry[:] = [{'label':i ,'value':i} for i in np.sort(data.gbads_chickens_merged_fordash['year'].unique())]
+
+    # Swine
+    # Update March 2025: removing Denmark to avoid inconsistencies with the AMU Case Study dashboard
+    country_options_swine[:] = [
+        {'label':f"{i} ({country_shortnames.get(i ,i)})" ,'value':i}
+        for i in np.sort(data.gbads_pigs_merged_fordash['country'].unique())
+        if country_shortnames.get(i) != 'DNK'
+    ]
+    year_options_swine[:] = [{'label':i ,'value':i} for i in np.sort(data.gbads_pigs_merged_fordash['year'].unique())]
+
+    # Global Aggregate
+    ga_countries_biomass = data.ga_countries_biomass
+    ga_species_options[:] = [{'label':i ,'value':i} for i in ga_countries_biomass['species'].unique()]
+    country_options_ga[:] = [{'label': "All", 'value': "All", 'disabled': False}] \
+        + [{'label':i ,'value':i} for i in ga_countries_biomass['country'].unique()]
+    incomegrp_options_ga[:] = [{'label': "All", 'value': "All"}] \
+        + [{'label':i ,'value':i} for i in ga_countries_biomass['incomegroup'].unique()]
+    year_options_ga[:] = [{'label':i ,'value':i} for i in np.sort(ga_countries_biomass['year'].unique())]
+    wb_region_options_ga[:] = [{'label': "All", 'value': "All"}] \
+        + [{'label':i ,'value':i} for i in ga_countries_biomass['region_label'].unique()]
+    return None
+
+refresh_data_options()
 
-# East Asia & Pacific options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'East Asia & Pacific')]
-wb_eap_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_eap_options_ga.append({'label':i,'value':(i)}))
-
-# Europe & Central Asia options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'Europe & Central Asia')]
-wb_eca_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_eca_options_ga.append({'label':i,'value':(i)}))
-
-# Latin America & the Caribbean options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'Latin America & the Caribbean')]
-wb_lac_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_lac_options_ga.append({'label':i,'value':(i)}))
-
-# Middle East & North Africa options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'Middle East & North Africa')]
-wb_mena_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_mena_options_ga.append({'label':i,'value':(i)}))
-
-# North America options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'North America')]
-wb_na_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_na_options_ga.append({'label':i,'value':(i)}))
-
-# South Asia options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'South Asia')]
-wb_southasia_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_southasia_options_ga.append({'label':i,'value':(i)}))
-
-# Sub-Saharan Africa options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'Sub-Saharan Africa')]
-wb_africa_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_africa_options_ga.append({'label':i,'value':(i)}))
+# =============================================================================
+#### Data reloading
+# =============================================================================
+# When a pipeline publishes a new snapshot, it is read in the background and swapped in between
+# requests, together with clearing results derived from the old data. See lib/data_snapshots.py.
+# Status at /metrics/data (local requests only). Set DASH_DATA_POLL_S=0 to turn reloading off.
+# Dropdown options built from the data are rebuilt at the swap (see Options from the data above).
+snap.register_reload(
+    gbadsDash
+    ,DASH_DATA_FOLDER
+    ,read_pipeline_data
+    ,data
+    ,CLEAR=[refresh_data_options ,exp.clear_exports ,bgj.clear_results ,warm.clear_responses]
+    ,AFTER_SWAP=[warm.warm_again]
+    ,POLL_S=float(os.environ.get('DASH_DATA_POLL_S' ,30))
+)
 
 
 # =============================================================================
@@ -923,6 +977,130 @@ for i in options['country'].unique():
 #      'height': '3.2rem',
 #      'margin': '0rem 1rem',
 #  }
+# =============================================================================
+#### Data exports
+# =============================================================================
+# Datasets that can be downloaded in full or filtered from /export/<name>.csv or .parquet
+# See lib/data_export.py for the query parameters
+# Burden of disease at the default slider values, using the breed standard for each country
+# Poultry days on feed default to the data for each country and year, as in the dashboard
+def calc_bod_poultry_defaults():
+    input_df = data.gbads_chickens_merged_fordash.loc[
+        data.gbads_chickens_merged_fordash['country'].isin(list(poultry_lookup_breed_from_country))
+    ]
+    breed_labels = input_df['country'].map(poultry_lookup_breed_from_country)
+    days_on_feed = input_df['acc_avgdaysonfeed'].fillna(dof_poultry_default)
+    frames = []
+    for (BREED_LABEL ,AVG_DOF) ,group_df in input_df.groupby([breed_labels ,days_on_feed] ,sort=False):
+        frames.append(bod.calc_bod_master_poultry(
+            group_df
+            ,ACHIEVABLE_PCT_MASTER=achievable_pct_poultry_default
+            ,AVG_DOF_MASTER=AVG_DOF
+            ,BREED_DF_MASTER=data.breedstd[BREED_LABEL]
+            ,FEEDPRICE_USDPERTONNE_MASTER=ration_price_poultry_default
+            ,IDEAL_FCR_LIVE_MASTER=fcr_poultry_default
+        ))
+    return pd.concat(frames).sort_index()
+
+def calc_bod_swine_defaults():
+    return bod.calc_bod_master_swine(
+        data.gbads_pigs_merged_fordash
+        ,ACHIEVABLE_WT_KG_MASTER=achievable_weight_swine_default
+        ,AVG_DOF_MASTER=dof_swine_default
+        ,BREED_DF_MASTER=data.breedstd['PIC']
+        ,AVG_CARC_YIELD_MASTER=0.75
+        ,FEEDPRICE_USDPERTONNE_MASTER=ration_price_swine_default
+        ,IDEAL_FCR_LIVE_MASTER=fcr_swine_default
+    )
+
+# Antimicrobial data with the default usage and price for each region selected (the middle of each slider)
+def prep_amu_regional_defaults():
+    df = data.amu_combined_regional.copy()
+    df['amu_terrestrial_tonnes_selected'] = df['terr_amu_tonnes_region_2020'].astype(int)
+    df['am_price_usdpertonne_selected'] = df['am_price_usdpertonne_mid'].astype(int)
+    df['am_expenditure_usd_selected'] = df['amu_terrestrial_tonnes_selected'] * df['am_price_usdpertonne_selected']
+    df['am_expenditure_usd_perkg_selected'] = df['am_expenditure_usd_selected'] / df['biomass_terr_kg_region']
+    return df
+
+# Global aggregate AHLE with the default antimicrobial data, calculated as in the global aggregate callbacks
+# Drops the working columns added by ga.add_antimicrobial_expenditure()
+ga_export_drop_columns = [
+    'region_woah'
+    ,'am_expenditure_usd_selected'
+    ,'total_biomass_thisregion_thisyear'
+    ,'total_biomass_prpnofregion_thisyear'
+]
+def calc_ga_ahle_defaults():
+    input_df = ga.add_mortality_rate(data.ga_countries_biomass)
+    input_df = ga.add_morbidity_rate(input_df)
+    input_df = ga.add_vetmed_rates(input_df)
+    input_df = ga.add_antimicrobial_expenditure(input_df ,prep_amu_regional_defaults())
+    input_df = ga.ahle_calcs_adj_outputs(input_df)
+    return input_df.drop(columns=ga_export_drop_columns)
+
+# Calculated datasets are kept until the data is reloaded. The others are read from the data at each export.
+exp.add_dataset('poultry-bod' ,calc_bod_poultry_defaults ,FILTER_VARS=['country' ,'year'] ,KEEP=True)
+exp.add_dataset('swine-bod' ,calc_bod_swine_defaults ,FILTER_VARS=['country' ,'year'] ,KEEP=True)
+exp.add_dataset('ga-ahle' ,calc_ga_ahle_defaults ,FILTER_VARS=['region_label' ,'incomegroup' ,'country' ,'species' ,'year'] ,KEEP=True)
+exp.add_dataset('ecs-scenario-summary' ,lambda: data.ahle_all_scensmry ,FILTER_VARS=['species' ,'production_system' ,'agesex_scenario' ,'region' ,'year'])
+exp.add_dataset('ecs-attribution' ,lambda: data.ecs_ahle_all_withattr ,FILTER_VARS=['species' ,'production_system' ,'region' ,'age_group' ,'sex' ,'ahle_component' ,'cause'])
+exp.add_dataset('ecs-expert-attribution-smallruminants' ,lambda: data.ecs_expertattr_smallrum)
+exp.add_dataset('ecs-expert-attribution-cattle' ,lambda: data.ecs_expertattr_cattle)
+exp.add_dataset('ecs-expert-attribution-poultry' ,lambda: data.ecs_expertattr_poultry)
+
+# =============================================================================
+#### Clientside lookups
+# =============================================================================
+# Static tables used by the clientside callbacks in assets/clientside_callbacks.js
+# Shipped once with the layout in dcc.Store(id='clientside-lookups')
+# Country options: for each alignment, options by region, and the region to use for regions not listed
+clientside_lookups = {
+    'region_options':{
+        'WOAH':WOAH_region_options
+        ,'FAO':fao_region_options
+        ,'World Bank':wb_region_options
+        }
+    ,'country_options':{
+        'WOAH':{
+            'regions':{
+                'Africa':WOAH_africa_options
+                ,'Americas':WOAH_americas_options
+                ,'Asia, Far East and Oceania':WOAH_asia_options
+                ,'Europe':WOAH_europe_options
+                }
+            ,'other':'Europe'
+            }
+        ,'FAO':{
+            'regions':{
+                'Africa':fao_africa_options
+                ,'Asia':fao_asia_options
+                ,'Europe and Central Asia':fao_eca_options
+                ,'Latin America and the Caribbean':fao_lac_options
+                ,'South West Pacific':fao_swp_options
+                }
+            ,'other':'South West Pacific'
+            }
+        ,'World Bank':{
+            'regions':{
+                'Sub-Saharan Africa':wb_africa_options
+                ,'Europe & Central Asia':wb_eca_options
+                ,'Latin America & the Caribbean':wb_lac_options
+                ,'North America':wb_na_options
+                ,'South Asia':wb_southasia_options
+                }
+            ,'other':'South Asia'
+            }
+        }
+    ,'all_country_options':{
+        'poultry':country_options_poultry
+        ,'swine':country_options_swine
+        }
+    ,'defaults':{
+        'achievable_pct_poultry':achievable_pct_poultry_default
+        ,'dof_swine':dof_swine_default
+        }
+}
+
 # =============================================================================
 #### Burden of disease calcs
 # =============================================================================
@@ -1275,22 +1453,24 @@ def prep_bod_forstackedbar_swine(INPUT_DF):
 
    return OUTPUT_DF
 
+# Ordering of current values dictionary determines order in plot
+ga_current_values_labels = {
+    'biomass_value_2010usd':'Biomass'
+    ,'output_value_meat_2010usd':'Meat'
+    ,'output_value_eggs_2010usd':'Eggs'
+    ,'output_value_milk_2010usd':'Milk'
+    ,'output_value_wool_2010usd':'Wool'
+
+    ,'vetspend_farm_usd':'Producers vet & med costs'
+    # Update 4/5/2023: William no longer wants public expenditure to appear in calculations
+    # ,'vetspend_public_usd':'Public vet & med costs'
+    ,'antimicrobial_expenditure_usd':'Antimicrobial expenditure'
+
+    ,'net_value_2010usd':'Net value'
+}
+
 def prep_ahle_forwaterfall_ga(INPUT_DF):
-    # Ordering of current values dictionary determines order in plot
-    current_values_labels = {
-        'biomass_value_2010usd':'Biomass'
-        ,'output_value_meat_2010usd':'Meat'
-        ,'output_value_eggs_2010usd':'Eggs'
-        ,'output_value_milk_2010usd':'Milk'
-        ,'output_value_wool_2010usd':'Wool'
-
-        ,'vetspend_farm_usd':'Producers vet & med costs'
-        # Update 4/5/2023: William no longer wants public expenditure to appear in calculations
-        # ,'vetspend_public_usd':'Public vet & med costs'
-        ,'antimicrobial_expenditure_usd':'Antimicrobial expenditure'
-
-        ,'net_value_2010usd':'Net value'
-    }
+    current_values_labels = ga_current_values_labels
     current_value_columns = list(current_values_labels)
     ideal_values_labels = {
         'ideal_biomass_value_2010usd':'Biomass'
@@ -1362,16 +1542,13 @@ def prep_ahle_forwaterfall_ga(INPUT_DF):
 #### Define the figures
 # =============================================================================
 # Define the Waterfall
-def create_waterfall(x, y, text):
+def _build_waterfall_template():
      waterfall_fig = go.Figure(go.Waterfall(
         name = "20",
         orientation = "v",
 
         measure = ["relative", "relative", "relative", "relative", "total"],  # This needs to change with number of columns in waterfalll
-        x=x,
-        y=y,
         hoverinfo = 'none',  # Disable the hover over tooltip
-        text=text,
         textposition = ["outside","outside","auto","auto","outside"],
         decreasing = {'marker':{"color":'#F7931D'}},
         increasing = {'marker':{"color":'#3598DB'}},
@@ -1390,8 +1567,13 @@ def create_waterfall(x, y, text):
 
      return waterfall_fig
 
+@cbm.figure_function
+def create_waterfall(x, y, text):
+     waterfall_fig = figt.figure_from_template('waterfall', _build_waterfall_template, [{'x':x, 'y':y, 'text':text}])
+     return waterfall_fig
+
 # Define the Sankey
-def create_sankey(label_list, color, x, y, source, target, values, n):
+def _build_sankey_template():
     sankey_fig = go.Figure(data=go.Sankey(
         textfont = dict(size=15),
         arrangement = 'fixed',
@@ -1401,39 +1583,36 @@ def create_sankey(label_list, color, x, y, source, target, values, n):
             pad = 25,
             thickness = 15,
             line = dict(color = "black", width = 0.5),
-            label = label_list,
-            x = x,
-            y = y,
-            color = color
             ),
-        link = dict(
-            source = source,
-            target = target,
-            value = values,
-            color = ['#ededed']*n),
         ))
     return sankey_fig
 
+@cbm.figure_function
+def create_sankey(label_list, color, x, y, source, target, values, n):
+    sankey_fig = figt.figure_from_template('sankey', _build_sankey_template, [{
+        'node':dict(label = label_list, x = x, y = y, color = color),
+        'link':dict(source = source, target = target, value = values, color = ['#ededed']*n),
+        }])
+    return sankey_fig
+
 # Define the stacked bar
-def create_stacked_bar_poultry(input_df, x, y, color):
-    bar_fig = px.bar(
-       input_df,
-       x=x,
-       y=y,
-       color=color,
-       # Keys in color map must match values assigned in pretty_bod_cost_names
-       color_discrete_map={
-          "Feed":"#2A80B9",
-          "Chicks":"#9B58B5",
-          "Labour":"#F1C40F",
-          "Land & Housing":"#2DCC70",
-          "Medicine":"#7A7A7A",
-          "Other":"#7A7A7A",
-          "Burden of Disease":"#F7931D",
-          },
-       text='label'
-       )
+# Keys in color map must match values assigned in pretty_bod_cost_names
+stacked_bar_colors_poultry = {
+   "Feed":"#2A80B9",
+   "Chicks":"#9B58B5",
+   "Labour":"#F1C40F",
+   "Land & Housing":"#2DCC70",
+   "Medicine":"#7A7A7A",
+   "Other":"#7A7A7A",
+   "Burden of Disease":"#F7931D",
+   }
+
+def _build_stacked_bar_template_poultry():
+    bar_fig = go.Figure(go.Bar(showlegend=True))
     bar_fig.update_layout(
+       barmode='relative',
+       margin_t=60,                 # Match plotly express defaults
+       legend_tracegroupgap=0,
        plot_bgcolor="#ededed",
        hovermode=False,
        showlegend=True,
@@ -1449,23 +1628,31 @@ def create_stacked_bar_poultry(input_df, x, y, color):
         )
     return bar_fig
 
-def create_stacked_bar_swine(input_df, x, y, color):
-    bar_fig = px.bar(
-       input_df,
-       x=x,
-       y=y,
-       color=color,
-       # Keys in color map must match values assigned in pretty_bod_cost_names
-       color_discrete_map={
-          "Feed":"#2A80B9",
-          "Nonfeed Variable Costs":"#9B58B5",
-          "Labour":"#F1C40F",
-          "Finance":"#2DCC70",
-          "Burden of Disease":"#F7931D",
-          },
-       text='label'
+@cbm.figure_function
+def create_stacked_bar_poultry(input_df, x, y, color):
+    bar_fig = figt.figure_from_template(
+       'stacked_bar_poultry',
+       _build_stacked_bar_template_poultry,
+       figt.stacked_bar_traces(x, y, color, stacked_bar_colors_poultry, text=input_df['label']),
+       LAYOUT={'legend':{'title':{'text':color.name}}},
        )
+    return bar_fig
+
+# Keys in color map must match values assigned in pretty_bod_cost_names
+stacked_bar_colors_swine = {
+   "Feed":"#2A80B9",
+   "Nonfeed Variable Costs":"#9B58B5",
+   "Labour":"#F1C40F",
+   "Finance":"#2DCC70",
+   "Burden of Disease":"#F7931D",
+   }
+
+def _build_stacked_bar_template_swine():
+    bar_fig = go.Figure(go.Bar(showlegend=True))
     bar_fig.update_layout(
+       barmode='relative',
+       margin_t=60,                 # Match plotly express defaults
+       legend_tracegroupgap=0,
        plot_bgcolor="#ededed",
        hovermode=False,
        showlegend=True,
@@ -1481,7 +1668,18 @@ def create_stacked_bar_swine(input_df, x, y, color):
         )
     return bar_fig
 
+@cbm.figure_function
+def create_stacked_bar_swine(input_df, x, y, color):
+    bar_fig = figt.figure_from_template(
+       'stacked_bar_swine',
+       _build_stacked_bar_template_swine,
+       figt.stacked_bar_traces(x, y, color, stacked_bar_colors_swine, text=input_df['label']),
+       LAYOUT={'legend':{'title':{'text':color.name}}},
+       )
+    return bar_fig
+
 # Define the attribution treemap
+@cbm.figure_function
 def create_attr_treemap_ecs(input_df, path):
     treemap_fig = px.treemap(
         input_df,
@@ -1508,18 +1706,13 @@ def create_attr_treemap_ecs(input_df, path):
     return treemap_fig
 
 # Define the AHLE waterfall
-def create_ahle_waterfall_ecs(input_df, name, measure, x, y):
+def _build_ahle_waterfall_template_ecs():
     waterfall_fig = go.Figure(go.Waterfall(
-        name = name,
         orientation = "v",
-        measure = measure,  # This needs to change with number of columns in waterfalll
-        x=x,
-        y=y,
         decreasing = {'marker':{"color":'#E84C3D'}},
         increasing = {'marker':{"color":'#3598DB'}},
         totals = {'marker':{"color":'#F7931D'}},
         connector = {"line":{"color":"darkgrey"}},
-        customdata=np.stack((y, input_df['item']), axis=-1),
         ))
 
     waterfall_fig.update_layout(clickmode='event+select', ### EVENT SELECT ??????
@@ -1545,30 +1738,39 @@ def create_ahle_waterfall_ecs(input_df, name, measure, x, y):
 
     return waterfall_fig
 
+@cbm.figure_function
+def create_ahle_waterfall_ecs(input_df, name, measure, x, y):
+    waterfall_fig = figt.figure_from_template('ahle_waterfall_ecs', _build_ahle_waterfall_template_ecs, [{
+        'name':name,
+        'measure':measure,  # This needs to change with number of columns in waterfalll
+        'x':x,
+        'y':y,
+        'customdata':np.stack((y, input_df['item']), axis=-1),
+        }])
+    return waterfall_fig
+
 # Define the stacked bar
-def create_stacked_bar_ecs(input_df, x, y, text, color, yaxis_title):
-    bar_fig = px.bar(
-        input_df,
-        x=x,
-        y=y,
-        text = text,
-        color=color,
-        color_discrete_map={
-          "Neonatal male":"#2A80B9",
-          "Neonatal":"#2A80B9",
-          "Neonatal female":"#6eb1de",
-          "Juvenile male":"#9B58B5",
-          "Juvenile":"#9B58B5",
-          "Juvenile female":"#caa6d8",
-          "Adult male":"#2DCC70",
-          "Adult female":"#82e3aa",
-          })
+stacked_bar_colors_ecs = {
+  "Neonatal male":"#2A80B9",
+  "Neonatal":"#2A80B9",
+  "Neonatal female":"#6eb1de",
+  "Juvenile male":"#9B58B5",
+  "Juvenile":"#9B58B5",
+  "Juvenile female":"#caa6d8",
+  "Adult male":"#2DCC70",
+  "Adult female":"#82e3aa",
+  }
+
+def _build_stacked_bar_template_ecs():
+    bar_fig = go.Figure(go.Bar(showlegend=True))
     bar_fig.update_layout(
+        barmode='relative',
+        margin_t=60,                # Match plotly express defaults
+        legend_tracegroupgap=0,
         plot_bgcolor="#ededed",
         hovermode=False,
         showlegend=True,
         xaxis_title=None,
-        yaxis_title=yaxis_title,
         )
     bar_fig.update_xaxes(
         fixedrange=True
@@ -1578,7 +1780,18 @@ def create_stacked_bar_ecs(input_df, x, y, text, color, yaxis_title):
         )
     return bar_fig
 
+@cbm.figure_function
+def create_stacked_bar_ecs(input_df, x, y, text, color, yaxis_title):
+    bar_fig = figt.figure_from_template(
+        'stacked_bar_ecs',
+        _build_stacked_bar_template_ecs,
+        figt.stacked_bar_traces(x, y, color, stacked_bar_colors_ecs, text=text),
+        LAYOUT={'yaxis':{'title':{'text':yaxis_title}}, 'legend':{'title':{'text':color.name}}},
+        )
+    return bar_fig
+
 # Define Ethiopia subnation level map
+@cbm.figure_function
 def create_map_display_ecs(input_df, geojson, location, featurekey, color_by, color_scale):
     ecs_map_fig = px.choropleth_mapbox(input_df,
                                        geojson=geojson,
@@ -1599,6 +1812,7 @@ def create_map_display_ecs(input_df, geojson, location, featurekey, color_by, co
     return ecs_map_fig
 
 # Wider Economic Impact charts for Ethiopia
+@cbm.figure_function
 def create_wei_chart(
         input_df                # Dataframe
         ,plot_xvar              # String: variable to use for x axis
@@ -1670,6 +1884,7 @@ def create_wei_chart(
     return fig
 
 # Define the Biomass map
+@cbm.figure_function
 def create_biomass_map_ga(input_df, iso_alpha3, value, country, display):
     biomass_map_fig = px.choropleth(input_df,
                                     locations=iso_alpha3,
@@ -1706,6 +1921,7 @@ def create_biomass_map_ga(input_df, iso_alpha3, value, country, display):
 
 # Define the biomass, pop, livewt line chart
 # def create_line_chart_ga(input_df, year, biomass, population, liveweight, country):
+@cbm.figure_function
 def create_line_chart_ga(input_df, year, value, country, facet):
     bio_pop_live_line_fig = px.line(input_df, x=year,
                                     y=value,
@@ -1735,13 +1951,9 @@ def create_line_chart_ga(input_df, year, value, country, facet):
 
     return bio_pop_live_line_fig
 
-def create_ahle_waterfall_ga(input_df, name, measure, x, y):
+def _build_ahle_waterfall_template_ga():
     waterfall_fig = go.Figure(go.Waterfall(
-        name = name,
         orientation = "v",
-        measure = measure,  # This needs to change with number of columns in waterfalll
-        x=x,
-        y=y,
         # text=text,
         # hoverinfo = 'none',
         # textposition = ["outside","outside","auto","auto","outside"],
@@ -1768,6 +1980,31 @@ def create_ahle_waterfall_ga(input_df, name, measure, x, y):
 
     return waterfall_fig
 
+@cbm.figure_function
+def create_ahle_waterfall_ga(input_df, name, measure, x, y):
+    waterfall_fig = figt.figure_from_template('ahle_waterfall_ga', _build_ahle_waterfall_template_ga, [{
+        'name':name,
+        'measure':measure,  # This needs to change with number of columns in waterfalll
+        'x':x,
+        'y':y,
+        }])
+    return waterfall_fig
+
+# To get credible intervals for the global AHLE charts from ga.ahle_uncertainty()
+# Data is limited to the country-years in the filtered chart data. Items are labeled as in the charts.
+def get_ahle_intervals_ga(input_df, input_df_amu, filtered_df, group_vars=[]):
+    mc_df = input_df.merge(filtered_df[['country' ,'year']].drop_duplicates(), on=['country' ,'year'])
+    intervals = ga.ahle_uncertainty(mc_df, input_df_amu, GROUP_VARS=group_vars)
+    intervals['item'] = intervals['item'].replace(ga_current_values_labels)
+    return intervals
+
+# To add a shaded credible interval around a line
+def add_interval_band_ga(fig, x, low, high, color, name):
+    fill_color = 'rgba({}, {}, {}, 0.2)'.format(*px.colors.hex_to_rgb(color))
+    fig.add_trace(go.Scatter(x=x, y=low, mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=x, y=high, mode='lines', line=dict(width=0), fill='tonexty', fillcolor=fill_color,
+                             name=f'{name} 95% interval', hoverinfo='skip'))
+    return fig
 
 # def create_map_display_amu(input_df, value):
 #     # Add graphing country column for map
@@ -1922,7 +2159,7 @@ gbadsDash.layout = html.Div([
             html.Div([
                 html.A(href="https://animalhealthmetrics.org/",
                        children=[
-                       html.Img(title="Link to GBADS site", src=os.environ.get("BASE_URL", "") + '/assets/GBADs-LOGO-Black-sm.png')
+                       html.Img(title="Link to GBADS site", src=ht.asset_url(gbadsDash ,'GBADs-LOGO-Black-sm.png'))
                        ]
                        ),
                 # html.H3("Inclusiveness Challenge Delivery Rigour Transparency",
@@ -1941,6 +2178,7 @@ gbadsDash.layout = html.Div([
     dcc.Store(id='core-data-poultry'),
     dcc.Store(id='core-data-swine'),
     dcc.Store(id='amu-regional-data'),
+    dcc.Store(id='clientside-lookups' ,data=clientside_lookups),
 
     #### TABS
     dcc.Tabs([
@@ -2089,6 +2327,7 @@ gbadsDash.layout = html.Div([
                               )
                     # End of Spinner
                     ],size="md", color="#393375", fullscreen=False),
+                    bgj.progress_bar('ga-map-progress'),
                     # End of Map
                     ]),
 
@@ -2135,6 +2374,20 @@ gbadsDash.layout = html.Div([
                             "margin-right":"70px",
                             }
                 ),
+                # Uncertainty
+                dbc.Col([
+                    html.H6("Uncertainty"),
+                    dcc.Checklist(id='select-uncertainty-ga',
+                                  options=[{'label': 'Show 95% credible interval', 'value': 'Show'}],
+                                  value=[],
+                                  inputStyle={"margin-right": "2px"}, # This pulls the words off of the button
+                                  ),
+                    ],
+                    style={
+                            "margin-top":"10px",
+                            "margin-right":"70px",
+                            }
+                ),
                 # Region-country alignment
                 dbc.Col([
                     html.H6('Region-country alignment'),
@@ -2349,6 +2602,7 @@ gbadsDash.layout = html.Div([
                                   )
                         # End of Spinner
                         ],size="md", color="#393375", fullscreen=False),
+                    bgj.progress_bar('ga-waterfall-progress'),
                     # End of Side by side waterfall
                     ],style={"width":5}),
 
@@ -2376,6 +2630,7 @@ gbadsDash.layout = html.Div([
                                   )
                         # End of Spinner
                         ],size="md", color="#393375", fullscreen=False),
+                    bgj.progress_bar('ga-over-time-progress'),
                     # End of plot over time
                     ],style={"width":5}),
                 ]),
@@ -2653,6 +2908,7 @@ gbadsDash.layout = html.Div([
                           )
                 # End of Spinner
                 ],size="md", color="#393375", fullscreen=False),
+                bgj.progress_bar('poultry-core-progress'),
                 # End of Waterfall
                 ],style={"width":5}),
 
@@ -2964,6 +3220,7 @@ gbadsDash.layout = html.Div([
                           )
                 # End of Spinner
                 ],size="md", color="#393375", fullscreen=False),
+                bgj.progress_bar('swine-core-progress'),
                 # End of Waterfall
                 ],style={"width":5}),
 
@@ -3863,76 +4120,30 @@ gbadsDash.layout = html.Div([
 #### -- Controls
 # ------------------------------------------------------------------------------
 #Update regions based on region contry aligment selection:
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='region_options'),
     Output(component_id='select-region-poultry', component_property='options'),
     Input(component_id='Region-country-alignment-poultry', component_property='value'),
+    State(component_id='clientside-lookups', component_property='data'),
     )
-def update_region_options_poultry(region_country):
-    if region_country == "WOAH":
-        options = WOAH_region_options
-    elif region_country =="FAO":
-        options = fao_region_options
-    elif region_country == "World Bank":
-        options = wb_region_options
-    return options
 
 # Update country options based on region selection
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='country_options_poultry'),
     Output(component_id='select-country-poultry', component_property='options'),
     Input(component_id='Region-country-alignment-poultry', component_property='value'),
     Input(component_id='select-region-poultry', component_property='value'),
+    State(component_id='clientside-lookups', component_property='data'),
     )
-def update_country_options_poultry(region_country, region):
-    if region_country == "WOAH":
-        if region == "All":
-            options = country_options_poultry
-        elif region == "Africa":
-            options = WOAH_africa_options
-        elif region == "Americas":
-            options = WOAH_americas_options
-        elif region == "Asia, Far East and Oceania":
-            options = WOAH_asia_options
-        else:
-            options = WOAH_europe_options
-    elif region_country =="FAO":
-        if region == "All":
-            options = country_options_poultry
-        elif region == "Africa":
-            options = fao_africa_options
-        elif region == "Asia":
-            options = fao_asia_options
-        elif region == "Europe and Central Asia":
-            options = fao_eca_options
-        elif region == "Latin America and the Caribbean":
-            options = fao_lac_options
-        else:
-            options = fao_swp_options
-    elif region_country == "World Bank":
-        if region == "All":
-            options = country_options_poultry
-        elif region == "Sub-Saharan Africa":
-            options = wb_africa_options
-        elif region == "Europe & Central Asia":
-            options = wb_eca_options
-        elif region == "Latin America & the Caribbean":
-            options = wb_lac_options
-        elif region == "North America":
-            options = wb_na_options
-        else:
-            options = wb_southasia_options
-    else:
-        options = country_options_poultry
-
-    return options
 
 # Set slider starting values and add reference underneath based on selected country
 # Also enable "Reset to Default" button
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='reset_achievablepct_poultry'),
     Output('achievable-pct-slider-poultry', 'value'),
-    Input(component_id='reset-val-poultry', component_property='n_clicks')   # Reset to defaults button
+    Input(component_id='reset-val-poultry', component_property='n_clicks'),   # Reset to defaults button
+    State('clientside-lookups', 'data'),
     )
-def reset_achievablepct_poultry(reset):
-    return achievable_pct_poultry_default
 
 @gbadsDash.callback(
     Output('dof-slider-poultry', 'value'),
@@ -3942,7 +4153,7 @@ def reset_achievablepct_poultry(reset):
     Input(component_id='reset-val-poultry', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_daysonfeed_poultry(country, year, reset):
-    input_df = gbads_chickens_merged_fordash
+    input_df = data.gbads_chickens_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_avgdaysonfeed'].values[0]
     country_shortname = country_shortnames[country]
@@ -3962,7 +4173,7 @@ def show_ref_daysonfeed_poultry(country, year, reset):
     Input(component_id='reset-val-poultry', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_producerprice_poultry(country, year, reset):
-    input_df = gbads_chickens_merged_fordash
+    input_df = data.gbads_chickens_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_producerprice_usdperkgcarc'].values[0]
     country_shortname = country_shortnames[country]
@@ -3982,7 +4193,7 @@ def show_ref_producerprice_poultry(country, year, reset):
     Input(component_id='reset-val-poultry', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_feedprice_poultry(country, year, reset):
-    input_df = gbads_chickens_merged_fordash
+    input_df = data.gbads_chickens_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_feedprice_usdpertonne'].values[0]
     country_shortname = country_shortnames[country]
@@ -4004,7 +4215,7 @@ def show_ref_feedprice_poultry(country, year, reset):
     )
 def show_ref_fcr_poultry(country, dof, reset):
     breed_label_touse = poultry_lookup_breed_from_country[country]
-    breed_df_touse = poultry_lookup_breed_df[breed_label_touse]
+    breed_df_touse = data.breedstd[breed_label_touse]
     _rowselect = (breed_df_touse['dayonfeed'] == dof)
     datavalue = breed_df_touse.loc[_rowselect ,'fcr'].values[0]
     if pd.isnull(datavalue):
@@ -4027,13 +4238,15 @@ def show_ref_fcr_poultry(country, dof, reset):
     Input('dof-slider-poultry','value'),
     Input('select-country-poultry','value'),
     Input('ration-price-slider-poultry','value'),
-    Input('fcr-slider-poultry','value')
+    Input('fcr-slider-poultry','value'),
+    **bgj.job_args('poultry-core-progress')
     )
-def update_core_data_poultry(achievable_pct, avg_dof, country, feedprice, fcr):
+def update_core_data_poultry(set_progress, achievable_pct, avg_dof, country, feedprice, fcr):
+    set_progress((0 ,2))
     breed_label_touse = poultry_lookup_breed_from_country[country]
-    breed_df_touse = poultry_lookup_breed_df[breed_label_touse]
+    breed_df_touse = data.breedstd[breed_label_touse]
     poultry_data_withbod = bod.calc_bod_master_poultry(
-      gbads_chickens_merged_fordash
+      data.gbads_chickens_merged_fordash
       ,ACHIEVABLE_PCT_MASTER=achievable_pct      # Integer [0, 120]: proportion of ideal production that is achievable without disease, i.e. efficiency of feed, medications, and practices
       ,AVG_DOF_MASTER=avg_dof                      # Integer (0, 63]: Average days on feed. Will lookup breed standard weight for this day on feed.
       ,BREED_DF_MASTER=breed_df_touse     # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
@@ -4041,6 +4254,7 @@ def update_core_data_poultry(achievable_pct, avg_dof, country, feedprice, fcr):
       ,IDEAL_FCR_LIVE_MASTER=fcr                        # Float: ideal FCR per kg live weight
       # ,AVG_CARC_YIELD_MASTER=0.695                 # Float [0, 1]: average carcass yield as proportion of live weight. If blank, will use 'bod_breedstdyield_prpn'.
     )
+    set_progress((1 ,2))
     poultry_data_withbod['year'] = poultry_data_withbod['year'].astype(str)   # Change Year type to text
     return poultry_data_withbod.to_json(date_format='iso', orient='split')
 
@@ -4117,7 +4331,8 @@ def update_background_data_poultry(input_json, country ,producerprice ,rationpri
     # ------------------------------------------------------------------------------
     # Order does not matter in these lists
     # Zero decimal places
-    background_data.update(background_data[[
+    number_formats = {}
+    number_formats.update({COL:tbl.fixed(0) for COL in [
       'acc_headplaced'
       ,'acc_headslaughtered'
       ,'acc_totalcarcweight_tonnes'
@@ -4131,10 +4346,10 @@ def update_background_data_poultry(input_json, country ,producerprice ,rationpri
       ,'wb_gdp_usd'
       ,'ideal_headplaced'
       ,'ideal_feed_tonnes'
-    ]].applymap('{:,.0f}'.format))
+    ]})
 
     # Two decimal places
-    background_data.update(background_data[[
+    number_formats.update({COL:tbl.fixed(2) for COL in [
       'bod_breedstdwt_kg'
       ,'bod_breedstdyield_prpn'
       ,'bod_breedstdcarcwt_kg'
@@ -4155,7 +4370,7 @@ def update_background_data_poultry(input_json, country ,producerprice ,rationpri
       ,'ideal_laborcost_usdperkglive'
       ,'ideal_medcost_usdperkglive'
       ,'ideal_othercost_usdperkglive'
-    ]].applymap('{:,.2f}'.format))
+    ]})
 
     # ------------------------------------------------------------------------------
     # Hover-over text
@@ -4212,11 +4427,11 @@ def update_background_data_poultry(input_json, country ,producerprice ,rationpri
             html.H4(f"Data for {country}"),
             # html.P('All currently processed data.  Unformatted and unfiltered.'),
             #html.P(' '.join(df['id'].tolist())),
-            dash_table.DataTable(
-                columns=[{"name": j, "id": i} for i, j in columns_to_display_with_labels.items()],
-                data=background_data.to_dict('records'),
-                export_format="csv",
-                sort_action = 'native',
+            tbl.paged_table(
+                'poultry-background-table',
+                background_data,
+                columns_to_display_with_labels,
+                FORMATS=number_formats,
                 # #filter_action="native",
                 style_cell={
                     # 'minWidth': '250px',
@@ -4245,7 +4460,7 @@ def update_background_data_poultry(input_json, country ,producerprice ,rationpri
     )
 def update_breed_data_poultry(country):
     breed_label_touse = poultry_lookup_breed_from_country[country]
-    breed_df_touse = poultry_lookup_breed_df[breed_label_touse]
+    breed_df_touse = data.breedstd[breed_label_touse]
 
     columns_to_display_with_labels = {
       'dayonfeed':'Day on Feed'
@@ -4572,74 +4787,30 @@ def update_stacked_bar_poultry(input_json, country, year):
 #### -- Controls
 # ------------------------------------------------------------------------------
 # Update regions based on region contry aligment selection:
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='region_options'),
     Output(component_id='select-region-swine', component_property='options'),
     Input(component_id='Region-country-alignment-swine', component_property='value'),
+    State(component_id='clientside-lookups', component_property='data'),
     )
-def update_region_options_swine(region_country):
-    if region_country == "WOAH":
-        options = WOAH_region_options
-    elif region_country =="FAO":
-        options = fao_region_options
-    elif region_country == "World Bank":
-        options = wb_region_options
-    return options
 
 # Update country options based on region selection
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='country_options_swine'),
     Output(component_id='select-country-swine', component_property='options'),
     Input(component_id='Region-country-alignment-swine', component_property='value'),
     Input(component_id='select-region-swine', component_property='value'),
+    State(component_id='clientside-lookups', component_property='data'),
     )
-def update_country_options_swine(region_country, region):
-    if region_country == "WOAH":
-        if region == "All":
-            options = country_options_swine
-        elif region == "Africa":
-            options = WOAH_africa_options
-        elif region == "Americas":
-            options = WOAH_americas_options
-        elif region == "Asia, Far East and Oceania":
-            options = WOAH_asia_options
-        else:
-            options = WOAH_europe_options
-    elif region_country =="FAO":
-        if region == "All":
-            options = country_options_swine
-        elif region == "Africa":
-            options = fao_africa_options
-        elif region == "Asia":
-            options = fao_asia_options
-        elif region == "Europe and Central Asia":
-            options = fao_eca_options
-        elif region == "Latin America and the Caribbean":
-            options = fao_lac_options
-        else:
-            options = fao_swp_options
-    elif region_country == "World Bank":
-        if region == "All":
-            options = country_options_swine
-        elif region == "Sub-Saharan Africa":
-            options = wb_africa_options
-        elif region == "Europe & Central Asia":
-            options = wb_eca_options
-        elif region == "Latin America & the Caribbean":
-            options = wb_lac_options
-        elif region == "North America":
-            options = wb_na_options
-        else:
-            options = wb_southasia_options
-
-    return options
 
 # Set slider starting values and add reference underneath based on selected country
 # Also enable "Reset to Default" button
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='reset_daysonfeed_swine'),
     Output('dof-slider-swine', 'value'),
-    Input(component_id='reset-val-swine', component_property='n_clicks')   # Reset to defaults button
+    Input(component_id='reset-val-swine', component_property='n_clicks'),   # Reset to defaults button
+    State('clientside-lookups', 'data'),
     )
-def reset_daysonfeed_swine(reset):
-    return dof_swine_default
 
 # @gbadsDash.callback(
 #     Output('dof-slider-swine', 'value'),
@@ -4689,7 +4860,7 @@ def reset_daysonfeed_swine(reset):
     Input(component_id='reset-val-swine', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_liveweight_swine(country, year, reset):
-    input_df = gbads_pigs_merged_fordash
+    input_df = data.gbads_pigs_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_avgliveweight_kg'].values[0]
     country_shortname = country_shortnames[country]
@@ -4709,7 +4880,7 @@ def show_ref_liveweight_swine(country, year, reset):
     Input(component_id='reset-val-swine', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_producerprice_swine(country, year, reset):
-    input_df = gbads_pigs_merged_fordash
+    input_df = data.gbads_pigs_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_producerprice_usdperkgcarc'].values[0]
     country_shortname = country_shortnames[country]
@@ -4729,7 +4900,7 @@ def show_ref_producerprice_swine(country, year, reset):
     Input(component_id='reset-val-swine', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_feedprice_swine(country, year, reset):
-    input_df = gbads_pigs_merged_fordash
+    input_df = data.gbads_pigs_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_feedprice_usdpertonne'].values[0]
     country_shortname = country_shortnames[country]
@@ -4751,7 +4922,7 @@ def show_ref_feedprice_swine(country, year, reset):
     )
 def show_ref_fcr_swine(country, dof, reset):
     breed_label_touse = swine_lookup_breed_from_country[country]
-    breed_df_touse = swine_lookup_breed_df[breed_label_touse]
+    breed_df_touse = data.breedstd[breed_label_touse]
     _rowselect = (breed_df_touse['dayonfeed'] == dof)
     datavalue = breed_df_touse.loc[_rowselect ,'cml_fcr'].values[0]
     if pd.isnull(datavalue):
@@ -4779,7 +4950,7 @@ def show_ref_fcr_swine(country, dof, reset):
 #       gbads_pigs_merged_fordash
 #       ,ACHIEVABLE_PCT_MASTER=achievable_pct
 #       ,AVG_DOF_MASTER=avg_dof
-#       ,BREED_DF_MASTER=swinebreedstd_pic_growthandfeed   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
+#       ,BREED_DF_MASTER=data.breedstd['PIC']   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
 #       ,AVG_CARC_YIELD_MASTER=0.75                        # Float [0, 1]: average carcass yield in kg meat per kg live weight
 #     )
 #     swine_data_withbod['year'] = swine_data_withbod['year'].astype(str)   # Change Year type to text
@@ -4792,18 +4963,21 @@ def show_ref_fcr_swine(country, dof, reset):
     Input('achievable-weight-slider-swine','value'),
     Input('dof-slider-swine','value'),
     Input('ration-price-slider-swine','value'),
-    Input('fcr-slider-swine','value')
+    Input('fcr-slider-swine','value'),
+    **bgj.job_args('swine-core-progress')
     )
-def update_core_data_swine(achievable_wt ,avg_dof ,feedprice ,fcr):
+def update_core_data_swine(set_progress ,achievable_wt ,avg_dof ,feedprice ,fcr):
+    set_progress((0 ,2))
     swine_data_withbod = bod.calc_bod_master_swine(
-        gbads_pigs_merged_fordash
+        data.gbads_pigs_merged_fordash
         ,ACHIEVABLE_WT_KG_MASTER=achievable_wt             # Float: achievable weight without disease
         ,AVG_DOF_MASTER=avg_dof                            # Integer [1, 176]: Average days on feed. Will lookup breed standard weight for this day on feed.
-        ,BREED_DF_MASTER=swinebreedstd_pic_growthandfeed   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
+        ,BREED_DF_MASTER=data.breedstd['PIC']   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
         ,AVG_CARC_YIELD_MASTER=0.75                        # Float [0, 1]: average carcass yield in kg meat per kg live weight
         ,FEEDPRICE_USDPERTONNE_MASTER=feedprice           # Float
         ,IDEAL_FCR_LIVE_MASTER=fcr                        # Float: ideal FCR per kg live weight
     )
+    set_progress((1 ,2))
     swine_data_withbod['year'] = swine_data_withbod['year'].astype(str)   # Change Year type to text
     return swine_data_withbod.to_json(date_format='iso', orient='split')
 
@@ -4819,7 +4993,7 @@ def update_core_data_swine(achievable_wt ,avg_dof ,feedprice ,fcr):
 #          gbads_pigs_merged_fordash
 #          ,ACHIEVABLE_WT_KG_MASTER=achievable_wt             # Float: achievable weight without disease
 #          ,AVG_FEEDINT_KG_MASTER=avg_feedint                 # Float: average feed intake in kg per head
-#          ,BREED_DF_MASTER=swinebreedstd_pic_growthandfeed   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
+#          ,BREED_DF_MASTER=data.breedstd['PIC']   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
 #          ,AVG_CARC_YIELD_MASTER=0.75                        # Float [0, 1]: average carcass yield as proportion of live weight
 #     )
 #     swine_data_withbod['year'] = swine_data_withbod['year'].astype(str)   # Change Year type to text
@@ -4899,7 +5073,8 @@ def update_background_data_swine(input_json, country ,producerprice ,rationprice
     # ------------------------------------------------------------------------------
     # Order does not matter in these lists
     # Zero decimal places
-    background_data.update(background_data[[
+    number_formats = {}
+    number_formats.update({COL:tbl.fixed(0) for COL in [
       'acc_breedingsows'
       ,'acc_headweaned'
       ,'acc_headplaced'
@@ -4916,18 +5091,18 @@ def update_background_data_swine(input_json, country ,producerprice ,rationprice
       ,'wb_gdp_usd'
       ,'ideal_headplaced'
       ,'ideal_feed_tonnes'
-    ]].applymap('{:,.0f}'.format))
+    ]})
 
     # One decimal place
-    background_data.update(background_data[[
+    number_formats.update({COL:tbl.fixed(1) for COL in [
       'bod_breedstdwt_kg'
       ,'bod_breedstdcarcwt_kg'
       ,'acc_avgcarcweight_kg'
       # ,'acc_avgfeedintake_kgperhd'
-    ]].applymap('{:,.1f}'.format))
+    ]})
 
     # Two decimal places
-    background_data.update(background_data[[
+    number_formats.update({COL:tbl.fixed(2) for COL in [
       'producerprice_usdperkg'
       ,'bod_totalburden_usd'
       ,'bod_breedstdyield_prpn'
@@ -4941,7 +5116,7 @@ def update_background_data_swine(input_json, country ,producerprice ,rationprice
       ,'ideal_nonfeedvariablecost_usdperkgcarc'
       ,'ideal_laborcost_usdperkgcarc'
       ,'ideal_landhousingcost_usdperkgcarc'
-    ]].applymap('{:,.2f}'.format))
+    ]})
 
     # ------------------------------------------------------------------------------
     # Hover-over text
@@ -4997,11 +5172,11 @@ def update_background_data_swine(input_json, country ,producerprice ,rationprice
 
     return [
             html.H4(f"Data for {country}"),
-            dash_table.DataTable(
-                columns=[{"name": j, "id": i} for i, j in columns_to_display_with_labels.items()],
-                data=background_data.to_dict('records'),
-                export_format="csv",
-                sort_action = 'native',
+            tbl.paged_table(
+                'swine-background-table',
+                background_data,
+                columns_to_display_with_labels,
+                FORMATS=number_formats,
                 style_cell={
                     # 'minWidth': '250px',
                     'font-family':'sans-serif',
@@ -5033,7 +5208,7 @@ def update_breed_data_swine(breed):
       ,'cml_feedintake_kg':'Cml Feed Intake (kg)'
       ,'cml_fcr':'FCR'
     }
-    breed_data = swinebreedstd_pic_growthandfeed.copy()
+    breed_data = data.breedstd['PIC'].copy()
 
     # Subset columns
     breed_data = breed_data[list(columns_to_display_with_labels)]
@@ -5368,57 +5543,7 @@ def update_region_detail_options_ga(region_country):
     Input('select-incomegrp-overview-ga','value'),
     )
 def update_country_overview_options_ga(region_country, region, income):
-    if region_country == "WOAH":
-        if region == "All":
-            options = country_options_ga
-        elif region == "Africa":
-            options = WOAH_africa_options_ga
-        elif region == "Americas":
-            options = WOAH_americas_options_ga
-        elif region == "Asia, Far East and Oceania":
-            options = WOAH_asia_options_ga
-        elif region == "Europe":
-            options = WOAH_europe_options_ga
-        else:
-            options = WOAH_me_options_ga
-    elif region_country =="FAO":
-        if region == "All":
-            options = country_options_ga
-        elif region == "Africa":
-            options = fao_africa_options_ga
-        elif region == "Asia":
-            options = fao_asia_options_ga
-        elif region == "Europe and Central Asia":
-            options = fao_eca_options_ga
-        elif region == "Latin America and the Caribbean":
-            options = fao_lac_options_ga
-        elif region == "Near East and North Africa":
-            options = fao_ena_options_ga
-        else:
-            options = fao_swp_options_ga
-    elif region_country == "World Bank":
-        if region == "All":
-            if income == "All":
-                options = country_options_ga
-            else:
-                options_df = ga_countries_biomass.loc[(ga_countries_biomass['incomegroup'] == income)]
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-        else:
-            options_df = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == region)]
-            if income == "All":
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-            else:
-                options_df = options_df.loc[(options_df['incomegroup'] == income)]
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-    else:
-        options = country_options_ga
-
+    options = geo.get_options(ga_geo_index_for(region_country) ,'country' ,region_label=region ,incomegroup=income)
     return options
 
 # Update country options based on region and income group selection
@@ -5429,153 +5554,22 @@ def update_country_overview_options_ga(region_country, region, income):
     Input('select-incomegrp-detail-ga','value'),
     )
 def update_country_detail_options_ga(region_country, region, income):
-    if region_country == "WOAH":
-        if region == "All":
-            options = country_options_ga
-        elif region == "Africa":
-            options = WOAH_africa_options_ga
-        elif region == "Americas":
-            options = WOAH_americas_options_ga
-        elif region == "Asia, Far East and Oceania":
-            options = WOAH_asia_options_ga
-        elif region == "Europe":
-            options = WOAH_europe_options_ga
-        else:
-            options = WOAH_me_options_ga
-    elif region_country =="FAO":
-        if region == "All":
-            options = country_options_ga
-        elif region == "Africa":
-            options = fao_africa_options_ga
-        elif region == "Asia":
-            options = fao_asia_options_ga
-        elif region == "Europe and Central Asia":
-            options = fao_eca_options_ga
-        elif region == "Latin America and the Caribbean":
-            options = fao_lac_options_ga
-        elif region == "Near East and North Africa":
-            options = fao_ena_options_ga
-        else:
-            options = fao_swp_options_ga
-    elif region_country == "World Bank":
-        if region == "All":
-            if income == "All":
-                options = country_options_ga
-            else:
-                options_df = ga_countries_biomass.loc[(ga_countries_biomass['incomegroup'] == income)]
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-        else:
-            options_df = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == region)]
-            if income == "All":
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-            else:
-                options_df = options_df.loc[(options_df['incomegroup'] == income)]
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-    else:
-        options = country_options_ga
-
+    options = geo.get_options(ga_geo_index_for(region_country) ,'country' ,region_label=region ,incomegroup=income)
     return options
 
 # Update species options based on region and country selections
 @gbadsDash.callback(
     Output('select-species-ga', 'options'),
+    Input('Region-country-alignment-overview-ga', 'value'),
     Input('select-country-overview-ga', 'value'),
     Input('select-region-overview-ga', 'value'),
     )
-def update_species_options_ga(country, region):
-    if region == 'All':
-        if country == "All":
-            options = []
-            for i in ga_countries_biomass['species'].unique():
-                str(options.append({'label':i,'value':(i)}))
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-            options = []
-            for i in input_df['species'].unique():
-                str(options.append({'label':i,'value':(i)}))
-    elif region == "Sub-Saharan Africa":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_africa_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
-    elif region == "East Asia & Pacific":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_eap_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
-    elif region == "Europe & Central Asia":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_eca_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
-    elif region == "Latin America & the Caribbean":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_lac_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
-    elif region == "Middle East & North Africa":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_mena_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
-    elif region == "North America":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_na_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
+def update_species_options_ga(region_country, country, region):
+    # A selected country overrides the region
+    if country == 'All':
+        options = geo.get_options(ga_geo_index_for(region_country) ,'species' ,region_label=region)
     else:
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_southasia_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
+        options = geo.get_options(ga_geo_index_for(region_country) ,'species' ,country=country)
 
     return options
 
@@ -5607,6 +5601,7 @@ def update_species_options_ga(country, region):
     Input('select-country-overview-ga','value'),
     # Input('select-currency-ecs','value'),
     Input('amu-regional-data', 'data'),
+    Input('Region-country-alignment-overview-ga', 'value'),
     )
 def update_overview_table_ga(
         species
@@ -5614,9 +5609,10 @@ def update_overview_table_ga(
         ,region
         ,country
         ,amu_data_json
+        ,region_country
     ):
     # Read in data
-    input_df = ga_countries_biomass.copy()
+    input_df = data.ga_countries_biomass.copy()
     input_df_amu = pd.read_json(amu_data_json, orient='split')
 
     # Add mortality, morbidity, and vetmed rate columns
@@ -5628,82 +5624,25 @@ def update_overview_table_ga(
     # Apply AHLE calcs
     input_df = ga.ahle_calcs_adj_outputs(input_df)
 
+    # Filter Region, Income Group & country
+    # A selected country overrides the region
+    if country == 'All':
+        input_df = geo.filter_rows(input_df ,ga_geo_index_for(region_country) ,region_label=region ,incomegroup=income)
+    else:
+        input_df = geo.filter_rows(input_df ,ga_geo_index_for(region_country) ,incomegroup=income ,country=country)
+
     # Filter Species
     input_df = input_df.loc[(input_df['species'] == species)]
 
-    # Filter Income Group
-    if income == 'All':
-        input_df = input_df
-    else:
-        input_df = input_df.loc[(input_df['incomegroup'] == income)]
-
-    # Filter Region & country
-    if region == "All":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in country_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "Sub-Saharan Africa":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_africa_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "East Asia & Pacific":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_eap_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "Europe & Central Asia":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_eca_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "Latin America & the Caribbean":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_lac_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "Middle East & North Africa":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_mena_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "North America":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_na_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    else:
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_southasia_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-
     # Fill in for missing values AHLE
     # input_df['ahle_total_2010usd'] = input_df['ahle_total_2010usd'].fillna(0)
 
-    # Format numbers
-    input_df.update(input_df[['biomass',
-                              'population',
-                              'liveweight',
-                               # 'ahle_total_2010usd',
-                              ]].applymap('{:,.0f}'.format))
+    # Number formats, applied in the browser
+    number_formats = {COL:tbl.fixed(0) for COL in [
+        'biomass'
+        ,'population'
+        ,'liveweight'
+    ]}
 
     columns_to_display_with_labels = {
        'country':'Country'
@@ -5729,18 +5668,18 @@ def update_overview_table_ga(
     }
     return [
             html.H4("Global Aggregation Data"),
-            dash_table.DataTable(
-                columns=[{"name": j, "id": i} for i, j in columns_to_display_with_labels.items()],
+            tbl.paged_table(
+                'ga-overview-table',
+                input_df,
+                columns_to_display_with_labels,
+                FORMATS=number_formats,
                 fixed_rows={'headers': True, 'data': 0},
-                data=input_df.to_dict('records'),
-                export_format="csv",
                 style_cell={
                     'font-family':'sans-serif',
                     },
                 style_table={'overflowX': 'scroll',
                               'height': '680px',
                               'overflowY': 'auto'},
-                page_action='none',
 
                 # Hover-over for column headers
                 tooltip_header=column_tooltips,
@@ -5770,7 +5709,7 @@ def update_detail_table_ga(
         ,amu_data_json
     ):
     # Read data
-    input_df = ga_countries_biomass.copy()
+    input_df = data.ga_countries_biomass.copy()
     input_df_amu = pd.read_json(amu_data_json, orient='split')
 
     # Add mortality, morbidity, and vetmed rate columns
@@ -5873,33 +5812,34 @@ def update_detail_table_ga(
     # ------------------------------------------------------------------------------
     # Order does not matter in these lists
     # Zero decimal places without comma
-    input_df_filtered.update(input_df_filtered[[
+    number_formats = {}
+    number_formats.update({COL:tbl.fixed(0 ,GROUP=False) for COL in [
         'year'
-    ]].applymap('{:.0f}'.format))
+    ]})
 
     # Zero decimal places
-    input_df_filtered.update(input_df_filtered[[
+    number_formats.update({COL:tbl.fixed(0) for COL in [
         'population'
         ,'biomass'
         ,'production_eggs_tonnes'
         ,'production_meat_tonnes'
         ,'production_milk_tonnes'
         ,'production_wool_tonnes'
-    ]].applymap('{:,.0f}'.format))
+    ]})
 
     # One decimal place
-    input_df_filtered.update(input_df_filtered[[
+    number_formats.update({COL:tbl.fixed(1) for COL in [
         'liveweight'
-    ]].applymap('{:,.1f}'.format))
+    ]})
 
     # Two decimal places
-    input_df_filtered.update(input_df_filtered[[
+    number_formats.update({COL:tbl.fixed(2) for COL in [
         'mortality_rate'
         ,'morbidity_rate'
-    ]].applymap('{:,.2f}'.format))
+    ]})
 
     # Dollars
-    input_df_filtered.update(input_df_filtered[[
+    number_formats.update({COL:tbl.money(2) for COL in [
         # 'producer_price_meat_live_usdpertonne_cnst2010'
         # ,'producer_price_eggs_usdpertonne_cnst2010'
         # ,'producer_price_meat_usdpertonne_cnst2010'
@@ -5928,7 +5868,7 @@ def update_detail_table_ga(
         ,'ahle_dueto_reducedoutput_2010usd'
         ,'ahle_dueto_vetandmedcost_2010usd'
         # ,'ahle_total_2010usd'
-    ]].applymap('${:,.2f}'.format))
+    ]})
 
     # ------------------------------------------------------------------------------
     # Hover-over text
@@ -5985,12 +5925,12 @@ def update_detail_table_ga(
     # adjusted_columns = long_column_names + med_column_names + small_column_names
     return [
         html.H4(f"Detailed data for {print_selected_country}{print_selected_incgrp}"),
-        dash_table.DataTable(
-            columns=[{"name": j, "id": i} for i, j in columns_to_display_with_labels.items()],
+        tbl.paged_table(
+            'ga-detail-table',
+            input_df_filtered,
+            columns_to_display_with_labels,
+            FORMATS=number_formats,
             fixed_rows={'headers': True, 'data': 0},
-            data=input_df_filtered.to_dict('records'),
-            export_format="csv",
-            sort_action = 'native',
             style_cell={'font-family':'sans-serif',
                         'minWidth':200},
             style_table={'overflowX': 'scroll',
@@ -6026,18 +5966,23 @@ def update_detail_table_ga(
     Input('select-incomegrp-overview-ga','value'),
     # Input('select-currency-ecs','value'),
     Input('amu-regional-data', 'data'),
-   )
+    Input('Region-country-alignment-overview-ga', 'value'),
+    **bgj.job_args('ga-map-progress')
+    )
 def update_bio_ahle_visual_ga(
-        viz_selection
+        set_progress
+        ,viz_selection
         ,species
         ,country
         ,region
         ,display
         ,income
         ,amu_data_json
+        ,region_country
     ):
+   set_progress((0 ,3))
    # Data
-   input_df = ga_countries_biomass.copy()
+   input_df = data.ga_countries_biomass.copy()
    input_df_amu = pd.read_json(amu_data_json, orient='split')
 
    # Add mortality, morbidity, and vetmed rate columns
@@ -6046,72 +5991,17 @@ def update_bio_ahle_visual_ga(
    input_df = ga.add_vetmed_rates(input_df)
    input_df = ga.add_antimicrobial_expenditure(input_df ,input_df_amu)
 
+   set_progress((1 ,3))
    # Apply AHLE calcs
    input_df = ga.ahle_calcs_adj_outputs(input_df)
 
-   # Filter Region & country
-   if region == "All":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in country_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "Sub-Saharan Africa":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_africa_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "East Asia & Pacific":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_eap_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "Europe & Central Asia":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_eca_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "Latin America & the Caribbean":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_lac_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "Middle East & North Africa":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_mena_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "North America":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_na_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   else:
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_southasia_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-
-    # Filter Income Group
-   if income == 'All':
-        input_df = input_df
+   set_progress((2 ,3))
+   # Filter Region, Income Group & country
+   # A selected country overrides the region
+   if country == 'All':
+       input_df = geo.filter_rows(input_df ,ga_geo_index_for(region_country) ,region_label=region ,incomegroup=income)
    else:
-        input_df = input_df.loc[(input_df['incomegroup'] == income)]
+       input_df = geo.filter_rows(input_df ,ga_geo_index_for(region_country) ,incomegroup=income ,country=country)
 
     # Filter Species
    input_df = input_df.loc[(input_df['species'] == species)]
@@ -6200,17 +6090,22 @@ def update_bio_ahle_visual_ga(
     Input('select-country-detail-ga','value'),
     Input('select-year-ga','value'),
     Input('select-display-ga','value'),
+    Input('select-uncertainty-ga','value'),
+    **bgj.job_args('ga-waterfall-progress')
     )
 def update_ahle_waterfall_ga(
-        amu_data_json
+        set_progress
+        ,amu_data_json
         ,selected_region
         ,selected_incgrp
         ,selected_country
         ,selected_year
         ,display
+        ,uncertainty
     ):
+    set_progress((0 ,3))
     # Read data
-    input_df = ga_countries_biomass.copy()
+    input_df = data.ga_countries_biomass.copy()
     input_df_amu = pd.read_json(amu_data_json, orient='split')
 
     # Add mortality, morbidity, and vetmed rate columns
@@ -6219,9 +6114,11 @@ def update_ahle_waterfall_ga(
     input_df = ga.add_vetmed_rates(input_df)
     input_df = ga.add_antimicrobial_expenditure(input_df ,input_df_amu)
 
+    set_progress((1 ,3))
     # Apply AHLE calcs
     input_df = ga.ahle_calcs_adj_outputs(input_df)
 
+    set_progress((2 ,3))
     # Prep the data
     prep_df = prep_ahle_forwaterfall_ga(input_df)
 
@@ -6277,6 +6174,20 @@ def update_ahle_waterfall_ga(
 
     # Get total AHLE for printing
     total_ahle = prep_df_sums.query("item.str.upper() == 'NET VALUE'")['value_usd_ahle_diff'].values[0]
+    print_interval = ''
+
+    # Credible intervals from Monte Carlo draws of the rates and antimicrobial expenditure
+    if 'Show' in uncertainty:
+        intervals = get_ahle_intervals_ga(input_df, input_df_amu, prep_df_filtered)
+        intervals = intervals.set_index('item').reindex(prep_df_sums['item'].astype(str))
+
+        # Costs are shown as negative values, so negate their intervals
+        _cost_items = intervals.index.str.contains('COSTS|EXPENDITURE', case=False)
+        for VALUE in ['value_usd_current', 'value_usd_ahle_diff']:
+            low = intervals[f'{VALUE}_q2.5'].copy()
+            intervals.loc[_cost_items, f'{VALUE}_q2.5'] = -1 * intervals.loc[_cost_items, f'{VALUE}_q97.5']
+            intervals.loc[_cost_items, f'{VALUE}_q97.5'] = -1 * low[_cost_items]
+        print_interval = f" (95% credible interval ${intervals.loc['Net value', 'value_usd_ahle_diff_q2.5'] :,.0f} to ${intervals.loc['Net value', 'value_usd_ahle_diff_q97.5'] :,.0f})"
 
     if display =='Side by Side':
         # Create graph with current values
@@ -6301,7 +6212,7 @@ def update_ahle_waterfall_ga(
             waterfallgroupgap = 0.5,    # Gap between bars
             )
 
-        ga_waterfall_fig.update_layout(title_text=f'Compare Current values and costs | {print_selected_country}{print_selected_incgrp}{selected_year}<br><sup>Total animal health loss envelope: ${total_ahle :,.0f} in constant 2010 US dollars</sup><br>',
+        ga_waterfall_fig.update_layout(title_text=f'Compare Current values and costs | {print_selected_country}{print_selected_incgrp}{selected_year}<br><sup>Total animal health loss envelope: ${total_ahle :,.0f}{print_interval} in constant 2010 US dollars</sup><br>',
                                         yaxis_title='US Dollars (2010 constant)',
                                         font_size=15)
     else:
@@ -6312,7 +6223,25 @@ def update_ahle_waterfall_ga(
         y = prep_df_sums['value_usd_ahle_diff']
         ga_waterfall_fig = create_ahle_waterfall_ga(prep_df_sums, name, measure, x, y)
 
-        ga_waterfall_fig.update_layout(title_text=f'Ideal minus current values and costs | {print_selected_country}{print_selected_incgrp}{selected_year}<br><sup>Total animal health loss envelope: ${total_ahle :,.0f} in constant 2010 US dollars</sup><br>',
+        # Add intervals as error bars at the end of each bar
+        if 'Show' in uncertainty:
+            low = intervals['value_usd_ahle_diff_q2.5'].to_numpy()
+            high = intervals['value_usd_ahle_diff_q97.5'].to_numpy()
+            bar_ends = y.cumsum().to_numpy()
+            bar_ends[-1] = y.iloc[-1]       # Total bar
+            ga_waterfall_fig.add_trace(go.Scatter(
+                x=x,
+                y=bar_ends,
+                mode='markers',
+                marker=dict(color='rgba(0,0,0,0)'),
+                error_y=dict(type='data', array=high - y.to_numpy(), arrayminus=y.to_numpy() - low, color='#393375', thickness=1.5),
+                customdata=np.column_stack([low, high]),
+                hovertemplate='%{x}: $%{customdata[0]:,.0f} to $%{customdata[1]:,.0f}<extra>95% interval</extra>',
+                name='95% interval',
+                showlegend=False,
+                ))
+
+        ga_waterfall_fig.update_layout(title_text=f'Ideal minus current values and costs | {print_selected_country}{print_selected_incgrp}{selected_year}<br><sup>Total animal health loss envelope: ${total_ahle :,.0f}{print_interval} in constant 2010 US dollars</sup><br>',
                                         yaxis_title='US Dollars (2010 constant)',
                                         font_size=15)
 
@@ -6327,17 +6256,22 @@ def update_ahle_waterfall_ga(
     Input('select-item-ga','value'),
     Input('select-display-ga','value'),
     Input('amu-regional-data', 'data'),
+    Input('select-uncertainty-ga','value'),
+    **bgj.job_args('ga-over-time-progress')
     )
 def update_ahle_lineplot_ga(
-        selected_region
+        set_progress
+        ,selected_region
         ,selected_incgrp
         ,selected_country
         ,selected_item
         ,display
         ,amu_data_json
+        ,uncertainty
     ):
+    set_progress((0 ,3))
     # Read data
-    input_df = ga_countries_biomass.copy()
+    input_df = data.ga_countries_biomass.copy()
     input_df_amu = pd.read_json(amu_data_json, orient='split')
 
     # Add mortality, morbidity, and vetmed rate columns
@@ -6346,9 +6280,11 @@ def update_ahle_lineplot_ga(
     input_df = ga.add_vetmed_rates(input_df)
     input_df = ga.add_antimicrobial_expenditure(input_df ,input_df_amu)
 
+    set_progress((1 ,3))
     # Apply AHLE calcs
     input_df = ga.ahle_calcs_adj_outputs(input_df)
 
+    set_progress((2 ,3))
     # Prep the data
     # Initial data prep is same as waterfall!
     prep_df = prep_ahle_forwaterfall_ga(input_df)
@@ -6402,6 +6338,11 @@ def update_ahle_lineplot_ga(
     prep_df_sums = prep_df_filtered.groupby('year')[['value_usd_current' ,'value_usd_ideal', 'value_usd_ahle_diff']].sum()
     prep_df_sums = prep_df_sums.reset_index()
 
+    # Credible intervals for each year from Monte Carlo draws of the rates and antimicrobial expenditure
+    if 'Show' in uncertainty:
+        intervals = get_ahle_intervals_ga(input_df, input_df_amu, prep_df_filtered, group_vars=['year'])
+        intervals = intervals.loc[intervals['item'] == selected_item].sort_values(by='year')
+
 
     if display == "Side by Side":
         # Plot current value
@@ -6420,6 +6361,9 @@ def update_ahle_lineplot_ga(
             )
 
         ga_lineplot_fig = make_subplots()
+        if 'Show' in uncertainty:
+            add_interval_band_ga(ga_lineplot_fig, intervals['year'], intervals['value_usd_ideal_q2.5'], intervals['value_usd_ideal_q97.5'], '#00CA0F', 'Ideal')
+            add_interval_band_ga(ga_lineplot_fig, intervals['year'], intervals['value_usd_current_q2.5'], intervals['value_usd_current_q97.5'], '#0028CA', 'Current')
         ga_lineplot_fig.add_trace(plot_ideal_value)
         ga_lineplot_fig.add_trace(plot_current_value)
         ga_lineplot_fig.update_layout(title_text=f'Current & ideal {print_selected_item} | {print_selected_country}{print_selected_incgrp}<br><sup></sup><br>',
@@ -6456,6 +6400,8 @@ def update_ahle_lineplot_ga(
                 )
 
         ga_lineplot_fig = make_subplots()
+        if 'Show' in uncertainty:
+            add_interval_band_ga(ga_lineplot_fig, intervals['year'], intervals['value_usd_ahle_diff_q2.5'], intervals['value_usd_ahle_diff_q97.5'], plot_ahle_value.line.color, display)
         ga_lineplot_fig.add_trace(plot_ahle_value)
         ga_lineplot_fig.update_layout(title_text=f'Ideal minus current {print_selected_item} | {print_selected_country}{print_selected_incgrp}<br><sup></sup><br>',
                                       yaxis_title='US Dollars (2010 constant)',
@@ -6779,7 +6725,7 @@ def update_ahle_lineplot_ga(
 # Update regional data
 @gbadsDash.callback(
     Output('amu-regional-data', 'data'),
-    Input('select-species-ga', 'value')      # Dummy input (not used)
+    Input('select-species-ga', 'value'),     # Dummy input (not used)
     # Input('am-usage-slider-africa', 'value'),
     # Input('am-price-slider-africa', 'value'),
     # Input('am-usage-slider-americas', 'value'),
@@ -6800,35 +6746,7 @@ def update_regional_table_amu(
         # ,usage_mideast ,price_mideast
     ):
     # Reading these values directly from data instead of sliders, as AMU tab is being removed
-    regional_usage_price_data = amu_combined_regional.copy()
-    usage_africa = regional_usage_price_data.query("region == 'Africa'")['terr_amu_tonnes_region_2020'].values[0].astype(int)
-    price_africa = regional_usage_price_data.query("region == 'Africa'")['am_price_usdpertonne_mid'].values[0].astype(int)
-    usage_americas = regional_usage_price_data.query("region == 'Americas'")['terr_amu_tonnes_region_2020'].values[0].astype(int)
-    price_americas = regional_usage_price_data.query("region == 'Americas'")['am_price_usdpertonne_mid'].values[0].astype(int)
-    usage_asia = regional_usage_price_data.query("region == 'Asia, Far East and Oceania'")['terr_amu_tonnes_region_2020'].values[0].astype(int)
-    price_asia = regional_usage_price_data.query("region == 'Asia, Far East and Oceania'")['am_price_usdpertonne_mid'].values[0].astype(int)
-    usage_europe = regional_usage_price_data.query("region == 'Europe'")['terr_amu_tonnes_region_2020'].values[0].astype(int)
-    price_europe = regional_usage_price_data.query("region == 'Europe'")['am_price_usdpertonne_mid'].values[0].astype(int)
-    usage_mideast = regional_usage_price_data.query("region == 'Middle East'")['terr_amu_tonnes_region_2020'].values[0].astype(int)
-    price_mideast = regional_usage_price_data.query("region == 'Middle East'")['am_price_usdpertonne_mid'].values[0].astype(int)
-
-    df = amu_combined_regional.copy()
-
-    # Add selected usage and price values as columns
-    df.loc[df['region'].str.contains('africa' ,case=False) ,['amu_terrestrial_tonnes_selected' ,'am_price_usdpertonne_selected']] = \
-       [usage_africa ,price_africa]
-    df.loc[df['region'].str.contains('americas' ,case=False) ,['amu_terrestrial_tonnes_selected' ,'am_price_usdpertonne_selected']] = \
-        [usage_americas ,price_americas]
-    df.loc[df['region'].str.contains('asia' ,case=False) ,['amu_terrestrial_tonnes_selected' ,'am_price_usdpertonne_selected']] = \
-        [usage_asia ,price_asia]
-    df.loc[df['region'].str.contains('europe' ,case=False) ,['amu_terrestrial_tonnes_selected' ,'am_price_usdpertonne_selected']] = \
-        [usage_europe ,price_europe]
-    df.loc[df['region'].str.contains('middle' ,case=False) ,['amu_terrestrial_tonnes_selected' ,'am_price_usdpertonne_selected']] = \
-        [usage_mideast ,price_mideast]
-
-    # Calculate expenditure based on usage and price slider input
-    df['am_expenditure_usd_selected'] = df['amu_terrestrial_tonnes_selected'] * df['am_price_usdpertonne_selected']
-    df['am_expenditure_usd_perkg_selected'] = df['am_expenditure_usd_selected'] / df['biomass_terr_kg_region']
+    df = prep_amu_regional_defaults()
 
     return df.to_json(date_format='iso', orient='split')
 
@@ -8143,10 +8061,35 @@ if __name__ == "__main__":
 
    fa.run_server(app, use_port, debug=True)
 
+# =============================================================================
+#### Warm-up
+# =============================================================================
+# Views computed when the server starts, on top of the default view of each tab.
+# Each is a dictionary of {'<component id>.<property>': value} applied to the page as loaded.
+# Set DASH_WARM_SELECTIONS to a JSON file with a list of these to replace this list, or DASH_WARM_UP=0 to skip the warm-up.
+warm_selections = [
+    {'select-country-poultry.value':'United States of America'}
+    ,{'select-country-swine.value':'United States of America'}
+    ,{'select-metric-poultry.value':'US dollars'}
+]
+
+def warm_up_app():
+    if os.environ.get('DASH_WARM_UP' ,'1') == '0':
+        return None
+    selections = warm.read_selections(os.environ['DASH_WARM_SELECTIONS']) if os.environ.get('DASH_WARM_SELECTIONS') else warm_selections
+    headers = {}
+    if prod:
+        username ,password = next(iter(VALID_USERNAME_PASSWORD_PAIRS.items()))
+        headers['Authorization'] = 'Basic ' + base64.b64encode(f'{username}:{password}'.encode('utf-8')).decode('ascii')
+    return warm.warm_up(gbadsDash ,SELECTIONS=selections ,HEADERS=headers)
+
 def returnApp():
     """
     This function is used to create the app and return it to waitress in the docker container
     """
+    # Compute the default views before the server takes requests, so the first visitors do not wait for them
+    warm_up_app()
+
     # If BASE_URL is set, use DispatcherMiddleware to serve the app from that path
     if 'BASE_URL' in os.environ:
         from werkzeug.middleware.dispatcher import DispatcherMiddleware
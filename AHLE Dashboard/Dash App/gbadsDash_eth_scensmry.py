@@ -17,16 +17,23 @@ from pathlib import Path
 import inspect
 import requests
 import io
+import base64
 
 print(f"[{dt.datetime.now().strftime('%Y%m%d_%H%M%S.%f')[:19]}] Starting {__name__}")
 print(f"[{dt.datetime.now().strftime('%Y%m%d_%H%M%S.%f')[:19]}] cwd = {os.getcwd()}")
 print(f"[{dt.datetime.now().strftime('%Y%m%d_%H%M%S.%f')[:19]}] {sys.path[:2] = }")
 print(f"[{dt.datetime.now().strftime('%Y%m%d_%H%M%S.%f')[:19]}] {sys.version = }")
 
+# Modules shared with the pipelines, e.g. _pert_uncertainty and _breed_standards, are in pipeline_common at the top of the repository.
+# The Docker image keeps the same layout (see Dockerfile).
+PIPELINE_COMMON_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())) ,'pipeline_common')
+if PIPELINE_COMMON_FOLDER not in sys.path:
+    sys.path.insert(0 ,PIPELINE_COMMON_FOLDER)
+
 # Third party packages (ie, those installed with pip )
 # NO NEED to import Dash or JupyterDash here.  That is done within fa.instantiate_app
 
-from dash import html, dcc, Input, Output, State, dash_table, ctx
+from dash import html, dcc, Input, Output, State, dash_table, ctx, ClientsideFunction
 import dash_bootstrap_components as dbc  # Allows easy access to all bootstrap themes
 import dash_daq as daq
 import dash_auth
@@ -41,7 +48,20 @@ from flask import Flask, redirect
 # private (fa) libraries
 import lib.fa_dash_utils as fa
 import lib.bod_calcs as bod
+import _breed_standards as brd     # In pipeline_common, shared with the Major Producers scripts
 import lib.ga_ahle_calcs as ga
+import lib.geo_index as geo
+import lib.hierarchy_agg as hagg
+import lib.slice_store as slst
+import lib.callback_metrics as cbm
+import lib.figure_templates as figt
+import lib.paged_tables as tbl
+import lib.data_export as exp
+import lib.background_jobs as bgj
+import lib.http_transport as ht
+import lib.data_snapshots as snap
+import lib.warm_start as warm
+import _pert_uncertainty as pert
 
 #### PARAMETERS
 prod                         = False   # Use when testing/dev mode to remove auth
@@ -57,6 +77,38 @@ external_stylesheets=[dbc.themes.BOOTSTRAP]
 flask_server, app = fa.instantiate_app(app_title, external_stylesheets) # dont change name "flask_server".  Gunicorn expects to find it
 gbadsDash = app  # an alias for app; the app name used within this program
 
+# Time every callback and report percentiles at /metrics/callbacks (local requests only)
+# Set DASH_CALLBACK_LOG to a file name to also write one line of JSON per callback call
+# Callback time is split into building figures (functions marked @cbm.figure_function) and other calculations.
+# Set DASH_TIME_FIGURES=1 to also count plotly calls outside those functions as figures.
+# This patches plotly for the whole process, so it is off by default.
+cbm.instrument_app(
+    gbadsDash
+    ,LOG_FILE=os.environ.get('DASH_CALLBACK_LOG')
+    ,SLOW_MS=float(os.environ.get('DASH_CALLBACK_SLOW_MS' ,2000))
+    ,TIME_FIGURES=os.environ.get('DASH_TIME_FIGURES') == '1'
+)
+
+# Serve large data tables page by page from the server, with CSV export of the whole table
+tbl.register_paging(gbadsDash)
+
+# Stream datasets as CSV or Parquet from /export/<name>.csv or .parquet
+exp.register_export(gbadsDash)
+
+# Run the heaviest callbacks as background jobs, at most DASH_MAX_JOBS at a time in this process,
+# so they do not hold the server's request threads. Job counts and run times at /metrics/jobs (local requests only)
+# Each job runs against one version of the data (see Data reloading in section 3), and results are kept per version.
+bgj.register_jobs(
+    gbadsDash
+    ,MAX_JOBS=int(os.environ.get('DASH_MAX_JOBS' ,2))
+    ,JOB_CONTEXT=snap.pinned
+    ,cache_by=[snap.data_version]
+)
+
+# Answer the first requests for the default views from responses computed when the server starts
+# (see returnApp() in section 6). Warm-up time at /metrics/warmup (local requests only)
+warm.register_warm_up(gbadsDash)
+
 if prod:
     ## USERNAMES AND PASSWORDS
     # Keep this out of source code repository - save in a file or a database
@@ -163,64 +215,24 @@ else:
     ECS_PROGRAM_OUTPUT_FOLDER = os.path.join(GBADsLiverpool, Ethiopia_Workspace, "Program outputs")
     GA_DATA_FOLDER = os.path.join(GBADsLiverpool, Global_Agg_Workspace, "Data")
 
-# -----------------------------------------------------------------------------
-# Poultry
-# -----------------------------------------------------------------------------
-# Main table
-gbads_chickens_merged_fordash = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'gbads_chickens_merged_fordash.pkl.gz'))
-
-# Breed Standards
-poultrybreedstd_ross308 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poultrybreedstd_ross308.pkl.gz'))
-poultrybreedstd_ross708 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poultrybreedstd_ross708.pkl.gz'))
-poultrybreedstd_cobb500 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poultrybreedstd_cobb500.pkl.gz'))
-poultrybreedstd_vencobb400 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poultrybreedstd_vencobb400.pkl.gz'))
-poultrybreedstd_liverpool_model = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poultrybreedstd_liverpool_model.pkl.gz'))
-
-# -----------------------------------------------------------------------------
-# Swine
-# -----------------------------------------------------------------------------
-# Main table
-gbads_pigs_merged_fordash = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'gbads_pigs_merged_fordash.pkl.gz'))
-
-# Breed Standards
-swinebreedstd_pic_growthandfeed = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'swinebreedstd_pic_growthandfeed.pkl.gz'))
-swinebreedstd_liverpool_model3 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'swinebreedstd_liverpool_model3.pkl.gz'))
+# Breed standards are read with the pipeline outputs below, as data.breedstd
 
 # -----------------------------------------------------------------------------
 # Ethiopia Case Study
 # -----------------------------------------------------------------------------
-# AHLE Summary
-# ecs_ahle_summary = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_summary.csv'))
-# Using alternative data which summarizes results from age/sex specific scenarios
-ahle_all_scensmry = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_scensmry.csv'))
-
-# AHLE Summary 2 - for stacked bar
-ecs_ahle_summary2 = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_summary2.csv'))
-
-# Attribution Summary
-# ecs_ahle_all_withattr = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_withattr.csv'))
-# Using data with disease-specific attribution
-ecs_ahle_all_withattr = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_withattr_disease.csv'))
-
-# JR 2023-4-19: added regional results. Testing with Nationl level (should be same as before).
-# ahle_all_scensmry = ahle_all_scensmry.query("region == 'National'").copy()
-ecs_ahle_summary2 = ecs_ahle_summary2.query("region == 'National'")
-# ecs_ahle_all_withattr = ecs_ahle_all_withattr.query("region == 'National'")
-
 # Ethiopia geojson files from S3
 # Regional level
 url = 'https://gbads-data-repo.s3.ca-central-1.amazonaws.com/shape-files/eth_admbnda_adm1_csa_bofedb_2021.geojson'
 r = requests.get(url, allow_redirects=True)
 geojson_ecs = r.json()
 
+# The browser loads the geojson once from a fingerprinted URL and caches it, rather than
+# receiving it inside every map figure
+geojson_ecs_url = ht.add_static_json(gbadsDash ,'eth_admbnda_adm1_csa_bofedb_2021.geojson' ,geojson_ecs)
+
 # Alternative: read from local copy
 # geojson_ecs = gpd.read_file(os.path.join(DASH_DATA_FOLDER ,'eth_admbnda_adm1_csa_bofedb_2021.geojson'))
 
-# Expert opinion files
-ecs_expertattr_smallrum = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'attribution_experts_smallruminants.csv'))
-ecs_expertattr_cattle = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'attribution_experts_cattle.csv'))
-ecs_expertattr_poultry = pd.read_csv(os.path.join(DASH_DATA_FOLDER ,'attribution_experts_chickens.csv'))
-
 # Economic data is very simple. From Dashboard WEI 08082023.xlsx shared by Tom Marsh
 wei_ethiopia_raw = pd.DataFrame({
     'species':'Cattle and Small Ruminants'
@@ -234,33 +246,32 @@ wei_ethiopia_raw = pd.DataFrame({
 # -----------------------------------------------------------------------------
 # Global Aggregate
 # -----------------------------------------------------------------------------
-# Biomass FAOSTAT
-ga_countries_biomass = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'world_ahle_abt_fordash.pkl.gz'))
-
+# Biomass FAOSTAT, read with the pipeline outputs below
 # Drop unnecessary columns
-ga_countries_biomass = ga_countries_biomass.drop(columns=['producing_animals_eggs_hd',
-                                                          'producing_animals_hides_hd',
-                                                          'producing_animals_meat_hd',
-                                                          'producing_animals_milk_hd',
-                                                          'producing_animals_wool_hd',
-                                                          'output_live_hd',
-                                                          'output_total_hd',
-                                                          # 'output_live_biomass_kg',
-                                                          # 'output_total_biomass_kg',
-                                                          'output_value_live_2010usd',
-                                                          'output_value_total_2010usd',
-                                                          'output_value_meatlive_2010usd',
-                                                          'producer_price_milk_usdpertonne_cnst2010',
-                                                          'producer_price_wool_usdpertonne_cnst2010',
-                                                          'producer_price_meat_live_usdpertonne_cnst2010',
-                                                          'producer_price_eggs_usdpertonne_cnst2010',
-                                                          'producer_price_meat_usdpertonne_cnst2010',
-                                                          'production_eggs_kgperkgbm',
-                                                          'production_hides_kgperkgbm',
-                                                          'production_meat_kgperkgbm',
-                                                          'production_milk_kgperkgbm',
-                                                          'production_wool_kgperkgbm',
-                                                          ])
+ga_drop_columns = [
+    'producing_animals_eggs_hd',
+    'producing_animals_hides_hd',
+    'producing_animals_meat_hd',
+    'producing_animals_milk_hd',
+    'producing_animals_wool_hd',
+    'output_live_hd',
+    'output_total_hd',
+    # 'output_live_biomass_kg',
+    # 'output_total_biomass_kg',
+    'output_value_live_2010usd',
+    'output_value_total_2010usd',
+    'output_value_meatlive_2010usd',
+    'producer_price_milk_usdpertonne_cnst2010',
+    'producer_price_wool_usdpertonne_cnst2010',
+    'producer_price_meat_live_usdpertonne_cnst2010',
+    'producer_price_eggs_usdpertonne_cnst2010',
+    'producer_price_meat_usdpertonne_cnst2010',
+    'production_eggs_kgperkgbm',
+    'production_hides_kgperkgbm',
+    'production_meat_kgperkgbm',
+    'production_milk_kgperkgbm',
+    'production_wool_kgperkgbm',
+]
 
 # Drop species
 drop_species = ['Camels',
@@ -268,9 +279,6 @@ drop_species = ['Camels',
                 'Buffaloes',
                 'Ducks']
 
-_drop_species = (ga_countries_biomass['species'].isin(drop_species))
-ga_countries_biomass = ga_countries_biomass.loc[~ _drop_species]
-
 
 # Drop countries
 # Thin the regions with many countries
@@ -431,36 +439,214 @@ drop_countries = [
     ,'Zambia'
     # ,'Zimbabwe'
 ]
-_drop_countries = (ga_countries_biomass['country'].isin(drop_countries))
-ga_countries_biomass = ga_countries_biomass.loc[~ _drop_countries]
 
-# Keep history only to 2015
-# ga_countries_biomass = ga_countries_biomass.loc[ga_countries_biomass['year'] >= 2015]
 
-# Drop missing values from species
-ga_countries_biomass['species'].replace('', np.nan, inplace=True)
-ga_countries_biomass.dropna(subset=['species'], inplace=True)
+# WOAH and FAO region-country mapping
+# These alignments are not in the data. The geography index for each is built from these lists
+# in read_pipeline_data(). A country can be in more than one region.
+ga_woah_region_countries = {
+    "Africa":["Ethiopia"]
+    ,"Americas":["Brazil" ,"United States of America"]
+    ,"Asia, Far East and Oceania":["India" ,"United States of America"]
+    ,"Europe":["France" ,"Germany" ,"Italy" ,"Netherlands" ,"Poland" ,"United Kingdom"]
+    ,"Middle East":["TEST"]
+}
+ga_fao_region_countries = {
+    "Africa":["Ethiopia"]
+    ,"Asia":["India"]
+    ,"Europe and Central Asia":["France" ,"Germany" ,"Italy" ,"Netherlands" ,"Poland" ,"United Kingdom"]
+    ,"Latin America and the Caribbean":["Brazil"]
+    ,"Near East and North Africa":["TEST"]
+    ,"South West Pacific":["France" ,"United States of America"]
+}
 
 # -----------------------------------------------------------------------------
-# Antimicrobial Usage
+# Pipeline outputs
 # -----------------------------------------------------------------------------
-amu2018_combined_tall = pd.read_csv(os.path.join(DASH_DATA_FOLDER, "amu2018_combined_tall.csv"))
+# Files written by the Ethiopia, Global Aggregate, Major Producers and AMU pipelines.
+# They are read here at startup and again whenever a pipeline publishes a new version
+# (see Data reloading below), so everything derived from them is also built here.
+# Returns a dictionary {data name: value}, which the app holds in a snap.DataHolder (see below).
+def read_pipeline_data(DATA_FOLDER):
+    # Breed standards {label: data frame}, labels as in _breed_standards.BREED_STANDARD_FILES
+    # Loading through _breed_standards also builds the interpolated growth curves used by bod_calcs
+    breedstd = brd.load_breed_standards(DATA_FOLDER)
+
+    # Poultry and swine main tables
+    gbads_chickens_merged_fordash = pd.read_pickle(os.path.join(DATA_FOLDER ,'gbads_chickens_merged_fordash.pkl.gz'))
+    gbads_pigs_merged_fordash = pd.read_pickle(os.path.join(DATA_FOLDER ,'gbads_pigs_merged_fordash.pkl.gz'))
+
+    # -------------------------------------------------------------------------
+    # Ethiopia Case Study
+    # -------------------------------------------------------------------------
+    # AHLE Summary
+    # ecs_ahle_summary = pd.read_csv(os.path.join(DATA_FOLDER ,'ahle_all_summary.csv'))
+    # Using alternative data which summarizes results from age/sex specific scenarios
+    ahle_all_scensmry = pd.read_csv(os.path.join(DATA_FOLDER ,'ahle_all_scensmry.csv'))
+
+    # Values are kept in Birr only. USD is applied to the rows being displayed with convert_currency_ecs(),
+    # using the exchange rate for each year. Drop USD copies of columns if the data file still has them.
+    ecs_exchg_rate_byyear = ahle_all_scensmry.groupby('year')['exchg_rate_lcuperusdol'].first()
+    ahle_all_scensmry = ahle_all_scensmry.drop(columns=[i for i in list(ahle_all_scensmry) if '_usd' in i])
 
-# Create region labels with number of countries reporting
-# amu2018_combined_tall["region_with_countries_reporting"] = \
-#     amu2018_combined_tall['region'] + " (" + round(amu2018_combined_tall['number_of_countries'] ,0).astype(int).astype(str) + ")"
+    # AHLE Summary 2 - for stacked bar
+    ecs_ahle_summary2 = pd.read_csv(os.path.join(DATA_FOLDER ,'ahle_all_summary2.csv'))
+
+    # Attribution Summary
+    # ecs_ahle_all_withattr = pd.read_csv(os.path.join(DATA_FOLDER ,'ahle_all_withattr.csv'))
+    # Using data with disease-specific attribution
+    ecs_ahle_all_withattr = pd.read_csv(os.path.join(DATA_FOLDER ,'ahle_all_withattr_disease.csv'))
+
+    # JR 2023-4-19: added regional results. Testing with Nationl level (should be same as before).
+    # ahle_all_scensmry = ahle_all_scensmry.query("region == 'National'").copy()
+    ecs_ahle_summary2 = ecs_ahle_summary2.query("region == 'National'").copy()
+    # ecs_ahle_all_withattr = ecs_ahle_all_withattr.query("region == 'National'")
+
+    # Production system
+    # Rename Overall to more descriptive
+    ahle_all_scensmry['production_system'] = ahle_all_scensmry['production_system'].replace({'Overall': 'All Production Systems'})
+    ecs_ahle_summary2['production_system'] = ecs_ahle_summary2['production_system'].replace({'Overall': 'All Production Systems'})
+
+    # Index the scenario summaries by the keys the callbacks filter on, so each callback gets its
+    # slice with a lookup instead of masking the full table
+    ahle_all_scensmry_store = slst.build_slice_store(
+        ahle_all_scensmry
+        ,KEY_SETS=[
+            ['species']
+            ,['species' ,'production_system' ,'agesex_scenario']
+            ,['species' ,'production_system' ,'agesex_scenario' ,'region']
+            ,['species' ,'production_system' ,'agesex_scenario' ,'item']
+            ]
+        )
+    ecs_ahle_summary2_store = slst.build_slice_store(
+        ecs_ahle_summary2
+        ,KEY_SETS=[['species' ,'production_system' ,'year']]
+        )
 
-# Create region labels with proportion of biomass represented in countries reporting
-amu2018_combined_tall["region_with_countries_reporting"] = \
-    amu2018_combined_tall['region'] \
-        + " (" + round(amu2018_combined_tall['number_of_countries'] ,0).astype(int).astype(str) \
-        + " | " + round(amu2018_combined_tall['biomass_prpn_reporting'] * 100 ,1).astype(str) + "%)"
+    # Expert opinion files
+    ecs_expertattr_smallrum = pd.read_csv(os.path.join(DATA_FOLDER ,'attribution_experts_smallruminants.csv'))
+    ecs_expertattr_cattle = pd.read_csv(os.path.join(DATA_FOLDER ,'attribution_experts_cattle.csv'))
+    ecs_expertattr_poultry = pd.read_csv(os.path.join(DATA_FOLDER ,'attribution_experts_chickens.csv'))
+
+    # -------------------------------------------------------------------------
+    # Global Aggregate
+    # -------------------------------------------------------------------------
+    # Biomass FAOSTAT
+    ga_countries_biomass = pd.read_pickle(os.path.join(DATA_FOLDER ,'world_ahle_abt_fordash.pkl.gz'))
+    ga_countries_biomass = ga_countries_biomass.drop(columns=ga_drop_columns)
+
+    _drop_species = (ga_countries_biomass['species'].isin(drop_species))
+    ga_countries_biomass = ga_countries_biomass.loc[~ _drop_species]
+
+    _drop_countries = (ga_countries_biomass['country'].isin(drop_countries))
+    ga_countries_biomass = ga_countries_biomass.loc[~ _drop_countries]
+
+    # Keep history only to 2015
+    # ga_countries_biomass = ga_countries_biomass.loc[ga_countries_biomass['year'] >= 2015]
+
+    # Drop missing values from species
+    ga_countries_biomass['species'].replace('', np.nan, inplace=True)
+    ga_countries_biomass.dropna(subset=['species'], inplace=True)
+
+    # Income group
+    # Rename Overall to more descriptive
+    ga_countries_biomass['incomegroup'] = ga_countries_biomass['incomegroup'].replace(
+        {'L': 'Low',
+         'LM':'Lower Middle',
+         'UM':'Upper Middle',
+         'H':'High',
+         'UNK':'Unassigned',
+         'NaN':'Unassigned'
+         })
+
+    # replacing na values in college with No college
+    ga_countries_biomass['incomegroup'].fillna("Unassigned", inplace = True)
+
+    # World Bank regions
+    ga_countries_biomass['region_label'] = ga_countries_biomass['region'].replace({'EAP': 'East Asia & Pacific',
+                                                                             'ECA':'Europe & Central Asia',
+                                                                             'LAC':'Latin America & the Caribbean',
+                                                                             'MENA':'Middle East & North Africa',
+                                                                             'NA':'North America',
+                                                                             'SA':'South Asia',
+                                                                             'SSA':'Sub-Saharan Africa'})
+
+    # Number rows from zero, as the tables in the callbacks are after merging with the antimicrobial data,
+    # so the geography index below can filter them by row position
+    ga_countries_biomass = ga_countries_biomass.reset_index(drop=True)
+
+    # Geography index for each region-country alignment: region -> income group -> country, with the
+    # species and years available for each. Cascading dropdowns and filters look up the current selections in it.
+    # The region level is called region_label in all three. For WOAH and FAO it is a region from the lists above.
+    ga_geo_index = {
+        'World Bank':geo.build_geo_index(ga_countries_biomass)
+        ,'WOAH':geo.build_geo_index(ga_countries_biomass ,REGIONS=ga_woah_region_countries)
+        ,'FAO':geo.build_geo_index(ga_countries_biomass ,REGIONS=ga_fao_region_countries)
+    }
 
-amu_combined_regional = pd.read_csv(os.path.join(DASH_DATA_FOLDER, "amu_combined_regional.csv"))
-# amu_uncertainty_data = pd.read_csv(os.path.join(DASH_DATA_FOLDER, "amu_uncertainty_data.csv"))
+    # -------------------------------------------------------------------------
+    # Antimicrobial Usage
+    # -------------------------------------------------------------------------
+    amu2018_combined_tall = pd.read_csv(os.path.join(DATA_FOLDER, "amu2018_combined_tall.csv"))
+
+    # Create region labels with number of countries reporting
+    # amu2018_combined_tall["region_with_countries_reporting"] = \
+    #     amu2018_combined_tall['region'] + " (" + round(amu2018_combined_tall['number_of_countries'] ,0).astype(int).astype(str) + ")"
+
+    # Create region labels with proportion of biomass represented in countries reporting
+    amu2018_combined_tall["region_with_countries_reporting"] = \
+        amu2018_combined_tall['region'] \
+            + " (" + round(amu2018_combined_tall['number_of_countries'] ,0).astype(int).astype(str) \
+            + " | " + round(amu2018_combined_tall['biomass_prpn_reporting'] * 100 ,1).astype(str) + "%)"
+
+    amu_combined_regional = pd.read_csv(os.path.join(DATA_FOLDER, "amu_combined_regional.csv"))
+    # amu_uncertainty_data = pd.read_csv(os.path.join(DATA_FOLDER, "amu_uncertainty_data.csv"))
+
+    # Antimicrobial resistance data
+    amr_withsmry = pd.read_csv(os.path.join(DATA_FOLDER, "amr_withsmry.csv"))
+    amr_withsmry_store = slst.build_slice_store(amr_withsmry, KEY_SETS=[['antimicrobial_class'], ['antimicrobial_class', 'pathogen']])
+
+    # AMR data table: the data only changes with a new version, so format it once per version
+    amr_withsmry_fordisplay = amr_withsmry.copy()
+    amr_withsmry_fordisplay['sum_isolates'] = amr_withsmry_fordisplay['sum_isolates'].map('{:,.0f}'.format)
+    amr_withsmry_fordisplay['overall_prev'] = amr_withsmry_fordisplay['overall_prev'].map('{:,.1%}'.format)
+
+    # Display tables for the AMU figures, created by the AMU pipeline (2_combine_and_process.py)
+    # Class names are already cleaned and totals already summed, so the callbacks only select from these.
+    amu2018_display = pd.read_csv(os.path.join(DATA_FOLDER, "amu2018_display.csv"))                         # Scope All, one row per region & antimicrobial
+    amu2018_display_byregion = pd.read_csv(os.path.join(DATA_FOLDER, "amu2018_display_byregion.csv"))       # One row per region
+    amu2018_display_bycategory = pd.read_csv(os.path.join(DATA_FOLDER, "amu2018_display_bycategory.csv"))   # One row per region, classification, and category
+    amu2018_display_bycategory_store = slst.build_slice_store(amu2018_display_bycategory, KEY_SETS=[['classification'], ['classification', 'region']])
+
+    return {
+        'breedstd':breedstd
+        ,'gbads_chickens_merged_fordash':gbads_chickens_merged_fordash
+        ,'gbads_pigs_merged_fordash':gbads_pigs_merged_fordash
+        ,'ahle_all_scensmry':ahle_all_scensmry
+        ,'ecs_exchg_rate_byyear':ecs_exchg_rate_byyear
+        ,'ecs_ahle_summary2':ecs_ahle_summary2
+        ,'ecs_ahle_all_withattr':ecs_ahle_all_withattr
+        ,'ahle_all_scensmry_store':ahle_all_scensmry_store
+        ,'ecs_ahle_summary2_store':ecs_ahle_summary2_store
+        ,'ecs_expertattr_smallrum':ecs_expertattr_smallrum
+        ,'ecs_expertattr_cattle':ecs_expertattr_cattle
+        ,'ecs_expertattr_poultry':ecs_expertattr_poultry
+        ,'ga_countries_biomass':ga_countries_biomass
+        ,'ga_geo_index':ga_geo_index
+        ,'amu2018_combined_tall':amu2018_combined_tall
+        ,'amu_combined_regional':amu_combined_regional
+        ,'amr_withsmry':amr_withsmry
+        ,'amr_withsmry_store':amr_withsmry_store
+        ,'amr_withsmry_fordisplay':amr_withsmry_fordisplay
+        ,'amu2018_display':amu2018_display
+        ,'amu2018_display_byregion':amu2018_display_byregion
+        ,'amu2018_display_bycategory':amu2018_display_bycategory
+        ,'amu2018_display_bycategory_store':amu2018_display_bycategory_store
+    }
 
-# Antimicrobial resistance data
-amr_withsmry = pd.read_csv(os.path.join(DASH_DATA_FOLDER, "amr_withsmry.csv"))
+# Pipelines publish their outputs as versioned snapshots of the data folder. Read the current one.
+# The callbacks read it as attributes of data, e.g. data.ga_countries_biomass.
+data = snap.DataHolder(read_pipeline_data(snap.current_folder(DASH_DATA_FOLDER)))
 
 # =============================================================================
 #### User options and defaults
@@ -591,15 +777,8 @@ metric_options = [
 # -----------------------------------------------------------------------------
 # Poultry
 # -----------------------------------------------------------------------------
-country_options_poultry = []
-for i in np.sort(gbads_chickens_merged_fordash['country'].unique()) :
-   country_shortname = country_shortnames[i]
-   compound_label = f"{i} ({country_shortname})"
-   str(country_options_poultry.append({'label':compound_label,'value':(i)}))
-
-year_options_poultry = []
-for i in np.sort(gbads_chickens_merged_fordash['year'].unique()) :
-   str(year_options_poultry.append({'label':i,'value':(i)}))
+country_options_poultry = []   # Filled from the data by refresh_data_options() below
+year_options_poultry = []   # Filled from the data by refresh_data_options() below
 
 # Global defaults for sliders
 # Most sliders will default to a value based on data for the selected country and year
@@ -627,28 +806,14 @@ poultry_lookup_breed_from_country = {
    ,'United States of America':'Cobb 500'
 }
 
-# Breed data lookup
-# Keys must match values in poultry_lookup_breed_from_country
-# Values must be data frames imported above
-poultry_lookup_breed_df = {
-   'Cobb 500':poultrybreedstd_cobb500
-   ,'Ross 308':poultrybreedstd_ross308
-   ,'Ross 708':poultrybreedstd_ross708
-   ,'Venncobb 400':poultrybreedstd_vencobb400
-}
+# Breed data lookup: data.breedstd
+# Values in poultry_lookup_breed_from_country must be keys there
 
 # -----------------------------------------------------------------------------
 # Swine
 # -----------------------------------------------------------------------------
-country_options_swine = []
-for i in np.sort(gbads_pigs_merged_fordash['country'].unique()) :
-   country_shortname = country_shortnames[i]
-   compound_label = f"{i} ({country_shortname})"
-   str(country_options_swine.append({'label':compound_label,'value':(i)}))
-
-year_options_swine = []
-for i in np.sort(gbads_pigs_merged_fordash['year'].unique()):
-   str(year_options_swine.append({'label':i,'value':(i)}))
+country_options_swine = []   # Filled from the data by refresh_data_options() below
+year_options_swine = []   # Filled from the data by refresh_data_options() below
 
 # Global defaults for sliders
 # Most sliders will default to a value based on data for the selected country and year
@@ -678,12 +843,8 @@ swine_lookup_breed_from_country = {
    ,'United States of America':'PIC'
 }
 
-# Breed data lookup
-# Keys must match values in swine_lookup_breed_from_country
-# Values must be data frames imported above
-swine_lookup_breed_df = {
-   'PIC':swinebreedstd_pic_growthandfeed
-}
+# Breed data lookup: data.breedstd
+# Values in swine_lookup_breed_from_country must be keys there
 
 # =============================================================================
 #### Ethiopia case study options
@@ -702,10 +863,6 @@ ecs_species_options = [{'label': i, 'value': i, 'disabled': False} for i in ["Ca
                                                                              "Poultry indigenous",
                                                                              ]]
 
-# Production system
-# Rename Overall to more descriptive
-ahle_all_scensmry['production_system'] = ahle_all_scensmry['production_system'].replace({'Overall': 'All Production Systems'})
-
 # ecs_prodsys_options are now defined dynamically in a callback based on selected species
 # ecs_prodsys_options = []
 # for i in np.sort(ahle_all_scensmry['production_system'].unique()):
@@ -718,9 +875,7 @@ ahle_all_scensmry['production_system'] = ahle_all_scensmry['production_system'].
 #     str(ecs_year_options.append({'label':i,'value':(i)}))
 
 # Sex
-ecs_agesex_options=[]
-for i in np.sort(ahle_all_scensmry['agesex_scenario'].unique()):
-   str(ecs_agesex_options.append({'label':i,'value':(i)}))
+ecs_agesex_options = []   # Filled from the data by refresh_data_options() below
 
 # Currency
 ecs_currency_options = [{'label': "Birr", 'value': "Birr", 'disabled': False},
@@ -741,9 +896,7 @@ ecs_hierarchy_dd_attr_options = [{'label': i, 'value': i, 'disabled': False} for
 ecs_hierarchy_dd_attr_options += ecs_hierarchy_attr_options
 
 # Region - removing 'National' from the options
-ecs_region_options = []
-for i in ahle_all_scensmry.query("region != 'National'").region.unique():
-    str(ecs_region_options.append({'label':i,'value':(i)}))
+ecs_region_options = []   # Filled from the data by refresh_data_options() below
 
 # Display
 ecs_display_options = [{'label': i, 'value': i, 'disabled': False} for i in ["Difference",
@@ -779,39 +932,18 @@ ecs_map_denominator_options = [{'label': i, 'value': i, 'disabled': False} for i
 #### Global Aggregate options
 # =============================================================================
 # Species
-ga_species_options = []
-for i in ga_countries_biomass['species'].unique():
-    str(ga_species_options.append({'label':i,'value':(i)}))
+ga_species_options = []   # Filled from the data by refresh_data_options() below
 
-country_options_ga = [{'label': "All", 'value': "All", 'disabled': False}]
-for i in ga_countries_biomass['country'].unique():
-    str(country_options_ga.append({'label':i,'value':(i)}))
+country_options_ga = []   # Filled from the data by refresh_data_options() below
 
 # Income group
-# Rename Overall to more descriptive
-ga_countries_biomass['incomegroup'] = ga_countries_biomass['incomegroup'].replace(
-    {'L': 'Low',
-     'LM':'Lower Middle',
-     'UM':'Upper Middle',
-     'H':'High',
-     'UNK':'Unassigned',
-     'NaN':'Unassigned'
-     })
-
-# replacing na values in college with No college
-ga_countries_biomass['incomegroup'].fillna("Unassigned", inplace = True)
-
-incomegrp_options_ga = [{'label': "All", 'value': "All"}]
-for i in ga_countries_biomass['incomegroup'].unique():
-    str(incomegrp_options_ga.append({'label':i,'value':(i)}))
+incomegrp_options_ga = []   # Filled from the data by refresh_data_options() below
 
 # Mortality rate
 mortality_rate_options_ga = [{'label': f'{i*100: .0f}%', 'value': i, 'disabled': True} for i in list(np.array(range(1, 11)) / 100)]
 
 # Year
-year_options_ga = []
-for i in np.sort(ga_countries_biomass['year'].unique()):
-   str(year_options_ga.append({'label':i,'value':(i)}))
+year_options_ga = []   # Filled from the data by refresh_data_options() below
 
 # AHLE elements
 # Values here must match item names defined in prep_ahle_forwaterfall_ga()
@@ -862,23 +994,7 @@ WOAH_region_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in [
                                                                                "Europe",
                                                                                "Middle East"
                                                                                ]]
-# WOAH region-country mapping
-WOAH_africa_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["Ethiopia"]]
-
-WOAH_americas_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["Brazil",
-                                                                                 "United States of America"]]
-
-WOAH_asia_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["India",
-                                                                             "United States of America"]]
-
-WOAH_europe_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["France",
-                                                                               "Germany",
-                                                                               "Italy",
-                                                                               "Netherlands",
-                                                                               "Poland",
-                                                                               "United Kingdom"]]
-
-WOAH_me_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["TEST"]]
+# WOAH region-country mapping: ga_woah_region_countries, in the geography index (ga_geo_index)
 
 
 # FAO regions
@@ -887,87 +1003,22 @@ fao_region_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["
                                                                                "Asia",
                                                                                "Europe and Central Asia",
                                                                                "Latin America and the Caribbean",
-                                                                               "Near East and North Africa"
+                                                                               "Near East and North Africa",
                                                                                "South West Pacific"
                                                                                ]]
 
-# FAO region-country mapping
-fao_africa_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["Ethiopia"]]
-
-fao_asia_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["India"]]
-
-fao_eca_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["France",
-                                                                            "Germany",
-                                                                            "Italy",
-                                                                            "Netherlands",
-                                                                            "Poland",
-                                                                            "United Kingdom"]]
-
-fao_lac_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["Brazil"]]
-
-fao_ena_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["TEST"]]
-
-
-fao_swp_options_ga = [{'label': i, 'value': i, 'disabled': False} for i in ["France",
-                                                                            "United States of America"]]
+# FAO region-country mapping: ga_fao_region_countries, in the geography index (ga_geo_index)
 
 # World Bank regions
-ga_countries_biomass['region_label'] = ga_countries_biomass['region'].replace({'EAP': 'East Asia & Pacific',
-                                                                         'ECA':'Europe & Central Asia',
-                                                                         'LAC':'Latin America & the Caribbean',
-                                                                         'MENA':'Middle East & North Africa',
-                                                                         'NA':'North America',
-                                                                         'SA':'South Asia',
-                                                                         'SSA':'Sub-Saharan Africa'})
-
-wb_region_options_ga = [{'label': "All", 'value': "All"}]
-for i in ga_countries_biomass['region_label'].unique():
-    str(wb_region_options_ga.append({'label':i,'value':(i)}))
+wb_region_options_ga = []   # Filled from the data by refresh_data_options() below
 
 # World Bank region-country mapping
 # Pulled from World Bank site (https://datahelpdesk.worldbank.org/knowledgebase/articles/906519-world-bank-country-and-lending-groups)
+# Geography index (ga_geo_index) is built in read_pipeline_data(), one for each alignment
 
-# East Asia & Pacific options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'East Asia & Pacific')]
-wb_eap_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_eap_options_ga.append({'label':i,'value':(i)}))
-
-# Europe & Central Asia options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'Europe & Central Asia')]
-wb_eca_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_eca_options_ga.append({'label':i,'value':(i)}))
-
-# Latin America & the Caribbean options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'Latin America & the Caribbean')]
-wb_lac_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_lac_options_ga.append({'label':i,'value':(i)}))
-
-# Middle East & North Africa options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'Middle East & North Africa')]
-wb_mena_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_mena_options_ga.append({'label':i,'value':(i)}))
-
-# North America options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'North America')]
-wb_na_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_na_options_ga.append({'label':i,'value':(i)}))
-
-# South Asia options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'South Asia')]
-wb_southasia_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_southasia_options_ga.append({'label':i,'value':(i)}))
-
-# Sub-Saharan Africa options
-options = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == 'Sub-Saharan Africa')]
-wb_africa_options_ga = [{'label': "All", 'value': "All"}]
-for i in options['country'].unique():
-    str(wb_africa_options_ga.append({'label':i,'value':(i)}))
+# Geography index for the selected region-country alignment. World Bank if none is selected.
+def ga_geo_index_for(region_country):
+    return data.ga_geo_index.get(region_country ,data.ga_geo_index['World Bank'])
 
 
 # =============================================================================
@@ -984,14 +1035,72 @@ amu_map_display_options = [{'label': i, 'value': i, 'disabled': False} for i in
 
 
 # Antimicrobial Class
-amu_antimicrobial_class_options = []
-for i in np.sort(amr_withsmry['antimicrobial_class'].unique()):
-    str(amu_antimicrobial_class_options.append({'label':i,'value':(i)}))
+amu_antimicrobial_class_options = []   # Filled from the data by refresh_data_options() below
 
 # Pathogen
-amu_pathogen_options = []
-for i in np.sort(amr_withsmry['pathogen'].unique()):
-    str(amu_pathogen_options.append({'label':i,'value':(i)}))
+amu_pathogen_options = []   # Filled from the data by refresh_data_options() below
+
+# =============================================================================
+#### Options from the data
+# =============================================================================
+# The option lists above that depend on the data are filled here. They are rebuilt in place
+# when the data is reloaded, so the layout, the clientside lookups and the callbacks, which all
+# refer to these lists, show the countries, years and regions of the new data.
+def refresh_data_options():
+    # Poultry
+    country_options_poultry[:] = [
+        {'label':f"{i} ({country_shortnames.get(i ,i)})" ,'value':i}
+        for i in np.sort(data.gbads_chickens_merged_fordash['country'].unique())
+    ]
+    year_options_poultry[:] = [{'label':i ,'value':i} for i in np.sort(data.gbads_chickens_merged_fordash['year'].unique())]
+
+    # Swine
+    country_options_swine[:] = [
+        {'label':f"{i} ({country_shortnames.get(i ,i)})" ,'value':i}
+        for i in np.sort(data.gbads_pigs_merged_fordash['country'].unique())
+    ]
+    year_options_swine[:] = [{'label':i ,'value':i} for i in np.sort(data.gbads_pigs_merged_fordash['year'].unique())]
+
+    # Ethiopia case study
+    ecs_agesex_options[:] = [{'label':i ,'value':i} for i in np.sort(data.ahle_all_scensmry['agesex_scenario'].unique())]
+    # Removing 'National' from the region options
+    ecs_region_options[:] = [{'label':i ,'value':i} for i in data.ahle_all_scensmry.query("region != 'National'").region.unique()]
+
+    # Global Aggregate
+    ga_countries_biomass = data.ga_countries_biomass
+    ga_species_options[:] = [{'label':i ,'value':i} for i in ga_countries_biomass['species'].unique()]
+    country_options_ga[:] = [{'label': "All", 'value': "All", 'disabled': False}] \
+        + [{'label':i ,'value':i} for i in ga_countries_biomass['country'].unique()]
+    incomegrp_options_ga[:] = [{'label': "All", 'value': "All"}] \
+        + [{'label':i ,'value':i} for i in ga_countries_biomass['incomegroup'].unique()]
+    year_options_ga[:] = [{'label':i ,'value':i} for i in np.sort(ga_countries_biomass['year'].unique())]
+    wb_region_options_ga[:] = [{'label': "All", 'value': "All"}] \
+        + [{'label':i ,'value':i} for i in ga_countries_biomass['region_label'].unique()]
+
+    # Antimicrobial resistance
+    amu_antimicrobial_class_options[:] = [{'label':i ,'value':i} for i in np.sort(data.amr_withsmry['antimicrobial_class'].unique())]
+    amu_pathogen_options[:] = [{'label':i ,'value':i} for i in np.sort(data.amr_withsmry['pathogen'].unique())]
+    return None
+
+refresh_data_options()
+
+# =============================================================================
+#### Data reloading
+# =============================================================================
+# When a pipeline publishes a new snapshot, it is read in the background and swapped in between
+# requests, together with clearing results derived from the old data. See lib/data_snapshots.py.
+# Status at /metrics/data (local requests only). Set DASH_DATA_POLL_S=0 to turn reloading off.
+# Dropdown options built from the data are rebuilt at the swap (see Options from the data above).
+snap.register_reload(
+    gbadsDash
+    ,DASH_DATA_FOLDER
+    ,read_pipeline_data
+    ,data
+    ,CLEAR=[refresh_data_options ,hagg.clear_cache ,exp.clear_exports ,bgj.clear_results ,warm.clear_responses]
+    ,AFTER_SWAP=[warm.warm_again]
+    ,POLL_S=float(os.environ.get('DASH_DATA_POLL_S' ,30))
+)
+
 
 # nav_btn_style = {
 #      'align': 'center',
@@ -1002,6 +1111,131 @@ for i in np.sort(amr_withsmry['pathogen'].unique()):
 #      'height': '3.2rem',
 #      'margin': '0rem 1rem',
 #  }
+# =============================================================================
+#### Data exports
+# =============================================================================
+# Datasets that can be downloaded in full or filtered from /export/<name>.csv or .parquet
+# See lib/data_export.py for the query parameters
+# Burden of disease at the default slider values, using the breed standard for each country
+# Poultry days on feed default to the data for each country and year, as in the dashboard
+def calc_bod_poultry_defaults():
+    input_df = data.gbads_chickens_merged_fordash.loc[
+        data.gbads_chickens_merged_fordash['country'].isin(list(poultry_lookup_breed_from_country))
+    ]
+    breed_labels = input_df['country'].map(poultry_lookup_breed_from_country)
+    days_on_feed = input_df['acc_avgdaysonfeed'].fillna(dof_poultry_default)
+    frames = []
+    for (BREED_LABEL ,AVG_DOF) ,group_df in input_df.groupby([breed_labels ,days_on_feed] ,sort=False):
+        frames.append(bod.calc_bod_master_poultry(
+            group_df
+            ,ACHIEVABLE_PCT_MASTER=achievable_pct_poultry_default
+            ,AVG_DOF_MASTER=AVG_DOF
+            ,BREED_DF_MASTER=data.breedstd[BREED_LABEL]
+            ,FEEDPRICE_USDPERTONNE_MASTER=ration_price_poultry_default
+            ,IDEAL_FCR_LIVE_MASTER=fcr_poultry_default
+        ))
+    return pd.concat(frames).sort_index()
+
+def calc_bod_swine_defaults():
+    return bod.calc_bod_master_swine(
+        data.gbads_pigs_merged_fordash
+        ,ACHIEVABLE_WT_KG_MASTER=achievable_weight_swine_default
+        ,AVG_DOF_MASTER=dof_swine_default
+        ,BREED_DF_MASTER=data.breedstd['PIC']
+        ,AVG_CARC_YIELD_MASTER=0.75
+        ,FEEDPRICE_USDPERTONNE_MASTER=ration_price_swine_default
+        ,IDEAL_FCR_LIVE_MASTER=fcr_swine_default
+    )
+
+# Antimicrobial data with the default usage and price for each region selected (the middle of each slider)
+def prep_amu_regional_defaults():
+    df = data.amu_combined_regional.copy()
+    df['amu_terrestrial_tonnes_selected'] = df['terr_amu_tonnes_region_2020'].astype(int)
+    df['am_price_usdpertonne_selected'] = df['am_price_usdpertonne_mid'].astype(int)
+    df['am_expenditure_usd_selected'] = df['amu_terrestrial_tonnes_selected'] * df['am_price_usdpertonne_selected']
+    df['am_expenditure_usd_perkg_selected'] = df['am_expenditure_usd_selected'] / df['biomass_terr_kg_region']
+    return df
+
+# Global aggregate AHLE with the default antimicrobial data, calculated as in the global aggregate callbacks
+# Drops the working columns added by ga.add_antimicrobial_expenditure()
+ga_export_drop_columns = [
+    'region_woah'
+    ,'am_expenditure_usd_selected'
+    ,'total_biomass_thisregion_thisyear'
+    ,'total_biomass_prpnofregion_thisyear'
+]
+def calc_ga_ahle_defaults():
+    input_df = ga.add_mortality_rate(data.ga_countries_biomass)
+    input_df = ga.add_morbidity_rate(input_df)
+    input_df = ga.add_vetmed_rates(input_df)
+    input_df = ga.add_antimicrobial_expenditure(input_df ,prep_amu_regional_defaults())
+    input_df = ga.ahle_calcs_adj_outputs(input_df)
+    return input_df.drop(columns=ga_export_drop_columns)
+
+# Calculated datasets are kept until the data is reloaded. The others are read from the data at each export.
+exp.add_dataset('poultry-bod' ,calc_bod_poultry_defaults ,FILTER_VARS=['country' ,'year'] ,KEEP=True)
+exp.add_dataset('swine-bod' ,calc_bod_swine_defaults ,FILTER_VARS=['country' ,'year'] ,KEEP=True)
+exp.add_dataset('ga-ahle' ,calc_ga_ahle_defaults ,FILTER_VARS=['region_label' ,'incomegroup' ,'country' ,'species' ,'year'] ,KEEP=True)
+exp.add_dataset('ecs-scenario-summary' ,lambda: data.ahle_all_scensmry ,FILTER_VARS=['species' ,'production_system' ,'agesex_scenario' ,'region' ,'year'])
+exp.add_dataset('ecs-attribution' ,lambda: data.ecs_ahle_all_withattr ,FILTER_VARS=['species' ,'production_system' ,'region' ,'age_group' ,'sex' ,'ahle_component' ,'cause'])
+exp.add_dataset('ecs-expert-attribution-smallruminants' ,lambda: data.ecs_expertattr_smallrum)
+exp.add_dataset('ecs-expert-attribution-cattle' ,lambda: data.ecs_expertattr_cattle)
+exp.add_dataset('ecs-expert-attribution-poultry' ,lambda: data.ecs_expertattr_poultry)
+
+# =============================================================================
+#### Clientside lookups
+# =============================================================================
+# Static tables used by the clientside callbacks in assets/clientside_callbacks.js
+# Shipped once with the layout in dcc.Store(id='clientside-lookups')
+# Country options: for each alignment, options by region, and the region to use for regions not listed
+clientside_lookups = {
+    'region_options':{
+        'WOAH':WOAH_region_options
+        ,'FAO':fao_region_options
+        ,'World Bank':wb_region_options
+        }
+    ,'country_options':{
+        'WOAH':{
+            'regions':{
+                'Africa':WOAH_africa_options
+                ,'Americas':WOAH_americas_options
+                ,'Asia, Far East and Oceania':WOAH_asia_options
+                ,'Europe':WOAH_europe_options
+                }
+            ,'other':'Europe'
+            }
+        ,'FAO':{
+            'regions':{
+                'Africa':fao_africa_options
+                ,'Asia':fao_asia_options
+                ,'Europe and Central Asia':fao_eca_options
+                ,'Latin America and the Caribbean':fao_lac_options
+                ,'South West Pacific':fao_swp_options
+                }
+            ,'other':'South West Pacific'
+            }
+        ,'World Bank':{
+            'regions':{
+                'Sub-Saharan Africa':wb_africa_options
+                ,'Europe & Central Asia':wb_eca_options
+                ,'Latin America & the Caribbean':wb_lac_options
+                ,'North America':wb_na_options
+                ,'South Asia':wb_southasia_options
+                }
+            ,'other':'South Asia'
+            }
+        }
+    ,'all_country_options':{
+        'poultry':country_options_poultry
+        ,'swine':country_options_swine
+        }
+    ,'defaults':{
+        'achievable_pct_poultry':achievable_pct_poultry_default
+        ,'dof_swine':dof_swine_default
+        }
+    ,'ecs_hierarchy_dd_attr_options':ecs_hierarchy_dd_attr_options
+}
+
 # =============================================================================
 #### Burden of disease calcs
 # =============================================================================
@@ -1390,6 +1624,21 @@ def prep_ahle_fortreemap_ecs(INPUT_DF):
    return OUTPUT_DF
 
 
+# Convert mean and standard deviation columns from Birr to USD using the exchange rate for each year
+# Standard deviations scale the same way as means: SD(aX) = a * SD(X) for a > 0.
+# Only currency items (item_type_code 'mv' or 'mc') have USD values. Other items become missing.
+def convert_currency_ecs(INPUT_DF, currency):
+   if currency != 'USD':
+      return INPUT_DF
+
+   OUTPUT_DF = INPUT_DF.copy()
+   value_cols = [i for i in list(OUTPUT_DF) if i.startswith(('mean_', 'stdev_'))]
+   usd_per_birr = 1 / OUTPUT_DF['year'].map(data.ecs_exchg_rate_byyear)
+   usd_per_birr = usd_per_birr.where(OUTPUT_DF['item_type_code'].isin(['mv', 'mc']))
+   OUTPUT_DF[value_cols] = OUTPUT_DF[value_cols].mul(usd_per_birr, axis=0)
+
+   return OUTPUT_DF
+
 def prep_ahle_forwaterfall_ecs(INPUT_DF):
    ecs_ahle_waterfall = INPUT_DF.copy()
 
@@ -1485,22 +1734,24 @@ def prep_ahle_forstackedbar_ecs(INPUT_DF, cols_birr_costs, cols_usd_costs, prett
 
    return OUTPUT_DF
 
+# Ordering of current values dictionary determines order in plot
+ga_current_values_labels = {
+    'biomass_value_2010usd':'Biomass'
+    ,'output_value_meat_2010usd':'Meat'
+    ,'output_value_eggs_2010usd':'Eggs'
+    ,'output_value_milk_2010usd':'Milk'
+    ,'output_value_wool_2010usd':'Wool'
+
+    ,'vetspend_farm_usd':'Producers vet & med costs'
+    # Update 4/5/2023: William no longer wants public expenditure to appear in calculations
+    # ,'vetspend_public_usd':'Public vet & med costs'
+    ,'antimicrobial_expenditure_usd':'Antimicrobial expenditure'
+
+    ,'net_value_2010usd':'Net value'
+}
+
 def prep_ahle_forwaterfall_ga(INPUT_DF):
-    # Ordering of current values dictionary determines order in plot
-    current_values_labels = {
-        'biomass_value_2010usd':'Biomass'
-        ,'output_value_meat_2010usd':'Meat'
-        ,'output_value_eggs_2010usd':'Eggs'
-        ,'output_value_milk_2010usd':'Milk'
-        ,'output_value_wool_2010usd':'Wool'
-
-        ,'vetspend_farm_usd':'Producers vet & med costs'
-        # Update 4/5/2023: William no longer wants public expenditure to appear in calculations
-        # ,'vetspend_public_usd':'Public vet & med costs'
-        ,'antimicrobial_expenditure_usd':'Antimicrobial expenditure'
-
-        ,'net_value_2010usd':'Net value'
-    }
+    current_values_labels = ga_current_values_labels
     current_value_columns = list(current_values_labels)
     ideal_values_labels = {
         'ideal_biomass_value_2010usd':'Biomass'
@@ -1571,16 +1822,13 @@ def prep_ahle_forwaterfall_ga(INPUT_DF):
 #### Define the figures
 # =============================================================================
 # Define the Waterfall
-def create_waterfall(x, y, text):
+def _build_waterfall_template():
      waterfall_fig = go.Figure(go.Waterfall(
         name = "20",
         orientation = "v",
 
         measure = ["relative", "relative", "relative", "relative", "total"],  # This needs to change with number of columns in waterfalll
-        x=x,
-        y=y,
         hoverinfo = 'none',  # Disable the hover over tooltip
-        text=text,
         textposition = ["outside","outside","auto","auto","outside"],
         decreasing = {'marker':{"color":'#F7931D'}},
         increasing = {'marker':{"color":'#3598DB'}},
@@ -1599,8 +1847,13 @@ def create_waterfall(x, y, text):
 
      return waterfall_fig
 
+@cbm.figure_function
+def create_waterfall(x, y, text):
+     waterfall_fig = figt.figure_from_template('waterfall', _build_waterfall_template, [{'x':x, 'y':y, 'text':text}])
+     return waterfall_fig
+
 # Define the Sankey
-def create_sankey(label_list, color, x, y, source, target, values, n):
+def _build_sankey_template():
     sankey_fig = go.Figure(data=go.Sankey(
         textfont = dict(size=15),
         arrangement = 'fixed',
@@ -1610,39 +1863,36 @@ def create_sankey(label_list, color, x, y, source, target, values, n):
             pad = 25,
             thickness = 15,
             line = dict(color = "black", width = 0.5),
-            label = label_list,
-            x = x,
-            y = y,
-            color = color
             ),
-        link = dict(
-            source = source,
-            target = target,
-            value = values,
-            color = ['#ededed']*n),
         ))
     return sankey_fig
 
+@cbm.figure_function
+def create_sankey(label_list, color, x, y, source, target, values, n):
+    sankey_fig = figt.figure_from_template('sankey', _build_sankey_template, [{
+        'node':dict(label = label_list, x = x, y = y, color = color),
+        'link':dict(source = source, target = target, value = values, color = ['#ededed']*n),
+        }])
+    return sankey_fig
+
 # Define the stacked bar
-def create_stacked_bar_poultry(input_df, x, y, color):
-    bar_fig = px.bar(
-       input_df,
-       x=x,
-       y=y,
-       color=color,
-       # Keys in color map must match values assigned in pretty_bod_cost_names
-       color_discrete_map={
-          "Feed":"#2A80B9",
-          "Chicks":"#9B58B5",
-          "Labour":"#F1C40F",
-          "Land & Housing":"#2DCC70",
-          "Medicine":"#7A7A7A",
-          "Other":"#7A7A7A",
-          "Burden of Disease":"#F7931D",
-          },
-       text='label'
-       )
+# Keys in color map must match values assigned in pretty_bod_cost_names
+stacked_bar_colors_poultry = {
+   "Feed":"#2A80B9",
+   "Chicks":"#9B58B5",
+   "Labour":"#F1C40F",
+   "Land & Housing":"#2DCC70",
+   "Medicine":"#7A7A7A",
+   "Other":"#7A7A7A",
+   "Burden of Disease":"#F7931D",
+   }
+
+def _build_stacked_bar_template_poultry():
+    bar_fig = go.Figure(go.Bar(showlegend=True))
     bar_fig.update_layout(
+       barmode='relative',
+       margin_t=60,                 # Match plotly express defaults
+       legend_tracegroupgap=0,
        plot_bgcolor="#ededed",
        hovermode=False,
        showlegend=True,
@@ -1658,23 +1908,31 @@ def create_stacked_bar_poultry(input_df, x, y, color):
         )
     return bar_fig
 
-def create_stacked_bar_swine(input_df, x, y, color):
-    bar_fig = px.bar(
-       input_df,
-       x=x,
-       y=y,
-       color=color,
-       # Keys in color map must match values assigned in pretty_bod_cost_names
-       color_discrete_map={
-          "Feed":"#2A80B9",
-          "Nonfeed Variable Costs":"#9B58B5",
-          "Labour":"#F1C40F",
-          "Finance":"#2DCC70",
-          "Burden of Disease":"#F7931D",
-          },
-       text='label'
+@cbm.figure_function
+def create_stacked_bar_poultry(input_df, x, y, color):
+    bar_fig = figt.figure_from_template(
+       'stacked_bar_poultry',
+       _build_stacked_bar_template_poultry,
+       figt.stacked_bar_traces(x, y, color, stacked_bar_colors_poultry, text=input_df['label']),
+       LAYOUT={'legend':{'title':{'text':color.name}}},
        )
+    return bar_fig
+
+# Keys in color map must match values assigned in pretty_bod_cost_names
+stacked_bar_colors_swine = {
+   "Feed":"#2A80B9",
+   "Nonfeed Variable Costs":"#9B58B5",
+   "Labour":"#F1C40F",
+   "Finance":"#2DCC70",
+   "Burden of Disease":"#F7931D",
+   }
+
+def _build_stacked_bar_template_swine():
+    bar_fig = go.Figure(go.Bar(showlegend=True))
     bar_fig.update_layout(
+       barmode='relative',
+       margin_t=60,                 # Match plotly express defaults
+       legend_tracegroupgap=0,
        plot_bgcolor="#ededed",
        hovermode=False,
        showlegend=True,
@@ -1690,39 +1948,37 @@ def create_stacked_bar_swine(input_df, x, y, color):
         )
     return bar_fig
 
+@cbm.figure_function
+def create_stacked_bar_swine(input_df, x, y, color):
+    bar_fig = figt.figure_from_template(
+       'stacked_bar_swine',
+       _build_stacked_bar_template_swine,
+       figt.stacked_bar_traces(x, y, color, stacked_bar_colors_swine, text=input_df['label']),
+       LAYOUT={'legend':{'title':{'text':color.name}}},
+       )
+    return bar_fig
+
 # Define the attribution treemap
-def create_attr_treemap_ecs(input_df, path):
-    treemap_fig = px.treemap(input_df,
-                      # path=[
-                      #    'cause',
-                      #    'production_system',
-                      #    'age_group',
-                      #    'sex',
-                      #    'ahle_component',
-                      #    ],
-                      path = path,
-                      values='mean',
-                      # hover_data=['pct_of_total'],
-                      # custom_data=['pct_of_total'],
-                      color='cause', # cause only applys to the cause level
-                      color_discrete_map={'(?)':'lightgrey','Infectious':'#68000D', 'Non-infectious':'#08316C', 'External':'#00441B'} # Cause colors matches the Human health dashboard
-                      )
+def create_attr_treemap_ecs(input_df, path, dataset_key=None):
+    treemap_fig = create_treemap_withagg(
+        input_df
+        ,HIERARCHY=path
+        ,COLOR_BY='cause'     # cause only applys to the cause level
+        ,VALUE_VAR='mean'
+        ,COLOR_DISCRETE_MAP={'Infectious':'#68000D', 'Non-infectious':'#08316C', 'External':'#00441B'} # Cause colors matches the Human health dashboard
+        ,DATASET_KEY=dataset_key
+        )
 
     return treemap_fig
 
 # Define the AHLE waterfall
-def create_ahle_waterfall_ecs(input_df, name, measure, x, y):
+def _build_ahle_waterfall_template_ecs():
     waterfall_fig = go.Figure(go.Waterfall(
-        name = name,
         orientation = "v",
-        measure = measure,  # This needs to change with number of columns in waterfalll
-        x=x,
-        y=y,
         decreasing = {'marker':{"color":'#E84C3D'}},
         increasing = {'marker':{"color":'#3598DB'}},
         totals = {'marker':{"color":'#F7931D'}},
         connector = {"line":{"color":"darkgrey"}},
-        customdata=np.stack((y, input_df['item']), axis=-1),
         ))
 
     waterfall_fig.update_layout(clickmode='event+select', ### EVENT SELECT ??????
@@ -1748,30 +2004,39 @@ def create_ahle_waterfall_ecs(input_df, name, measure, x, y):
 
     return waterfall_fig
 
+@cbm.figure_function
+def create_ahle_waterfall_ecs(input_df, name, measure, x, y):
+    waterfall_fig = figt.figure_from_template('ahle_waterfall_ecs', _build_ahle_waterfall_template_ecs, [{
+        'name':name,
+        'measure':measure,  # This needs to change with number of columns in waterfalll
+        'x':x,
+        'y':y,
+        'customdata':np.stack((y, input_df['item']), axis=-1),
+        }])
+    return waterfall_fig
+
 # Define the stacked bar
-def create_stacked_bar_ecs(input_df, x, y, text, color, yaxis_title):
-    bar_fig = px.bar(
-        input_df,
-        x=x,
-        y=y,
-        text = text,
-        color=color,
-        color_discrete_map={
-          "Neonatal male":"#2A80B9",
-          "Neonatal":"#2A80B9",
-          "Neonatal female":"#6eb1de",
-          "Juvenile male":"#9B58B5",
-          "Juvenile":"#9B58B5",
-          "Juvenile female":"#caa6d8",
-          "Adult male":"#2DCC70",
-          "Adult female":"#82e3aa",
-          })
+stacked_bar_colors_ecs = {
+  "Neonatal male":"#2A80B9",
+  "Neonatal":"#2A80B9",
+  "Neonatal female":"#6eb1de",
+  "Juvenile male":"#9B58B5",
+  "Juvenile":"#9B58B5",
+  "Juvenile female":"#caa6d8",
+  "Adult male":"#2DCC70",
+  "Adult female":"#82e3aa",
+  }
+
+def _build_stacked_bar_template_ecs():
+    bar_fig = go.Figure(go.Bar(showlegend=True))
     bar_fig.update_layout(
+        barmode='relative',
+        margin_t=60,                # Match plotly express defaults
+        legend_tracegroupgap=0,
         plot_bgcolor="#ededed",
         hovermode=False,
         showlegend=True,
         xaxis_title=None,
-        yaxis_title=yaxis_title,
         )
     bar_fig.update_xaxes(
         fixedrange=True
@@ -1781,7 +2046,18 @@ def create_stacked_bar_ecs(input_df, x, y, text, color, yaxis_title):
         )
     return bar_fig
 
+@cbm.figure_function
+def create_stacked_bar_ecs(input_df, x, y, text, color, yaxis_title):
+    bar_fig = figt.figure_from_template(
+        'stacked_bar_ecs',
+        _build_stacked_bar_template_ecs,
+        figt.stacked_bar_traces(x, y, color, stacked_bar_colors_ecs, text=text),
+        LAYOUT={'yaxis':{'title':{'text':yaxis_title}}, 'legend':{'title':{'text':color.name}}},
+        )
+    return bar_fig
+
 # Define Ethiopia subnation level map
+@cbm.figure_function
 def create_map_display_ecs(input_df, geojson, location, featurekey, color_by, color_scale):
     ecs_map_fig = px.choropleth_mapbox(input_df,
                                        geojson=geojson,
@@ -1802,6 +2078,7 @@ def create_map_display_ecs(input_df, geojson, location, featurekey, color_by, co
     return ecs_map_fig
 
 # Wider Economic Impact charts for Ethiopia
+@cbm.figure_function
 def create_wei_chart(
         input_df                # Dataframe
         ,plot_xvar              # String: variable to use for x axis
@@ -1873,6 +2150,7 @@ def create_wei_chart(
     return fig
 
 # Define the Biomass map
+@cbm.figure_function
 def create_biomass_map_ga(input_df, iso_alpha3, value, country, display):
     biomass_map_fig = px.choropleth(input_df,
                                     locations=iso_alpha3,
@@ -1909,6 +2187,7 @@ def create_biomass_map_ga(input_df, iso_alpha3, value, country, display):
 
 # Define the biomass, pop, livewt line chart
 # def create_line_chart_ga(input_df, year, biomass, population, liveweight, country):
+@cbm.figure_function
 def create_line_chart_ga(input_df, year, value, country, facet):
     bio_pop_live_line_fig = px.line(input_df, x=year,
                                     y=value,
@@ -1938,13 +2217,9 @@ def create_line_chart_ga(input_df, year, value, country, facet):
 
     return bio_pop_live_line_fig
 
-def create_ahle_waterfall_ga(input_df, name, measure, x, y):
+def _build_ahle_waterfall_template_ga():
     waterfall_fig = go.Figure(go.Waterfall(
-        name = name,
         orientation = "v",
-        measure = measure,  # This needs to change with number of columns in waterfalll
-        x=x,
-        y=y,
         # text=text,
         # hoverinfo = 'none',
         # textposition = ["outside","outside","auto","auto","outside"],
@@ -1971,7 +2246,33 @@ def create_ahle_waterfall_ga(input_df, name, measure, x, y):
 
     return waterfall_fig
 
+@cbm.figure_function
+def create_ahle_waterfall_ga(input_df, name, measure, x, y):
+    waterfall_fig = figt.figure_from_template('ahle_waterfall_ga', _build_ahle_waterfall_template_ga, [{
+        'name':name,
+        'measure':measure,  # This needs to change with number of columns in waterfalll
+        'x':x,
+        'y':y,
+        }])
+    return waterfall_fig
+
+# To get credible intervals for the global AHLE charts from ga.ahle_uncertainty()
+# Data is limited to the country-years in the filtered chart data. Items are labeled as in the charts.
+def get_ahle_intervals_ga(input_df, input_df_amu, filtered_df, group_vars=[]):
+    mc_df = input_df.merge(filtered_df[['country' ,'year']].drop_duplicates(), on=['country' ,'year'])
+    intervals = ga.ahle_uncertainty(mc_df, input_df_amu, GROUP_VARS=group_vars)
+    intervals['item'] = intervals['item'].replace(ga_current_values_labels)
+    return intervals
+
+# To add a shaded credible interval around a line
+def add_interval_band_ga(fig, x, low, high, color, name):
+    fill_color = 'rgba({}, {}, {}, 0.2)'.format(*px.colors.hex_to_rgb(color))
+    fig.add_trace(go.Scatter(x=x, y=low, mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=x, y=high, mode='lines', line=dict(width=0), fill='tonexty', fillcolor=fill_color,
+                             name=f'{name} 95% interval', hoverinfo='skip'))
+    return fig
 
+@cbm.figure_function
 def create_map_display_amu(input_df, value):
     # Add graphing country column for map
     input_df['graphing_country'] = 'TEST'
@@ -1999,6 +2300,7 @@ def create_map_display_amu(input_df, value):
 
     return amu_map_fig
 
+@cbm.figure_function
 def create_donut_chart_amu(input_df, value, names):
 
     pie_fig = go.Figure(data=[go.Pie(labels=names,
@@ -2018,15 +2320,18 @@ def create_donut_chart_amu(input_df, value, names):
 
     return pie_fig
 
-def create_tree_map_amu(input_df, value, categories):
-    tree_map_fig = px.treemap(input_df,
-                              path=[px.Constant("Global"), 'region_with_countries_reporting', categories, 'antimicrobial_class'],
-                              values=value,
-                              maxdepth=3,
-                              color='region',
-                              # color_discrete_map={'(?)':'lightgrey', 'Africa':'#636FFA', 'Americas':'#EF553B', 'Asia, Far East and Oceania':'#00CC97', 'Europe':'#AB63FA', 'Middle East':'#FFC091'},
-                              color_discrete_map={'(?)':'lightgrey', 'Africa':'rgb(135,197,95)', 'Americas':'rgb(248,156,116)', 'Asia, Far East and Oceania':'rgb(102,197,204)', 'Europe':'rgb(220,176,242)', 'Middle East':'rgb(254,136,177)'},
-                              )
+def create_tree_map_amu(input_df, value, categories, dataset_key=None):
+    tree_map_fig = create_treemap_withagg(
+        input_df
+        ,HIERARCHY=['region_with_countries_reporting', categories, 'antimicrobial_class']
+        ,COLOR_BY='region'
+        ,VALUE_VAR=value
+        # ,COLOR_DISCRETE_MAP={'Africa':'#636FFA', 'Americas':'#EF553B', 'Asia, Far East and Oceania':'#00CC97', 'Europe':'#AB63FA', 'Middle East':'#FFC091'}
+        ,COLOR_DISCRETE_MAP={'Africa':'rgb(135,197,95)', 'Americas':'rgb(248,156,116)', 'Asia, Far East and Oceania':'rgb(102,197,204)', 'Europe':'rgb(220,176,242)', 'Middle East':'rgb(254,136,177)'}
+        ,ROOT_LABEL='Global'
+        ,MAXDEPTH=3
+        ,DATASET_KEY=dataset_key
+        )
 
     # # Add value to bottom leaf node labels
     # tree_map_fig.data[0].textinfo = 'label+text+value'
@@ -2035,80 +2340,60 @@ def create_tree_map_amu(input_df, value, categories):
 
 # This function creates a plotly treemap with an option to show weighted averages
 # instead of sums for boxes above the base level.
-# It first calculates weighted averages using a pivot table, then draws the treemap by
-# specifying the id and parent for each box.
-# 2023/3/22: There is a bug causing a blank chart when AGGREGATION == 'mean'. Not using this at this time.
+# Aggregation to every level of the hierarchy is done by hagg.aggregate_hierarchy(), which is
+# cached, then the treemap is drawn by specifying the id and parent for each box.
 def create_treemap_withagg(
         INPUT_DF
         ,HIERARCHY              # List: categorical variables that define hierarchy, in desired order most to least aggregated
-        ,COLOR_BY               # String: variable to color by. WARNING: must be one of the variables in HIERARCHY.
+        ,COLOR_BY               # String: categorical variable to color by. Boxes with children of more than one color get '(?)'.
         ,VALUE_VAR              # String: variable with values to plot
         ,AGGREGATION='sum'      # String: how to aggregate VALUE_VAR. 'sum' (default) or 'mean'.
         ,WEIGHT_VAR=None        # String (optional): variable to use for weighting if AGGREGATION='mean'.
+        ,COLOR_DISCRETE_MAP={}  # Dictionary (optional): {COLOR_BY value: color}. Other values use the plotly default sequence.
+        ,ROOT_LABEL=None        # String (optional): label for a single box containing the whole hierarchy, like px.Constant()
+        ,MAXDEPTH=None          # Integer (optional): number of levels to display at once
+        ,DATASET_KEY=None       # Hashable (optional): identifies INPUT_DF for caching, e.g. the filter selections used to create it
     ):
-    if AGGREGATION == 'mean':
-        dfmod = INPUT_DF.copy()
+    treemap_df = hagg.aggregate_hierarchy(
+        INPUT_DF
+        ,HIERARCHY=HIERARCHY
+        ,VALUE_VAR=VALUE_VAR
+        ,AGGREGATION=AGGREGATION
+        ,WEIGHT_VAR=WEIGHT_VAR
+        ,COLOR_BY=COLOR_BY
+        ,ROOT_LABEL=ROOT_LABEL
+        ,DATASET_KEY=DATASET_KEY
+        )
 
-        # Create weighted value
-        if WEIGHT_VAR:
-            dfmod['treemap_weight'] = dfmod[WEIGHT_VAR]
-        else:
-            dfmod['treemap_weight'] = 1
-        dfmod['treemap_weighted_value'] = dfmod[VALUE_VAR] * dfmod['treemap_weight']
-
-        # For each variable in the hierarchy, create summary rows where that variable is ALL
-        # Calculate the mean of the weighted value
-        treemap_df = pd.DataFrame()     # Initialize dataframe to hold results
-        for i ,VAR in enumerate(HIERARCHY):
-            summary_rows = dfmod.pivot_table(
-                index=HIERARCHY[:i+1]     # Index is all hierarchy variables up to i
-                ,values=['treemap_weighted_value' ,'treemap_weight']
-                ,aggfunc='sum'
-                ).reset_index()
-            # summary_rows['treemap_value'] = summary_rows['treemap_weighted_value'] / summary_rows['treemap_weight']
-            treemap_df = pd.concat([treemap_df ,summary_rows] ,axis=0 ,ignore_index=True)
-
-        # Add a row for the global total
-        global_row = pd.DataFrame(dfmod[['treemap_weighted_value' ,'treemap_weight']].sum()).transpose()
-        treemap_df = pd.concat([global_row ,treemap_df] ,axis=0 ,ignore_index=True)
-
-        # Calculate weighted mean
-        treemap_df['treemap_value'] = treemap_df['treemap_weighted_value'] / treemap_df['treemap_weight']
-
-        # Drop rows with zero or negative value - these cause plotly to fail silently!
+    if AGGREGATION == 'mean':
+        # Drop boxes with zero or negative value - these cause plotly to fail silently!
+        # Weighted means of children do not add up to their parent, so size each box independently.
         treemap_df = treemap_df.query("treemap_value > 0")
-
-        # Add columns for id and parent
-        treemap_df['treemap_id'] = treemap_df[f'{HIERARCHY[0]}'].str.cat(treemap_df[HIERARCHY[1:]] ,sep='|' ,na_rep='_all_')
-        treemap_df['treemap_id'] = treemap_df['treemap_id'].str.replace('|_all_' ,'' ,regex=False)
-        treemap_df[['treemap_parent' ,'treemap_parent_remainder']] = treemap_df['treemap_id'].str.rsplit('|' ,n=1 ,expand=True)
-
-        treemap_df.loc[treemap_df['treemap_parent_remainder'].isnull() ,'treemap_parent'] = '_all_'  # First level of hierarchy gets parent _all_
-        treemap_df.loc[treemap_df['treemap_id'] == '_all_' ,'treemap_parent'] = ''  # Global level of hierarchy gets parent blank
-
-        # Draw tree map
-        # Figure is blank with no errors!!
-        tree_map_fig = px.treemap(
-            ids=treemap_df['treemap_id']
-            ,parents=treemap_df['treemap_parent']
-            ,values=treemap_df['treemap_value']
-            ,color=treemap_df[COLOR_BY]
-            )
-
-        # Figure is blank with no errors!!
-        # tree_map_fig = go.Figure(go.Treemap(
-        #     ids=treemap_df['treemap_id']
-        #     ,parents=treemap_df['treemap_parent']
-        #     ,values=treemap_df['treemap_value']
-        #     ))
-
-    elif AGGREGATION == 'sum':
-        tree_map_fig = px.treemap(
-            INPUT_DF
-            ,path=HIERARCHY
-            ,values=VALUE_VAR
-            ,color=COLOR_BY
-            )
+        branchvalues = 'remainder'
+    else:
+        branchvalues = 'total'
+
+    # Assign colors as plotly express does: mapped values first, then the default sequence in order of appearance
+    color_map = {hagg.MIXED_COLOR:'lightgrey'}
+    color_map.update(COLOR_DISCRETE_MAP)
+    color_sequence = px.colors.qualitative.Plotly
+    next_color = 0
+    for VALUE in treemap_df['treemap_color'].unique():
+        if VALUE not in color_map:
+            color_map[VALUE] = color_sequence[next_color % len(color_sequence)]
+            next_color += 1
+
+    tree_map_fig = go.Figure(go.Treemap(
+        ids=treemap_df['treemap_id']
+        ,labels=treemap_df['label']
+        ,parents=treemap_df['treemap_parent']
+        ,values=treemap_df['treemap_value']
+        ,branchvalues=branchvalues
+        ,marker_colors=treemap_df['treemap_color'].map(color_map)
+        ,maxdepth=MAXDEPTH
+        ,hovertemplate='%{label}<br>' + VALUE_VAR + '=%{value}<extra></extra>'
+        ))
+    tree_map_fig.update_layout(margin=dict(t=50 ,l=25 ,r=25 ,b=25))
 
     return tree_map_fig
 
@@ -2124,7 +2409,7 @@ gbadsDash.layout = html.Div([
         dbc.Col(html.Div([
             html.A(href="https://animalhealthmetrics.org/",
             children=[
-                html.Img(title="Link to GBADS site",src=os.environ.get("BASE_URL", "") + '/assets/GBADs-LOGO-Black-sm.png')
+                html.Img(title="Link to GBADS site",src=ht.asset_url(gbadsDash ,'GBADs-LOGO-Black-sm.png'))
             ],),
                 html.H3("Inclusiveness Challenge Delivery Rigour Transparency",
                         style={"font-style": "italic",
@@ -2140,6 +2425,7 @@ gbadsDash.layout = html.Div([
     dcc.Store(id='core-data-poultry'),
     dcc.Store(id='core-data-swine'),
     dcc.Store(id='amu-regional-data'),
+    dcc.Store(id='clientside-lookups' ,data=clientside_lookups),
 
     #### TABS
     dcc.Tabs([
@@ -2288,6 +2574,7 @@ gbadsDash.layout = html.Div([
                               )
                     # End of Spinner
                     ],size="md", color="#393375", fullscreen=False),
+                    bgj.progress_bar('ga-map-progress'),
                     # End of Map
                     ]),
 
@@ -2334,6 +2621,20 @@ gbadsDash.layout = html.Div([
                             "margin-right":"70px",
                             }
                 ),
+                # Uncertainty
+                dbc.Col([
+                    html.H6("Uncertainty"),
+                    dcc.Checklist(id='select-uncertainty-ga',
+                                  options=[{'label': 'Show 95% credible interval', 'value': 'Show'}],
+                                  value=[],
+                                  inputStyle={"margin-right": "2px"}, # This pulls the words off of the button
+                                  ),
+                    ],
+                    style={
+                            "margin-top":"10px",
+                            "margin-right":"70px",
+                            }
+                ),
                 # Region-country alignment
                 dbc.Col([
                     html.H6('Region-country alignment'),
@@ -2548,6 +2849,7 @@ gbadsDash.layout = html.Div([
                                   )
                         # End of Spinner
                         ],size="md", color="#393375", fullscreen=False),
+                    bgj.progress_bar('ga-waterfall-progress'),
                     # End of Side by side waterfall
                     ],style={"width":5}),
 
@@ -2575,6 +2877,7 @@ gbadsDash.layout = html.Div([
                                   )
                         # End of Spinner
                         ],size="md", color="#393375", fullscreen=False),
+                    bgj.progress_bar('ga-over-time-progress'),
                     # End of plot over time
                     ],style={"width":5}),
                 ]),
@@ -2852,6 +3155,7 @@ gbadsDash.layout = html.Div([
                           )
                 # End of Spinner
                 ],size="md", color="#393375", fullscreen=False),
+                bgj.progress_bar('poultry-core-progress'),
                 # End of Waterfall
                 ],style={"width":5}),
 
@@ -3163,6 +3467,7 @@ gbadsDash.layout = html.Div([
                           )
                 # End of Spinner
                 ],size="md", color="#393375", fullscreen=False),
+                bgj.progress_bar('swine-core-progress'),
                 # End of Waterfall
                 ],style={"width":5}),
 
@@ -3695,6 +4000,7 @@ gbadsDash.layout = html.Div([
                                   }
                               )
                         ],size="md", color="#393375", fullscreen=False),    # End of Spinner
+                    bgj.progress_bar('ecs-map-progress'),
                     ]),     # End of Map
                 ]),     # END OF MAP ROW
 
@@ -4565,7 +4871,7 @@ gbadsDash.layout = html.Div([
                dbc.Col(html.Div([
                    html.A(href="#AMU-tab",
                    children=[
-                       html.Img(title="Back to top",src=os.environ.get("BASE_URL", "") + '/assets/up_arrow_icon_black-modified.png')
+                       html.Img(title="Back to top",src=ht.asset_url(gbadsDash ,'up_arrow_icon_black-modified.png'))
                    ], style={'width':'80px'},
                    ),
                        ], style = {'margin-left':"10px",
@@ -4603,76 +4909,30 @@ gbadsDash.layout = html.Div([
 #### -- Controls
 # ------------------------------------------------------------------------------
 #Update regions based on region contry aligment selection:
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='region_options'),
     Output(component_id='select-region-poultry', component_property='options'),
     Input(component_id='Region-country-alignment-poultry', component_property='value'),
+    State(component_id='clientside-lookups', component_property='data'),
     )
-def update_region_options_poultry(region_country):
-    if region_country == "WOAH":
-        options = WOAH_region_options
-    elif region_country =="FAO":
-        options = fao_region_options
-    elif region_country == "World Bank":
-        options = wb_region_options
-    return options
 
 # Update country options based on region selection
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='country_options_poultry'),
     Output(component_id='select-country-poultry', component_property='options'),
     Input(component_id='Region-country-alignment-poultry', component_property='value'),
     Input(component_id='select-region-poultry', component_property='value'),
+    State(component_id='clientside-lookups', component_property='data'),
     )
-def update_country_options_poultry(region_country, region):
-    if region_country == "WOAH":
-        if region == "All":
-            options = country_options_poultry
-        elif region == "Africa":
-            options = WOAH_africa_options
-        elif region == "Americas":
-            options = WOAH_americas_options
-        elif region == "Asia, Far East and Oceania":
-            options = WOAH_asia_options
-        else:
-            options = WOAH_europe_options
-    elif region_country =="FAO":
-        if region == "All":
-            options = country_options_poultry
-        elif region == "Africa":
-            options = fao_africa_options
-        elif region == "Asia":
-            options = fao_asia_options
-        elif region == "Europe and Central Asia":
-            options = fao_eca_options
-        elif region == "Latin America and the Caribbean":
-            options = fao_lac_options
-        else:
-            options = fao_swp_options
-    elif region_country == "World Bank":
-        if region == "All":
-            options = country_options_poultry
-        elif region == "Sub-Saharan Africa":
-            options = wb_africa_options
-        elif region == "Europe & Central Asia":
-            options = wb_eca_options
-        elif region == "Latin America & the Caribbean":
-            options = wb_lac_options
-        elif region == "North America":
-            options = wb_na_options
-        else:
-            options = wb_southasia_options
-    else:
-        options = country_options_poultry
-
-    return options
 
 # Set slider starting values and add reference underneath based on selected country
 # Also enable "Reset to Default" button
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='reset_achievablepct_poultry'),
     Output('achievable-pct-slider-poultry', 'value'),
-    Input(component_id='reset-val-poultry', component_property='n_clicks')   # Reset to defaults button
+    Input(component_id='reset-val-poultry', component_property='n_clicks'),   # Reset to defaults button
+    State('clientside-lookups', 'data'),
     )
-def reset_achievablepct_poultry(reset):
-    return achievable_pct_poultry_default
 
 @gbadsDash.callback(
     Output('dof-slider-poultry', 'value'),
@@ -4682,7 +4942,7 @@ def reset_achievablepct_poultry(reset):
     Input(component_id='reset-val-poultry', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_daysonfeed_poultry(country, year, reset):
-    input_df = gbads_chickens_merged_fordash
+    input_df = data.gbads_chickens_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_avgdaysonfeed'].values[0]
     country_shortname = country_shortnames[country]
@@ -4702,7 +4962,7 @@ def show_ref_daysonfeed_poultry(country, year, reset):
     Input(component_id='reset-val-poultry', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_producerprice_poultry(country, year, reset):
-    input_df = gbads_chickens_merged_fordash
+    input_df = data.gbads_chickens_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_producerprice_usdperkgcarc'].values[0]
     country_shortname = country_shortnames[country]
@@ -4722,7 +4982,7 @@ def show_ref_producerprice_poultry(country, year, reset):
     Input(component_id='reset-val-poultry', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_feedprice_poultry(country, year, reset):
-    input_df = gbads_chickens_merged_fordash
+    input_df = data.gbads_chickens_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_feedprice_usdpertonne'].values[0]
     country_shortname = country_shortnames[country]
@@ -4744,7 +5004,7 @@ def show_ref_feedprice_poultry(country, year, reset):
     )
 def show_ref_fcr_poultry(country, dof, reset):
     breed_label_touse = poultry_lookup_breed_from_country[country]
-    breed_df_touse = poultry_lookup_breed_df[breed_label_touse]
+    breed_df_touse = data.breedstd[breed_label_touse]
     _rowselect = (breed_df_touse['dayonfeed'] == dof)
     datavalue = breed_df_touse.loc[_rowselect ,'fcr'].values[0]
     if pd.isnull(datavalue):
@@ -4767,13 +5027,15 @@ def show_ref_fcr_poultry(country, dof, reset):
     Input('dof-slider-poultry','value'),
     Input('select-country-poultry','value'),
     Input('ration-price-slider-poultry','value'),
-    Input('fcr-slider-poultry','value')
+    Input('fcr-slider-poultry','value'),
+    **bgj.job_args('poultry-core-progress')
     )
-def update_core_data_poultry(achievable_pct, avg_dof, country, feedprice, fcr):
+def update_core_data_poultry(set_progress, achievable_pct, avg_dof, country, feedprice, fcr):
+    set_progress((0 ,2))
     breed_label_touse = poultry_lookup_breed_from_country[country]
-    breed_df_touse = poultry_lookup_breed_df[breed_label_touse]
+    breed_df_touse = data.breedstd[breed_label_touse]
     poultry_data_withbod = bod.calc_bod_master_poultry(
-      gbads_chickens_merged_fordash
+      data.gbads_chickens_merged_fordash
       ,ACHIEVABLE_PCT_MASTER=achievable_pct      # Integer [0, 120]: proportion of ideal production that is achievable without disease, i.e. efficiency of feed, medications, and practices
       ,AVG_DOF_MASTER=avg_dof                      # Integer (0, 63]: Average days on feed. Will lookup breed standard weight for this day on feed.
       ,BREED_DF_MASTER=breed_df_touse     # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
@@ -4781,6 +5043,7 @@ def update_core_data_poultry(achievable_pct, avg_dof, country, feedprice, fcr):
       ,IDEAL_FCR_LIVE_MASTER=fcr                        # Float: ideal FCR per kg live weight
       # ,AVG_CARC_YIELD_MASTER=0.695                 # Float [0, 1]: average carcass yield as proportion of live weight. If blank, will use 'bod_breedstdyield_prpn'.
     )
+    set_progress((1 ,2))
     poultry_data_withbod['year'] = poultry_data_withbod['year'].astype(str)   # Change Year type to text
     return poultry_data_withbod.to_json(date_format='iso', orient='split')
 
@@ -4857,7 +5120,8 @@ def update_background_data_poultry(input_json, country ,producerprice ,rationpri
     # ------------------------------------------------------------------------------
     # Order does not matter in these lists
     # Zero decimal places
-    background_data.update(background_data[[
+    number_formats = {}
+    number_formats.update({COL:tbl.fixed(0) for COL in [
       'acc_headplaced'
       ,'acc_headslaughtered'
       ,'acc_totalcarcweight_tonnes'
@@ -4871,10 +5135,10 @@ def update_background_data_poultry(input_json, country ,producerprice ,rationpri
       ,'wb_gdp_usd'
       ,'ideal_headplaced'
       ,'ideal_feed_tonnes'
-    ]].applymap('{:,.0f}'.format))
+    ]})
 
     # Two decimal places
-    background_data.update(background_data[[
+    number_formats.update({COL:tbl.fixed(2) for COL in [
       'bod_breedstdwt_kg'
       ,'bod_breedstdyield_prpn'
       ,'bod_breedstdcarcwt_kg'
@@ -4895,7 +5159,7 @@ def update_background_data_poultry(input_json, country ,producerprice ,rationpri
       ,'ideal_laborcost_usdperkglive'
       ,'ideal_medcost_usdperkglive'
       ,'ideal_othercost_usdperkglive'
-    ]].applymap('{:,.2f}'.format))
+    ]})
 
     # ------------------------------------------------------------------------------
     # Hover-over text
@@ -4952,11 +5216,11 @@ def update_background_data_poultry(input_json, country ,producerprice ,rationpri
             html.H4(f"Data for {country}"),
             # html.P('All currently processed data.  Unformatted and unfiltered.'),
             #html.P(' '.join(df['id'].tolist())),
-            dash_table.DataTable(
-                columns=[{"name": j, "id": i} for i, j in columns_to_display_with_labels.items()],
-                data=background_data.to_dict('records'),
-                export_format="csv",
-                sort_action = 'native',
+            tbl.paged_table(
+                'poultry-background-table',
+                background_data,
+                columns_to_display_with_labels,
+                FORMATS=number_formats,
                 # #filter_action="native",
                 style_cell={
                     # 'minWidth': '250px',
@@ -4985,7 +5249,7 @@ def update_background_data_poultry(input_json, country ,producerprice ,rationpri
     )
 def update_breed_data_poultry(country):
     breed_label_touse = poultry_lookup_breed_from_country[country]
-    breed_df_touse = poultry_lookup_breed_df[breed_label_touse]
+    breed_df_touse = data.breedstd[breed_label_touse]
 
     columns_to_display_with_labels = {
       'dayonfeed':'Day on Feed'
@@ -5312,74 +5576,30 @@ def update_stacked_bar_poultry(input_json, country, year):
 #### -- Controls
 # ------------------------------------------------------------------------------
 # Update regions based on region contry aligment selection:
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='region_options'),
     Output(component_id='select-region-swine', component_property='options'),
     Input(component_id='Region-country-alignment-swine', component_property='value'),
+    State(component_id='clientside-lookups', component_property='data'),
     )
-def update_region_options_swine(region_country):
-    if region_country == "WOAH":
-        options = WOAH_region_options
-    elif region_country =="FAO":
-        options = fao_region_options
-    elif region_country == "World Bank":
-        options = wb_region_options
-    return options
 
 # Update country options based on region selection
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='country_options_swine'),
     Output(component_id='select-country-swine', component_property='options'),
     Input(component_id='Region-country-alignment-swine', component_property='value'),
     Input(component_id='select-region-swine', component_property='value'),
+    State(component_id='clientside-lookups', component_property='data'),
     )
-def update_country_options_swine(region_country, region):
-    if region_country == "WOAH":
-        if region == "All":
-            options = country_options_swine
-        elif region == "Africa":
-            options = WOAH_africa_options
-        elif region == "Americas":
-            options = WOAH_americas_options
-        elif region == "Asia, Far East and Oceania":
-            options = WOAH_asia_options
-        else:
-            options = WOAH_europe_options
-    elif region_country =="FAO":
-        if region == "All":
-            options = country_options_swine
-        elif region == "Africa":
-            options = fao_africa_options
-        elif region == "Asia":
-            options = fao_asia_options
-        elif region == "Europe and Central Asia":
-            options = fao_eca_options
-        elif region == "Latin America and the Caribbean":
-            options = fao_lac_options
-        else:
-            options = fao_swp_options
-    elif region_country == "World Bank":
-        if region == "All":
-            options = country_options_swine
-        elif region == "Sub-Saharan Africa":
-            options = wb_africa_options
-        elif region == "Europe & Central Asia":
-            options = wb_eca_options
-        elif region == "Latin America & the Caribbean":
-            options = wb_lac_options
-        elif region == "North America":
-            options = wb_na_options
-        else:
-            options = wb_southasia_options
-
-    return options
 
 # Set slider starting values and add reference underneath based on selected country
 # Also enable "Reset to Default" button
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='reset_daysonfeed_swine'),
     Output('dof-slider-swine', 'value'),
-    Input(component_id='reset-val-swine', component_property='n_clicks')   # Reset to defaults button
+    Input(component_id='reset-val-swine', component_property='n_clicks'),   # Reset to defaults button
+    State('clientside-lookups', 'data'),
     )
-def reset_daysonfeed_swine(reset):
-    return dof_swine_default
 
 # @gbadsDash.callback(
 #     Output('dof-slider-swine', 'value'),
@@ -5429,7 +5649,7 @@ def reset_daysonfeed_swine(reset):
     Input(component_id='reset-val-swine', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_liveweight_swine(country, year, reset):
-    input_df = gbads_pigs_merged_fordash
+    input_df = data.gbads_pigs_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_avgliveweight_kg'].values[0]
     country_shortname = country_shortnames[country]
@@ -5449,7 +5669,7 @@ def show_ref_liveweight_swine(country, year, reset):
     Input(component_id='reset-val-swine', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_producerprice_swine(country, year, reset):
-    input_df = gbads_pigs_merged_fordash
+    input_df = data.gbads_pigs_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_producerprice_usdperkgcarc'].values[0]
     country_shortname = country_shortnames[country]
@@ -5469,7 +5689,7 @@ def show_ref_producerprice_swine(country, year, reset):
     Input(component_id='reset-val-swine', component_property='n_clicks')   # Reset to defaults button
     )
 def show_ref_feedprice_swine(country, year, reset):
-    input_df = gbads_pigs_merged_fordash
+    input_df = data.gbads_pigs_merged_fordash
     _rowselect = (input_df['country'] == country) & (input_df['year'] == year)
     datavalue = input_df.loc[_rowselect ,'acc_feedprice_usdpertonne'].values[0]
     country_shortname = country_shortnames[country]
@@ -5491,7 +5711,7 @@ def show_ref_feedprice_swine(country, year, reset):
     )
 def show_ref_fcr_swine(country, dof, reset):
     breed_label_touse = swine_lookup_breed_from_country[country]
-    breed_df_touse = swine_lookup_breed_df[breed_label_touse]
+    breed_df_touse = data.breedstd[breed_label_touse]
     _rowselect = (breed_df_touse['dayonfeed'] == dof)
     datavalue = breed_df_touse.loc[_rowselect ,'cml_fcr'].values[0]
     if pd.isnull(datavalue):
@@ -5519,7 +5739,7 @@ def show_ref_fcr_swine(country, dof, reset):
 #       gbads_pigs_merged_fordash
 #       ,ACHIEVABLE_PCT_MASTER=achievable_pct
 #       ,AVG_DOF_MASTER=avg_dof
-#       ,BREED_DF_MASTER=swinebreedstd_pic_growthandfeed   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
+#       ,BREED_DF_MASTER=data.breedstd['PIC']   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
 #       ,AVG_CARC_YIELD_MASTER=0.75                        # Float [0, 1]: average carcass yield in kg meat per kg live weight
 #     )
 #     swine_data_withbod['year'] = swine_data_withbod['year'].astype(str)   # Change Year type to text
@@ -5532,18 +5752,21 @@ def show_ref_fcr_swine(country, dof, reset):
     Input('achievable-weight-slider-swine','value'),
     Input('dof-slider-swine','value'),
     Input('ration-price-slider-swine','value'),
-    Input('fcr-slider-swine','value')
+    Input('fcr-slider-swine','value'),
+    **bgj.job_args('swine-core-progress')
     )
-def update_core_data_swine(achievable_wt ,avg_dof ,feedprice ,fcr):
+def update_core_data_swine(set_progress ,achievable_wt ,avg_dof ,feedprice ,fcr):
+    set_progress((0 ,2))
     swine_data_withbod = bod.calc_bod_master_swine(
-        gbads_pigs_merged_fordash
+        data.gbads_pigs_merged_fordash
         ,ACHIEVABLE_WT_KG_MASTER=achievable_wt             # Float: achievable weight without disease
         ,AVG_DOF_MASTER=avg_dof                            # Integer [1, 176]: Average days on feed. Will lookup breed standard weight for this day on feed.
-        ,BREED_DF_MASTER=swinebreedstd_pic_growthandfeed   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
+        ,BREED_DF_MASTER=data.breedstd['PIC']   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
         ,AVG_CARC_YIELD_MASTER=0.75                        # Float [0, 1]: average carcass yield in kg meat per kg live weight
         ,FEEDPRICE_USDPERTONNE_MASTER=feedprice           # Float
         ,IDEAL_FCR_LIVE_MASTER=fcr                        # Float: ideal FCR per kg live weight
     )
+    set_progress((1 ,2))
     swine_data_withbod['year'] = swine_data_withbod['year'].astype(str)   # Change Year type to text
     return swine_data_withbod.to_json(date_format='iso', orient='split')
 
@@ -5559,7 +5782,7 @@ def update_core_data_swine(achievable_wt ,avg_dof ,feedprice ,fcr):
 #          gbads_pigs_merged_fordash
 #          ,ACHIEVABLE_WT_KG_MASTER=achievable_wt             # Float: achievable weight without disease
 #          ,AVG_FEEDINT_KG_MASTER=avg_feedint                 # Float: average feed intake in kg per head
-#          ,BREED_DF_MASTER=swinebreedstd_pic_growthandfeed   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
+#          ,BREED_DF_MASTER=data.breedstd['PIC']   # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
 #          ,AVG_CARC_YIELD_MASTER=0.75                        # Float [0, 1]: average carcass yield as proportion of live weight
 #     )
 #     swine_data_withbod['year'] = swine_data_withbod['year'].astype(str)   # Change Year type to text
@@ -5639,7 +5862,8 @@ def update_background_data_swine(input_json, country ,producerprice ,rationprice
     # ------------------------------------------------------------------------------
     # Order does not matter in these lists
     # Zero decimal places
-    background_data.update(background_data[[
+    number_formats = {}
+    number_formats.update({COL:tbl.fixed(0) for COL in [
       'acc_breedingsows'
       ,'acc_headweaned'
       ,'acc_headplaced'
@@ -5656,18 +5880,18 @@ def update_background_data_swine(input_json, country ,producerprice ,rationprice
       ,'wb_gdp_usd'
       ,'ideal_headplaced'
       ,'ideal_feed_tonnes'
-    ]].applymap('{:,.0f}'.format))
+    ]})
 
     # One decimal place
-    background_data.update(background_data[[
+    number_formats.update({COL:tbl.fixed(1) for COL in [
       'bod_breedstdwt_kg'
       ,'bod_breedstdcarcwt_kg'
       ,'acc_avgcarcweight_kg'
       # ,'acc_avgfeedintake_kgperhd'
-    ]].applymap('{:,.1f}'.format))
+    ]})
 
     # Two decimal places
-    background_data.update(background_data[[
+    number_formats.update({COL:tbl.fixed(2) for COL in [
       'producerprice_usdperkg'
       ,'bod_totalburden_usd'
       ,'bod_breedstdyield_prpn'
@@ -5681,7 +5905,7 @@ def update_background_data_swine(input_json, country ,producerprice ,rationprice
       ,'ideal_nonfeedvariablecost_usdperkgcarc'
       ,'ideal_laborcost_usdperkgcarc'
       ,'ideal_landhousingcost_usdperkgcarc'
-    ]].applymap('{:,.2f}'.format))
+    ]})
 
     # ------------------------------------------------------------------------------
     # Hover-over text
@@ -5737,11 +5961,11 @@ def update_background_data_swine(input_json, country ,producerprice ,rationprice
 
     return [
             html.H4(f"Data for {country}"),
-            dash_table.DataTable(
-                columns=[{"name": j, "id": i} for i, j in columns_to_display_with_labels.items()],
-                data=background_data.to_dict('records'),
-                export_format="csv",
-                sort_action = 'native',
+            tbl.paged_table(
+                'swine-background-table',
+                background_data,
+                columns_to_display_with_labels,
+                FORMATS=number_formats,
                 style_cell={
                     # 'minWidth': '250px',
                     'font-family':'sans-serif',
@@ -5773,7 +5997,7 @@ def update_breed_data_swine(breed):
       ,'cml_feedintake_kg':'Cml Feed Intake (kg)'
       ,'cml_fcr':'FCR'
     }
-    breed_data = swinebreedstd_pic_growthandfeed.copy()
+    breed_data = data.breedstd['PIC'].copy()
 
     # Subset columns
     breed_data = breed_data[list(columns_to_display_with_labels)]
@@ -6108,57 +6332,7 @@ def update_region_detail_options_ga(region_country):
     Input('select-incomegrp-overview-ga','value'),
     )
 def update_country_overview_options_ga(region_country, region, income):
-    if region_country == "WOAH":
-        if region == "All":
-            options = country_options_ga
-        elif region == "Africa":
-            options = WOAH_africa_options_ga
-        elif region == "Americas":
-            options = WOAH_americas_options_ga
-        elif region == "Asia, Far East and Oceania":
-            options = WOAH_asia_options_ga
-        elif region == "Europe":
-            options = WOAH_europe_options_ga
-        else:
-            options = WOAH_me_options_ga
-    elif region_country =="FAO":
-        if region == "All":
-            options = country_options_ga
-        elif region == "Africa":
-            options = fao_africa_options_ga
-        elif region == "Asia":
-            options = fao_asia_options_ga
-        elif region == "Europe and Central Asia":
-            options = fao_eca_options_ga
-        elif region == "Latin America and the Caribbean":
-            options = fao_lac_options_ga
-        elif region == "Near East and North Africa":
-            options = fao_ena_options_ga
-        else:
-            options = fao_swp_options_ga
-    elif region_country == "World Bank":
-        if region == "All":
-            if income == "All":
-                options = country_options_ga
-            else:
-                options_df = ga_countries_biomass.loc[(ga_countries_biomass['incomegroup'] == income)]
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-        else:
-            options_df = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == region)]
-            if income == "All":
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-            else:
-                options_df = options_df.loc[(options_df['incomegroup'] == income)]
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-    else:
-        options = country_options_ga
-
+    options = geo.get_options(ga_geo_index_for(region_country) ,'country' ,region_label=region ,incomegroup=income)
     return options
 
 # Update country options based on region and income group selection
@@ -6169,153 +6343,22 @@ def update_country_overview_options_ga(region_country, region, income):
     Input('select-incomegrp-detail-ga','value'),
     )
 def update_country_detail_options_ga(region_country, region, income):
-    if region_country == "WOAH":
-        if region == "All":
-            options = country_options_ga
-        elif region == "Africa":
-            options = WOAH_africa_options_ga
-        elif region == "Americas":
-            options = WOAH_americas_options_ga
-        elif region == "Asia, Far East and Oceania":
-            options = WOAH_asia_options_ga
-        elif region == "Europe":
-            options = WOAH_europe_options_ga
-        else:
-            options = WOAH_me_options_ga
-    elif region_country =="FAO":
-        if region == "All":
-            options = country_options_ga
-        elif region == "Africa":
-            options = fao_africa_options_ga
-        elif region == "Asia":
-            options = fao_asia_options_ga
-        elif region == "Europe and Central Asia":
-            options = fao_eca_options_ga
-        elif region == "Latin America and the Caribbean":
-            options = fao_lac_options_ga
-        elif region == "Near East and North Africa":
-            options = fao_ena_options_ga
-        else:
-            options = fao_swp_options_ga
-    elif region_country == "World Bank":
-        if region == "All":
-            if income == "All":
-                options = country_options_ga
-            else:
-                options_df = ga_countries_biomass.loc[(ga_countries_biomass['incomegroup'] == income)]
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-        else:
-            options_df = ga_countries_biomass.loc[(ga_countries_biomass['region_label'] == region)]
-            if income == "All":
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-            else:
-                options_df = options_df.loc[(options_df['incomegroup'] == income)]
-                options = [{'label': "All", 'value': "All"}]
-                for i in options_df['country'].unique():
-                    str(options.append({'label':i,'value':(i)}))
-    else:
-        options = country_options_ga
-
+    options = geo.get_options(ga_geo_index_for(region_country) ,'country' ,region_label=region ,incomegroup=income)
     return options
 
 # Update species options based on region and country selections
 @gbadsDash.callback(
     Output('select-species-ga', 'options'),
+    Input('Region-country-alignment-overview-ga', 'value'),
     Input('select-country-overview-ga', 'value'),
     Input('select-region-overview-ga', 'value'),
     )
-def update_species_options_ga(country, region):
-    if region == 'All':
-        if country == "All":
-            options = []
-            for i in ga_countries_biomass['species'].unique():
-                str(options.append({'label':i,'value':(i)}))
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-            options = []
-            for i in input_df['species'].unique():
-                str(options.append({'label':i,'value':(i)}))
-    elif region == "Sub-Saharan Africa":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_africa_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
-    elif region == "East Asia & Pacific":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_eap_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
-    elif region == "Europe & Central Asia":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_eca_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
-    elif region == "Latin America & the Caribbean":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_lac_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
-    elif region == "Middle East & North Africa":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_mena_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
-    elif region == "North America":
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_na_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
+def update_species_options_ga(region_country, country, region):
+    # A selected country overrides the region
+    if country == 'All':
+        options = geo.get_options(ga_geo_index_for(region_country) ,'species' ,region_label=region)
     else:
-        if country == 'All':
-            country = [[v for k,v in d.items()] for d in wb_southasia_options_ga]
-            country = [a[1] for a in country]
-            input_df = ga_countries_biomass[ga_countries_biomass['country'].isin(country)]
-        else:
-            input_df=ga_countries_biomass.loc[(ga_countries_biomass['country'] == country)]
-        # Set options for species based on the filters for region and country
-        options = []
-        for i in input_df['species'].unique():
-            str(options.append({'label':i,'value':(i)}))
+        options = geo.get_options(ga_geo_index_for(region_country) ,'species' ,country=country)
 
     return options
 
@@ -6347,6 +6390,7 @@ def update_species_options_ga(country, region):
     Input('select-country-overview-ga','value'),
     # Input('select-currency-ecs','value'),
     Input('amu-regional-data', 'data'),
+    Input('Region-country-alignment-overview-ga', 'value'),
     )
 def update_overview_table_ga(
         species
@@ -6354,9 +6398,10 @@ def update_overview_table_ga(
         ,region
         ,country
         ,amu_data_json
+        ,region_country
     ):
     # Read in data
-    input_df = ga_countries_biomass.copy()
+    input_df = data.ga_countries_biomass.copy()
     input_df_amu = pd.read_json(amu_data_json, orient='split')
 
     # Add mortality, morbidity, and vetmed rate columns
@@ -6368,82 +6413,25 @@ def update_overview_table_ga(
     # Apply AHLE calcs
     input_df = ga.ahle_calcs_adj_outputs(input_df)
 
+    # Filter Region, Income Group & country
+    # A selected country overrides the region
+    if country == 'All':
+        input_df = geo.filter_rows(input_df ,ga_geo_index_for(region_country) ,region_label=region ,incomegroup=income)
+    else:
+        input_df = geo.filter_rows(input_df ,ga_geo_index_for(region_country) ,incomegroup=income ,country=country)
+
     # Filter Species
     input_df = input_df.loc[(input_df['species'] == species)]
 
-    # Filter Income Group
-    if income == 'All':
-        input_df = input_df
-    else:
-        input_df = input_df.loc[(input_df['incomegroup'] == income)]
-
-    # Filter Region & country
-    if region == "All":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in country_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "Sub-Saharan Africa":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_africa_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "East Asia & Pacific":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_eap_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "Europe & Central Asia":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_eca_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "Latin America & the Caribbean":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_lac_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "Middle East & North Africa":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_mena_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    elif region == "North America":
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_na_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-    else:
-         if country == 'All':
-             selected = [[v for k,v in d.items()] for d in wb_southasia_options_ga]
-             selected = [a[1] for a in selected]
-             input_df = input_df[input_df['country'].isin(selected)]
-         else:
-             input_df=input_df.loc[(input_df['country'] == country)]
-
     # Fill in for missing values AHLE
     # input_df['ahle_total_2010usd'] = input_df['ahle_total_2010usd'].fillna(0)
 
-    # Format numbers
-    input_df.update(input_df[['biomass',
-                              'population',
-                              'liveweight',
-                               # 'ahle_total_2010usd',
-                              ]].applymap('{:,.0f}'.format))
+    # Number formats, applied in the browser
+    number_formats = {COL:tbl.fixed(0) for COL in [
+        'biomass'
+        ,'population'
+        ,'liveweight'
+    ]}
 
     columns_to_display_with_labels = {
        'country':'Country'
@@ -6469,18 +6457,18 @@ def update_overview_table_ga(
     }
     return [
             html.H4("Global Aggregation Data"),
-            dash_table.DataTable(
-                columns=[{"name": j, "id": i} for i, j in columns_to_display_with_labels.items()],
+            tbl.paged_table(
+                'ga-overview-table',
+                input_df,
+                columns_to_display_with_labels,
+                FORMATS=number_formats,
                 fixed_rows={'headers': True, 'data': 0},
-                data=input_df.to_dict('records'),
-                export_format="csv",
                 style_cell={
                     'font-family':'sans-serif',
                     },
                 style_table={'overflowX': 'scroll',
                               'height': '680px',
                               'overflowY': 'auto'},
-                page_action='none',
 
                 # Hover-over for column headers
                 tooltip_header=column_tooltips,
@@ -6510,7 +6498,7 @@ def update_detail_table_ga(
         ,amu_data_json
     ):
     # Read data
-    input_df = ga_countries_biomass.copy()
+    input_df = data.ga_countries_biomass.copy()
     input_df_amu = pd.read_json(amu_data_json, orient='split')
 
     # Add mortality, morbidity, and vetmed rate columns
@@ -6613,33 +6601,34 @@ def update_detail_table_ga(
     # ------------------------------------------------------------------------------
     # Order does not matter in these lists
     # Zero decimal places without comma
-    input_df_filtered.update(input_df_filtered[[
+    number_formats = {}
+    number_formats.update({COL:tbl.fixed(0 ,GROUP=False) for COL in [
         'year'
-    ]].applymap('{:.0f}'.format))
+    ]})
 
     # Zero decimal places
-    input_df_filtered.update(input_df_filtered[[
+    number_formats.update({COL:tbl.fixed(0) for COL in [
         'population'
         ,'biomass'
         ,'production_eggs_tonnes'
         ,'production_meat_tonnes'
         ,'production_milk_tonnes'
         ,'production_wool_tonnes'
-    ]].applymap('{:,.0f}'.format))
+    ]})
 
     # One decimal place
-    input_df_filtered.update(input_df_filtered[[
+    number_formats.update({COL:tbl.fixed(1) for COL in [
         'liveweight'
-    ]].applymap('{:,.1f}'.format))
+    ]})
 
     # Two decimal places
-    input_df_filtered.update(input_df_filtered[[
+    number_formats.update({COL:tbl.fixed(2) for COL in [
         'mortality_rate'
         ,'morbidity_rate'
-    ]].applymap('{:,.2f}'.format))
+    ]})
 
     # Dollars
-    input_df_filtered.update(input_df_filtered[[
+    number_formats.update({COL:tbl.money(2) for COL in [
         # 'producer_price_meat_live_usdpertonne_cnst2010'
         # ,'producer_price_eggs_usdpertonne_cnst2010'
         # ,'producer_price_meat_usdpertonne_cnst2010'
@@ -6668,7 +6657,7 @@ def update_detail_table_ga(
         ,'ahle_dueto_reducedoutput_2010usd'
         ,'ahle_dueto_vetandmedcost_2010usd'
         # ,'ahle_total_2010usd'
-    ]].applymap('${:,.2f}'.format))
+    ]})
 
     # ------------------------------------------------------------------------------
     # Hover-over text
@@ -6725,12 +6714,12 @@ def update_detail_table_ga(
     # adjusted_columns = long_column_names + med_column_names + small_column_names
     return [
         html.H4(f"Detailed data for {print_selected_country}{print_selected_incgrp}"),
-        dash_table.DataTable(
-            columns=[{"name": j, "id": i} for i, j in columns_to_display_with_labels.items()],
+        tbl.paged_table(
+            'ga-detail-table',
+            input_df_filtered,
+            columns_to_display_with_labels,
+            FORMATS=number_formats,
             fixed_rows={'headers': True, 'data': 0},
-            data=input_df_filtered.to_dict('records'),
-            export_format="csv",
-            sort_action = 'native',
             style_cell={'font-family':'sans-serif',
                         'minWidth':200},
             style_table={'overflowX': 'scroll',
@@ -6766,18 +6755,23 @@ def update_detail_table_ga(
     Input('select-incomegrp-overview-ga','value'),
     # Input('select-currency-ecs','value'),
     Input('amu-regional-data', 'data'),
-   )
+    Input('Region-country-alignment-overview-ga', 'value'),
+    **bgj.job_args('ga-map-progress')
+    )
 def update_bio_ahle_visual_ga(
-        viz_selection
+        set_progress
+        ,viz_selection
         ,species
         ,country
         ,region
         ,display
         ,income
         ,amu_data_json
+        ,region_country
     ):
+   set_progress((0 ,3))
    # Data
-   input_df = ga_countries_biomass.copy()
+   input_df = data.ga_countries_biomass.copy()
    input_df_amu = pd.read_json(amu_data_json, orient='split')
 
    # Add mortality, morbidity, and vetmed rate columns
@@ -6786,72 +6780,17 @@ def update_bio_ahle_visual_ga(
    input_df = ga.add_vetmed_rates(input_df)
    input_df = ga.add_antimicrobial_expenditure(input_df ,input_df_amu)
 
+   set_progress((1 ,3))
    # Apply AHLE calcs
    input_df = ga.ahle_calcs_adj_outputs(input_df)
 
-   # Filter Region & country
-   if region == "All":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in country_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "Sub-Saharan Africa":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_africa_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "East Asia & Pacific":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_eap_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "Europe & Central Asia":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_eca_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "Latin America & the Caribbean":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_lac_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "Middle East & North Africa":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_mena_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-   elif region == "North America":
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_na_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
+   set_progress((2 ,3))
+   # Filter Region, Income Group & country
+   # A selected country overrides the region
+   if country == 'All':
+       input_df = geo.filter_rows(input_df ,ga_geo_index_for(region_country) ,region_label=region ,incomegroup=income)
    else:
-        if country == 'All':
-            selected = [[v for k,v in d.items()] for d in wb_southasia_options_ga]
-            selected = [a[1] for a in selected]
-            input_df = input_df[input_df['country'].isin(selected)]
-        else:
-            input_df=input_df.loc[(input_df['country'] == country)]
-
-    # Filter Income Group
-   if income == 'All':
-        input_df = input_df
-   else:
-        input_df = input_df.loc[(input_df['incomegroup'] == income)]
+       input_df = geo.filter_rows(input_df ,ga_geo_index_for(region_country) ,incomegroup=income ,country=country)
 
     # Filter Species
    input_df = input_df.loc[(input_df['species'] == species)]
@@ -6940,17 +6879,22 @@ def update_bio_ahle_visual_ga(
     Input('select-country-detail-ga','value'),
     Input('select-year-ga','value'),
     Input('select-display-ga','value'),
+    Input('select-uncertainty-ga','value'),
+    **bgj.job_args('ga-waterfall-progress')
     )
 def update_ahle_waterfall_ga(
-        amu_data_json
+        set_progress
+        ,amu_data_json
         ,selected_region
         ,selected_incgrp
         ,selected_country
         ,selected_year
         ,display
+        ,uncertainty
     ):
+    set_progress((0 ,3))
     # Read data
-    input_df = ga_countries_biomass.copy()
+    input_df = data.ga_countries_biomass.copy()
     input_df_amu = pd.read_json(amu_data_json, orient='split')
 
     # Add mortality, morbidity, and vetmed rate columns
@@ -6959,9 +6903,11 @@ def update_ahle_waterfall_ga(
     input_df = ga.add_vetmed_rates(input_df)
     input_df = ga.add_antimicrobial_expenditure(input_df ,input_df_amu)
 
+    set_progress((1 ,3))
     # Apply AHLE calcs
     input_df = ga.ahle_calcs_adj_outputs(input_df)
 
+    set_progress((2 ,3))
     # Prep the data
     prep_df = prep_ahle_forwaterfall_ga(input_df)
 
@@ -7017,6 +6963,20 @@ def update_ahle_waterfall_ga(
 
     # Get total AHLE for printing
     total_ahle = prep_df_sums.query("item.str.upper() == 'NET VALUE'")['value_usd_ahle_diff'].values[0]
+    print_interval = ''
+
+    # Credible intervals from Monte Carlo draws of the rates and antimicrobial expenditure
+    if 'Show' in uncertainty:
+        intervals = get_ahle_intervals_ga(input_df, input_df_amu, prep_df_filtered)
+        intervals = intervals.set_index('item').reindex(prep_df_sums['item'].astype(str))
+
+        # Costs are shown as negative values, so negate their intervals
+        _cost_items = intervals.index.str.contains('COSTS|EXPENDITURE', case=False)
+        for VALUE in ['value_usd_current', 'value_usd_ahle_diff']:
+            low = intervals[f'{VALUE}_q2.5'].copy()
+            intervals.loc[_cost_items, f'{VALUE}_q2.5'] = -1 * intervals.loc[_cost_items, f'{VALUE}_q97.5']
+            intervals.loc[_cost_items, f'{VALUE}_q97.5'] = -1 * low[_cost_items]
+        print_interval = f" (95% credible interval ${intervals.loc['Net value', 'value_usd_ahle_diff_q2.5'] :,.0f} to ${intervals.loc['Net value', 'value_usd_ahle_diff_q97.5'] :,.0f})"
 
     if display =='Side by Side':
         # Create graph with current values
@@ -7041,7 +7001,7 @@ def update_ahle_waterfall_ga(
             waterfallgroupgap = 0.5,    # Gap between bars
             )
 
-        ga_waterfall_fig.update_layout(title_text=f'Compare Current values and costs | {print_selected_country}{print_selected_incgrp}{selected_year}<br><sup>Total animal health loss envelope: ${total_ahle :,.0f} in constant 2010 US dollars</sup><br>',
+        ga_waterfall_fig.update_layout(title_text=f'Compare Current values and costs | {print_selected_country}{print_selected_incgrp}{selected_year}<br><sup>Total animal health loss envelope: ${total_ahle :,.0f}{print_interval} in constant 2010 US dollars</sup><br>',
                                         yaxis_title='US Dollars (2010 constant)',
                                         font_size=15)
     else:
@@ -7052,7 +7012,25 @@ def update_ahle_waterfall_ga(
         y = prep_df_sums['value_usd_ahle_diff']
         ga_waterfall_fig = create_ahle_waterfall_ga(prep_df_sums, name, measure, x, y)
 
-        ga_waterfall_fig.update_layout(title_text=f'Ideal minus current values and costs | {print_selected_country}{print_selected_incgrp}{selected_year}<br><sup>Total animal health loss envelope: ${total_ahle :,.0f} in constant 2010 US dollars</sup><br>',
+        # Add intervals as error bars at the end of each bar
+        if 'Show' in uncertainty:
+            low = intervals['value_usd_ahle_diff_q2.5'].to_numpy()
+            high = intervals['value_usd_ahle_diff_q97.5'].to_numpy()
+            bar_ends = y.cumsum().to_numpy()
+            bar_ends[-1] = y.iloc[-1]       # Total bar
+            ga_waterfall_fig.add_trace(go.Scatter(
+                x=x,
+                y=bar_ends,
+                mode='markers',
+                marker=dict(color='rgba(0,0,0,0)'),
+                error_y=dict(type='data', array=high - y.to_numpy(), arrayminus=y.to_numpy() - low, color='#393375', thickness=1.5),
+                customdata=np.column_stack([low, high]),
+                hovertemplate='%{x}: $%{customdata[0]:,.0f} to $%{customdata[1]:,.0f}<extra>95% interval</extra>',
+                name='95% interval',
+                showlegend=False,
+                ))
+
+        ga_waterfall_fig.update_layout(title_text=f'Ideal minus current values and costs | {print_selected_country}{print_selected_incgrp}{selected_year}<br><sup>Total animal health loss envelope: ${total_ahle :,.0f}{print_interval} in constant 2010 US dollars</sup><br>',
                                         yaxis_title='US Dollars (2010 constant)',
                                         font_size=15)
 
@@ -7067,17 +7045,22 @@ def update_ahle_waterfall_ga(
     Input('select-item-ga','value'),
     Input('select-display-ga','value'),
     Input('amu-regional-data', 'data'),
+    Input('select-uncertainty-ga','value'),
+    **bgj.job_args('ga-over-time-progress')
     )
 def update_ahle_lineplot_ga(
-        selected_region
+        set_progress
+        ,selected_region
         ,selected_incgrp
         ,selected_country
         ,selected_item
         ,display
         ,amu_data_json
+        ,uncertainty
     ):
+    set_progress((0 ,3))
     # Read data
-    input_df = ga_countries_biomass.copy()
+    input_df = data.ga_countries_biomass.copy()
     input_df_amu = pd.read_json(amu_data_json, orient='split')
 
     # Add mortality, morbidity, and vetmed rate columns
@@ -7086,9 +7069,11 @@ def update_ahle_lineplot_ga(
     input_df = ga.add_vetmed_rates(input_df)
     input_df = ga.add_antimicrobial_expenditure(input_df ,input_df_amu)
 
+    set_progress((1 ,3))
     # Apply AHLE calcs
     input_df = ga.ahle_calcs_adj_outputs(input_df)
 
+    set_progress((2 ,3))
     # Prep the data
     # Initial data prep is same as waterfall!
     prep_df = prep_ahle_forwaterfall_ga(input_df)
@@ -7142,6 +7127,11 @@ def update_ahle_lineplot_ga(
     prep_df_sums = prep_df_filtered.groupby('year')[['value_usd_current' ,'value_usd_ideal', 'value_usd_ahle_diff']].sum()
     prep_df_sums = prep_df_sums.reset_index()
 
+    # Credible intervals for each year from Monte Carlo draws of the rates and antimicrobial expenditure
+    if 'Show' in uncertainty:
+        intervals = get_ahle_intervals_ga(input_df, input_df_amu, prep_df_filtered, group_vars=['year'])
+        intervals = intervals.loc[intervals['item'] == selected_item].sort_values(by='year')
+
 
     if display == "Side by Side":
         # Plot current value
@@ -7160,6 +7150,9 @@ def update_ahle_lineplot_ga(
             )
 
         ga_lineplot_fig = make_subplots()
+        if 'Show' in uncertainty:
+            add_interval_band_ga(ga_lineplot_fig, intervals['year'], intervals['value_usd_ideal_q2.5'], intervals['value_usd_ideal_q97.5'], '#00CA0F', 'Ideal')
+            add_interval_band_ga(ga_lineplot_fig, intervals['year'], intervals['value_usd_current_q2.5'], intervals['value_usd_current_q97.5'], '#0028CA', 'Current')
         ga_lineplot_fig.add_trace(plot_ideal_value)
         ga_lineplot_fig.add_trace(plot_current_value)
         ga_lineplot_fig.update_layout(title_text=f'Current & ideal {print_selected_item} | {print_selected_country}{print_selected_incgrp}<br><sup></sup><br>',
@@ -7196,6 +7189,8 @@ def update_ahle_lineplot_ga(
                 )
 
         ga_lineplot_fig = make_subplots()
+        if 'Show' in uncertainty:
+            add_interval_band_ga(ga_lineplot_fig, intervals['year'], intervals['value_usd_ahle_diff_q2.5'], intervals['value_usd_ahle_diff_q97.5'], plot_ahle_value.line.color, display)
         ga_lineplot_fig.add_trace(plot_ahle_value)
         ga_lineplot_fig.update_layout(title_text=f'Ideal minus current {print_selected_item} | {print_selected_country}{print_selected_incgrp}<br><sup></sup><br>',
                                       yaxis_title='US Dollars (2010 constant)',
@@ -7220,7 +7215,7 @@ def update_ahle_lineplot_ga(
     )
 def update_prodsys_options_ecs(species):
     # Get unique production systems for selected species
-    unique_prodsys = np.sort(ahle_all_scensmry.loc[ahle_all_scensmry['species'] == species ,'production_system'].unique())
+    unique_prodsys = np.sort(slst.get_slice_values(data.ahle_all_scensmry_store ,'production_system' ,species=species))
     options = [{'label': i, 'value': i} for i in unique_prodsys]
     value = options[0]['value']  # Default is first one
     return options, value
@@ -7256,7 +7251,7 @@ def update_year_select_ecs(graph, species):
 
     if (graph == 'Single Year') & (species.upper() == 'CATTLE'):
         ecs_year_options=[]
-        for i in np.sort(ahle_all_scensmry['year'].unique()):
+        for i in np.sort(data.ahle_all_scensmry['year'].unique()):
             str(ecs_year_options.append({'label':i,'value':(i)}))
     elif graph == 'Over Time':   # Over time - placeholder (all)
         placeholder = '(all)'
@@ -7323,73 +7318,36 @@ def update_compare_options_ecs(species):
 
 # Update hierarchy dropdown filters to remove higher level selections from the options
 # And change if displaying stacked bar
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='ecs_top_lvl_title'),
     Output('select-top-lvl-attr-ecs-title','children'),
     Input('select-graph-ahle-ecs','value'),
     )
-def update_year_item_switch(graph):
-    if graph == 'Single Year':
-        title = 'Top Level'
-    else:
-        title = 'Segmentation'
-    return title
 
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='ecs_dd1_options'),
     Output('select-dd-1-attr-ecs','options'),
     Output('select-dd-1-attr-ecs','value'),
     Output('select-dd-1-attr-ecs','style'),
     Output('select-dd-1-attr-ecs-title','style'),
     Input('select-graph-ahle-ecs','value'),
     Input('select-top-lvl-attr-ecs','value'),
+    State('clientside-lookups','data'),
     )
-def update_dd1_options_ecs(graph, top_lvl_hierarchy):
-    options = ecs_hierarchy_dd_attr_options.copy()
 
-    if graph == 'Over Time':
-        for d in options:
-            d['disabled']=True
-        display_style = {'display': 'none'}
-
-    else:
-        for d in options:
-            if d['value'] == top_lvl_hierarchy:
-                d['disabled']=True
-            else:
-                d['disabled']=False
-        display_style = {'display': 'block'}
-
-    value='production_system'
-
-    return options, value, display_style, display_style
-
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='ecs_dd_options'),
     Output('select-dd-2-attr-ecs','options'),
     Output('select-dd-2-attr-ecs','style'),
     Output('select-dd-2-attr-ecs-title','style'),
     Input('select-graph-ahle-ecs','value'),
     Input('select-top-lvl-attr-ecs','value'),
     Input('select-dd-1-attr-ecs','value'),
+    State('clientside-lookups','data'),
     )
-def update_dd2_options_ecs(graph, top_lvl_hierarchy, dd1_hierarchy):
-    options = ecs_hierarchy_dd_attr_options
 
-    if graph == 'Over Time':
-        for d in options:
-            d['disabled']=True
-        display_style = {'display': 'none'}
-
-    else:
-        for d in options:
-            if d['value'] != 'None':
-                if d['value'] == top_lvl_hierarchy or d['value'] == dd1_hierarchy:
-                    d['disabled']= True
-                else:
-                    d['disabled']=False
-        display_style = {'display': 'block'}
-
-    return options, display_style, display_style
-
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='ecs_dd_options'),
     Output('select-dd-3-attr-ecs','options'),
     Output('select-dd-3-attr-ecs','style'),
     Output('select-dd-3-attr-ecs-title','style'),
@@ -7397,27 +7355,11 @@ def update_dd2_options_ecs(graph, top_lvl_hierarchy, dd1_hierarchy):
     Input('select-top-lvl-attr-ecs','value'),
     Input('select-dd-1-attr-ecs','value'),
     Input('select-dd-2-attr-ecs','value'),
+    State('clientside-lookups','data'),
     )
-def update_dd3_options_ecs(graph, top_lvl_hierarchy, dd1_hierarchy, dd2_hierarchy):
-    options = ecs_hierarchy_dd_attr_options
-
-    if graph == 'Over Time':
-        for d in options:
-            d['disabled']=True
-        display_style = {'display': 'none'}
-
-    else:
-        for d in options:
-            if d['value'] != 'None':
-                if d['value'] == top_lvl_hierarchy or d['value'] == dd1_hierarchy or d['value'] == dd2_hierarchy:
-                    d['disabled']= True
-                else:
-                    d['disabled']=False
-        display_style = {'display': 'block'}
 
-    return options, display_style, display_style
-
-@gbadsDash.callback(
+gbadsDash.clientside_callback(
+    ClientsideFunction(namespace='gbads' ,function_name='ecs_dd_options'),
     Output('select-dd-4-attr-ecs','options'),
     Output('select-dd-4-attr-ecs','style'),
     Output('select-dd-4-attr-ecs-title','style'),
@@ -7426,24 +7368,8 @@ def update_dd3_options_ecs(graph, top_lvl_hierarchy, dd1_hierarchy, dd2_hierarch
     Input('select-dd-1-attr-ecs','value'),
     Input('select-dd-2-attr-ecs','value'),
     Input('select-dd-3-attr-ecs','value'),
+    State('clientside-lookups','data'),
     )
-def update_dd4_options_ecs(graph, top_lvl_hierarchy, dd1_hierarchy, dd2_hierarchy, dd3_hierarchy):
-    options = ecs_hierarchy_dd_attr_options
-    if graph == 'Over Time':
-        for d in options:
-            d['disabled']=True
-        display_style = {'display': 'none'}
-
-    else:
-        for d in options:
-            if d['value'] != 'None':
-                if d['value'] == top_lvl_hierarchy or d['value'] == dd1_hierarchy or d['value'] == dd2_hierarchy or d['value'] == dd3_hierarchy:
-                    d['disabled']= True
-                else:
-                    d['disabled']=False
-        display_style = {'display': 'block'}
-
-    return options, display_style, display_style
 
 # @gbadsDash.callback(
 #     Output('select-dd-5-attr-ecs','options'),
@@ -7667,38 +7593,28 @@ def update_footnote(graph):
     Input('select-agesex-ecs', 'value'),
 )
 def update_ecs_ahle_data(currency, species, prodsys, agesex):
-    # Read in data and apply filters
-    input_df = ahle_all_scensmry.copy()
-
-    # Species filter
-    input_df = input_df.loc[(input_df['species'] == species)]
-
-    # Production System filter
-    # Rename values to match filters
-    input_df['production_system'] = input_df['production_system'].replace({'Overall': 'All Production Systems'})
-    input_df=input_df.loc[(input_df['production_system'] == prodsys)]
-
-    # Age/sex filter
-    input_df=input_df.loc[(input_df['agesex_scenario'] == agesex)]
+    # Get data for selected species, production system, and age/sex group
+    input_df = slst.get_slice(
+        data.ahle_all_scensmry_store
+        ,species=species
+        ,production_system=prodsys
+        ,agesex_scenario=agesex
+        )
 
-    # If currency is USD, use USD columns
+    # Convert to selected currency
     display_currency = 'Birr'
     if currency == 'USD':
         display_currency = 'USD'
+    input_df = convert_currency_ecs(input_df, currency)
 
-        input_df['mean_current'] = input_df['mean_current_usd']
-        input_df['stdev_current'] = input_df['stdev_current_usd']
-        input_df['mean_mortality_zero'] = input_df['mean_mortality_zero_usd']
-        input_df['stdev_mortality_zero'] = input_df['stdev_mortality_zero_usd']
-        input_df['mean_ideal'] = input_df['mean_ideal_usd']
-        input_df['stdev_ideal'] = input_df['stdev_ideal_usd']
-
-    # Format numbers
-    input_df.update(input_df[['mean_current',
-                              'mean_ideal',
-                              'mean_mortality_zero',
-                              'mean_diff_ideal',
-                              'mean_diff_mortzero',]].applymap('{:,.0f}'.format))
+    # Number formats, applied in the browser
+    number_formats = {COL:tbl.fixed(0) for COL in [
+        'mean_current'
+        ,'mean_ideal'
+        ,'mean_mortality_zero'
+        ,'mean_diff_ideal'
+        ,'mean_diff_mortzero'
+    ]}
 
     columns_to_display_with_labels = {
         'species':'Species'
@@ -7744,10 +7660,11 @@ def update_ecs_ahle_data(currency, species, prodsys, agesex):
                 *Output of the compartmental population model*
                 '''
                 ),
-            dash_table.DataTable(
-                columns=[{"name": j, "id": i} for i, j in columns_to_display_with_labels.items()],
-                data=input_df.to_dict('records'),
-                export_format="csv",
+            tbl.paged_table(
+                'ecs-ahle-table',
+                input_df,
+                columns_to_display_with_labels,
+                FORMATS=number_formats,
                 style_cell={
                     # 'minWidth': '250px',
                     'font-family':'sans-serif',
@@ -7766,7 +7683,7 @@ def update_ecs_ahle_data(currency, species, prodsys, agesex):
     )
 def update_ecs_attr_data(currency, prodsys, species):
     # Read in data
-    input_df = ecs_ahle_all_withattr
+    input_df = data.ecs_ahle_all_withattr
 
     # Production System filter
     # If All production systems, don't filter. Attribution data is not aggregated to that level.
@@ -7791,12 +7708,13 @@ def update_ecs_attr_data(currency, prodsys, species):
     if currency == 'USD':
         display_currency = 'USD'
 
-    # Format numbers
-    input_df.update(input_df[['mean',
-                              'sd',
-                              'lower95',
-                              'upper95',
-                              ]].applymap('{:,.0f}'.format))
+    # Number formats, applied in the browser
+    number_formats = {COL:tbl.fixed(0) for COL in [
+        'mean'
+        ,'sd'
+        ,'lower95'
+        ,'upper95'
+    ]}
     # input_df.update(input_df[['pct_of_total']].applymap('{:,.2f}%'.format))
 
     columns_to_display_with_labels = {
@@ -7827,10 +7745,11 @@ def update_ecs_attr_data(currency, prodsys, species):
                 *Based on expert opinion attribution proportions*
                 '''
                 ),
-            dash_table.DataTable(
-                columns=[{"name": j, "id": i} for i, j in columns_to_display_with_labels.items()],
-                data=input_df.to_dict('records'),
-                export_format="csv",
+            tbl.paged_table(
+                'ecs-attr-table',
+                input_df,
+                columns_to_display_with_labels,
+                FORMATS=number_formats,
                 style_cell={
                     # 'minWidth': '250px',
                     'font-family':'sans-serif',
@@ -7838,7 +7757,6 @@ def update_ecs_attr_data(currency, prodsys, species):
                 style_table={'overflowX': 'scroll',
                               'height': '320px',
                               'overflowY': 'auto'},
-                page_action='none',
             )
         ]
 
@@ -7850,13 +7768,13 @@ def update_ecs_attr_data(currency, prodsys, species):
 def update_ecs_attr_expert_data(species):
     # Read in data depending on species selected
     if species in ["All Small Ruminants", "Goat", "Sheep"]:
-        input_df = ecs_expertattr_smallrum
+        input_df = data.ecs_expertattr_smallrum
         spec_label = "Small Ruminants"
     elif species == "Cattle":
-        input_df = ecs_expertattr_cattle
+        input_df = data.ecs_expertattr_cattle
         spec_label = "Cattle"
     elif species in ["All Poultry", "Poultry hybrid", "Poultry indigenous"]:
-        input_df = ecs_expertattr_poultry
+        input_df = data.ecs_expertattr_poultry
         spec_label = "Poultry"
 
     # Format numbers
@@ -7934,89 +7852,29 @@ def update_ahle_value_and_cost_viz_ecs(
         geo_view,
         region,
     ):
-    # Read in data and apply filters
-    input_df = ahle_all_scensmry
-
-    # Species filter
-    input_df = input_df.loc[(input_df['species'] == species)]
-
-    # Production System filter
-    input_df=input_df.loc[(input_df['production_system'] == prodsys)]
-
-    # Age/sex filter
-    input_df=input_df.loc[(input_df['agesex_scenario'] == agesex)]
-
     # Geographic filter
     if geo_view.upper() == "NATIONAL":
-        input_df = input_df.query("region == 'National'")
         reg_title = 'National'
     else:
-        input_df = input_df.query("region == @region")
         reg_title = region
 
+    # Get data for selected species, production system, age/sex group, and region
+    input_df = slst.get_slice(
+        data.ahle_all_scensmry_store
+        ,species=species
+        ,production_system=prodsys
+        ,agesex_scenario=agesex
+        ,region=reg_title
+        )
+
     # Prep the data
     prep_df = prep_ahle_forwaterfall_ecs(input_df)
 
-    # If currency is USD, use USD columns
+    # Convert to selected currency
     display_currency = 'Ethiopian Birr'
     if currency == 'USD':
         display_currency = 'USD'
-
-        prep_df['mean_current']                     = prep_df['mean_current_usd']
-        prep_df['mean_mortality_zero']              = prep_df['mean_mortality_zero_usd']
-        prep_df['mean_ideal']                       = prep_df['mean_ideal_usd']
-        prep_df['mean_diff_ideal']                  = prep_df['mean_diff_ideal_usd']
-        prep_df['mean_diff_mortzero']               = prep_df['mean_diff_mortzero_usd']
-        prep_df['mean_all_mort_25_imp']             = prep_df['mean_all_mort_25_imp_usd']
-        prep_df['mean_all_mort_50_imp']             = prep_df['mean_all_mort_50_imp_usd']
-        prep_df['mean_all_mort_75_imp']             = prep_df['mean_all_mort_75_imp_usd']
-        prep_df['mean_diff_mortimp25']              = prep_df['mean_diff_mortimp25_usd']
-        prep_df['mean_diff_mortimp50']              = prep_df['mean_diff_mortimp50_usd']
-        prep_df['mean_diff_mortimp75']              = prep_df['mean_diff_mortimp75_usd']
-        prep_df['mean_current_repro_25_imp']        = prep_df['mean_current_repro_25_imp_usd']
-        prep_df['mean_current_repro_50_imp']        = prep_df['mean_current_repro_50_imp_usd']
-        prep_df['mean_current_repro_75_imp']        = prep_df['mean_current_repro_75_imp_usd']
-        prep_df['mean_current_repro_100_imp']       = prep_df['mean_current_repro_100_imp_usd']
-        prep_df['mean_diff_reprimp25']              = prep_df['mean_diff_reprimp25_usd']
-        prep_df['mean_diff_reprimp50']              = prep_df['mean_diff_reprimp50_usd']
-        prep_df['mean_diff_reprimp75']              = prep_df['mean_diff_reprimp75_usd']
-        prep_df['mean_diff_reprimp100']             = prep_df['mean_diff_reprimp100_usd']
-        prep_df['mean_current_growth_25_imp_all']   = prep_df['mean_current_growth_25_imp_all_usd']
-        prep_df['mean_current_growth_50_imp_all']   = prep_df['mean_current_growth_50_imp_all_usd']
-        prep_df['mean_current_growth_75_imp_all']   = prep_df['mean_current_growth_75_imp_all_usd']
-        prep_df['mean_current_growth_100_imp_all']  = prep_df['mean_current_growth_100_imp_all_usd']
-        prep_df['mean_diff_growimp25']              = prep_df['mean_diff_growimp25_usd']
-        prep_df['mean_diff_growimp50']              = prep_df['mean_diff_growimp50_usd']
-        prep_df['mean_diff_growimp75']              = prep_df['mean_diff_growimp75_usd']
-        prep_df['mean_diff_growimp100']             = prep_df['mean_diff_growimp100_usd']
-
-        prep_df['stdev_current']                     = prep_df['stdev_current_usd']
-        prep_df['stdev_mortality_zero']              = prep_df['stdev_mortality_zero_usd']
-        prep_df['stdev_ideal']                       = prep_df['stdev_ideal_usd']
-        prep_df['stdev_diff_ideal']                  = prep_df['stdev_diff_ideal_usd']
-        prep_df['stdev_diff_mortzero']               = prep_df['stdev_diff_mortzero_usd']
-        prep_df['stdev_all_mort_25_imp']             = prep_df['stdev_all_mort_25_imp_usd']
-        prep_df['stdev_all_mort_50_imp']             = prep_df['stdev_all_mort_50_imp_usd']
-        prep_df['stdev_all_mort_75_imp']             = prep_df['stdev_all_mort_75_imp_usd']
-        prep_df['stdev_diff_mortimp25']              = prep_df['stdev_diff_mortimp25_usd']
-        prep_df['stdev_diff_mortimp50']              = prep_df['stdev_diff_mortimp50_usd']
-        prep_df['stdev_diff_mortimp75']              = prep_df['stdev_diff_mortimp75_usd']
-        prep_df['stdev_current_repro_25_imp']        = prep_df['stdev_current_repro_25_imp_usd']
-        prep_df['stdev_current_repro_50_imp']        = prep_df['stdev_current_repro_50_imp_usd']
-        prep_df['stdev_current_repro_75_imp']        = prep_df['stdev_current_repro_75_imp_usd']
-        prep_df['stdev_current_repro_100_imp']       = prep_df['stdev_current_repro_100_imp_usd']
-        prep_df['stdev_diff_reprimp25']              = prep_df['stdev_diff_reprimp25_usd']
-        prep_df['stdev_diff_reprimp50']              = prep_df['stdev_diff_reprimp50_usd']
-        prep_df['stdev_diff_reprimp75']              = prep_df['stdev_diff_reprimp75_usd']
-        prep_df['stdev_diff_reprimp100']             = prep_df['stdev_diff_reprimp100_usd']
-        prep_df['stdev_current_growth_25_imp_all']   = prep_df['stdev_current_growth_25_imp_all_usd']
-        prep_df['stdev_current_growth_50_imp_all']   = prep_df['stdev_current_growth_50_imp_all_usd']
-        prep_df['stdev_current_growth_75_imp_all']   = prep_df['stdev_current_growth_75_imp_all_usd']
-        prep_df['stdev_current_growth_100_imp_all']  = prep_df['stdev_current_growth_100_imp_all_usd']
-        prep_df['stdev_all_current_growth_25_AHLE']  = prep_df['stdev_all_current_growth_25_AHLE_usd']
-        prep_df['stdev_all_current_growth_50_AHLE']  = prep_df['stdev_all_current_growth_50_AHLE_usd']
-        prep_df['stdev_all_current_growth_75_AHLE']  = prep_df['stdev_all_current_growth_75_AHLE_usd']
-        prep_df['stdev_all_current_growth_100_AHLE'] = prep_df['stdev_all_current_growth_100_AHLE_usd']
+    prep_df = convert_currency_ecs(prep_df, currency)
 
     # Create longitudinal chart
     if graph_options == "Over Time":
@@ -8670,7 +8528,7 @@ def update_attr_treemap_ecs(
         region,
     ):
     # Data
-    input_df = ecs_ahle_all_withattr
+    input_df = data.ecs_ahle_all_withattr
 
     # Geographic filter
     if geo_view.upper() == "NATIONAL":
@@ -8729,7 +8587,12 @@ def update_attr_treemap_ecs(
             path +=[dd4_hierarchy]
 
         # Set up treemap structure
-        ecs_treemap_fig = create_attr_treemap_ecs(input_df, path)
+        # The treemap data depends only on the filter selections, so cache the aggregation on them
+        ecs_treemap_fig = create_attr_treemap_ecs(
+            input_df,
+            path,
+            dataset_key=('ecs_ahle_all_withattr', reg_title, prodsys, species_label, currency, selected_year)
+            )
 
         # Add title
         ecs_treemap_fig.update_layout(
@@ -8812,10 +8675,7 @@ def update_stacked_bar_ecs(
         selected_item,
     ):
     # AHLE Summary 2 - for stacked bar
-    input_df = ecs_ahle_summary2
-
-    # Rename values to match filters
-    input_df['production_system'] = input_df['production_system'].replace({'Overall': 'All Production Systems'})
+    # Production system labels were renamed to match filters at startup
 
     # Set columns for stacked bar based on selections
     # Change y based on selected currency value
@@ -9180,21 +9040,21 @@ def update_stacked_bar_ecs(
     # -----------------------------------------------------------------------------
     # Base plot
     # -----------------------------------------------------------------------------
-    # Apply year filter
+    # Get data for selected species, production system, and year
     if graph_options == "Single Year":
-        input_df = input_df.loc[input_df['year'] == selected_year]
+        bar_year = selected_year
     else:
-        input_df = input_df.loc[input_df['year'] == 2021]
+        bar_year = 2021
+    input_df = slst.get_slice(
+        data.ecs_ahle_summary2_store
+        ,species=species
+        ,production_system=prodsys
+        ,year=bar_year
+        )
 
     # Structure for plot
     stackedbar_df = prep_ahle_forstackedbar_ecs(input_df, cols_birr_costs, cols_usd_costs, pretty_ahle_cost_names)
 
-    # Apply production system filter
-    stackedbar_df = stackedbar_df.loc[stackedbar_df['production_system'] == prodsys]
-
-    # Apply species filter
-    stackedbar_df = stackedbar_df.loc[stackedbar_df['species'] == species]
-
     x = stackedbar_df['species']
 
     # Change y based on selected currency value
@@ -9291,8 +9151,9 @@ def update_wei_display_ecs(species):
     Input('select-map-display-ecs','value'),
     Input('select-currency-ecs','value'),
     Input('select-map-denominator-ecs','value'),
+    **bgj.job_args('ecs-map-progress')
     )
-def update_map_display_ecs(species, agesex_scenario, prodsys, item, currency, denominator):
+def update_map_display_ecs(set_progress, species, agesex_scenario, prodsys, item, currency, denominator):
     if species.upper() != 'CATTLE':
         ecs_map_fig = go.Figure()
         ecs_map_fig.update_layout(
@@ -9311,8 +9172,8 @@ def update_map_display_ecs(species, agesex_scenario, prodsys, item, currency, de
                ]
            )
     else:
-        # Ethiopia subnational level map data from S3
-        geojson_ecs_df = geojson_ecs.copy()
+        # Ethiopia subnational level map data from S3, loaded by the browser from its URL
+        geojson_ecs_df = geojson_ecs_url
         # geojson_ecs_df = gpd.read_file('<filename>.geojson')
 
         # Set location based on the granularity level of data - currently Region
@@ -9322,49 +9183,35 @@ def update_map_display_ecs(species, agesex_scenario, prodsys, item, currency, de
         # Set the featureid key needed for the choropleth mapbox map
         featurekey = (f'properties.{featureid}')
 
-        # Read in data and apply filters
-        input_df = ahle_all_scensmry
+        if item == 'Ideal Gross Margin' or item == 'Animal Health Loss Envelope':
+            item_filter = 'Gross Margin'
+        else:
+            item_filter = item
 
+        set_progress((0 ,2))
+        # Get data for selected production system, age/sex group, and item
         # Filter based on species - Currently only have Cattle for 2021
-        input_df = input_df.loc[(input_df['species'] == 'Cattle')]
+        input_df = slst.get_slice(
+            data.ahle_all_scensmry_store
+            ,species='Cattle'
+            ,production_system=prodsys
+            ,agesex_scenario=agesex_scenario
+            ,item=item_filter
+            )
 
         # Remove 'National' for regional view
         input_df = input_df.query("region != 'National'")
 
-        # Production System filter
-        # Rename values to match filters
-        input_df['production_system'] = input_df['production_system'].replace({'Overall': 'All Production Systems'})
-        input_df=input_df.loc[(input_df['production_system'] == prodsys)]
-
-        # Age/sex filter
-        input_df=input_df.loc[(input_df['agesex_scenario'] == agesex_scenario)]
-
-        if item == 'Ideal Gross Margin' or item == 'Animal Health Loss Envelope':
-            item_filter = 'Gross Margin'
-        else:
-            item_filter = item
-        input_df = input_df.query("item == @item_filter")
-
         # Set values based on selected currency and denominator values
-        # If currency is USD, use USD columns
         display_currency = 'Ethiopian Birr'
-        if denominator.upper() == 'PER KG BIOMASS':
-            if currency == 'USD':
-                display_currency = 'USD'
-                input_df['mean_current'] = input_df['mean_current_usd_perkgbiomass']
-                input_df['mean_ideal'] = input_df['mean_ideal_usd_perkgbiomass']
-                input_df['mean_diff_ideal'] = input_df['mean_diff_ideal_usd_perkgbiomass']
-            else:
-                input_df['mean_current'] = input_df['mean_current_perkgbiomass']
-                input_df['mean_ideal'] = input_df['mean_ideal_perkgbiomass']
-                input_df['mean_diff_ideal'] = input_df['mean_diff_ideal_perkgbiomass']
+        if currency == 'USD':
+            display_currency = 'USD'
+        input_df = convert_currency_ecs(input_df, currency)
 
-        else:
-            if currency == 'USD':
-                display_currency = 'USD'
-                input_df['mean_current'] = input_df['mean_current_usd']
-                input_df['mean_ideal'] = input_df['mean_ideal_usd']
-                input_df['mean_diff_ideal'] = input_df['mean_diff_ideal_usd']
+        if denominator.upper() == 'PER KG BIOMASS':
+            input_df['mean_current'] = input_df['mean_current_perkgbiomass']
+            input_df['mean_ideal'] = input_df['mean_ideal_perkgbiomass']
+            input_df['mean_diff_ideal'] = input_df['mean_diff_ideal_perkgbiomass']
 
         # Color scale by current, ideal or AHLE
         if item == 'Ideal Gross Margin':
@@ -9384,6 +9231,7 @@ def update_map_display_ecs(species, agesex_scenario, prodsys, item, currency, de
         elif "COST" in item.upper():
             color_scale = [(0, "#fdeeec"), (0.5, "#f08d83"), (1, "#E84C3D")]
 
+        set_progress((1 ,2))
         ecs_map_fig = create_map_display_ecs(input_df, geojson_ecs_df, location, featurekey, color_by, color_scale)
 
         # Set min to 0
@@ -9510,9 +9358,8 @@ def update_map_amr_options(display_option, antimicrobial_class):
 
         if display_option == 'Antimicrobial Resistance (country level)':
             # Filter data based on antimicrobial class selected
-            input_df=amr_withsmry.query(f"antimicrobial_class == '{antimicrobial_class}'")
             options2 = []
-            for i in input_df['pathogen'].unique():
+            for i in slst.get_slice_values(data.amr_withsmry_store, 'pathogen', antimicrobial_class=antimicrobial_class):
                 str(options2.append({'label':i,'value':(i)}))
 
             block = {'display': 'block'}
@@ -9602,7 +9449,7 @@ def update_map_amr_options(display_option, antimicrobial_class):
     Input('reset-sliders-amu','n_clicks'),
     )
 def update_usage_price_sliders(reset_button):
-    regional_usage_price_data = amu_combined_regional.copy()
+    regional_usage_price_data = data.amu_combined_regional.copy()
 
 
     # Steps will be the same for all
@@ -9755,7 +9602,7 @@ def update_regional_table_amu(
         ,usage_europe ,price_europe
         ,usage_mideast ,price_mideast
     ):
-    df = amu_combined_regional.copy()
+    df = data.amu_combined_regional.copy()
 
     # Add selected usage and price values as columns
     df.loc[df['region'].str.contains('africa' ,case=False) ,['amu_terrestrial_tonnes_selected' ,'am_price_usdpertonne_selected']] = \
@@ -9773,6 +9620,20 @@ def update_regional_table_amu(
     df['am_expenditure_usd_selected'] = df['amu_terrestrial_tonnes_selected'] * df['am_price_usdpertonne_selected']
     df['am_expenditure_usd_perkg_selected'] = df['am_expenditure_usd_selected'] / df['biomass_terr_kg_region']
 
+    # Uncertainty in expenditure: usage and price as PERT distributions over the slider ranges,
+    # with the selected values as most likely. Seeded, so the same selections give the same interval.
+    df = pert.expenditure_uncertainty(
+        df
+        ,USAGE_COLS=['terr_amu_tonnes_reporting_2020' ,'amu_terrestrial_tonnes_selected' ,'terr_amu_tonnes_mulch_2020']
+        ,PRICE_COLS=['am_price_usdpertonne_low' ,'am_price_usdpertonne_selected' ,'am_price_usdpertonne_high']
+        ,QUANTILES=[0.025 ,0.975]
+        ,N_SAMPLES=5000
+    )
+    df['am_expenditure_usd_errorlow'] = (df['am_expenditure_usd_selected'] - df['expenditure_q2.5']).clip(lower=0)
+    df['am_expenditure_usd_errorhigh'] = (df['expenditure_q97.5'] - df['am_expenditure_usd_selected']).clip(lower=0)
+    df['am_expenditure_usd_perkg_errorlow'] = df['am_expenditure_usd_errorlow'] / df['biomass_terr_kg_region']
+    df['am_expenditure_usd_perkg_errorhigh'] = df['am_expenditure_usd_errorhigh'] / df['biomass_terr_kg_region']
+
     return df.to_json(date_format='iso', orient='split')
 
 # Datatable below graphics
@@ -9781,7 +9642,7 @@ def update_regional_table_amu(
     Input('select-species-ga','value'),
     )
 def update_table_display_amu(dummy_input):
-    display_data = amu2018_combined_tall.copy()
+    display_data = data.amu2018_combined_tall.copy()
 
     # Filter out AGP
     display_data = display_data.query("scope != 'AGP'")
@@ -10008,7 +9869,7 @@ def update_regional_display_amu(input_json):
     Input('amu-regional-data', 'data'),
     )
 def update_amr_display_amu(dummy_input):
-    display_data = amr_withsmry.copy()
+    display_data = data.amr_withsmry_fordisplay
 
     columns_to_display_with_labels = {
         'woah_region':'Region'
@@ -10020,27 +9881,7 @@ def update_amr_display_amu(dummy_input):
         ,'reporting_year':'Reporting Year'
         }
 
-    # ------------------------------------------------------------------------------
-    # Format data to display in the table
-    # ------------------------------------------------------------------------------
-    # Order does not matter in these lists
-    # Zero decimal places
-    display_data.update(display_data[[
-        'sum_isolates'
-    ]].applymap('{:,.0f}'.format))
-
-    # One decimal place
-    # display_data.update(display_data[[
-    # ]].applymap('{:,.1f}'.format))
-
-    # Two decimal places
-    # display_data.update(display_data[[
-    # ]].applymap('{:,.2f}'.format))
-
-    # Percent
-    display_data.update(display_data[[
-        'overall_prev'
-    ]].applymap('{:,.1%}'.format))
+    # Data is formatted for display when it is read in (amr_withsmry_fordisplay)
 
     return [
             html.H4("Antimicrobial Resistance Data"),
@@ -10195,49 +10036,25 @@ def update_amr_display_amu(dummy_input):
     Input('amu-regional-data', 'data'),
     )
 def update_map_amu (viz_switch, quantity, antimicrobial_class, pathogens, input_json):
-    input_df = amu2018_combined_tall.copy()
-    input_df_amr = amr_withsmry.copy()
+    # AMU display tables have scope All and cleaned class names (see amu2018_display)
+    input_df = data.amu2018_display                      # One row per region & antimicrobial, for the tree map
+    input_df_byregion = data.amu2018_display_byregion.copy()    # One row per region, for the map
     input_df_am_expend = pd.read_json(input_json, orient='split')
 
-    # Filter scope to All and remove nulls from importance category
-    input_df = input_df.query("scope == 'All'")
-
-    # Filter AMR to just 2018, selected antimicrobial class and pathogen, and sort data by region
-    # input_df_amr = input_df_amr.query("reporting_year == 2018").query(f"antimicrobial_class == '{antimicrobial_class}'").query(f"pathogen == '{pathogens}'")
-    # Update: AMR data now includes only a single year selected for each region based on the most data available
-    input_df_amr = input_df_amr.query(f"antimicrobial_class == '{antimicrobial_class}'").query(f"pathogen == '{pathogens}'")
+    # Filter AMR to selected antimicrobial class and pathogen, and sort data by region
+    # AMR data includes only a single year selected for each region based on the most data available
+    input_df_amr = slst.get_slice(data.amr_withsmry_store, antimicrobial_class=antimicrobial_class, pathogen=pathogens)
     input_df_amr = input_df_amr.sort_values(by=['woah_region'])
 
-    # Fix antimicrobial class names
-    input_df = input_df.replace(['aggregated_class_data',
-                                 'other_important',
-                                 'sulfonamides__including_trimethoprim',
-                                 'cephalosporins__all_generations',
-                                 '1_2_gen__cephalosporins',
-                                 '3_4_gen_cephalosporins',
-                                 'other_quinolones'],
-                                ['aggregated class data',
-                                 'other (important)',
-                                 'sulfonamides (with trimethoprim)',
-                                 'cephalosporins (all gens)',
-                                 'cephalosporins (1 & 2 gen)',
-                                 'cephalosporins (3 & 4 gen)',
-                                 'other quinolones'])
-
-    # Convert antimicrobial classes to title case
-    input_df.antimicrobial_class = input_df.antimicrobial_class.str.title()
-    input_df.antimicrobial_class_group = input_df.antimicrobial_class_group.str.title()
-    input_df.antimicrobial_class_group2 = input_df.antimicrobial_class_group2.str.title()
-
     # Use selected quantity value (AMU & AMR)
     if quantity == 'Antimicrobial usage: tonnes':
         value = input_df['amu_tonnes']
-        map_value = input_df['amu_tonnes_by_region'] = input_df['amu_tonnes'].groupby(input_df['region']).transform('sum')
+        map_value = input_df_byregion['amu_tonnes_by_region']
     elif quantity == 'Antimicrobial usage: mg per kg biomass':
         value = input_df['amu_mg_perkgbiomass']
-        map_value = input_df['amu_mg_perkgbiomass_by_region'] = input_df['amu_mg_perkgbiomass'].groupby(input_df['region']).transform('sum')
+        map_value = input_df_byregion['amu_mg_perkgbiomass_by_region']
     elif quantity == 'Biomass':
-        map_value = input_df['biomass_total_kg_reporting']
+        map_value = input_df_byregion['biomass_total_kg_reporting']
     elif quantity == 'Antimicrobial Resistance (country level)':
         map_value = input_df_amr['overall_prev']
     elif quantity == 'Drug Resistance Index (region level)':
@@ -10300,7 +10117,7 @@ def update_map_amu (viz_switch, quantity, antimicrobial_class, pathogens, input_
             amu_map_fig = create_map_display_amu(input_df_am_expend, map_value)
         else:
             # Use create map defined above for AMU
-            amu_map_fig = create_map_display_amu(input_df, map_value)
+            amu_map_fig = create_map_display_amu(input_df_byregion, map_value)
 
 
 
@@ -10397,7 +10214,8 @@ def update_map_amu (viz_switch, quantity, antimicrobial_class, pathogens, input_
             category_title = 'WOAH importance categories'
 
         # Use create map defined above
-        amu_map_fig = create_tree_map_amu(input_df, value, categories)
+        # The treemap data depends only on the static AMU table, so it can be cached on the table name
+        amu_map_fig = create_tree_map_amu(input_df, value.name, categories, dataset_key='amu2018_display')
 
         # treemap_hierarchy = ['region_with_countries_reporting', categories, 'antimicrobial_class']
         # if quantity == 'Antimicrobial usage: tonnes':
@@ -10461,25 +10279,11 @@ def update_map_amu (viz_switch, quantity, antimicrobial_class, pathogens, input_
     )
 
 def update_stacked_bar_amu (classification, quantity, select_amu_graph):
-    stackedbar_df = amu2018_combined_tall.copy()
-    stackedbar_df = stackedbar_df.query("scope == 'All'").query("antimicrobial_class != 'total_antimicrobials'")
-
-    # Workaround to fix names in legend
-    stackedbar_df = stackedbar_df.replace(['aggregated_class_data', 'other_important', 'sulfonamides__including_trimethoprim'],
-                                          ['aggregated class data', 'other (important)', 'sulfonamides (with trimethoprim)'])
-
-    # Convert antimicrobial classes to title case
-    stackedbar_df.antimicrobial_class = stackedbar_df.antimicrobial_class.str.title()
-    stackedbar_df.antimicrobial_class_group = stackedbar_df.antimicrobial_class_group.str.title()
-    stackedbar_df.antimicrobial_class_group2 = stackedbar_df.antimicrobial_class_group2.str.title()
+    # Totals for each region and category of the selected classification (see amu2018_display_bycategory)
+    # Region labels show the number of countries reporting and proportion of biomass represented, with a break
+    stackedbar_df = slst.get_slice(data.amu2018_display_bycategory_store, classification=classification)
 
-    # Create region labels with proportion of biomass represented in countries reporting and adding a break
-    stackedbar_df["region_with_countries_reporting"] = stackedbar_df['region'] \
-            + '<br>' \
-            + " (" + round(stackedbar_df['number_of_countries'] ,0).astype(int).astype(str) \
-            + " | " + round(stackedbar_df['biomass_prpn_reporting'] * 100 ,1).astype(str) + "%)"
-
-    x_var = 'region_with_countries_reporting'
+    x_var = 'region_with_countries_reporting_br'
 
     if quantity.upper() == 'TONNES':
         y_var = 'amu_tonnes'
@@ -10516,27 +10320,22 @@ def update_stacked_bar_amu (classification, quantity, select_amu_graph):
         "Tetracyclines": '#FF97FF',
         }
 
+    color = 'category'
     if classification.upper() == 'WHO IMPORTANCE CATEGORIES':
-        color = 'who_importance_ctg'
         color_map = color_map_impctg
-        stackedbar_df['id'] = stackedbar_df.groupby(['who_importance_ctg']).ngroup()
+        color_label = "WHO Importance Category"
     elif classification.upper() == 'WOAH IMPORTANCE CATEGORIES':
-        color = 'woah_importance_ctg'
         color_map = color_map_impctg
-        stackedbar_df['id'] = stackedbar_df.groupby(['woah_importance_ctg']).ngroup()
+        color_label = "WOAH Importance Category"
     elif classification.upper() == 'ONEHEALTH IMPORTANCE CATEGORIES':
-        color = 'onehealth_importance_ctg'
         color_map = color_map_impctg
-        stackedbar_df['id'] = stackedbar_df.groupby(['onehealth_importance_ctg']).ngroup()
+        color_label = "OneHealth Importance Category"
     elif classification.upper() == 'INDIVIDUAL CLASSES':
-        color = 'antimicrobial_class_group'
         color_map = color_map_indiv
-        stackedbar_df['id'] = stackedbar_df.groupby(['antimicrobial_class']).ngroup()
-        # stackedbar_df['id'] = stackedbar_df.groupby(['antimicrobial_class_group']).ngroup()
+        color_label = "Antimicrobial Class"
     elif classification.upper() == 'TOP GLOBAL CLASSES':
-        color = 'antimicrobial_class_group2'
         color_map = color_map_indiv
-        stackedbar_df['id'] = stackedbar_df.groupby(['antimicrobial_class_group2']).ngroup()
+        color_label = "Antimicrobial Class"
 
     # Options to change between graphs
     if select_amu_graph.upper() == 'TOTAL':
@@ -10547,11 +10346,7 @@ def update_stacked_bar_amu (classification, quantity, select_amu_graph):
                                    color_discrete_map=color_map,
                                    labels={
                                        x_var: "",
-                                       "who_importance_ctg": "WHO Importance Category",
-                                       "woah_importance_ctg": "WOAH Importance Category",
-                                       "onehealth_importance_ctg": "OneHealth Importance Category",
-                                       "antimicrobial_class_group": "Antimicrobial Class",
-                                       "antimicrobial_class_group2": "Antimicrobial Class"
+                                       color: color_label
                                        }
                                    )
 
@@ -10613,7 +10408,7 @@ def update_stacked_bar_amu (classification, quantity, select_amu_graph):
              text_auto='.1f',
              labels={
                 x_var: "",
-                "antimicrobial_class_group": "Antimicrobial Class"
+                color: color_label
                 }
              )
 
@@ -10642,30 +10437,22 @@ def update_stacked_bar_amu (classification, quantity, select_amu_graph):
     Input('select-classification-amu', 'value'),
     )
 def update_donut_chart_amu (quantity, region, classification):
-    input_df = amu2018_combined_tall.copy()
-
-    # Workaround to fix names in legend
-    input_df = input_df.replace(['aggregated_class_data', 'other_important', 'sulfonamides__including_trimethoprim'],
-                                ['Aggregated Class Data', 'Other (Important)', 'Sulfonamides (With Trimethoprim)'])
-
-    # Convert antimicrobial classes to title case
-    input_df.antimicrobial_class_group = input_df.antimicrobial_class_group.str.title()
-    input_df.antimicrobial_class_group2 = input_df.antimicrobial_class_group2.str.title()
-
-    # Filter scope to All and remove nulls from importance category
+    # Totals for each region and category of the selected classification (see amu2018_display_bycategory)
     # Filter by region selected
     if region == 'All':
         selected_region = 'Global'
+        input_df = slst.get_slice(data.amu2018_display_bycategory_store, classification=classification)
     else:
         selected_region = f'{region}'
-        input_df = input_df.loc[(input_df['region'] == region)]
+        input_df = slst.get_slice(data.amu2018_display_bycategory_store, classification=classification, region=region)
+
+    # Sum over regions for each category
+    summarize_df = input_df.groupby('category')[['amu_tonnes' ,'biomass_total_kg_reporting']].sum().reset_index()
+    names = summarize_df['category']
 
     # Use selected classification value
     if classification == 'Individual Classes':
-        summarize_df = input_df.query("scope == 'All'").groupby('antimicrobial_class_group')[['amu_tonnes' ,'biomass_total_kg_reporting']].sum().reset_index()
-        sort_by = 'antimicrobial_class'
         legend_title = 'Antimicrobial Class'
-        names = summarize_df['antimicrobial_class_group']
         # Set colors to sync across visuals
         colors = {
         "Aggregated Class Data": '#636EFA',
@@ -10681,13 +10468,10 @@ def update_donut_chart_amu (quantity, region, classification):
         "Sulfonamides (With Trimethoprim)": '#B6E880',
         "Tetracyclines": '#FF97FF',
         }
-        summarize_df['Color']= summarize_df['antimicrobial_class_group'].map(colors)
+        summarize_df['Color']= summarize_df['category'].map(colors)
 
     elif classification == 'WHO Importance Categories':
-        summarize_df = input_df.query("scope == 'All'").groupby('who_importance_ctg')[['amu_tonnes' ,'biomass_total_kg_reporting']].sum().reset_index()
-        sort_by = 'who_importance_ctg'
         legend_title = 'WHO Importance Category'
-        names = summarize_df['who_importance_ctg']
         # Set colors to sync across visuals
         colors = {
         "A: Critically Important": "#EF553B",
@@ -10695,13 +10479,10 @@ def update_donut_chart_amu (quantity, region, classification):
         "C: Other": "#636EFA",
         "D: Unknown": "#AB63FA",
         }
-        summarize_df['Color']= summarize_df['who_importance_ctg'].map(colors)
+        summarize_df['Color']= summarize_df['category'].map(colors)
 
     elif classification == 'WOAH Importance Categories':
-        summarize_df = input_df.query("scope == 'All'").groupby('woah_importance_ctg')[['amu_tonnes' ,'biomass_total_kg_reporting']].sum().reset_index()
-        sort_by = 'woah_importance_ctg'
         legend_title = 'WOAH Importance Category'
-        names = summarize_df['woah_importance_ctg']
         # Set colors to sync across visuals
         colors = {
         "A: Critically Important": "#EF553B",
@@ -10709,26 +10490,20 @@ def update_donut_chart_amu (quantity, region, classification):
         "C: Other": "#636EFA",
         "D: Unknown": "#AB63FA",
         }
-        summarize_df['Color']= summarize_df['woah_importance_ctg'].map(colors)
+        summarize_df['Color']= summarize_df['category'].map(colors)
 
     elif classification == 'OneHealth Importance Categories':
-        summarize_df = input_df.query("scope == 'All'").groupby('onehealth_importance_ctg')[['amu_tonnes' ,'biomass_total_kg_reporting']].sum().reset_index()
-        sort_by = 'onehealth_importance_ctg'
         legend_title = 'OneHealth Importance Category'
-        names = summarize_df['onehealth_importance_ctg']
         # Set colors to sync across visuals
         colors = {
         "Important": "#EF553B",
         "Other": "#636EFA",
         "Unknown": "#AB63FA",
         }
-        summarize_df['Color']= summarize_df['onehealth_importance_ctg'].map(colors)
+        summarize_df['Color']= summarize_df['category'].map(colors)
 
     elif classification == 'Top Global Classes':
-        summarize_df = input_df.query("scope == 'All'").groupby('antimicrobial_class_group2')[['amu_tonnes' ,'biomass_total_kg_reporting']].sum().reset_index()
-        sort_by = 'antimicrobial_class_group2'
         legend_title = 'Top Global Classes'
-        names = summarize_df['antimicrobial_class_group2']
         # Set colors to sync across visuals
         colors = {
         "Macrolides": '#AAFFE1',
@@ -10736,7 +10511,7 @@ def update_donut_chart_amu (quantity, region, classification):
         "Tetracyclines": '#FF97FF',
         "Others": '#C6CAFD'
         }
-        summarize_df['Color']= summarize_df['antimicrobial_class_group2'].map(colors)
+        summarize_df['Color']= summarize_df['category'].map(colors)
 
     # Use selected quantity value
     if quantity == 'Tonnes':
@@ -10746,8 +10521,7 @@ def update_donut_chart_amu (quantity, region, classification):
         value = summarize_df['amu_mg_perkgbiomass']
 
 
-    # Sort the data by classification to sync the legends across the visualizations
-    input_df = input_df.sort_values(by=sort_by)
+    # Data is sorted by category (groupby above) to sync the legends across the visualizations
 
     # Use create donut chart defined above
     amu_donut_fig = create_donut_chart_amu(summarize_df, value, names)
@@ -10924,13 +10698,17 @@ def update_expenditure_amu(input_json, expenditure_units):
     # Set the units based on the expenditure selected
     if expenditure_units == 'per kg biomass':
         y='am_expenditure_usd_perkg_selected'
+        error_prefix='am_expenditure_usd_perkg'
     else:
         y='am_expenditure_usd_selected'
+        error_prefix='am_expenditure_usd'
 
     bar_fig = px.bar(
         input_df,
         x='region',
         y=y,
+        error_y=f'{error_prefix}_errorhigh',
+        error_y_minus=f'{error_prefix}_errorlow',
         text_auto='$,.5r',
         labels={
             'am_expenditure_usd_selected':'Expenditure (USD)',
@@ -10945,7 +10723,7 @@ def update_expenditure_amu(input_json, expenditure_units):
         )
 
     # Add title and hide legend
-    bar_fig.update_layout(title_text='Estimated Antimicrobial Expenditure<br><sup>Terrestrial Livestock',
+    bar_fig.update_layout(title_text='Estimated Antimicrobial Expenditure<br><sup>Terrestrial Livestock, with 95% interval from usage and price ranges',
                           showlegend=False)
 
     # Adjust margins
@@ -11086,10 +10864,36 @@ if __name__ == "__main__":
 
    fa.run_server(app, use_port, debug=True)
 
+# =============================================================================
+#### Warm-up
+# =============================================================================
+# Views computed when the server starts, on top of the default view of each tab.
+# Each is a dictionary of {'<component id>.<property>': value} applied to the page as loaded.
+# Set DASH_WARM_SELECTIONS to a JSON file with a list of these to replace this list, or DASH_WARM_UP=0 to skip the warm-up.
+warm_selections = [
+    {'select-species-ecs.value':'All Small Ruminants'}
+    ,{'select-species-ecs.value':'All Poultry'}
+    ,{'select-currency-ecs.value':'USD'}
+    ,{'select-country-poultry.value':'United States of America'}
+]
+
+def warm_up_app():
+    if os.environ.get('DASH_WARM_UP' ,'1') == '0':
+        return None
+    selections = warm.read_selections(os.environ['DASH_WARM_SELECTIONS']) if os.environ.get('DASH_WARM_SELECTIONS') else warm_selections
+    headers = {}
+    if prod:
+        username ,password = next(iter(VALID_USERNAME_PASSWORD_PAIRS.items()))
+        headers['Authorization'] = 'Basic ' + base64.b64encode(f'{username}:{password}'.encode('utf-8')).decode('ascii')
+    return warm.warm_up(gbadsDash ,SELECTIONS=selections ,HEADERS=headers)
+
 def returnApp():
     """
     This function is used to create the app and return it to waitress in the docker container
     """
+    # Compute the default views before the server takes requests, so the first visitors do not wait for them
+    warm_up_app()
+
     # If BASE_URL is set, use DispatcherMiddleware to serve the app from that path
     if 'BASE_URL' in os.environ:
         from werkzeug.middleware.dispatcher import DispatcherMiddleware
@@ -0,0 +1,344 @@
+#%% About
+'''
+This defines background execution of heavy Dash callbacks in the serving process.
+
+A callback registered with background=True returns at once with a job id, and
+the browser polls for the result. The job runs on a small pool of threads
+owned by this process, so the request threads of the server (e.g. waitress)
+are free for other users while it runs. No broker or external store is needed.
+
+The job manager:
+    - runs at most MAX_JOBS jobs at a time in each serving process. Others wait in a queue.
+    - shares one job between identical requests. A request for the same callback
+      and inputs as a job that is queued or running waits for that job rather than
+      starting another.
+    - keeps finished results for RESULT_TTL seconds (at most RESULTS_MAXSIZE), so
+      a repeated request is answered without running the callback again.
+    - cancels superseded jobs. When a user changes an input again before the job
+      for the previous value finishes, Dash asks for the old job to be cancelled.
+      A queued job is dropped. A running job stops at its next call to
+      set_progress(), which raises JobCancelled. A job shared by several requests
+      only stops when all of them have cancelled.
+    - reports progress. Callbacks given a progress bar receive set_progress as
+      their first argument and call it with (steps done, total steps).
+    - runs each job inside JOB_CONTEXT, if given. With data reloading
+      (data_snapshots), this keeps a job on one version of the data.
+
+With callback_metrics, each job's run time, including figure time, is also recorded
+at /metrics/callbacks, marked as background. The requests starting and polling for
+a job are not.
+
+Jobs and results live in the memory of the serving process. With several worker
+processes, the polling requests for a job must reach the process that started it.
+
+Usage, right after creating the app and before defining callbacks:
+    bgj.register_jobs(gbadsDash ,MAX_JOBS=int(os.environ.get('DASH_MAX_JOBS' ,2)))
+In the layout:
+    bgj.progress_bar('ga-waterfall-progress')
+For each heavy callback:
+    @gbadsDash.callback(
+        Output('ga-ahle-waterfall','figure'),
+        Input(...),
+        **bgj.job_args('ga-waterfall-progress')
+        )
+    def update_ahle_waterfall_ga(set_progress ,...):
+        set_progress((1 ,3))
+        ...
+'''
+#%% Imports
+
+import os
+import time
+import itertools
+import threading
+import traceback
+import contextlib
+import collections
+import concurrent.futures
+
+import numpy as np
+import flask
+from dash import Output
+from dash.exceptions import PreventUpdate
+from dash.long_callback.managers import BaseLongCallbackManager
+import dash_bootstrap_components as dbc
+
+#%% Job manager
+
+MAX_JOBS = 2                    # Heavy jobs running at once in each serving process
+RESULT_TTL = 300                # Seconds a finished result is kept for repeated requests
+RESULTS_MAXSIZE = 64            # Finished results kept
+WINDOW = 200                    # Most recent run times kept for each callback
+
+_NO_UPDATE = {'_dash_no_update':'_dash_no_update'}
+
+class JobCancelled(Exception):
+    '''Raised by set_progress() in a job that has been cancelled.'''
+
+class ThreadJobManager(BaseLongCallbackManager):
+    '''
+    Background callback manager running jobs on a thread pool in this process.
+    See the module description.
+    '''
+    def __init__(
+            self
+            ,MAX_JOBS=MAX_JOBS
+            ,RESULT_TTL=RESULT_TTL
+            ,RESULTS_MAXSIZE=RESULTS_MAXSIZE
+            ,JOB_CONTEXT=None       # Function with no arguments returning a context manager to run each job in, e.g. snap.pinned
+            ,cache_by=None          # List of functions with no arguments. Their values are part of the result key, e.g. a data version.
+        ):
+        self.max_jobs = MAX_JOBS
+        self.job_context = JOB_CONTEXT or contextlib.nullcontext
+        self.result_ttl = RESULT_TTL
+        self.results_maxsize = RESULTS_MAXSIZE
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_JOBS ,thread_name_prefix='dash-job')
+        self.lock = threading.Lock()
+        self.job_ids = itertools.count(1)
+        self.jobs = {}                          # {job id: job}
+        self.inflight = {}                      # {result key: job id} for jobs queued or running
+        self.results = collections.OrderedDict()    # {result key: (time finished, result)}
+        self.counts = collections.Counter()
+        self.run_ms = collections.defaultdict(lambda: collections.deque(maxlen=WINDOW))
+        super().__init__(cache_by)
+
+    # ---------------------------------------------------------------------
+    # Starting jobs
+    # ---------------------------------------------------------------------
+    def make_job_fn(self ,fn ,progress):
+        def job_fn(set_progress ,user_callback_args):
+            maybe_progress = [set_progress] if progress else []
+            if isinstance(user_callback_args ,dict):
+                return fn(*maybe_progress ,**user_callback_args)
+            if isinstance(user_callback_args ,(list ,tuple)):
+                return fn(*maybe_progress ,*user_callback_args)
+            return fn(*maybe_progress ,user_callback_args)
+        job_fn.callback_name = fn.__name__
+        return job_fn
+
+    def call_job_fn(self ,key ,job_fn ,args ,context):
+        with self.lock:
+            self._drop_expired_results()
+            self.counts['requests'] += 1
+            job_id = str(next(self.job_ids))
+            job = {
+                'key':key ,'callback':job_fn.callback_name ,'state':'queued' ,'waiters':1
+                ,'progress':None ,'result':None ,'cancelled':threading.Event()
+            }
+
+            # Answer from a recent result
+            if key in self.results:
+                self.results.move_to_end(key)
+                job.update(state='done' ,result=self.results[key][1] ,finished=time.time())
+                self.jobs[job_id] = job
+                self.counts['cached'] += 1
+                return job_id
+
+            # Wait for an identical job already queued or running
+            if key in self.inflight:
+                shared_id = self.inflight[key]
+                self.jobs[shared_id]['waiters'] += 1
+                self.counts['shared'] += 1
+                return shared_id
+
+            self.jobs[job_id] = job
+            self.inflight[key] = job_id
+            self.counts['started'] += 1
+        job['future'] = self.executor.submit(self._run ,job_id ,job_fn ,args)
+        return job_id
+
+    def _run(self ,job_id ,job_fn ,args):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if job['cancelled'].is_set():       # Cancelled after leaving the queue
+            with self.lock:
+                self.jobs.pop(job_id ,None)
+                self.counts['cancelled'] += 1
+            return None
+        job['state'] = 'running'
+        timer_start = time.perf_counter()
+
+        def set_progress(progress_value):
+            if job['cancelled'].is_set():
+                raise JobCancelled()
+            if not isinstance(progress_value ,(list ,tuple)):
+                progress_value = [progress_value]
+            job['progress'] = list(progress_value)
+
+        state = 'done'
+        try:
+            with self.job_context():
+                result = job_fn(set_progress ,args)
+        except JobCancelled:
+            state ,result = 'cancelled' ,None
+        except PreventUpdate:
+            result = _NO_UPDATE
+        except Exception as err:
+            state = 'error'
+            result = {'long_callback_error':{'msg':str(err) ,'tb':traceback.format_exc()}}
+        run_ms = 1000 * (time.perf_counter() - timer_start)
+
+        with self.lock:
+            job.update(state=state ,result=result ,finished=time.time())
+            if job['waiters'] <= 0:
+                self.jobs.pop(job_id ,None)
+            if self.inflight.get(job['key']) == job_id:
+                del self.inflight[job['key']]
+            if state == 'done':
+                self.results[job['key']] = (time.time() ,result)
+                self.results.move_to_end(job['key'])
+                while len(self.results) > self.results_maxsize:
+                    self.results.popitem(last=False)
+                self.run_ms[job['callback']].append(run_ms)
+            self.counts[state] += 1
+        return None
+
+    # Drop results past RESULT_TTL, and finished jobs whose requests stopped polling
+    def _drop_expired_results(self):
+        oldest = time.time() - self.result_ttl
+        while self.results and next(iter(self.results.values()))[0] < oldest:
+            self.results.popitem(last=False)
+        for JOB_ID in [JOB_ID for JOB_ID ,job in self.jobs.items() if job.get('finished' ,time.time()) < oldest]:
+            del self.jobs[JOB_ID]
+
+    # To drop all finished results, e.g. after the data has been reloaded
+    def clear_results(self):
+        with self.lock:
+            self.results.clear()
+        return None
+
+    # ---------------------------------------------------------------------
+    # Polling and cancelling
+    # ---------------------------------------------------------------------
+    def _find_job(self ,job):
+        return self.jobs.get(str(job)) if job is not None else None
+
+    def job_running(self ,job):
+        found = self._find_job(job)
+        return found is not None and found['state'] in ('queued' ,'running')
+
+    def get_progress(self ,key):
+        job_id = self.inflight.get(key)
+        found = self.jobs.get(job_id) if job_id else None
+        return found['progress'] if found else None
+
+    def result_ready(self ,key):
+        return key in self.results
+
+    # Hands the result to one of the requests waiting for the job. The job is forgotten
+    # once every request waiting for it has its result or has cancelled.
+    def get_result(self ,key ,job):
+        with self.lock:
+            found = self._find_job(job)
+            if found is None or found['key'] != key:
+                cached = self.results.get(key)
+                return cached[1] if cached else self.UNDEFINED
+            if found['state'] in ('queued' ,'running'):
+                return self.UNDEFINED
+            self._release(str(job) ,found)
+            return self.UNDEFINED if found['state'] == 'cancelled' else found['result']
+
+    def terminate_job(self ,job):
+        with self.lock:
+            found = self._find_job(job)
+            if found is None or found['state'] not in ('queued' ,'running'):
+                return None
+            if self._release(str(job) ,found) == 0:
+                found['cancelled'].set()
+                if found['state'] == 'queued' and found.get('future') is not None and found['future'].cancel():
+                    self.jobs.pop(str(job) ,None)
+                    self.counts['cancelled'] += 1
+                if self.inflight.get(found['key']) == str(job):
+                    del self.inflight[found['key']]
+        return None
+
+    def terminate_unhealthy_job(self ,job):
+        return False
+
+    def _release(self ,job_id ,found):
+        found['waiters'] -= 1
+        if found['waiters'] <= 0 and found['state'] not in ('queued' ,'running'):
+            self.jobs.pop(job_id ,None)
+        return found['waiters']
+
+    # ---------------------------------------------------------------------
+    # Summary
+    # ---------------------------------------------------------------------
+    def summarize_jobs(self):
+        with self.lock:
+            states = collections.Counter(job['state'] for job in self.jobs.values())
+            run_ms = {name:list(times) for name ,times in self.run_ms.items() if times}
+            summary = {
+                'pid':os.getpid()
+                ,'max_jobs':self.max_jobs
+                ,'queued':states['queued']
+                ,'running':states['running']
+                ,'results_kept':len(self.results)
+                ,'counts':dict(self.counts)
+            }
+        summary['run_ms'] = {
+            name:{f'p{P}':round(float(value) ,3) for P ,value in zip([50 ,95] ,np.percentile(times ,[50 ,95]))}
+            for name ,times in sorted(run_ms.items())
+        }
+        return summary
+
+#%% Registering with an app
+
+_manager = None
+
+def get_manager():
+    return _manager
+
+# To drop the finished results of the app's job manager
+def clear_results():
+    if _manager is not None:
+        _manager.clear_results()
+    return None
+
+# To run the app's background callbacks with a ThreadJobManager
+def register_jobs(
+        APP                             # Dash app
+        ,MAX_JOBS=MAX_JOBS              # Integer: heavy jobs running at once
+        ,ENDPOINT='/metrics/jobs'       # String: route on the app's server for the job summary. None to skip.
+        ,LOCAL_ONLY=True                # True: only answer summary requests from this machine
+        ,**MANAGER_ARGS                 # Other arguments to ThreadJobManager
+    ):
+    global _manager
+    if getattr(APP ,'_background_jobs' ,False):
+        return APP
+    _manager = ThreadJobManager(MAX_JOBS=MAX_JOBS ,**MANAGER_ARGS)
+    APP._background_manager = _manager
+
+    if ENDPOINT:
+        @APP.server.route(ENDPOINT)
+        def _job_metrics():
+            if LOCAL_ONLY and flask.request.remote_addr not in ('127.0.0.1' ,'::1' ,'localhost'):
+                flask.abort(403)
+            return flask.jsonify(_manager.summarize_jobs())
+
+    APP._background_jobs = True
+    return APP
+
+#%% Layout helpers
+
+_PROGRESS_SHOWN = {'height':'6px' ,'margin-top':'4px' ,'visibility':'visible'}
+_PROGRESS_HIDDEN = {'height':'6px' ,'margin-top':'4px' ,'visibility':'hidden'}
+
+# A progress bar for a background callback, shown while its job is queued or running
+def progress_bar(PROGRESS_ID):
+    return dbc.Progress(id=PROGRESS_ID ,value=0 ,max=1 ,striped=True ,animated=True ,color='#393375' ,style=_PROGRESS_HIDDEN)
+
+POLL_MS = 250                   # Milliseconds between the browser's requests for a job's result
+
+# Keyword arguments for @app.callback to run a callback as a background job
+# With a PROGRESS_ID, the job reports to that progress bar and the callback gets set_progress as its first argument.
+def job_args(PROGRESS_ID=None):
+    args = {'background':True ,'interval':POLL_MS}
+    if PROGRESS_ID:
+        args.update({
+            'progress':[Output(PROGRESS_ID ,'value') ,Output(PROGRESS_ID ,'max')]
+            ,'progress_default':[0 ,1]
+            ,'running':[(Output(PROGRESS_ID ,'style') ,_PROGRESS_SHOWN ,_PROGRESS_HIDDEN)]
+        })
+    return args
@@ -10,9 +10,10 @@ import sys
 import datetime as dt
 import inspect
 import numpy as np
-import scipy.interpolate
 import pandas as pd
 
+import _breed_standards as brd     # In pipeline_common
+
 #%% Master functions
 # These are species-specific and call all other functions.
 
@@ -31,17 +32,12 @@ def calc_bod_master_poultry(
    # Apply BOD calculations. Each one adds a column to the data frame.
    # Order matters as some rely on variables created by others!!!
    OUTPUT_DF['bod_dof_used'] = AVG_DOF_MASTER   # Save this as a column for display
-   OUTPUT_DF['bod_breedstdwt_kg'] = OUTPUT_DF.apply(calc_bod_breedstdwt_kg_fromdays_poultry ,axis=1
-      ,BREED_DF=BREED_DF_MASTER
-      ,AVG_DOF=AVG_DOF_MASTER
-   )
+   # Breed standard values are the same for all rows, so look them up once
+   OUTPUT_DF['bod_breedstdwt_kg'] = brd.weight_kg_at_day(BREED_DF_MASTER ,AVG_DOF_MASTER)
    if AVG_CARC_YIELD_MASTER:
       OUTPUT_DF['bod_breedstdyield_prpn'] = AVG_CARC_YIELD_MASTER
    else:
-      OUTPUT_DF['bod_breedstdyield_prpn'] = OUTPUT_DF.apply(calc_bod_breedstdyield_prpn_poultry ,axis=1
-         ,BREED_DF=BREED_DF_MASTER
-         ,AVG_DOF=AVG_DOF_MASTER
-      )
+      OUTPUT_DF['bod_breedstdyield_prpn'] = brd.yield_prpn_at_day(BREED_DF_MASTER ,AVG_DOF_MASTER)
    OUTPUT_DF['bod_breedstdcarcwt_kg'] = OUTPUT_DF.apply(calc_bod_breedstdcarcwt_kg ,axis=1)
    OUTPUT_DF['bod_referenceproduction_tonnes'] = OUTPUT_DF.apply(calc_bod_referenceproduction_tonnes ,axis=1)
    OUTPUT_DF['bod_efficiency_tonnes'] = OUTPUT_DF.apply(calc_bod_efficiency_tonnes_frompct ,axis=1
@@ -107,17 +103,12 @@ def calc_bod_master_swine(
 
    # Apply BOD calculations. Each one adds a column to the data frame.
    # Order matters as some rely on variables created by others!!!
+   # Breed standard values are the same for all rows, so look them up once
    if AVG_DOF_MASTER:
-      OUTPUT_DF['bod_breedstdwt_kg'] = OUTPUT_DF.apply(calc_bod_breedstdwt_kg_fromdays_swine ,axis=1
-          ,BREED_DF=BREED_DF_MASTER
-          ,AVG_DOF=AVG_DOF_MASTER
-      )
+      OUTPUT_DF['bod_breedstdwt_kg'] = brd.weight_kg_at_day(BREED_DF_MASTER ,AVG_DOF_MASTER)
       OUTPUT_DF['bod_dof_used'] = AVG_DOF_MASTER   # Add column for display
    elif AVG_FEEDINT_KG_MASTER:
-      OUTPUT_DF['bod_breedstdwt_kg'] = OUTPUT_DF.apply(calc_bod_breedstdwt_kg_fromfeed_swine ,axis=1
-         ,BREED_DF=BREED_DF_MASTER
-         ,AVG_FEEDINT_KG=AVG_FEEDINT_KG_MASTER
-      )
+      OUTPUT_DF['bod_breedstdwt_kg'] = brd.weight_kg_at_feed(BREED_DF_MASTER ,AVG_FEEDINT_KG_MASTER)
       OUTPUT_DF['bod_feedint_used'] = AVG_FEEDINT_KG_MASTER   # Add column for display
    else:
       print(f"<{funcname}> Error: missing required argument: either AVG_DOF_MASTER or AVG_FEEDINT_KG_MASTER.")
@@ -254,28 +245,26 @@ def calc_bod_breedstdcarcwt_kg(INPUT_ROW):
 
 # =============================================================================
 #### Poultry
+# Breed standard lookups use the interpolated curves in _breed_standards, so
+# days on feed need not be in the breed table.
 # =============================================================================
 def calc_bod_breedstdwt_kg_fromdays_poultry(
       INPUT_ROW
       ,BREED_DF       # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_g'.
-      ,AVG_DOF        # Integer (0, 60]: Average days on feed. Will lookup breed standard weight for this day on feed.
+      ,AVG_DOF        # Number (0, 60]: Average days on feed. Will lookup breed standard weight for this day on feed.
       ):
    # Could limit breed choice based on country
       # India: Vencobb400
       # Others: Cobb500, Ross308, or Ross708
-   _select_dof = (BREED_DF['dayonfeed'] == AVG_DOF)
-   breedstdwt_kg = BREED_DF.loc[_select_dof ,'bodyweight_g'] / 1000
-   OUTPUT = breedstdwt_kg
+   OUTPUT = brd.weight_kg_at_day(BREED_DF ,AVG_DOF)
    return OUTPUT
 
 def calc_bod_breedstdyield_prpn_poultry(
       INPUT_ROW
       ,BREED_DF       # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'pct_yield'.
-      ,AVG_DOF        # Integer (0, 60]: Average days on feed. Will lookup breed standard yield for this day on feed.
+      ,AVG_DOF        # Number (0, 60]: Average days on feed. Will lookup breed standard yield for this day on feed.
       ):
-   _select_dof = (BREED_DF['dayonfeed'] == AVG_DOF)
-   breedstdyield_prpn = BREED_DF.loc[_select_dof ,'pct_yield'] / 100
-   OUTPUT = breedstdyield_prpn
+   OUTPUT = brd.yield_prpn_at_day(BREED_DF ,AVG_DOF)
    return OUTPUT
 
 # =============================================================================
@@ -284,11 +273,9 @@ def calc_bod_breedstdyield_prpn_poultry(
 def calc_bod_breedstdwt_kg_fromdays_swine(
       INPUT_ROW
       ,BREED_DF       # Data frame with breed reference information. Must contain columns 'dayonfeed' and 'bodyweight_kg'.
-      ,AVG_DOF        # Integer [1, 176]: Average days on feed. Will lookup breed standard weight for this day on feed.
+      ,AVG_DOF        # Number [1, 176]: Average days on feed. Will lookup breed standard weight for this day on feed.
       ):
-   _select_dof = (BREED_DF['dayonfeed'] == AVG_DOF)
-   breedstdwt_kg = BREED_DF.loc[_select_dof ,'bodyweight_kg']
-   OUTPUT = breedstdwt_kg
+   OUTPUT = brd.weight_kg_at_day(BREED_DF ,AVG_DOF)
    return OUTPUT
 
 def calc_bod_breedstdwt_kg_fromfeed_swine(
@@ -296,13 +283,7 @@ def calc_bod_breedstdwt_kg_fromfeed_swine(
       ,BREED_DF         # Data frame with breed reference information. Must contain columns 'bodyweight_kg' and 'cml_feedintake_kg'.
       ,AVG_FEEDINT_KG   # Float: average feed intake in kg per head
       ):
-   # Create interpolator from breed standard
-   interp_weight_from_feed = scipy.interpolate.interp1d(
-      BREED_DF['cml_feedintake_kg']
-      ,BREED_DF['bodyweight_kg']
-   )
-   # Apply interpolator
-   OUTPUT = interp_weight_from_feed(AVG_FEEDINT_KG) * 1   # Multiply by one: trick to convert array to number
+   OUTPUT = brd.weight_kg_at_feed(BREED_DF ,AVG_FEEDINT_KG)
    return OUTPUT
 
 #%% Costs
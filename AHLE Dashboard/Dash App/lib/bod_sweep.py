@@ -0,0 +1,304 @@
+#%% About
+'''
+This defines batch scenario sweeps over the burden of disease calculations in
+bod_calcs.
+
+Instead of calling calc_bod_master_poultry() or calc_bod_master_swine() once
+for each combination of slider values, a sweep takes a list of values for each
+parameter, builds every combination (the grid), and evaluates all of them for
+all countries and years at once. Each calculation is done on arrays with one
+row per country-year and one column per grid point, following the same steps
+and the same wrong-sign morbidity correction as the master functions.
+
+Results are a long table with one row per country, year, and grid point, so
+they can be filtered to one parameter for a tornado chart or pivoted on two
+parameters for a heatmap. write_sweep() saves them as Parquet, which needs
+pyarrow (in requirements.txt and small_requirements.txt).
+
+Usage:
+    sweep_df = sweep_bod_poultry(
+        gbads_chickens_merged_fordash
+        ,BREED_DF=poultrybreedstd_cobb500
+        ,ACHIEVABLE_PCT=[80 ,90 ,100 ,110]
+        ,AVG_DOF=[35 ,42 ,49]
+        ,FEEDPRICE_USDPERTONNE=[300 ,400 ,500]
+        ,IDEAL_FCR_LIVE=[1.4 ,1.6 ,1.8]
+    )
+    write_sweep(sweep_df ,'bod_sweep_poultry.parquet')
+'''
+#%% Imports
+
+import itertools
+import numpy as np
+import pandas as pd
+
+import _breed_standards as brd     # In pipeline_common
+
+#%% Grid
+
+# To build all combinations of parameter values
+# Returns a data frame with one row per grid point and one column per parameter, in the order given
+def make_grid(PARAM_VALUES):     # Dictionary: {parameter name: list of values}
+    names = list(PARAM_VALUES)
+    values = [list(np.atleast_1d(np.asarray(PARAM_VALUES[NAME] ,dtype=object))) for NAME in names]
+    grid_df = pd.DataFrame(list(itertools.product(*values)) ,columns=names)
+    for NAME in names:
+        grid_df[NAME] = pd.to_numeric(grid_df[NAME])
+    return grid_df
+
+# To get breed standard values for every row and grid point, using a query function from _breed_standards
+# BREED_DF can be a single data frame used for all rows, or a dictionary {country: data frame}.
+def _breedstd_matrix(INPUT_DF ,BREED_DF ,QUERY_FUNC ,VALUES):
+    if isinstance(BREED_DF ,dict):
+        output = np.full((len(INPUT_DF) ,len(VALUES)) ,np.nan)
+        countries = INPUT_DF['country'].to_numpy()
+        for COUNTRY ,breed_df_country in BREED_DF.items():
+            output[countries == COUNTRY] = QUERY_FUNC(breed_df_country ,VALUES)
+        return output
+    return np.broadcast_to(QUERY_FUNC(BREED_DF ,VALUES) ,(len(INPUT_DF) ,len(VALUES)))
+
+# To get a column of the input data as an array with one row per country-year, for broadcasting against grid points
+def _col(INPUT_DF ,COLUMN):
+    return INPUT_DF[COLUMN].to_numpy(dtype=float)[: ,np.newaxis]
+
+#%% Common calculations
+
+# Production and burden columns shared by poultry and swine
+# Arguments are arrays of shape (rows, grid points) or broadcastable to it.
+def _calc_production(INPUT_DF ,BREEDSTDWT_KG ,BREEDSTDYIELD_PRPN ,ACHIEVABLE_PCT=None ,ACHIEVABLE_WT_KG=None):
+   acc_headplaced = _col(INPUT_DF ,'acc_headplaced')
+   results = {}
+   results['bod_breedstdwt_kg'] = BREEDSTDWT_KG
+   results['bod_breedstdyield_prpn'] = BREEDSTDYIELD_PRPN
+   results['bod_breedstdcarcwt_kg'] = BREEDSTDWT_KG * BREEDSTDYIELD_PRPN
+   results['bod_referenceproduction_tonnes'] = acc_headplaced * BREEDSTDWT_KG * BREEDSTDYIELD_PRPN / 1000
+   if ACHIEVABLE_PCT is not None:
+      efficiency = (results['bod_referenceproduction_tonnes'] * (1 - (ACHIEVABLE_PCT / 100))) * (-1)
+   else:
+      efficiency = (results['bod_referenceproduction_tonnes'] - (acc_headplaced * ACHIEVABLE_WT_KG * BREEDSTDYIELD_PRPN / 1000)) * (-1)
+   results['bod_gmax_tonnes'] = results['bod_referenceproduction_tonnes'] + efficiency
+   results['bod_realizedproduction_tonnes'] = np.broadcast_to(_col(INPUT_DF ,'acc_totalcarcweight_tonnes') ,efficiency.shape)
+   deathloss = (acc_headplaced - _col(INPUT_DF ,'acc_headslaughtered')) * _col(INPUT_DF ,'acc_avgcarcweight_kg') / 1000 * (-1)
+   deathloss = np.broadcast_to(deathloss ,efficiency.shape)
+   totalburden = (results['bod_gmax_tonnes'] - results['bod_realizedproduction_tonnes']) * (-1)
+   morbidity = totalburden - deathloss
+
+   # Adjustments & Corrections, as in the master functions
+   # If achievable proportion is too low, morbidity will be the wrong sign
+   # For these, set morbidity = 0 and add reduced growth to effect of feed
+   wrongsign_morbidity = (morbidity > 0)
+   results['bod_efficiency_tonnes'] = np.where(wrongsign_morbidity ,efficiency + morbidity ,efficiency)
+   results['bod_deathloss_tonnes'] = deathloss
+   results['bod_totalburden_tonnes'] = np.where(wrongsign_morbidity ,deathloss ,totalburden)
+   results['bod_morbidity_tonnes'] = np.where(wrongsign_morbidity ,0 ,morbidity)
+
+   # Head placed to get same production with zero mortality and morbidity
+   with np.errstate(divide='ignore' ,invalid='ignore'):
+      results['ideal_headplaced'] = np.round(acc_headplaced * (results['bod_realizedproduction_tonnes'] / results['bod_gmax_tonnes']) ,0)
+   return results
+
+#%% Sweeps
+
+def sweep_bod_poultry(
+      INPUT_DF
+      ,BREED_DF                       # Data frame with breed reference information, or dictionary {country: data frame}. Must contain columns 'dayonfeed', 'bodyweight_g', and 'pct_yield'.
+      ,ACHIEVABLE_PCT                 # List of integers [0, 120]
+      ,AVG_DOF                        # List of numbers (0, 63]: fractional days are interpolated
+      ,FEEDPRICE_USDPERTONNE          # List of floats
+      ,IDEAL_FCR_LIVE                 # List of floats
+      ,AVG_CARC_YIELD=[None]          # List of floats [0, 1] (optional). None uses the breed standard yield, as in calc_bod_master_poultry().
+      ,ID_VARS=['country' ,'year']    # Columns of INPUT_DF to keep for identifying rows
+      ):
+   '''
+   Returns a long data frame with one row per row of INPUT_DF and grid point,
+   with columns ID_VARS, scenario_id, the sweep parameters, and the calculated
+   columns of calc_bod_master_poultry() (bod_* and ideal_*).
+   '''
+   grid_df = make_grid({
+      'achievable_pct':ACHIEVABLE_PCT
+      ,'avg_dof':AVG_DOF
+      ,'feedprice_usdpertonne':FEEDPRICE_USDPERTONNE
+      ,'ideal_fcr_live':IDEAL_FCR_LIVE
+      ,'avg_carc_yield':[np.nan if VALUE is None else VALUE for VALUE in AVG_CARC_YIELD]
+   })
+   achievable_pct = grid_df['achievable_pct'].to_numpy()
+   avg_dof = grid_df['avg_dof'].to_numpy()
+   feedprice = grid_df['feedprice_usdpertonne'].to_numpy()
+   ideal_fcr = grid_df['ideal_fcr_live'].to_numpy()
+   avg_carc_yield = grid_df['avg_carc_yield'].to_numpy(dtype=float)
+
+   breedstdwt_kg = _breedstd_matrix(INPUT_DF ,BREED_DF ,brd.weight_kg_at_day ,avg_dof)
+   breedstdyield_prpn = _breedstd_matrix(INPUT_DF ,BREED_DF ,brd.yield_prpn_at_day ,avg_dof)
+   # As in the master function, a yield of zero or missing means use the breed standard
+   use_breedstd_yield = np.isnan(avg_carc_yield) | (avg_carc_yield == 0)
+   breedstdyield_prpn = np.where(use_breedstd_yield ,breedstdyield_prpn ,avg_carc_yield)
+
+   results = _calc_production(INPUT_DF ,breedstdwt_kg ,breedstdyield_prpn ,ACHIEVABLE_PCT=achievable_pct)
+   results['bod_dof_used'] = np.broadcast_to(avg_dof ,breedstdwt_kg.shape)
+
+   # Ideal Costs
+   acc_feedprice = _col(INPUT_DF ,'acc_feedprice_usdpertonne')
+   feedprice_slider_prpn = np.where(np.isnan(acc_feedprice) ,1 ,feedprice / acc_feedprice)
+   results['adjusted_feedcost_usdperkglive'] = _col(INPUT_DF ,'acc_feedcost_usdperkglive') * feedprice_slider_prpn
+   results['ideal_fcr'] = np.broadcast_to(ideal_fcr ,breedstdwt_kg.shape)
+   required_live_weight_tonnes = results['bod_realizedproduction_tonnes'] / breedstdyield_prpn
+   results['ideal_feed_tonnes'] = required_live_weight_tonnes * ideal_fcr
+   with np.errstate(divide='ignore' ,invalid='ignore'):
+      results['ideal_feedcost_usdperkglive'] = (results['ideal_feed_tonnes'] * feedprice) / (required_live_weight_tonnes * 1000)
+      ideal_headplaced_prpn = results['ideal_headplaced'] / _col(INPUT_DF ,'acc_headplaced')
+   results['ideal_chickcost_usdperkglive'] = _col(INPUT_DF ,'acc_chickcost_usdperkglive') * ideal_headplaced_prpn
+   results['ideal_landhousingcost_usdperkglive'] = _col(INPUT_DF ,'acc_landhousingcost_usdperkglive') * ideal_headplaced_prpn
+   with np.errstate(divide='ignore' ,invalid='ignore'):
+      ideal_financecost_prpn = results['ideal_landhousingcost_usdperkglive'] / _col(INPUT_DF ,'acc_landhousingcost_usdperkglive')
+   results['ideal_laborcost_usdperkglive'] = _col(INPUT_DF ,'acc_laborcost_usdperkglive') * ideal_financecost_prpn
+   results['ideal_medcost_usdperkglive'] = _col(INPUT_DF ,'acc_medcost_usdperkglive') * ideal_headplaced_prpn
+   results['ideal_othercost_usdperkglive'] = _col(INPUT_DF ,'acc_othercost_usdperkglive') * ideal_headplaced_prpn
+
+   return _to_long(INPUT_DF ,ID_VARS ,grid_df ,results)
+
+def sweep_bod_swine(
+      INPUT_DF
+      ,BREED_DF                       # Data frame with breed reference information. Must contain columns 'dayonfeed', 'bodyweight_kg', and 'cml_feedintake_kg'.
+      ,AVG_CARC_YIELD                 # List of floats [0, 1]
+      ,FEEDPRICE_USDPERTONNE          # List of floats
+      ,IDEAL_FCR_LIVE                 # List of floats
+
+      # Alternatives for calculating breed standard weight, as in calc_bod_master_swine()
+      # Specify one of these.
+      ,AVG_DOF=None                   # List of numbers [1, 176]: fractional days are interpolated
+      ,AVG_FEEDINT_KG=None            # List of floats: average feed intake in kg per head
+
+      # Alternatives for calculating suboptimal growth
+      # Specify one of these.
+      ,ACHIEVABLE_PCT=None            # List of integers [0, 120]
+      ,ACHIEVABLE_WT_KG=None          # List of floats: achievable weight without disease
+
+      ,ID_VARS=['country' ,'year']
+      ):
+   '''
+   Returns a long data frame with one row per row of INPUT_DF and grid point,
+   with columns ID_VARS, scenario_id, the sweep parameters, and the calculated
+   columns of calc_bod_master_swine() (bod_* and ideal_*).
+   '''
+   if AVG_DOF is not None:
+      stdwt_param = {'avg_dof':AVG_DOF}
+   elif AVG_FEEDINT_KG is not None:
+      stdwt_param = {'avg_feedint_kg':AVG_FEEDINT_KG}
+   else:
+      raise ValueError('Missing required argument: either AVG_DOF or AVG_FEEDINT_KG.')
+   if ACHIEVABLE_PCT is not None:
+      growth_param = {'achievable_pct':ACHIEVABLE_PCT}
+   elif ACHIEVABLE_WT_KG is not None:
+      growth_param = {'achievable_wt_kg':ACHIEVABLE_WT_KG}
+   else:
+      raise ValueError('Missing required argument for calculating suboptimal growth: either ACHIEVABLE_PCT or ACHIEVABLE_WT_KG.')
+
+   grid_df = make_grid({
+      **growth_param
+      ,**stdwt_param
+      ,'feedprice_usdpertonne':FEEDPRICE_USDPERTONNE
+      ,'ideal_fcr_live':IDEAL_FCR_LIVE
+      ,'avg_carc_yield':AVG_CARC_YIELD
+   })
+   feedprice = grid_df['feedprice_usdpertonne'].to_numpy()
+   ideal_fcr = grid_df['ideal_fcr_live'].to_numpy()
+   avg_carc_yield = grid_df['avg_carc_yield'].to_numpy(dtype=float)
+
+   if 'avg_dof' in grid_df:
+      breedstdwt_kg = _breedstd_matrix(INPUT_DF ,BREED_DF ,brd.weight_kg_at_day ,grid_df['avg_dof'].to_numpy())
+   else:
+      breedstdwt_kg = _breedstd_matrix(INPUT_DF ,BREED_DF ,brd.weight_kg_at_feed ,grid_df['avg_feedint_kg'].to_numpy())
+   breedstdyield_prpn = np.broadcast_to(avg_carc_yield ,breedstdwt_kg.shape)
+
+   results = _calc_production(
+      INPUT_DF ,breedstdwt_kg ,breedstdyield_prpn
+      ,ACHIEVABLE_PCT=grid_df['achievable_pct'].to_numpy() if 'achievable_pct' in grid_df else None
+      ,ACHIEVABLE_WT_KG=grid_df['achievable_wt_kg'].to_numpy() if 'achievable_wt_kg' in grid_df else None
+   )
+   if 'avg_dof' in grid_df:
+      results['bod_dof_used'] = np.broadcast_to(grid_df['avg_dof'].to_numpy() ,breedstdwt_kg.shape)
+   else:
+      results['bod_feedint_used'] = np.broadcast_to(grid_df['avg_feedint_kg'].to_numpy() ,breedstdwt_kg.shape)
+
+   # Ideal Costs
+   acc_feedprice = _col(INPUT_DF ,'acc_feedprice_usdpertonne')
+   with np.errstate(divide='ignore' ,invalid='ignore'):
+      results['adjusted_feedcost_usdperkgcarc'] = _col(INPUT_DF ,'acc_feedcost_usdperkgcarc') * (feedprice / acc_feedprice)
+   results['ideal_fcr'] = np.broadcast_to(ideal_fcr ,breedstdwt_kg.shape)
+   required_live_weight_tonnes = results['bod_realizedproduction_tonnes'] / breedstdyield_prpn
+   results['ideal_feed_tonnes'] = required_live_weight_tonnes * ideal_fcr
+   with np.errstate(divide='ignore' ,invalid='ignore'):
+      # calc_ideal_feedcost_usdperkgcarc() returns the cost at the feed price from the data, so the same is done here
+      results['ideal_feedcost_usdperkgcarc'] = (results['ideal_feed_tonnes'] * acc_feedprice) / (results['bod_realizedproduction_tonnes'] * 1000)
+      ideal_headplaced_prpn = results['ideal_headplaced'] / _col(INPUT_DF ,'acc_headplaced')
+   results['ideal_nonfeedvariablecost_usdperkgcarc'] = _col(INPUT_DF ,'acc_nonfeedvariablecost_usdperkgcarc') * ideal_headplaced_prpn
+   results['ideal_landhousingcost_usdperkgcarc'] = _col(INPUT_DF ,'acc_landhousingcost_usdperkgcarc') * ideal_headplaced_prpn
+   with np.errstate(divide='ignore' ,invalid='ignore'):
+      ideal_financecost_prpn = results['ideal_landhousingcost_usdperkgcarc'] / _col(INPUT_DF ,'acc_landhousingcost_usdperkgcarc')
+   results['ideal_laborcost_usdperkgcarc'] = _col(INPUT_DF ,'acc_laborcost_usdperkgcarc') * ideal_financecost_prpn
+
+   return _to_long(INPUT_DF ,ID_VARS ,grid_df ,results)
+
+# To stack the (rows, grid points) arrays into a long data frame
+# Rows are ordered by grid point, then by the order of INPUT_DF.
+def _to_long(INPUT_DF ,ID_VARS ,GRID_DF ,RESULTS):
+   n_rows = len(INPUT_DF)
+   n_points = len(GRID_DF)
+   OUTPUT_DF = pd.DataFrame({
+      VAR:np.tile(INPUT_DF[VAR].to_numpy() ,n_points) for VAR in ID_VARS
+   })
+   OUTPUT_DF['scenario_id'] = np.repeat(np.arange(n_points) ,n_rows)
+   for PARAM in GRID_DF.columns:
+      OUTPUT_DF[PARAM] = np.repeat(GRID_DF[PARAM].to_numpy() ,n_rows)
+   for COL ,values in RESULTS.items():
+      OUTPUT_DF[COL] = np.broadcast_to(values ,(n_rows ,n_points)).T.ravel()
+   return OUTPUT_DF
+
+#%% Output
+
+# To save a sweep as a compressed columnar file
+# Identifying columns are stored as categories, which keeps the file small for large grids.
+def write_sweep(SWEEP_DF ,FILENAME ,CATEGORICAL_VARS=['country']):
+   output_df = SWEEP_DF.copy()
+   for VAR in CATEGORICAL_VARS:
+      if VAR in output_df:
+         output_df[VAR] = output_df[VAR].astype('category')
+   output_df.to_parquet(FILENAME ,index=False ,compression='snappy')
+   return None
+
+def read_sweep(FILENAME ,COLUMNS=None):
+   return pd.read_parquet(FILENAME ,columns=COLUMNS)
+
+# To summarize a sweep for a tornado chart
+# For each parameter, varies that parameter over its swept values while holding the others at BASELINE,
+# and reports the lowest and highest total of VALUE_VAR over the rows kept by FILTER_QUERY.
+# Returns a data frame with one row per parameter: parameter, baseline_value, low_value, high_value, and range, sorted by range.
+def tornado_summary(
+      SWEEP_DF
+      ,VALUE_VAR                # String: calculated column to summarize, e.g. 'bod_totalburden_tonnes'
+      ,BASELINE                 # Dictionary: {parameter: baseline value}. Must be values that were swept.
+      ,FILTER_QUERY=None        # String (optional): query to select rows before summing, e.g. "country == 'Brazil' & year == 2020"
+      ):
+   df = SWEEP_DF.query(FILTER_QUERY) if FILTER_QUERY else SWEEP_DF
+   totals = df.groupby(list(BASELINE) ,dropna=False)[VALUE_VAR].sum()
+
+   # Match each parameter to its baseline, treating missing as equal to missing (e.g. poultry avg_carc_yield None)
+   at_baseline = {}
+   for KEY ,VALUE in BASELINE.items():
+      level = totals.index.get_level_values(KEY)
+      at_baseline[KEY] = level.isna() if pd.isna(VALUE) else (level == VALUE)
+   baseline_value = totals[np.logical_and.reduce(list(at_baseline.values()))].sum()
+
+   rows = []
+   for PARAM in BASELINE:
+      _others_at_baseline = np.logical_and.reduce([np.ones(len(totals) ,dtype=bool)] + [at_baseline[KEY] for KEY in BASELINE if KEY != PARAM])
+      values = totals[_others_at_baseline]
+      rows.append({
+         'parameter':PARAM
+         ,'baseline_value':baseline_value
+         ,'low_value':values.min()
+         ,'high_value':values.max()
+      })
+   OUTPUT_DF = pd.DataFrame(rows)
+   OUTPUT_DF['range'] = OUTPUT_DF['high_value'] - OUTPUT_DF['low_value']
+   return OUTPUT_DF.sort_values(by='range' ,ascending=False ,ignore_index=True)
@@ -0,0 +1,293 @@
+#%% About
+'''
+This defines instrumentation for the callbacks of a Dash app.
+
+instrument_app() replaces app.callback, so every callback registered after it is
+called is timed. For each call it records:
+    - total_ms: time for the whole request, including Dash's JSON serialization of the outputs
+    - function_ms: time inside the callback function
+    - figure_ms: time within the callback spent building figures
+    - compute_ms: the rest of the callback time, i.e. pandas and other calculations
+    - response_bytes: size of the serialized response sent to the browser
+    - triggered: the component properties that triggered the call
+    - background: True for callbacks run as background jobs
+
+By default figure_ms is the time in the app's figure functions, marked with the
+figure_function decorator. This costs one timer per figure function call. With
+TIME_FIGURES=True it also counts plotly calls made anywhere else in the callback,
+by wrapping the figure methods of plotly's BaseFigure and the plotly express
+functions. This patches plotly for the whole process, not just this app: the
+wrappers only time calls made inside an instrumented callback, but every plotly
+call in the process goes through them. It is off by default.
+
+Background callbacks (see background_jobs) are recorded when their job runs, on the
+job's thread: total_ms is the time the job ran, not counting time in the queue.
+There is no request, so response_bytes is not recorded and triggered is empty.
+The requests that start a job and poll for its result are not recorded. Queue
+and run times of jobs are at /metrics/jobs.
+
+The most recent calls for each callback are kept in memory and summarized as
+percentiles at a local metrics endpoint (default /metrics/callbacks). Each call
+can also be written as a line of JSON to a log file.
+
+Usage, right after creating the app and before defining callbacks:
+    import lib.callback_metrics as cbm
+    cbm.instrument_app(gbadsDash ,LOG_FILE=os.environ.get('DASH_CALLBACK_LOG'))
+Marking a figure function:
+    @cbm.figure_function
+    def create_waterfall(x, y, text):
+With timing of every plotly call, which patches plotly for the whole process:
+    cbm.instrument_app(gbadsDash ,TIME_FIGURES=True)
+'''
+#%% Imports
+
+import os
+import json
+import time
+import functools
+import threading
+import collections
+
+import numpy as np
+import flask
+
+import lib.fa_dash_utils as fa
+
+#%% Recording
+
+WINDOW = 500                    # Number of most recent calls kept for each callback
+PERCENTILES = [50 ,90 ,95 ,99]
+
+_lock = threading.Lock()
+_records = collections.defaultdict(lambda: collections.deque(maxlen=WINDOW))
+_counts = collections.defaultdict(collections.Counter)      # Calls, errors, prevented updates and cancelled jobs for each callback
+_state = threading.local()                                  # The call in progress on this thread
+
+def clear_metrics():
+    with _lock:
+        _records.clear()
+        _counts.clear()
+    return None
+
+def _record(RECORD ,LOG_FILE=None ,SLOW_MS=None):
+    with _lock:
+        _records[RECORD['callback']].append(RECORD)
+        _counts[RECORD['callback']]['calls'] += 1
+        _counts[RECORD['callback']][RECORD['status']] += 1
+        if LOG_FILE:
+            with open(LOG_FILE ,'a' ,encoding='utf-8') as f:
+                f.write(json.dumps(RECORD ,default=str) + '\n')
+    if SLOW_MS and RECORD['total_ms'] > SLOW_MS:
+        if RECORD['background']:
+            fa.logit(f"Slow background callback {RECORD['callback']}: {RECORD['total_ms'] :,.0f} ms")
+        else:
+            fa.logit(f"Slow callback {RECORD['callback']}: {RECORD['total_ms'] :,.0f} ms, {RECORD['response_bytes'] :,} bytes, triggered by {RECORD['triggered']}")
+    return None
+
+#%% Figure timing
+
+# Time spent in figure functions and, with TIME_FIGURES, in these plotly calls counts as figure
+# construction. Nested calls (e.g. px.bar() creating a go.Figure inside a figure function) are only
+# counted once.
+# _patch_plotly() replaces them for the whole process. Outside an instrumented callback the
+# wrappers call straight through.
+_FIGURE_METHODS = [
+    '__init__' ,'add_trace' ,'add_traces' ,'update_layout' ,'update_traces'
+    ,'update_xaxes' ,'update_yaxes' ,'add_annotation' ,'add_shape' ,'add_hline' ,'add_vline'
+]
+_plotly_patched = False
+
+def _time_figure_call(FUNC):
+    @functools.wraps(FUNC)
+    def wrapper(*args ,**kwargs):
+        call = getattr(_state ,'call' ,None)
+        if call is None or call['figure_depth'] > 0:
+            return FUNC(*args ,**kwargs)
+        call['figure_depth'] += 1
+        timer_start = time.perf_counter()
+        try:
+            return FUNC(*args ,**kwargs)
+        finally:
+            call['figure_s'] += time.perf_counter() - timer_start
+            call['figure_depth'] -= 1
+    return wrapper
+
+# To count the time in one of the app's functions as building figures, without patching plotly
+def figure_function(FUNC):
+    return _time_figure_call(FUNC)
+
+def _patch_plotly():
+    global _plotly_patched
+    if _plotly_patched:
+        return None
+    import plotly.basedatatypes
+    import plotly.express as px
+    for METHOD in _FIGURE_METHODS:
+        original = getattr(plotly.basedatatypes.BaseFigure ,METHOD ,None)
+        if original is not None:
+            setattr(plotly.basedatatypes.BaseFigure ,METHOD ,_time_figure_call(original))
+    for NAME in getattr(px ,'__all__' ,[]):
+        func = getattr(px ,NAME)
+        if callable(func) and NAME[0].islower() and not NAME.startswith('get_'):
+            setattr(px ,NAME ,_time_figure_call(func))
+    _plotly_patched = True
+    return None
+
+#%% Instrumenting an app
+
+def _triggered_ids():
+    try:
+        return list(flask.request.get_json(silent=True).get('changedPropIds') or [])
+    except AttributeError:
+        return []
+
+def _new_call():
+    return {
+        'callback':None ,'status':'ok' ,'request_start':time.perf_counter()
+        ,'function_s':0.0 ,'figure_s':0.0 ,'figure_depth':0
+    }
+
+def _call_status(err):
+    return {'PreventUpdate':'prevented' ,'JobCancelled':'cancelled'}.get(type(err).__name__ ,'error')
+
+def _timed_callback(
+        FUNC
+        ,FINISH             # Function recording a background call: FINISH(call ,response_bytes ,triggered)
+        ,BACKGROUND=False   # True: the callback runs as a background job, outside the request
+    ):
+    @functools.wraps(FUNC)
+    def wrapper(*args ,**kwargs):
+        call = getattr(_state ,'call' ,None)
+        job = call is None and BACKGROUND
+        if job:             # On the job's thread. The job is recorded here rather than by the request.
+            call = _state.call = _new_call()
+        elif call is None:  # Not in a request, e.g. called directly from another function
+            return FUNC(*args ,**kwargs)
+        call['callback'] = FUNC.__name__
+        timer_start = time.perf_counter()
+        try:
+            return FUNC(*args ,**kwargs)
+        except Exception as err:
+            call['status'] = _call_status(err)
+            raise
+        finally:
+            call['function_s'] += time.perf_counter() - timer_start
+            if job:
+                _state.call = None
+                call['background'] = True
+                FINISH(call ,None ,[])
+    return wrapper
+
+def instrument_app(
+        APP                             # Dash app
+        ,ENDPOINT='/metrics/callbacks'  # String: route on the app's server for the metrics summary. None to skip.
+        ,LOG_FILE=None                  # String (optional): file to append a line of JSON per callback call
+        ,SLOW_MS=None                   # Number (optional): log calls taking longer than this with fa.logit()
+        ,LOCAL_ONLY=True                # True: only answer metrics requests from this machine
+        ,TIME_FIGURES=False             # True: count every plotly call in figure_ms, not just figure functions. Patches plotly for the whole process.
+    ):
+    if getattr(APP ,'_callback_metrics' ,False):
+        return APP
+    if TIME_FIGURES:
+        _patch_plotly()
+
+    # Time every callback registered from now on
+    register_callback = APP.callback
+    @functools.wraps(register_callback)
+    def callback(*args ,**kwargs):
+        decorator = register_callback(*args ,**kwargs)
+        background = bool(kwargs.get('background'))
+        return lambda FUNC: decorator(_timed_callback(FUNC ,_finish ,background))
+    APP.callback = callback
+
+    server = APP.server
+    update_path = '_dash-update-component'
+
+    @server.before_request
+    def _start_callback_timer():
+        if flask.request.path.endswith(update_path):
+            _state.call = _new_call()
+        return None
+
+    def _finish(call ,response_bytes ,triggered=None):
+        function_ms = 1000 * call['function_s']
+        record = {
+            'time':time.strftime('%Y-%m-%d %X')
+            ,'callback':call['callback']
+            ,'status':call['status']
+            ,'total_ms':round(1000 * (time.perf_counter() - call['request_start']) ,3)
+            ,'function_ms':round(function_ms ,3)
+        }
+        figure_ms = 1000 * call['figure_s']
+        record['figure_ms'] = round(figure_ms ,3)
+        record['compute_ms'] = round(function_ms - figure_ms ,3)
+        if response_bytes is not None:
+            record['response_bytes'] = response_bytes
+        record['triggered'] = _triggered_ids() if triggered is None else triggered
+        record['background'] = call.get('background' ,False)
+        _record(record ,LOG_FILE ,SLOW_MS)
+        return None
+
+    @server.after_request
+    def _record_callback(response):
+        call = getattr(_state ,'call' ,None)
+        _state.call = None
+        if call is None or call['callback'] is None:
+            return response
+        if response.status_code == 204 and call['status'] == 'ok':
+            call['status'] = 'prevented'
+        elif response.status_code >= 500:
+            call['status'] = 'error'
+        response_bytes = response.content_length
+        if response_bytes is None and not response.direct_passthrough:
+            response_bytes = len(response.get_data())
+        _finish(call ,response_bytes or 0)
+        return response
+
+    # Record calls that ended without after_request being run, e.g. when handling an error failed
+    @server.teardown_request
+    def _record_unfinished_callback(error=None):
+        call = getattr(_state ,'call' ,None)
+        _state.call = None
+        if call is not None and call['callback'] is not None:
+            call['status'] = 'error'
+            _finish(call ,0)
+        return None
+
+    if ENDPOINT:
+        @server.route(ENDPOINT)
+        def _callback_metrics():
+            if LOCAL_ONLY and flask.request.remote_addr not in ('127.0.0.1' ,'::1' ,'localhost'):
+                flask.abort(403)
+            return flask.jsonify(summarize_metrics())
+
+    APP._callback_metrics = True
+    return APP
+
+#%% Summary
+
+def _percentiles(VALUES):
+    values = np.asarray(VALUES ,dtype=float)
+    summary = {f'p{P}':round(float(value) ,3) for P ,value in zip(PERCENTILES ,np.percentile(values ,PERCENTILES))}
+    summary['max'] = round(float(values.max()) ,3)
+    return summary
+
+# Percentiles over the most recent calls of each callback, slowest (by p95 total time) first
+def summarize_metrics():
+    with _lock:
+        records = {name:list(calls) for name ,calls in _records.items()}
+        counts = {name:dict(counter) for name ,counter in _counts.items()}
+    callbacks = []
+    for name ,calls in records.items():
+        if not calls:
+            continue
+        triggers = collections.Counter(trigger for call in calls for trigger in call['triggered'])
+        summary = {'callback':name ,'window':len(calls) ,'background':any(call.get('background') for call in calls)}
+        summary.update({key:counts[name].get(key ,0) for key in ('calls' ,'ok' ,'prevented' ,'error' ,'cancelled')})
+        for VAR in ('total_ms' ,'function_ms' ,'figure_ms' ,'compute_ms' ,'response_bytes'):
+            if all(VAR in call for call in calls):
+                summary[VAR] = _percentiles([call[VAR] for call in calls])
+        summary['triggered'] = dict(triggers.most_common())
+        callbacks.append(summary)
+    callbacks.sort(key=lambda summary: summary['total_ms']['p95'] ,reverse=True)
+    return {'pid':os.getpid() ,'percentiles':PERCENTILES ,'callbacks':callbacks}
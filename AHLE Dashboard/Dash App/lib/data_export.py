@@ -0,0 +1,244 @@
+#%% About
+'''
+This defines streaming export of dashboard data as CSV or Parquet.
+
+Datasets are registered by name and served from a route on the app's server:
+    /export/<name>.csv
+    /export/<name>.parquet
+Query parameters filter the rows and columns:
+    ?country=India&year=2020        rows matching every variable given. Repeat a variable for several values.
+    ?columns=country,year,biomass   columns to include, in order
+Only the filter variables registered for a dataset can be used.
+
+Responses are written in chunks of CHUNK_ROWS rows: each chunk is taken from
+the data, converted, sent and released before the next, so memory use depends
+on the chunk size and not on the size of the export. Parquet files have one row
+group per chunk.
+
+Parquet needs pyarrow. Without it, Parquet requests get 406 Not Acceptable
+before anything is sent.
+
+Responses carry an ETag based on the dataset contents and the query, and a
+Cache-Control max-age, so the browser or a proxy can reuse an export for the
+same query. A request with a matching If-None-Match gets 304 Not Modified.
+
+Usage, after creating the app:
+    exp.register_export(gbadsDash)
+    exp.add_dataset('ecs-attribution' ,lambda: data.ecs_ahle_all_withattr ,FILTER_VARS=['species' ,'production_system'])
+    exp.add_dataset('poultry-bod' ,calc_bod_poultry_defaults ,FILTER_VARS=['country' ,'year'] ,KEEP=True)
+'''
+#%% Imports
+
+import io
+import hashlib
+import inspect
+import weakref
+import threading
+import importlib.util
+
+import numpy as np
+import pandas as pd
+import flask
+
+#%% Datasets
+
+ROUTE = 'export'
+CHUNK_ROWS = 50000
+MAX_AGE = 3600                  # Seconds an export may be cached
+
+FORMATS = {
+    'csv':'text/csv'
+    ,'parquet':'application/vnd.apache.parquet'
+}
+
+# Formats that can be written in this environment
+def available_formats():
+    return [FMT for FMT in FORMATS if FMT != 'parquet' or importlib.util.find_spec('pyarrow') is not None]
+
+_lock = threading.Lock()
+_datasets = {}
+
+# To register a dataset for export
+# SOURCE is a function returning a data frame, so it can refer to data that is reloaded.
+# By default it is called for every export and nothing is kept: the version of the data (see
+# data_version()) is only recalculated when SOURCE returns a different data frame.
+# With KEEP=True, the data frame is kept from the first export until clear_exports(). Use this for
+# data calculated on demand.
+def add_dataset(
+        NAME                # String: name in the export URL
+        ,SOURCE             # Function with no arguments returning a data frame
+        ,FILTER_VARS=[]     # List: variables that can be filtered with query parameters
+        ,KEEP=False         # True: keep the data frame returned by SOURCE until clear_exports()
+    ):
+    with _lock:
+        _datasets[NAME] = {'source':SOURCE ,'filter_vars':list(FILTER_VARS) ,'keep':KEEP ,'data':None ,'frame':None ,'version':None}
+    return None
+
+# To drop the data kept for each dataset, so the next export calls its SOURCE again
+def clear_exports():
+    with _lock:
+        for DATASET in _datasets.values():
+            DATASET['data'] = None
+            DATASET['frame'] = None
+            DATASET['version'] = None
+    return None
+
+def list_datasets():
+    return sorted(_datasets)
+
+# Identify a data frame by its contents
+def data_version(INPUT_DF):
+    hashed = pd.util.hash_pandas_object(INPUT_DF ,index=False).to_numpy()
+    digest = hashlib.sha1(hashed.tobytes())
+    digest.update(str(list(INPUT_DF.columns)).encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+# To get the data for a registered dataset
+# Returns a tuple (data frame, version), or (None, None) if there is no such dataset
+def get_dataset(NAME):
+    dataset = _datasets.get(NAME)
+    if dataset is None:
+        return None ,None
+    with _lock:
+        if dataset['data'] is not None:
+            return dataset['data'] ,dataset['version']
+        data = dataset['source']()
+        if dataset['frame'] is None or dataset['frame']() is not data:
+            dataset['frame'] = weakref.ref(data)
+            dataset['version'] = data_version(data)
+        if dataset['keep']:
+            dataset['data'] = data
+        return data ,dataset['version']
+
+#%% Filtering
+
+# Convert query values to the type of a column, so e.g. year=2020 matches a numeric year
+def _typed_values(COLUMN ,VALUES):
+    if pd.api.types.is_numeric_dtype(COLUMN) and not pd.api.types.is_bool_dtype(COLUMN):
+        return pd.to_numeric(pd.Series(VALUES) ,errors='coerce').dropna().tolist()
+    return list(VALUES)
+
+# To get the positions of rows matching all selections
+# SELECTIONS is a dictionary {variable: list of values}
+def filter_positions(INPUT_DF ,SELECTIONS):
+    _selected = np.ones(len(INPUT_DF) ,dtype=bool)
+    for VAR ,VALUES in SELECTIONS.items():
+        column = INPUT_DF[VAR]
+        _selected &= column.isin(_typed_values(column ,VALUES)).to_numpy()
+    return np.flatnonzero(_selected)
+
+#%% Writing chunks
+
+# Yield chunks of rows without copying the whole table
+# POSITIONS (optional) selects and orders the rows. COLUMNS (optional) selects and orders the columns.
+def _chunks(INPUT_DF ,POSITIONS=None ,COLUMNS=None ,CHUNK_ROWS=CHUNK_ROWS):
+    n_rows = len(INPUT_DF) if POSITIONS is None else len(POSITIONS)
+    for START in range(0 ,max(n_rows ,1) ,CHUNK_ROWS):
+        if POSITIONS is None:
+            chunk = INPUT_DF.iloc[START:START + CHUNK_ROWS]
+        else:
+            chunk = INPUT_DF.iloc[POSITIONS[START:START + CHUNK_ROWS]]
+        yield chunk[COLUMNS] if COLUMNS else chunk
+
+def csv_chunks(INPUT_DF ,POSITIONS=None ,COLUMNS=None ,CHUNK_ROWS=CHUNK_ROWS):
+    for i ,chunk in enumerate(_chunks(INPUT_DF ,POSITIONS ,COLUMNS ,CHUNK_ROWS)):
+        yield chunk.to_csv(index=False ,header=(i == 0))
+
+# A file for the Parquet writer that hands back what was written since it was last emptied
+class _ChunkSink(io.RawIOBase):
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+    def writable(self):
+        return True
+    def write(self ,DATA):
+        self.buffer.extend(DATA)
+        self.position += len(DATA)
+        return len(DATA)
+    def tell(self):
+        return self.position
+    def take(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def parquet_chunks(INPUT_DF ,POSITIONS=None ,COLUMNS=None ,CHUNK_ROWS=CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    for chunk in _chunks(INPUT_DF ,POSITIONS ,COLUMNS ,CHUNK_ROWS):
+        if writer is None:
+            # Schema from the first chunk. Columns that are all missing in it are taken to be text.
+            schema = pa.Schema.from_pandas(chunk ,preserve_index=False)
+            for i ,FIELD in enumerate(schema):
+                if pa.types.is_null(FIELD.type):
+                    schema = schema.set(i ,pa.field(FIELD.name ,pa.string()))
+            writer = pq.ParquetWriter(sink ,schema ,compression='snappy')
+        writer.write_table(pa.Table.from_pandas(chunk ,schema=schema ,preserve_index=False))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+_WRITERS = {'csv':csv_chunks ,'parquet':parquet_chunks}
+
+#%% Responses
+
+# To stream a data frame as a download
+# ETAG (optional) identifies the contents. If the request already has it, answers 304 Not Modified.
+def export_response(INPUT_DF ,FORMAT ,FILENAME ,POSITIONS=None ,COLUMNS=None ,ETAG=None ,MAX_AGE=MAX_AGE):
+    if FORMAT not in FORMATS:
+        flask.abort(404)
+    if FORMAT not in available_formats():
+        flask.abort(406 ,f'{FORMAT} export is not available on this server')
+    if ETAG and ETAG in flask.request.if_none_match:
+        response = flask.Response(status=304)
+    else:
+        response = flask.Response(
+            flask.stream_with_context(_WRITERS[FORMAT](INPUT_DF ,POSITIONS ,COLUMNS))
+            ,mimetype=FORMATS[FORMAT]
+            ,headers={'Content-Disposition':f'attachment; filename={FILENAME}.{FORMAT}'}
+        )
+    if ETAG:
+        response.set_etag(ETAG)
+    response.cache_control.public = True
+    response.cache_control.max_age = MAX_AGE
+    return response
+
+def make_etag(*PARTS):
+    return hashlib.sha1(repr(PARTS).encode('utf-8')).hexdigest()
+
+#%% Registering with an app
+
+# To add the export route to an app
+def register_export(APP):
+    funcname = inspect.currentframe().f_code.co_name
+    if getattr(APP ,'_data_export' ,False):
+        return APP
+    formats = available_formats()
+    if len(formats) < len(FORMATS):
+        print(f"<{funcname}> pyarrow is not installed. Parquet export requests will get 406 Not Acceptable.")
+
+    @APP.server.route(f"{APP.config.routes_pathname_prefix}{ROUTE}/<name>.<fmt>")
+    def _export_dataset(name ,fmt):
+        if name not in _datasets or fmt not in FORMATS:
+            flask.abort(404)
+        if fmt not in formats:
+            flask.abort(406 ,f'{fmt} export is not available on this server')
+        data ,version = get_dataset(name)
+        if data is None:
+            flask.abort(404)
+        args = flask.request.args
+        columns = [COL for COL in args.get('columns' ,'').split(',') if COL]
+        unknown = [COL for COL in columns if COL not in data.columns]
+        unknown += [VAR for VAR in args if VAR != 'columns' and VAR not in _datasets[name]['filter_vars']]
+        if unknown:
+            flask.abort(400 ,f'Unknown columns or filter variables for {name}: {unknown}')
+        selections = {VAR:args.getlist(VAR) for VAR in args if VAR != 'columns'}
+        positions = filter_positions(data ,selections) if selections else None
+        etag = make_etag(name ,version ,fmt ,columns ,sorted((VAR ,sorted(VALUES)) for VAR ,VALUES in selections.items()))
+        return export_response(data ,fmt ,name ,POSITIONS=positions ,COLUMNS=columns ,ETAG=etag)
+
+    APP._data_export = True
+    return APP
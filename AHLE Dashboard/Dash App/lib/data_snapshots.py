@@ -0,0 +1,414 @@
+#%% About
+'''
+This defines versioned snapshots of the dashboard data, and reloading them in a
+running app without a restart.
+
+The pipelines write the dashboard files to the data folder as before. When a
+pipeline has finished, publish() copies the data folder into a new snapshot and
+then points CURRENT at it:
+    data/
+        CURRENT                     name of the current snapshot
+        snapshots/
+            20260119_101500_3f9a0c/ one folder per version, never changed once published
+Files unchanged since the previous snapshot are hard links to it, so a snapshot
+takes little extra space. CURRENT is switched with a single rename, so a reader
+finds either the old version or the new one, never a mix. The newest KEEP
+snapshots are kept.
+
+The apps read the current snapshot with current_folder(). If the data folder
+has no snapshots yet, this is the data folder itself.
+
+register_reload() checks CURRENT every POLL_S seconds on a background thread.
+When it has changed:
+    - The new version is read with the app's LOAD function on that thread, while
+      requests are still answered from the old version.
+    - It is then swapped in between requests: at a moment within SWAP_WAIT_S
+      when no request is running (otherwise the swap is tried again at the next
+      check). Requests arriving in the meantime are not held up. The app's
+      DataHolder then switches to the new values, in a single assignment, and the
+      CLEAR functions drop anything derived from the old data. New requests wait
+      only for this, which takes milliseconds.
+    - The AFTER_SWAP functions are then run on that thread, e.g. to warm up the
+      app's default views again.
+Every request therefore runs against a single version. Background jobs do not
+hold off the swap: each job is pinned to the version of the DataHolder it started
+with, and keeps reading it after a swap until it finishes.
+
+Usage, at the end of a pipeline:
+    python "AHLE Dashboard/Dash App/lib/data_snapshots.py" publish "AHLE Dashboard/Dash App/data"
+In an app:
+    data = snap.DataHolder(read_pipeline_data(snap.current_folder(DASH_DATA_FOLDER)))
+    snap.register_reload(gbadsDash ,DASH_DATA_FOLDER ,read_pipeline_data ,data ,CLEAR=[exp.clear_exports])
+and the data is read as attributes, e.g. data.ga_countries_biomass.
+Background jobs are pinned to the data they started with when registered with:
+    bgj.register_jobs(gbadsDash ,JOB_CONTEXT=snap.pinned ,cache_by=[snap.data_version])
+'''
+#%% Imports
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import inspect
+import argparse
+import threading
+import traceback
+import contextlib
+import datetime as dt
+
+#%% Snapshots
+
+SNAPSHOT_FOLDER = 'snapshots'
+POINTER = 'CURRENT'
+KEEP = 3                        # Snapshots kept, including the current one
+
+# Name of the current snapshot, or None if the data folder has no snapshots
+def current_version(DATA_FOLDER):
+    try:
+        with open(os.path.join(DATA_FOLDER ,POINTER) ,encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+# Folder to read the dashboard files from
+# Warns if files in the data folder have changed since the current snapshot was published,
+# e.g. a pipeline wrote its outputs without publishing them.
+def current_folder(DATA_FOLDER):
+    funcname = inspect.currentframe().f_code.co_name
+    version = current_version(DATA_FOLDER)
+    if version is None:
+        return DATA_FOLDER
+    folder = os.path.join(DATA_FOLDER ,SNAPSHOT_FOLDER ,version)
+    changed = unpublished_files(DATA_FOLDER ,folder)
+    if changed:
+        print(f"<{funcname}> Warning: {len(changed)} files in {DATA_FOLDER} have changed since snapshot {version} and are not used until published: {changed}")
+    return folder
+
+# Files in the data folder with their size and modified time
+def _data_files(FOLDER):
+    files = {}
+    for ENTRY in os.scandir(FOLDER):
+        if ENTRY.is_file() and ENTRY.name != POINTER and not ENTRY.name.startswith('.'):
+            stat = ENTRY.stat()
+            files[ENTRY.name] = (stat.st_size ,stat.st_mtime_ns)
+    return files
+
+def _same_file(PATH ,SIGNATURE):
+    try:
+        stat = os.stat(PATH)
+    except FileNotFoundError:
+        return False
+    return (stat.st_size ,stat.st_mtime_ns) == SIGNATURE
+
+# Files in the data folder that differ from the snapshot in SNAPSHOT_PATH
+def unpublished_files(DATA_FOLDER ,SNAPSHOT_PATH):
+    return sorted(
+        NAME for NAME ,SIGNATURE in _data_files(DATA_FOLDER).items()
+        if not _same_file(os.path.join(SNAPSHOT_PATH ,NAME) ,SIGNATURE)
+    )
+
+# Replace a file in one step, so readers never find it half written
+def _write_atomic(PATH ,TEXT):
+    temp_path = f'{PATH}.tmp'
+    with open(temp_path ,'w' ,encoding='utf-8') as f:
+        f.write(TEXT)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path ,PATH)
+    return None
+
+# To publish the files in the data folder as a new snapshot and make it current
+# Returns the name of the current snapshot. If no file has changed since it was published, no snapshot is added.
+def publish(DATA_FOLDER ,KEEP=KEEP):
+    funcname = inspect.currentframe().f_code.co_name
+    files = _data_files(DATA_FOLDER)
+    previous = current_version(DATA_FOLDER)
+    previous_folder = os.path.join(DATA_FOLDER ,SNAPSHOT_FOLDER ,previous) if previous else None
+    if previous_folder and os.path.isdir(previous_folder) \
+            and set(os.listdir(previous_folder)) == set(files) \
+            and all(_same_file(os.path.join(previous_folder ,NAME) ,SIGNATURE) for NAME ,SIGNATURE in files.items()):
+        print(f"<{funcname}> No changes since snapshot {previous}.")
+        return previous
+
+    digest = hashlib.sha1(repr(sorted(files.items())).encode('utf-8')).hexdigest()[:6]
+    version = f"{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}_{digest}"
+    snapshots = os.path.join(DATA_FOLDER ,SNAPSHOT_FOLDER)
+    os.makedirs(snapshots ,exist_ok=True)
+
+    # Build the snapshot under a temporary name, then rename it, so it is complete once it appears
+    temp_folder = os.path.join(snapshots ,f'.{version}.tmp')
+    shutil.rmtree(temp_folder ,ignore_errors=True)
+    os.makedirs(temp_folder)
+    n_linked = 0
+    for NAME ,SIGNATURE in files.items():
+        target = os.path.join(temp_folder ,NAME)
+        if previous_folder and _same_file(os.path.join(previous_folder ,NAME) ,SIGNATURE):
+            try:
+                os.link(os.path.join(previous_folder ,NAME) ,target)
+                n_linked += 1
+                continue
+            except OSError:     # File system without hard links
+                pass
+        shutil.copy2(os.path.join(DATA_FOLDER ,NAME) ,target)
+    os.rename(temp_folder ,os.path.join(snapshots ,version))
+
+    _write_atomic(os.path.join(DATA_FOLDER ,POINTER) ,version)
+    print(f"<{funcname}> Published snapshot {version}: {len(files)} files, {len(files) - n_linked} changed.")
+    prune(DATA_FOLDER ,KEEP)
+    return version
+
+# To delete all but the newest KEEP snapshots. The current snapshot is always kept.
+def prune(DATA_FOLDER ,KEEP=KEEP):
+    snapshots = os.path.join(DATA_FOLDER ,SNAPSHOT_FOLDER)
+    if not os.path.isdir(snapshots):
+        return []
+    current = current_version(DATA_FOLDER)
+    versions = sorted(NAME for NAME in os.listdir(snapshots) if not NAME.startswith('.'))
+    removed = [VERSION for VERSION in versions[:max(len(versions) - KEEP ,0)] if VERSION != current]
+    for VERSION in removed:
+        shutil.rmtree(os.path.join(snapshots ,VERSION) ,ignore_errors=True)
+    return removed
+
+#%% Read gate
+
+# Requests hold the gate while they run. A swap waits until none hold it and then runs
+# while holding the gate's lock, so new requests wait only for the swap itself, not for
+# the wait before it. The same thread can enter again.
+class _ReadGate:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.local = threading.local()
+
+    def enter(self):
+        depth = getattr(self.local ,'depth' ,0)
+        if depth == 0:
+            with self.condition:
+                self.readers += 1
+        self.local.depth = depth + 1
+        return None
+
+    def leave(self):
+        self.local.depth -= 1
+        if self.local.depth == 0:
+            with self.condition:
+                self.readers -= 1
+                self.condition.notify_all()
+        return None
+
+    # Run APPLY once no reader holds the gate. Returns False if readers were still running after WAIT_S seconds.
+    def swap(self ,APPLY ,WAIT_S):
+        with self.condition:
+            drained = self.condition.wait_for(lambda: self.readers == 0 ,timeout=WAIT_S)
+            if drained:
+                APPLY()
+            return drained
+
+_gate = _ReadGate()
+
+#%% Data holder
+
+class DataHolder:
+    '''
+    The data read by an app's LOAD function, as attributes, e.g. data.ga_countries_biomass.
+    replace() switches to new values with a single assignment, so the values read
+    together always come from the same version.
+    Within pinned(), a thread keeps reading the values current when it started,
+    even if they are replaced meanwhile.
+    '''
+    def __init__(self ,VALUES):
+        self._values = dict(VALUES)
+        self._pins = threading.local()
+
+    def __getattr__(self ,NAME):
+        values = getattr(self.__dict__['_pins'] ,'values' ,None)
+        if values is None:
+            values = self.__dict__['_values']
+        try:
+            return values[NAME]
+        except KeyError:
+            raise AttributeError(f"No data named '{NAME}'") from None
+
+    @contextlib.contextmanager
+    def pinned(self):
+        if getattr(self._pins ,'values' ,None) is not None:
+            yield
+            return
+        self._pins.values = self._values
+        try:
+            yield
+        finally:
+            self._pins.values = None
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(self._values))
+
+    def replace(self ,VALUES):
+        self._values = dict(VALUES)
+        return None
+
+    def names(self):
+        return sorted(self._values)
+
+#%% Reloading
+
+POLL_S = 30                     # Seconds between checks for a new snapshot
+SWAP_WAIT_S = 2                 # Seconds new requests may wait for running ones to finish, before the swap is retried later
+
+_reloader = None
+
+# Context manager keeping a background job on the version of the data it started with
+def pinned():
+    if _reloader is None:
+        return contextlib.nullcontext()
+    return _reloader.holder.pinned()
+
+# Name of the snapshot the app is serving, or None if it read the data folder itself
+def data_version():
+    return _reloader.version if _reloader is not None else None
+
+class _Reloader:
+    def __init__(self ,DATA_FOLDER ,LOAD ,HOLDER ,CLEAR ,AFTER_SWAP ,POLL_S ,SWAP_WAIT_S):
+        self.data_folder = DATA_FOLDER
+        self.load = LOAD
+        self.holder = HOLDER
+        self.clear = list(CLEAR)
+        self.after_swap = list(AFTER_SWAP)
+        self.poll_s = POLL_S
+        self.swap_wait_s = SWAP_WAIT_S
+        self.version = current_version(DATA_FOLDER)     # The app read this version at startup
+        self.pending = None                             # (version, loaded data) waiting to be swapped in
+        self.failed = None                              # Version that could not be read
+        self.counts = {'reloads':0 ,'retries':0 ,'failures':0}
+        self.last_reload = None
+
+    def run(self):
+        while True:
+            time.sleep(self.poll_s)
+            try:
+                self.check()
+            except Exception:
+                traceback.print_exc()
+
+    # Load a new version if CURRENT has changed and swap it in. Returns True if the data was replaced.
+    def check(self):
+        funcname = inspect.currentframe().f_code.co_name
+        version = current_version(self.data_folder)
+        if version is None or version in (self.version ,self.failed):
+            return False
+        if self.pending is None or self.pending[0] != version:
+            timer_start = time.perf_counter()
+            try:
+                loaded = self.load(current_folder(self.data_folder))
+            except Exception:
+                print(f"<{funcname}> Could not read snapshot {version}. Still serving {self.version}.")
+                traceback.print_exc()
+                self.failed = version
+                self.counts['failures'] += 1
+                return False
+            print(f"<{funcname}> Read snapshot {version} in {time.perf_counter() - timer_start :,.1f}s.")
+            self.pending = (version ,loaded)
+
+        def _apply():
+            self.holder.replace(self.pending[1])
+            for CLEAR_FUNC in self.clear:
+                CLEAR_FUNC()
+            self.version = self.pending[0]
+
+        if not _gate.swap(_apply ,self.swap_wait_s):
+            print(f"<{funcname}> Requests still running after {self.swap_wait_s}s. Will retry swapping in {version}.")
+            self.counts['retries'] += 1
+            return False
+        print(f"<{funcname}> Now serving snapshot {version}.")
+        self.pending = None
+        self.counts['reloads'] += 1
+        self.last_reload = dt.datetime.now().isoformat(timespec='seconds')
+
+        # Outside the gate, so these may make requests to the app
+        for AFTER_FUNC in self.after_swap:
+            try:
+                AFTER_FUNC()
+            except Exception:
+                traceback.print_exc()
+        return True
+
+    def summarize(self):
+        return {
+            'pid':os.getpid()
+            ,'serving':self.version
+            ,'current':current_version(self.data_folder)
+            ,'pending':self.pending[0] if self.pending else None
+            ,'last_reload':self.last_reload
+            ,'counts':dict(self.counts)
+        }
+
+#%% Registering with an app
+
+# To reload the app's data when a new snapshot is published
+def register_reload(
+        APP                             # Dash app
+        ,DATA_FOLDER                    # String: folder holding CURRENT and snapshots/
+        ,LOAD                           # Function taking a folder and returning a dictionary {data name: value}
+        ,HOLDER                         # DataHolder the app reads the data from
+        ,CLEAR=[]                       # List of functions with no arguments, called at the swap to drop derived caches
+        ,AFTER_SWAP=[]                  # List of functions with no arguments, called after the swap once requests run again
+        ,POLL_S=POLL_S
+        ,SWAP_WAIT_S=SWAP_WAIT_S
+        ,ENDPOINT='/metrics/data'       # String: route on the app's server for the reload status. None to skip.
+        ,LOCAL_ONLY=True                # True: only answer status requests from this machine
+    ):
+    global _reloader
+    import flask        # Here rather than at the top, so pipelines can publish without Flask installed
+
+    if getattr(APP ,'_data_reload' ,False):
+        return APP
+    _reloader = _Reloader(DATA_FOLDER ,LOAD ,HOLDER ,CLEAR ,AFTER_SWAP ,POLL_S ,SWAP_WAIT_S)
+    server = APP.server
+
+    # Each request holds the gate from before it runs until its response has been sent, including streamed responses
+    @server.before_request
+    def _enter_data_gate():
+        _gate.enter()
+        flask.g._data_gate = True
+        return None
+
+    @server.teardown_request
+    def _leave_data_gate(exc):
+        if flask.g.pop('_data_gate' ,False):
+            _gate.leave()
+        return None
+
+    if ENDPOINT:
+        @server.route(ENDPOINT)
+        def _data_metrics():
+            if LOCAL_ONLY and flask.request.remote_addr not in ('127.0.0.1' ,'::1' ,'localhost'):
+                flask.abort(403)
+            return flask.jsonify(_reloader.summarize())
+
+    if POLL_S:
+        threading.Thread(target=_reloader.run ,name='data-reload' ,daemon=True).start()
+    APP._data_reload = True
+    return APP
+
+#%% Command line
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish the dashboard data as a new snapshot')
+    subparsers = parser.add_subparsers(dest='command' ,required=True)
+    publish_parser = subparsers.add_parser('publish' ,help='Snapshot the files in DATA_FOLDER and make it current')
+    publish_parser.add_argument('data_folder')
+    publish_parser.add_argument('--keep' ,type=int ,default=KEEP ,help='Snapshots to keep')
+    current_parser = subparsers.add_parser('current' ,help='Print the current snapshot')
+    current_parser.add_argument('data_folder')
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        publish(args.data_folder ,KEEP=args.keep)
+    else:
+        print(current_version(args.data_folder))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
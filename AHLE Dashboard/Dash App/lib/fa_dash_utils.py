@@ -12,6 +12,7 @@ import numpy as np
 from dash import html, dcc
 import dash_bootstrap_components as dbc  # Allows easy access to all bootstrap themes
 from datetime import datetime as dt
+import lib.http_transport as ht
 
 in_spyder   = str(os.environ).count('SPY_') > 10
 in_jupyter  = str(os.environ).count('SPY_') < 10 and  str(os.environ).count('JPY_') > 1
@@ -61,6 +62,9 @@ def instantiate_app(app_title='title', external_stylesheets=[]):  # returns a Da
             app = Dash(__name__ , title=app_title,
                    external_stylesheets=external_stylesheets,
                    assets_folder=assets_folder)
+
+    # Compress responses and set HTTP cache headers. Set DASH_COMPRESS=0 to turn compression off.
+    ht.register_transport(app)
     return flask_server, app
 
 def get_open_port(beg=8050,end=8299):
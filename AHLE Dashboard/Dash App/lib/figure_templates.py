@@ -0,0 +1,99 @@
+#%% About
+'''
+This defines a cache of figure templates for charts that are redrawn with new data.
+
+The static parts of a chart (trace styling, layout, axes, colors, annotations)
+are built once per chart type, using the usual plotly calls, and stored as
+plain dictionaries. Each request then creates the figure in a single step,
+merging only the data arrays into the stored trace styles. This avoids running
+plotly express and the repeated update_layout() calls on every render.
+
+Figures returned are ordinary plotly figures, so callbacks can still add
+titles, shapes and annotations to them.
+
+Usage:
+    def _build_waterfall_template():
+        fig = go.Figure(go.Waterfall(orientation='v' ,connector={'line':{'color':'darkgrey'}}))
+        fig.update_layout(plot_bgcolor='#ededed')
+        return fig
+    fig = figure_from_template('waterfall' ,_build_waterfall_template ,[{'x':x ,'y':y}])
+'''
+#%% Imports
+
+import plotly.graph_objects as go
+import plotly.express as px
+
+#%% Cache
+
+_templates = {}
+
+def clear_templates():
+    _templates.clear()
+    return None
+
+# Build and store the template for a chart type on first use
+# Returns a dictionary {'trace_styles': list of trace dictionaries, 'layout': layout dictionary}
+def get_template(NAME ,BUILD_FUNC):
+    if NAME not in _templates:
+        template_json = BUILD_FUNC().to_plotly_json()
+        layout = dict(template_json['layout'])
+        layout.pop('template' ,None)        # The default plotly template is applied when each figure is created
+        _templates[NAME] = {'trace_styles':template_json['data'] ,'layout':layout}
+    return _templates[NAME]
+
+# Merge values into a stored style without changing it. Nested dictionaries (e.g. sankey node and link) are merged too.
+def _merge(STYLE ,VALUES):
+    merged = dict(STYLE)
+    for KEY ,VALUE in VALUES.items():
+        if isinstance(VALUE ,dict) and isinstance(merged.get(KEY) ,dict):
+            merged[KEY] = _merge(merged[KEY] ,VALUE)
+        else:
+            merged[KEY] = VALUE
+    return merged
+
+#%% Figures
+
+def figure_from_template(
+        NAME                # String: name of the chart type, used as the cache key
+        ,BUILD_FUNC         # Function with no arguments returning a figure with the static parts of the chart
+        ,TRACES             # List of dictionaries: data for each trace, e.g. [{'x':x ,'y':y ,'text':text}]
+        ,LAYOUT={}          # Dictionary (optional): layout values for this figure only
+    ):
+    '''
+    Each entry of TRACES is merged into the template's trace style with the same
+    position. Extra traces use the style of the template's last trace.
+    '''
+    template = get_template(NAME ,BUILD_FUNC)
+    styles = template['trace_styles']
+    data = [_merge(styles[min(i ,len(styles) - 1)] ,TRACE) for i ,TRACE in enumerate(TRACES)]
+    layout = _merge(template['layout'] ,LAYOUT) if LAYOUT else template['layout']
+    return go.Figure({'data':data ,'layout':layout})
+
+# To split a stacked bar into one trace per color category, as plotly express does
+# Categories keep their order of first appearance. Colors missing from COLOR_MAP are assigned from the default
+# plotly colors in the same way as plotly express, continuing from the number of mapped colors.
+def stacked_bar_traces(x ,y ,color ,COLOR_MAP={} ,text=None):
+    default_colors = px.colors.qualitative.Plotly
+    x = list(x)
+    y = list(y)
+    text = list(text) if text is not None else None
+    rows_by_category = {}
+    for i ,CATEGORY in enumerate(color):
+        rows_by_category.setdefault(CATEGORY ,[]).append(i)
+    traces = []
+    n_unmapped = 0
+    for CATEGORY ,rows in rows_by_category.items():
+        if CATEGORY in COLOR_MAP:
+            marker_color = COLOR_MAP[CATEGORY]
+        else:
+            marker_color = default_colors[(len(COLOR_MAP) + n_unmapped) % len(default_colors)]
+            n_unmapped += 1
+        trace = {
+            'name':str(CATEGORY) ,'legendgroup':str(CATEGORY)
+            ,'x':[x[i] for i in rows] ,'y':[y[i] for i in rows]
+            ,'marker':{'color':marker_color}
+        }
+        if text is not None:
+            trace['text'] = [text[i] for i in rows]
+        traces.append(trace)
+    return traces
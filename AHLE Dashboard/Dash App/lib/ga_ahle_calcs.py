@@ -7,6 +7,8 @@ This defines the functions to calculate AHLE for the global aggregate tab.
 import numpy as np
 import pandas as pd
 
+import _pert_uncertainty as pert      # In pipeline_common, shared with the AMU pipeline
+
 #%% Define functions
 
 # =============================================================================
@@ -25,52 +27,52 @@ def lookup_from_dictionary(KEY ,DICT):
 # These are currently trivial functions, but they could be made to recalculate
 # rates with various user input.
 # =============================================================================
+mortality_byincome = {
+    "Low":0.15
+    ,"Lower Middle":0.1
+    ,"Upper Middle":0.06
+    ,"High":0.04
+}
+morbidity_byincome = {
+    "Low":0.15
+    ,"Lower Middle":0.15
+    ,"Upper Middle":0.15
+    ,"High":0.15
+}
+# Spend per kg biomass, farm level
+farmspend_perkg_biomass_byincome = {
+    "Low":0.01
+    ,"Lower Middle":0.02
+    ,"Upper Middle":0.03
+    ,"High":0.05
+}
+# Spend per kg biomass, public level
+pubspend_perkg_biomass_byincome = {
+    "Low":0.005
+    ,"Lower Middle":0.01
+    ,"Upper Middle":0.02
+    ,"High":0.03
+}
+# Spend per kg production
+vetspend_perkg_prod_byincome = {
+    "Low":0.0025
+    ,"Lower Middle":0.005
+    ,"Upper Middle":0.01
+    ,"High":0.01
+}
+
 def add_mortality_rate(INPUT_DF):
-    mortality_byincome = {
-        "Low":0.15
-        ,"Lower Middle":0.1
-        ,"Upper Middle":0.06
-        ,"High":0.04
-    }
     OUTPUT_DF = INPUT_DF.copy()
     OUTPUT_DF['mortality_rate'] = OUTPUT_DF['incomegroup'].apply(lookup_from_dictionary ,DICT=mortality_byincome)
     return OUTPUT_DF
 
 def add_morbidity_rate(INPUT_DF):
     OUTPUT_DF = INPUT_DF.copy()
-    morbidity_byincome = {
-        "Low":0.15
-        ,"Lower Middle":0.15
-        ,"Upper Middle":0.15
-        ,"High":0.15
-    }
     OUTPUT_DF['morbidity_rate'] = OUTPUT_DF['incomegroup'].apply(lookup_from_dictionary ,DICT=morbidity_byincome)
     return OUTPUT_DF
 
 def add_vetmed_rates(INPUT_DF):
     OUTPUT_DF = INPUT_DF.copy()
-
-    # Spend per kg biomass, farm level
-    farmspend_perkg_biomass_byincome = {
-        "Low":0.01
-        ,"Lower Middle":0.02
-        ,"Upper Middle":0.03
-        ,"High":0.05
-    }
-    # Spend per kg biomass, public level
-    pubspend_perkg_biomass_byincome = {
-        "Low":0.005
-        ,"Lower Middle":0.01
-        ,"Upper Middle":0.02
-        ,"High":0.03
-    }
-    # Spend per kg production
-    vetspend_perkg_prod_byincome = {
-        "Low":0.0025
-        ,"Lower Middle":0.005
-        ,"Upper Middle":0.01
-        ,"High":0.01
-    }
     OUTPUT_DF['vetspend_biomass_farm_usdperkgbm'] = \
         OUTPUT_DF['incomegroup'].apply(lookup_from_dictionary ,DICT=farmspend_perkg_biomass_byincome)
     OUTPUT_DF['vetspend_biomass_public_usdperkgbm'] = \
@@ -82,6 +84,16 @@ def add_vetmed_rates(INPUT_DF):
 # =============================================================================
 # Add antimicrobial expenditure from AMU data
 # =============================================================================
+map_wb_regions_to_woah = {
+    "EAP":"Asia, Far East and Oceania"
+    ,"ECA":"Europe"
+    ,"LAC":"Americas"
+    ,"MENA":"Middle East"
+    ,"NA":"Americas"
+    ,"SA":"Asia, Far East and Oceania"
+    ,"SSA":"Africa"
+    }
+
 def add_antimicrobial_expenditure(
         INPUT_DF
         ,AMU_DF     # Data containing antimicrobial expenditure in USD by Region. Currently only a single year.
@@ -89,15 +101,6 @@ def add_antimicrobial_expenditure(
     OUTPUT_DF = INPUT_DF.copy()
 
     # Recode regions to match antimicrobial data
-    map_wb_regions_to_woah = {
-        "EAP":"Asia, Far East and Oceania"
-        ,"ECA":"Europe"
-        ,"LAC":"Americas"
-        ,"MENA":"Middle East"
-        ,"NA":"Americas"
-        ,"SA":"Asia, Far East and Oceania"
-        ,"SSA":"Africa"
-        }
     OUTPUT_DF['region_woah'] = OUTPUT_DF['region'].replace(map_wb_regions_to_woah)
 
     # Merge antimicrobial expenditure by region
@@ -320,3 +323,176 @@ def ahle_calcs_adj_inputs(INPUT_DF):
         ,inplace=True
     )
     return OUTPUT_DF
+
+#%% Monte Carlo uncertainty
+
+# =============================================================================
+# Distributions for the inputs
+# =============================================================================
+# Each rate is sampled from a PERT distribution for each income group, with the point value above
+# as most likely and the range given as multiples of it ('min' and 'max'). These are placeholder
+# ranges until estimates are available; change them here or pass RATE_UNCERTAINTY to ahle_uncertainty().
+# Rates not listed are fixed at their point values.
+RATE_UNCERTAINTY = {
+    'mortality_rate':{'min':0.5 ,'max':1.5 ,'distr':'Pert'}
+    ,'morbidity_rate':{'min':0.5 ,'max':1.5 ,'distr':'Pert'}
+    ,'vetspend_biomass_farm_usdperkgbm':{'min':0.5 ,'max':2 ,'distr':'Pert'}
+    ,'vetspend_production_usdperkgprod':{'min':0.5 ,'max':2 ,'distr':'Pert'}
+}
+rates_byincome = {
+    'mortality_rate':mortality_byincome
+    ,'morbidity_rate':morbidity_byincome
+    ,'vetspend_biomass_farm_usdperkgbm':farmspend_perkg_biomass_byincome
+    ,'vetspend_production_usdperkgprod':vetspend_perkg_prod_byincome
+}
+
+# Antimicrobial expenditure for each region is usage x price, each sampled from a PERT distribution
+# over the range of the AMU sliders, with the selected value as most likely.
+AM_USAGE_COLS = ['terr_amu_tonnes_reporting_2020' ,'amu_terrestrial_tonnes_selected' ,'terr_amu_tonnes_mulch_2020']
+AM_PRICE_COLS = ['am_price_usdpertonne_low' ,'am_price_usdpertonne_selected' ,'am_price_usdpertonne_high']
+
+# Number of draws used by the dashboard. 1,000 draws keep the intervals stable to about 2% between seeds and
+# take about 130 ms for all countries and species, whether for a single total or an interval for each year,
+# within the interactive budget of 200 ms. The cost grows with N_DRAWS times the number of income groups.
+MC_DRAWS = 1000
+MC_QUANTILES = [0.025 ,0.5 ,0.975]
+
+# Current and ideal value columns of the AHLE waterfall, as calculated by ahle_calcs_adj_outputs()
+# Costs have no ideal (zero).
+ahle_item_columns = {
+    'biomass_value_2010usd':'ideal_biomass_value_2010usd'
+    ,'output_value_meat_2010usd':'ideal_output_value_meat_2010usd'
+    ,'output_value_eggs_2010usd':'ideal_output_value_eggs_2010usd'
+    ,'output_value_milk_2010usd':'ideal_output_value_milk_2010usd'
+    ,'output_value_wool_2010usd':'ideal_output_value_wool_2010usd'
+    ,'vetspend_farm_usd':None
+    ,'antimicrobial_expenditure_usd':None
+    ,'net_value_2010usd':'ideal_output_plus_biomass_value_2010usd'
+}
+
+# =============================================================================
+# Draws
+# =============================================================================
+# To sample rates for each income group
+# Returns a dictionary {rate column: array with one row per draw and one column per income group}
+def sample_rates(INCOME_GROUPS ,N_DRAWS ,RNG ,RATE_UNCERTAINTY=RATE_UNCERTAINTY):
+    rate_draws = {}
+    for RATE ,byincome in rates_byincome.items():
+        point = np.array([byincome.get(GROUP ,np.nan) for GROUP in INCOME_GROUPS] ,dtype=float)
+        spec = RATE_UNCERTAINTY.get(RATE)
+        if spec:
+            params = pert.pert_params(point * spec['min'] ,point ,point * spec['max'] ,DISTR=spec.get('distr' ,'Pert') ,LAMBDA=spec.get('lambda'))
+            rate_draws[RATE] = pert.draw_samples(params ,N_DRAWS ,RNG).T
+        else:
+            rate_draws[RATE] = np.tile(point ,(N_DRAWS ,1))
+    return rate_draws
+
+# To sample antimicrobial expenditure for each region of the AMU data
+# Returns an array with one row per draw and one column per row of AMU_DF
+def sample_am_expenditure(AMU_DF ,N_DRAWS ,RNG):
+    if set(AM_USAGE_COLS + AM_PRICE_COLS).issubset(AMU_DF.columns):
+        usage_params = pert.pert_params(*[AMU_DF[COL].to_numpy() for COL in AM_USAGE_COLS])
+        price_params = pert.pert_params(*[AMU_DF[COL].to_numpy() for COL in AM_PRICE_COLS])
+        return (pert.draw_samples(usage_params ,N_DRAWS ,RNG) * pert.draw_samples(price_params ,N_DRAWS ,RNG)).T
+    return np.tile(AMU_DF['am_expenditure_usd_selected'].to_numpy(dtype=float) ,(N_DRAWS ,1))
+
+# =============================================================================
+# Credible intervals
+# =============================================================================
+# Data columns used by ahle_calcs_adj_outputs(). Given the rates, every item it calculates is linear in these.
+ahle_linear_columns = [
+    'biomass_value_2010usd' ,'output_value_meat_2010usd' ,'output_value_eggs_2010usd' ,'output_value_milk_2010usd' ,'output_value_wool_2010usd'
+    ,'output_plus_biomass_value_2010usd' ,'biomass'
+    ,'production_meat_tonnes' ,'production_eggs_tonnes' ,'production_milk_tonnes' ,'production_wool_tonnes'
+    ,'antimicrobial_expenditure_usd'
+]
+
+# To get credible intervals for the current, ideal, and AHLE (ideal - current) value of each waterfall item
+# The calculations are those of ahle_calcs_adj_outputs(), evaluated on the sampled rates. Rates vary by income
+# group, and given the rates each item is linear in the data columns (ahle_linear_columns). So rather than
+# evaluating every row of the data for every draw, ahle_calcs_adj_outputs() is evaluated once on probe rows,
+# one per draw, income group and data column, with that column set to 1 and the others to 0. This gives the
+# coefficient of each data column in each item, for each draw, which are then applied to the data summed
+# by income group (and region, for antimicrobial expenditure, which is sampled by region).
+# Missing values are treated as in ahle_calcs_adj_outputs() followed by summing in prep_ahle_forwaterfall_ga():
+# missing data counts as zero, and net value only sums rows that have both output value and antimicrobial expenditure.
+# Only the calculations of ahle_calcs_adj_outputs() are sampled. The items of ahle_calcs_adj_inputs() (input
+# animals and their value under ideal mortality and morbidity) are not part of the waterfall and get no
+# intervals. The data columns, i.e. populations, production, liveweights and prices, are point values;
+# only the rates in RATE_UNCERTAINTY and antimicrobial expenditure vary between draws.
+# With no spread in the distributions, every draw equals the point calculation.
+# Returns a dataframe with one row per group and item, with columns e.g. value_usd_ahle_diff_q2.5.
+def ahle_uncertainty(
+        INPUT_DF            # Data after add_antimicrobial_expenditure(), filtered to the countries and years to summarize
+        ,AMU_DF             # Regional AMU data used in add_antimicrobial_expenditure()
+        ,GROUP_VARS=[]      # List (optional): variables to get separate intervals for, e.g. ['year']. Default is a single total.
+        ,N_DRAWS=MC_DRAWS
+        ,QUANTILES=MC_QUANTILES
+        ,SEED=pert.DEFAULT_SEED
+        ,RATE_UNCERTAINTY=RATE_UNCERTAINTY
+    ):
+    group_vars = list(GROUP_VARS)
+    df = INPUT_DF.dropna(subset=['region' ,'region_label' ,'country' ,'year' ,'incomegroup'])
+    am_valid = df['antimicrobial_expenditure_usd'].notnull()
+    net_valid = df['output_plus_biomass_value_2010usd'].notnull() & am_valid
+
+    # Sum the data to arrays of (income group x data column x group), for all rows and for rows with a net value.
+    # Antimicrobial expenditure is summed as the share of its region, by (income group x AMU region x group).
+    income_codes ,income_groups = pd.factorize(df['incomegroup'])
+    if group_vars:
+        group_keys = pd.MultiIndex.from_frame(df[group_vars]) if len(group_vars) > 1 else df[group_vars[0]]
+        group_codes ,groups = pd.factorize(group_keys ,sort=True)
+    else:
+        group_codes ,groups = np.zeros(len(df) ,dtype=int) ,[None]
+    amu_regions = list(AMU_DF['region'])
+    region_pos = df['region_woah'].map({REGION:i for i ,REGION in enumerate(amu_regions)})
+    am_valid = am_valid & region_pos.notnull()
+    data_cols = ahle_linear_columns[:-1]
+    data = np.nan_to_num(df[data_cols].to_numpy(dtype=float))
+    am_prpn = np.nan_to_num(df['total_biomass_prpnofregion_thisyear'].to_numpy(dtype=float))
+    sums = {}
+    for NAME ,rows in [('all' ,np.ones(len(df) ,dtype=bool)) ,('net' ,net_valid.to_numpy())]:
+        sums[NAME] = np.zeros((len(income_groups) ,len(data_cols) ,len(groups)))
+        np.add.at(sums[NAME] ,(income_codes[rows] ,slice(None) ,group_codes[rows]) ,data[rows])
+        am_rows = rows & am_valid.to_numpy()
+        sums[f'{NAME}_am'] = np.zeros((len(income_groups) ,len(amu_regions) ,len(groups)))
+        np.add.at(sums[f'{NAME}_am'] ,(income_codes[am_rows] ,region_pos[am_rows].to_numpy(dtype=int) ,group_codes[am_rows]) ,am_prpn[am_rows])
+
+    # Probe rows: one per draw, income group and data column (draws x income groups x columns)
+    rng = np.random.default_rng(SEED)
+    rate_draws = sample_rates(list(income_groups) ,N_DRAWS ,rng ,RATE_UNCERTAINTY)
+    am_draws = np.nan_to_num(sample_am_expenditure(AMU_DF ,N_DRAWS ,rng))     # Draws x AMU regions
+    n_cols = len(ahle_linear_columns)
+    probe_df = pd.DataFrame(np.tile(np.eye(n_cols) ,(N_DRAWS * len(income_groups) ,1)) ,columns=ahle_linear_columns)
+    for RATE ,draws in rate_draws.items():
+        probe_df[RATE] = np.repeat(draws.ravel() ,n_cols)
+    probe_df['vetspend_biomass_public_usdperkgbm'] = np.tile(
+        np.repeat([pubspend_perkg_biomass_byincome.get(GROUP ,np.nan) for GROUP in income_groups] ,n_cols)
+        ,N_DRAWS
+        )
+    probe_df = ahle_calcs_adj_outputs(probe_df)
+
+    # Each item for each draw and group (draws x groups)
+    def _item_values(COL ,SUMS='all'):
+        coefs = np.nan_to_num(probe_df[COL].to_numpy().reshape(N_DRAWS ,len(income_groups) ,n_cols))
+        am_coefs = coefs[: ,: ,-1:] * am_draws[: ,np.newaxis ,:]       # Draws x income groups x AMU regions
+        return coefs[: ,: ,:-1].reshape(N_DRAWS ,-1) @ sums[SUMS].reshape(-1 ,len(groups)) \
+            + am_coefs.reshape(N_DRAWS ,-1) @ sums[f'{SUMS}_am'].reshape(-1 ,len(groups))
+    current = {COL:_item_values(COL ,'net' if COL == 'net_value_2010usd' else 'all') for COL in ahle_item_columns}
+    ideal = {COL:_item_values(COL) for COL in ahle_item_columns.values() if COL}
+
+    # Quantiles over draws
+    output_list = []
+    for CURRENT_COL ,IDEAL_COL in ahle_item_columns.items():
+        current_values = current[CURRENT_COL]
+        ideal_values = ideal[IDEAL_COL] if IDEAL_COL else np.zeros_like(current_values)
+        item_cols = {'item':[CURRENT_COL] * len(groups)}
+        for NAME ,values in [('value_usd_current' ,current_values) ,('value_usd_ideal' ,ideal_values) ,('value_usd_ahle_diff' ,ideal_values - current_values)]:
+            quantiles = np.quantile(values ,QUANTILES ,axis=0)
+            item_cols.update({f'{NAME}_q{100 * Q :g}':quantiles[i] for i ,Q in enumerate(QUANTILES)})
+        output_list.append(pd.DataFrame(item_cols))
+    output_df = pd.concat(output_list ,ignore_index=True)
+    if group_vars:
+        group_df = pd.DataFrame(list(groups) ,columns=group_vars) if len(group_vars) > 1 else pd.DataFrame({group_vars[0]:groups})
+        output_df = pd.concat([pd.concat([group_df] * len(ahle_item_columns) ,ignore_index=True) ,output_df] ,axis=1)
+    return output_df
@@ -0,0 +1,157 @@
+#%% About
+'''
+This defines a geography index for cascading dropdowns and filters.
+
+The index is built once from a data table and maps every combination of
+selections on the geography levels (by default region -> income group ->
+country), where each level is either a value or 'All', to:
+    the row positions in the table matching the selections
+    the values of each level and detail variable (by default species and year)
+      present in those rows, in order of first appearance
+    ready-made dropdown options for each of those
+Callbacks then look up the options or rows for the current selections in a
+dictionary rather than filtering the table, and new regions or countries in the
+data are picked up without code changes.
+
+Regions can also be given as lists of countries rather than a column of the
+table, for region-country alignments that are not in the data (e.g. WOAH or FAO
+regions). A country can then be in more than one region.
+
+Usage:
+    geo_idx = build_geo_index(ga_countries_biomass)
+    get_options(geo_idx ,'country' ,region_label='South Asia' ,incomegroup='All')
+    filter_rows(input_df ,geo_idx ,region_label='South Asia' ,country='India')
+    woah_idx = build_geo_index(ga_countries_biomass ,REGIONS={'Africa':['Ethiopia'] ,...})
+'''
+#%% Imports
+
+import itertools
+import numpy as np
+import pandas as pd
+
+#%% Index
+
+ALL = 'All'
+
+def build_geo_index(
+        INPUT_DF
+        ,LEVELS=['region_label' ,'incomegroup' ,'country']    # List: geography variables, from most to least aggregated
+        ,DETAIL_VARS=['species' ,'year']                      # List: other variables to list values for at each selection
+        ,REGIONS=None       # Optional dictionary {region: list of values of the last level}. If given, the regions of the first level are these rather than a column of INPUT_DF.
+    ):
+    '''
+    Returns a dictionary:
+        'levels'    LEVELS
+        'regions'   REGIONS
+        'n_rows'    number of rows in INPUT_DF
+        'fingerprint'   fingerprint of the row index of INPUT_DF, see _fingerprint()
+        'rows'      {selection key: array of row positions}
+        'values'    {variable: {selection key: list of values}}
+        'options'   {variable: {selection key: list of dropdown options}}
+    A selection key is a tuple with one entry per level, either a value or ALL.
+    Level variables get an 'All' option first; detail variables do not.
+    '''
+    LEVELS = list(LEVELS)
+    all_vars = LEVELS + [VAR for VAR in DETAIL_VARS if VAR not in LEVELS]
+    if REGIONS is not None:
+        # Values of the region level are listed from the regions of each key, below
+        column_values = {VAR:INPUT_DF[VAR].to_numpy() for VAR in all_vars[1:]}
+        rows = {(ALL ,) + KEY:positions for KEY ,positions in _group_rows(INPUT_DF ,LEVELS[1:]).items()}
+        for REGION ,MEMBERS in REGIONS.items():
+            in_region = np.flatnonzero(INPUT_DF[LEVELS[-1]].isin(MEMBERS).to_numpy())
+            for KEY ,positions in _group_rows(INPUT_DF.iloc[in_region] ,LEVELS[1:]).items():
+                rows[(REGION ,) + KEY] = in_region[positions]
+    else:
+        column_values = {VAR:INPUT_DF[VAR].to_numpy() for VAR in all_vars}
+        rows = _group_rows(INPUT_DF ,LEVELS)
+
+    values = {VAR:{} for VAR in all_vars}
+    options = {VAR:{} for VAR in all_vars}
+    for KEY ,positions in rows.items():
+        for VAR in all_vars:
+            if VAR not in column_values:
+                var_values = _regions_of(REGIONS ,KEY ,rows)
+            else:
+                var_values = pd.unique(column_values[VAR][positions]).tolist()
+            values[VAR][KEY] = var_values
+            options[VAR][KEY] = ([{'label':ALL ,'value':ALL}] if VAR in LEVELS else []) \
+                + [{'label':i ,'value':i} for i in var_values]
+
+    return {
+        'levels':LEVELS ,'regions':REGIONS ,'n_rows':len(INPUT_DF) ,'fingerprint':_fingerprint(INPUT_DF)
+        ,'rows':rows ,'values':values ,'options':options
+    }
+
+# To get the row positions for every combination of selections on LEVELS, each a value or ALL
+# Returns a dictionary {selection key: sorted array of row positions}
+def _group_rows(INPUT_DF ,LEVELS):
+    rows = {}
+    for SELECTED in itertools.product([False ,True] ,repeat=len(LEVELS)):
+        by = [LEVEL for LEVEL ,IS_SELECTED in zip(LEVELS ,SELECTED) if IS_SELECTED]
+        if not by:
+            rows[tuple([ALL] * len(LEVELS))] = np.arange(len(INPUT_DF))
+            continue
+        for GROUP ,positions in INPUT_DF.groupby(by ,sort=False).indices.items():
+            group_values = iter(GROUP if isinstance(GROUP ,tuple) else (GROUP ,))
+            key = tuple(next(group_values) if IS_SELECTED else ALL for IS_SELECTED in SELECTED)
+            rows[key] = np.sort(positions)
+    return rows
+
+# Regions from REGIONS with rows for the selections in KEY on the other levels
+def _regions_of(REGIONS ,KEY ,ROWS):
+    if KEY[0] != ALL:
+        return [KEY[0]] if len(ROWS[KEY]) else []
+    return [REGION for REGION in REGIONS if len(ROWS.get((REGION ,) + KEY[1:] ,[]))]
+
+# Identifies the rows of a table by its index labels, in order. Tables with the same
+# fingerprint as the one the index was built from have the same rows in the same positions.
+# A RangeIndex is identified by its range without reading it.
+def _fingerprint(INPUT_DF):
+    index = INPUT_DF.index
+    if isinstance(index ,pd.RangeIndex):
+        return ('range' ,index.start ,index.stop ,index.step)
+    return ('hash' ,len(index) ,int(pd.util.hash_pandas_object(index ,index=False).to_numpy().sum(dtype=np.uint64)))
+
+def _key(INDEX ,SELECTIONS):
+    return tuple(SELECTIONS.get(LEVEL) or ALL for LEVEL in INDEX['levels'])
+
+# Rows of INPUT_DF where LEVEL is VALUE, as a boolean array
+# A region given in REGIONS matches the rows for its list of values of the last level.
+def _matches(INPUT_DF ,INDEX ,LEVEL ,VALUE):
+    if INDEX['regions'] is not None and LEVEL == INDEX['levels'][0]:
+        return INPUT_DF[INDEX['levels'][-1]].isin(INDEX['regions'].get(VALUE ,[])).to_numpy()
+    return (INPUT_DF[LEVEL] == VALUE).to_numpy()
+
+#%% Lookups
+
+# Selections are given as keywords named for the levels, e.g. region_label='South Asia'.
+# Levels not given, or given as None or 'All', are not filtered.
+# Selections with no matching rows give empty results.
+
+# To get the values of a variable present for the selections
+def get_values(INDEX ,VAR ,**SELECTIONS):
+    return INDEX['values'][VAR].get(_key(INDEX ,SELECTIONS) ,[])
+
+# To get dropdown options for a variable for the selections
+def get_options(INDEX ,VAR ,**SELECTIONS):
+    default = [{'label':ALL ,'value':ALL}] if VAR in INDEX['levels'] else []
+    return INDEX['options'][VAR].get(_key(INDEX ,SELECTIONS) ,default)
+
+# To filter a table to the rows matching the selections
+# Row positions from the index are used when INPUT_DF has the same row index as the table
+# the index was built from, e.g. that table with calculated columns added, and the rows at
+# those positions have the selected values. Otherwise, e.g. after rows were dropped or
+# sorted, it is filtered on the level columns.
+def filter_rows(INPUT_DF ,INDEX ,**SELECTIONS):
+    key = _key(INDEX ,SELECTIONS)
+    if all(VALUE == ALL for VALUE in key):
+        return INPUT_DF
+    if len(INPUT_DF) == INDEX['n_rows'] and _fingerprint(INPUT_DF) == INDEX['fingerprint']:
+        output_df = INPUT_DF.iloc[INDEX['rows'].get(key ,np.array([] ,dtype=int))]
+        if all(_matches(output_df ,INDEX ,LEVEL ,VALUE).all() for LEVEL ,VALUE in zip(INDEX['levels'] ,key) if VALUE != ALL):
+            return output_df
+    _selected = np.ones(len(INPUT_DF) ,dtype=bool)
+    for LEVEL ,VALUE in zip(INDEX['levels'] ,key):
+        if VALUE != ALL:
+            _selected &= _matches(INPUT_DF ,INDEX ,LEVEL ,VALUE)
+    return INPUT_DF.loc[_selected]
@@ -0,0 +1,148 @@
+#%% About
+'''
+This defines a hierarchical aggregation for treemaps and other drill-down displays.
+
+All levels of the hierarchy are computed from a single group-by over the input
+data: the leaf level is aggregated once, and each higher level is rolled up from
+the level below it. Groups are keyed by the integer codes of each hierarchy
+variable, and parents are found by looking up each node's codes in the level
+above, so no strings are built or split until the labels of the nodes.
+
+Results are cached per (dataset, hierarchy, value, weight), so re-rendering a
+chart with the same selections does not re-aggregate.
+'''
+#%% Imports
+
+import collections
+import numpy as np
+import pandas as pd
+
+#%% Cache
+
+CACHE_MAXSIZE = 64
+_cache = collections.OrderedDict()
+
+def clear_cache():
+    _cache.clear()
+    return None
+
+# Identify a dataset by the contents of the columns used, when the caller does not supply a key
+def _dataset_fingerprint(INPUT_DF ,COLUMNS):
+    hashed = pd.util.hash_pandas_object(INPUT_DF[COLUMNS] ,index=False).to_numpy()
+    return (len(INPUT_DF) ,hash(hashed.tobytes()))
+
+#%% Aggregation
+
+# Color label used for nodes whose children have more than one color, matching plotly express
+MIXED_COLOR = '(?)'
+
+def aggregate_hierarchy(
+        INPUT_DF
+        ,HIERARCHY              # List: categorical variables that define hierarchy, in desired order most to least aggregated
+        ,VALUE_VAR              # String: variable with values to aggregate
+        ,AGGREGATION='sum'      # String: 'sum' (default) or 'mean'
+        ,WEIGHT_VAR=None        # String (optional): variable to use for weighting if AGGREGATION='mean'
+        ,COLOR_BY=None          # String (optional): categorical variable to carry up the hierarchy for coloring
+        ,ROOT_LABEL=None        # String (optional): label for a single root node above the first level
+        ,DATASET_KEY=None       # Hashable (optional): identifies INPUT_DF for caching. If None, the data is fingerprinted.
+    ):
+    '''
+    Returns a dataframe with one row per node of the hierarchy, ordered from the
+    top level down, with columns:
+        level, label, treemap_id, treemap_parent, treemap_value, and treemap_color if COLOR_BY was given.
+    The result is cached and shared between calls, so treat it as read-only.
+    '''
+    HIERARCHY = list(HIERARCHY)
+    used_cols = list(dict.fromkeys(HIERARCHY + [VALUE_VAR] + [col for col in (WEIGHT_VAR ,COLOR_BY) if col]))
+    if DATASET_KEY is None:
+        DATASET_KEY = _dataset_fingerprint(INPUT_DF ,used_cols)
+    cache_key = (DATASET_KEY ,tuple(HIERARCHY) ,VALUE_VAR ,AGGREGATION ,WEIGHT_VAR ,COLOR_BY ,ROOT_LABEL)
+    if cache_key in _cache:
+        _cache.move_to_end(cache_key)
+        return _cache[cache_key]
+
+    # Leaf level: the only pass over the input data
+    leaf_input = pd.DataFrame({'weight':INPUT_DF[WEIGHT_VAR] if WEIGHT_VAR else 1} ,index=INPUT_DF.index)
+    if AGGREGATION == 'mean':
+        leaf_input['weighted_value'] = INPUT_DF[VALUE_VAR] * leaf_input['weight']
+    else:
+        leaf_input['weighted_value'] = INPUT_DF[VALUE_VAR]
+    if COLOR_BY:
+        leaf_input['color'] = INPUT_DF[COLOR_BY].astype(str)
+    leaf_keys = []
+    level_labels = []      # For each hierarchy variable, the label of each code. Missing values (code -1) get the last label.
+    for VAR in HIERARCHY:
+        codes ,uniques = pd.factorize(INPUT_DF[VAR] ,sort=True)
+        leaf_keys.append(pd.Series(codes ,index=INPUT_DF.index ,name=VAR))
+        level_labels.append(np.append(np.asarray(uniques.astype(str) ,dtype=object) ,'nan'))
+    aggs = {'weighted_value':'sum' ,'weight':'sum'}
+    if COLOR_BY:
+        aggs['color'] = ['first' ,'nunique']
+    leaf = leaf_input.groupby(leaf_keys ,sort=True).agg(aggs)
+    leaf.columns = ['weighted_value' ,'weight'] + (['color' ,'n_colors'] if COLOR_BY else [])
+    leaf.index.names = HIERARCHY
+
+    # Roll up each higher level from the level below it
+    levels = [leaf]
+    for i in range(len(HIERARCHY) - 1 ,0 ,-1):
+        below = levels[0]
+        level_aggs = {'weighted_value':'sum' ,'weight':'sum'}
+        if COLOR_BY:
+            level_aggs.update({'color':['first' ,'nunique'] ,'n_colors':'max'})
+        level = below.groupby(level=list(range(i)) ,sort=True).agg(level_aggs)
+        if COLOR_BY:
+            level.columns = ['weighted_value' ,'weight' ,'color' ,'n_child_colors' ,'n_colors']
+            level['n_colors'] = np.maximum(level['n_colors'] ,level['n_child_colors'])
+            level = level.drop(columns='n_child_colors')
+        else:
+            level.columns = ['weighted_value' ,'weight']
+        levels.insert(0 ,level)
+
+    # Assign node ids in order of each level's group codes, top level first
+    nodes = []
+    next_id = 0
+    if ROOT_LABEL is not None:
+        root = pd.DataFrame({
+            'level':[0] ,'label':[ROOT_LABEL]
+            ,'node_id':[0] ,'parent_id':[-1]
+            ,'weighted_value':[leaf['weighted_value'].sum()] ,'weight':[leaf['weight'].sum()]
+        })
+        if COLOR_BY:
+            n_colors = leaf_input['color'].nunique()
+            root['color'] = leaf_input['color'].iloc[0] if n_colors == 1 else MIXED_COLOR
+        nodes.append(root)
+        next_id = 1
+    parent_ids = None
+    for i ,level in enumerate(levels):
+        level_nodes = level.reset_index(drop=True)
+        level_nodes['node_id'] = np.arange(next_id ,next_id + len(level))
+        if i == 0:
+            level_nodes['parent_id'] = 0 if ROOT_LABEL is not None else -1
+        else:
+            parent_keys = level.index.droplevel(-1)
+            level_nodes['parent_id'] = parent_ids.to_numpy()[parent_ids.index.get_indexer(parent_keys)]
+        level_nodes['level'] = i + 1
+        level_nodes['label'] = level_labels[i][level.index.get_level_values(-1).to_numpy()]
+        if COLOR_BY:
+            level_nodes['color'] = level_nodes['color'].where(level_nodes.pop('n_colors') == 1 ,MIXED_COLOR)
+        parent_ids = pd.Series(level_nodes['node_id'].to_numpy() ,index=level.index)
+        next_id += len(level)
+        nodes.append(level_nodes)
+    treemap_df = pd.concat(nodes ,ignore_index=True)
+
+    if AGGREGATION == 'mean':
+        treemap_df['treemap_value'] = treemap_df['weighted_value'] / treemap_df['weight']
+    else:
+        treemap_df['treemap_value'] = treemap_df['weighted_value']
+
+    # Plotly ids must be strings. Use the node ids, which come from the group codes, rather than
+    # paths of labels: charts show labels, not ids.
+    treemap_df['treemap_id'] = treemap_df['node_id'].astype(str)
+    treemap_df['treemap_parent'] = treemap_df['parent_id'].astype(str).where(treemap_df['parent_id'] >= 0 ,'')
+    keep_cols = ['level' ,'label' ,'treemap_id' ,'treemap_parent' ,'treemap_value'] + (['color'] if COLOR_BY else [])
+    treemap_df = treemap_df[keep_cols].rename(columns={'color':'treemap_color'})
+
+    _cache[cache_key] = treemap_df
+    if len(_cache) > CACHE_MAXSIZE:
+        _cache.popitem(last=False)
+    return treemap_df
@@ -0,0 +1,198 @@
+#%% About
+'''
+This defines compression and HTTP caching for the Dash apps.
+
+Compression (Flask-Compress): responses larger than MIN_SIZE bytes of the
+types in COMPRESS_MIMETYPES are compressed with brotli or gzip, whichever the
+browser accepts. This covers the page, the layout and callback definitions,
+callback responses (figure JSON and table data), the JS bundles, the CSS and JS
+in assets/, and static data added with add_static_json(). Static files are
+compressed once: the compressed copies are kept (at most STATIC_CACHE_MAXSIZE).
+Streamed responses, e.g. exports, are sent as they are so they stay streamed.
+
+Caching:
+    - Files in assets/ requested with a fingerprint (?m=<modified time>) may be
+      kept by the browser for a year, since the URL changes with the file. Dash
+      adds the fingerprint to the CSS and JS it loads from assets/; use
+      asset_url() for images and other files referenced in the layout.
+    - Other files in assets/ may be kept for ASSET_MAX_AGE seconds and are then
+      revalidated with their ETag.
+    - The page, layout and callback definitions get an ETag from their contents
+      and are revalidated on each load. A request with a matching If-None-Match
+      gets 304 Not Modified with no body.
+    - Static data added with add_static_json() has a fingerprinted URL and may be
+      kept for a year.
+    - Dash's fingerprinted JS bundles already get a one year max-age from Dash.
+
+Set DASH_COMPRESS=0 to turn compression off, e.g. to compare bandwidth.
+
+Usage, after creating the app (fa.instantiate_app does this):
+    register_transport(app)
+In the layout:
+    html.Img(src=ht.asset_url(gbadsDash ,'GBADs-LOGO-Black-sm.png'))
+For data the browser loads by URL, e.g. geojson for a map:
+    geojson_url = ht.add_static_json(gbadsDash ,'ethiopia_adm1.geojson' ,geojson_ecs)
+'''
+#%% Imports
+
+import os
+import json
+import hashlib
+import threading
+import collections
+
+import flask
+from flask_compress import Compress
+
+#%% Settings
+
+MIN_SIZE = 1024                 # Bytes: smaller responses are not compressed
+ASSET_MAX_AGE = 86400           # Seconds files in assets/ without a fingerprint may be cached
+IMMUTABLE_MAX_AGE = 31536000    # Seconds fingerprinted files may be cached (1 year)
+STATIC_CACHE_MAXSIZE = 128      # Compressed static files kept
+STATIC_ROUTE = 'static-data'
+
+COMPRESS_MIMETYPES = [
+    'text/html' ,'text/css' ,'text/xml' ,'text/plain' ,'text/javascript'
+    ,'application/json' ,'application/javascript' ,'application/geo+json' ,'image/svg+xml'
+]
+
+#%% Compressed static files
+
+_lock = threading.Lock()
+_compressed_static = collections.OrderedDict()      # {(path, query, validator, accept-encoding): (body, headers)}
+_static_json = {}                                   # {name: (body, fingerprint)}
+
+def clear_transport_cache():
+    with _lock:
+        _compressed_static.clear()
+    return None
+
+def _static_key(RESPONSE):
+    request = flask.request
+    validator = RESPONSE.get_etag()[0] or RESPONSE.headers.get('Last-Modified')
+    return (request.path ,request.query_string ,validator ,request.headers.get('Accept-Encoding' ,''))
+
+# Compress a static file, or reuse its compressed copy
+def _compress_static(COMPRESS ,RESPONSE):
+    key = _static_key(RESPONSE)
+    with _lock:
+        cached = _compressed_static.get(key)
+        if cached is not None:
+            _compressed_static.move_to_end(key)
+    if cached is not None:
+        body ,headers = cached
+        RESPONSE.direct_passthrough = False
+        RESPONSE.set_data(body)
+        RESPONSE.headers.update(headers)
+        return RESPONSE
+    RESPONSE = COMPRESS.after_request(RESPONSE)
+    if 'Content-Encoding' in RESPONSE.headers:
+        headers = {HEADER:RESPONSE.headers[HEADER] for HEADER in ('Content-Encoding' ,'ETag' ,'Vary') if HEADER in RESPONSE.headers}
+        with _lock:
+            _compressed_static[key] = (RESPONSE.get_data() ,headers)
+            while len(_compressed_static) > STATIC_CACHE_MAXSIZE:
+                _compressed_static.popitem(last=False)
+    return RESPONSE
+
+#%% Registering with an app
+
+def _cache_immutable(RESPONSE):
+    RESPONSE.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return RESPONSE
+
+# To compress responses and set cache headers on the app's server
+def register_transport(
+        APP                                 # Dash app
+        ,COMPRESS=None                      # True or False: compress responses. Default: True unless DASH_COMPRESS=0.
+        ,MIN_SIZE=MIN_SIZE
+        ,ASSET_MAX_AGE=ASSET_MAX_AGE
+    ):
+    if getattr(APP ,'_http_transport' ,False):
+        return APP
+    if COMPRESS is None:
+        COMPRESS = os.environ.get('DASH_COMPRESS' ,'1') != '0'
+    server = APP.server
+    prefix = APP.config.routes_pathname_prefix
+    assets_prefix = f"{prefix}{APP.config.assets_url_path.strip('/')}/"
+    static_prefix = f"{prefix}{STATIC_ROUTE}/"
+    revalidated_paths = (prefix ,f'{prefix}_dash-layout' ,f'{prefix}_dash-dependencies')
+
+    compress = None
+    if COMPRESS:
+        server.config.update({
+            'COMPRESS_REGISTER':False       # Run from _transport_headers below, after the cache headers are set
+            ,'COMPRESS_ALGORITHM':['br' ,'gzip']
+            ,'COMPRESS_BR_LEVEL':4
+            ,'COMPRESS_LEVEL':6
+            ,'COMPRESS_MIN_SIZE':MIN_SIZE
+            ,'COMPRESS_MIMETYPES':COMPRESS_MIMETYPES
+        })
+        compress = Compress()
+        compress.init_app(server)
+
+    # Compressed responses have the algorithm added to their ETag ("<tag>:gzip").
+    # Remove it from If-None-Match so the request matches the uncompressed ETag.
+    @server.before_request
+    def _strip_encoding_from_etag():
+        if_none_match = flask.request.environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            for ALGORITHM in ('br' ,'gzip' ,'deflate'):
+                if_none_match = if_none_match.replace(f':{ALGORITHM}"' ,'"')
+            flask.request.environ['HTTP_IF_NONE_MATCH'] = if_none_match
+        return None
+
+    @server.after_request
+    def _transport_headers(response):
+        request = flask.request
+        path = request.path
+        is_static = path.startswith(assets_prefix) or path.startswith(static_prefix) or '/_dash-component-suites/' in path
+
+        # Cache headers
+        if path.startswith(assets_prefix) and response.status_code in (200 ,304):
+            if 'm' in request.args:
+                _cache_immutable(response)
+            else:
+                response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}'
+        elif path in revalidated_paths and request.method == 'GET' and response.status_code == 200:
+            response.add_etag()
+            response.cache_control.no_cache = True
+            response = response.make_conditional(request)
+
+        # Compression. Generated streams (exports) are left as they are.
+        if compress is None or (response.is_streamed and not response.direct_passthrough):
+            return response
+        if is_static and response.status_code == 200:
+            return _compress_static(compress ,response)
+        return compress.after_request(response)
+
+    @server.route(f'{static_prefix}<name>')
+    def _serve_static_json(name):
+        if name not in _static_json:
+            flask.abort(404)
+        body ,fingerprint = _static_json[name]
+        response = flask.Response(body ,mimetype='application/geo+json' if name.endswith('.geojson') else 'application/json')
+        response.set_etag(fingerprint)
+        if flask.request.args.get('v') == fingerprint:
+            _cache_immutable(response)
+        else:
+            response.cache_control.no_cache = True
+        return response.make_conditional(flask.request)
+
+    APP._http_transport = True
+    return APP
+
+#%% URLs
+
+# URL of a file in assets/ with its modified time as a fingerprint, so it can be cached for a year
+def asset_url(APP ,PATH):
+    modified = os.path.getmtime(os.path.join(APP.config.assets_folder ,PATH))
+    return f'{APP.get_asset_url(PATH)}?m={modified}'
+
+# To serve data the browser loads by URL, e.g. geojson for a map, from a fingerprinted URL
+# Returns the URL. DATA is a dictionary or list, or a string of JSON.
+def add_static_json(APP ,NAME ,DATA):
+    body = DATA if isinstance(DATA ,str) else json.dumps(DATA ,separators=(',' ,':'))
+    fingerprint = hashlib.sha1(body.encode('utf-8')).hexdigest()[:16]
+    _static_json[NAME] = (body ,fingerprint)
+    return f'{APP.config.requests_pathname_prefix}{STATIC_ROUTE}/{NAME}?v={fingerprint}'
@@ -0,0 +1,304 @@
+#%% About
+'''
+This defines a server-side backend for large Dash DataTables.
+
+Callbacks that show a data table hand the full, typed data frame to
+paged_table(). The frame is kept on the server and only the current page is
+sent to the browser. Paging, sorting and filtering in the table
+(page_action, sort_action and filter_action 'custom') are answered by a single
+callback that looks the frame up and returns the requested page. Tables are
+kept up to CACHE_MAXSIZE at a time. If a table has been dropped since it was
+shown, paging it empties it and shows a message asking to reload the page,
+which builds the table again.
+
+Numbers stay numeric. Display formats (thousands separators, decimals,
+currency) are DataTable format specs applied in the browser, so sorting and
+filtering work on the values rather than on formatted strings.
+
+The Export button downloads the whole table, with the current sort and filter,
+as CSV streamed from a route on the app's server (see data_export). Replacing
+.csv with .parquet in the link gives Parquet.
+
+Usage, right after creating the app:
+    tbl.register_paging(gbadsDash)
+Then in a callback:
+    return tbl.paged_table('poultry-background' ,background_data ,columns_to_display_with_labels
+        ,FORMATS={'acc_headplaced':tbl.fixed(0) ,'bod_totalburden_usd':tbl.money(2)})
+'''
+#%% Imports
+
+import json
+import hashlib
+import operator
+import threading
+import collections
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+import flask
+
+import lib.data_export as exp
+from dash import html, dcc, dash_table, Input, Output, State, MATCH, no_update
+from dash.dash_table.Format import Format, Group, Scheme, Symbol
+
+#%% Number formats
+
+# Fixed decimals, with thousands separators unless GROUP=False
+def fixed(DECIMALS ,GROUP=True ,PREFIX='' ,SUFFIX=''):
+    number_format = Format(precision=DECIMALS ,scheme=Scheme.fixed ,group=Group.yes if GROUP else Group.no)
+    if PREFIX or SUFFIX:
+        number_format = number_format.symbol(Symbol.yes).symbol_prefix(PREFIX).symbol_suffix(SUFFIX)
+    return number_format
+
+# US dollars, e.g. $1,234.56
+def money(DECIMALS=2):
+    return fixed(DECIMALS ,PREFIX='$')
+
+#%% Table store
+
+CACHE_MAXSIZE = 256             # Number of tables kept on the server
+VIEW_CACHE_MAXSIZE = 32         # Number of sorted and filtered versions of tables kept
+PAGE_SIZE = 25
+
+_lock = threading.Lock()
+_tables = collections.OrderedDict()
+_views = collections.OrderedDict()
+
+def clear_tables():
+    with _lock:
+        _tables.clear()
+        _views.clear()
+    return None
+
+# Identify a table by its contents and labels, so the same table is stored once
+def _table_key(INPUT_DF ,LABELS):
+    hashed = pd.util.hash_pandas_object(INPUT_DF ,index=False).to_numpy()
+    digest = hashlib.sha1(hashed.tobytes())
+    digest.update(json.dumps(LABELS).encode('utf-8'))
+    digest.update(str(list(INPUT_DF.dtypes)).encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+# To keep a table on the server
+# Returns the key to look it up with
+def store_table(INPUT_DF ,LABELS):
+    data = INPUT_DF[list(LABELS)].reset_index(drop=True)
+    key = _table_key(data ,LABELS)
+    with _lock:
+        if key in _tables:
+            _tables.move_to_end(key)
+        else:
+            _tables[key] = {'data':data ,'labels':dict(LABELS)}
+            if len(_tables) > CACHE_MAXSIZE:
+                _tables.popitem(last=False)
+    return key
+
+#%% Filtering and sorting
+
+# Operators in DataTable filter queries, in the order they must be checked
+_FILTER_OPERATORS = [
+    (['ge ' ,'>=' ] ,operator.ge)
+    ,(['le ' ,'<='] ,operator.le)
+    ,(['lt ' ,'<'] ,operator.lt)
+    ,(['gt ' ,'>'] ,operator.gt)
+    ,(['ne ' ,'!='] ,operator.ne)
+    ,(['eq ' ,'='] ,operator.eq)
+    ,(['contains '] ,'contains')
+    ,(['datestartswith '] ,'startswith')
+]
+
+# To split one part of a filter query, e.g. "{year} > 2015", into (column, operation, value)
+def _split_filter_part(FILTER_PART):
+    for SYMBOLS ,OPERATION in _FILTER_OPERATORS:
+        for SYMBOL in SYMBOLS:
+            if SYMBOL in FILTER_PART:
+                name_part ,value_part = FILTER_PART.split(SYMBOL ,1)
+                column = name_part[name_part.find('{') + 1:name_part.rfind('}')]
+                value_part = value_part.strip()
+                quote = value_part[:1]
+                if quote and quote == value_part[-1] and quote in ("'" ,'"' ,'`'):
+                    value = value_part[1:-1].replace('\\' + quote ,quote)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+                return column ,OPERATION ,value
+    return None ,None ,None
+
+# To get the rows of a table matching a filter query
+# Parts that can't be parsed or don't name a column are ignored.
+# Comparisons that don't apply to a column, e.g. a number with a text column, match nothing.
+def apply_filter(INPUT_DF ,FILTER_QUERY):
+    if not FILTER_QUERY:
+        return INPUT_DF
+    _selected = np.ones(len(INPUT_DF) ,dtype=bool)
+    for FILTER_PART in FILTER_QUERY.split(' && '):
+        column ,operation ,value = _split_filter_part(FILTER_PART)
+        if column not in INPUT_DF.columns:
+            continue
+        values = INPUT_DF[column]
+        try:
+            if operation == 'contains':
+                _match = values.astype(str).str.contains(str(value) ,case=False ,regex=False)
+            elif operation == 'startswith':
+                _match = values.astype(str).str.startswith(str(value))
+            else:
+                _match = operation(values ,value)
+            _selected &= _match.fillna(False).to_numpy(dtype=bool)
+        except TypeError:
+            _selected[:] = False
+    return INPUT_DF.loc[_selected]
+
+# To sort a table by the DataTable's sort_by, a list of {'column_id' ,'direction'}
+# Missing values go last. Ties keep their original order.
+def apply_sort(INPUT_DF ,SORT_BY):
+    sort_by = [SORT for SORT in (SORT_BY or []) if SORT['column_id'] in INPUT_DF.columns]
+    if not sort_by:
+        return INPUT_DF
+    return INPUT_DF.sort_values(
+        by=[SORT['column_id'] for SORT in sort_by]
+        ,ascending=[SORT['direction'] == 'asc' for SORT in sort_by]
+        ,kind='mergesort'
+        ,na_position='last'
+    )
+
+# To get a stored table with a filter and sort applied
+# Returns a dictionary {'data' ,'labels'}, or None if the table is no longer stored
+def get_view(KEY ,FILTER_QUERY=None ,SORT_BY=None):
+    view_key = (KEY ,FILTER_QUERY or '' ,json.dumps(SORT_BY or []))
+    with _lock:
+        table = _tables.get(KEY)
+        if table is None:
+            return None
+        _tables.move_to_end(KEY)
+        if view_key in _views:
+            _views.move_to_end(view_key)
+            return _views[view_key]
+    view = {'data':apply_sort(apply_filter(table['data'] ,FILTER_QUERY) ,SORT_BY) ,'labels':table['labels']}
+    with _lock:
+        _views[view_key] = view
+        if len(_views) > VIEW_CACHE_MAXSIZE:
+            _views.popitem(last=False)
+    return view
+
+# To get one page of a table as records for the DataTable
+def get_page(VIEW ,PAGE_CURRENT ,PAGE_SIZE):
+    start = (PAGE_CURRENT or 0) * PAGE_SIZE
+    return VIEW['data'].iloc[start:start + PAGE_SIZE].to_dict('records')
+
+def _page_count(VIEW ,PAGE_SIZE):
+    return max(int(np.ceil(len(VIEW['data']) / PAGE_SIZE)) ,1)
+
+#%% Layout
+
+TABLE_TYPE = 'paged-table'
+KEY_TYPE = 'paged-table-key'
+EXPORT_TYPE = 'paged-table-export'
+EXPIRED_TYPE = 'paged-table-expired'
+EXPIRED_MESSAGE = 'This table has expired on the server. Reload the page to show it again.'     # Shown under a table that is no longer stored
+ROUTE = 'paged-tables'
+
+_export_path = '/' + ROUTE      # Set by register_paging() to include the app's URL prefix
+
+def _export_href(KEY ,FILTER_QUERY=None ,SORT_BY=None ,FORMAT='csv'):
+    query = urllib.parse.urlencode({'filter_query':FILTER_QUERY or '' ,'sort_by':json.dumps(SORT_BY or [])})
+    return f'{_export_path}/{KEY}.{FORMAT}?{query}'
+
+# DataTable column definitions. Numeric columns get type 'numeric' and their format, if given.
+def table_columns(INPUT_DF ,COLUMNS_WITH_LABELS ,FORMATS={}):
+    columns = []
+    for COL ,LABEL in COLUMNS_WITH_LABELS.items():
+        column = {'name':LABEL ,'id':COL}
+        if pd.api.types.is_numeric_dtype(INPUT_DF[COL]) and not pd.api.types.is_bool_dtype(INPUT_DF[COL]):
+            column['type'] = 'numeric'
+            if COL in FORMATS:
+                column['format'] = FORMATS[COL]
+        else:
+            column['type'] = 'text'
+        columns.append(column)
+    return columns
+
+# To create a DataTable served page by page from the server
+# Returns a Div with the Export button and the table
+def paged_table(
+        TABLE_ID                # String: identifies the table. Must be unique in the app.
+        ,INPUT_DF               # Data frame with typed columns
+        ,COLUMNS_WITH_LABELS    # Dictionary {column: label}: columns to show, in order
+        ,FORMATS={}             # Dictionary {column: Format}: display formats for numeric columns, e.g. fixed(0)
+        ,PAGE_SIZE=PAGE_SIZE
+        ,FILTER=True            # True: show a filter row under the headers
+        ,**DATATABLE_ARGS       # Other arguments for the DataTable, e.g. style_cell, tooltip_header
+    ):
+    key = store_table(INPUT_DF ,COLUMNS_WITH_LABELS)
+    view = get_view(key)
+    return html.Div([
+        html.A(
+            html.Button('Export' ,className='export')
+            ,id={'type':EXPORT_TYPE ,'index':TABLE_ID}
+            ,href=_export_href(key)
+            ,download=f'{TABLE_ID}.csv'
+        ),
+        dash_table.DataTable(
+            id={'type':TABLE_TYPE ,'index':TABLE_ID},
+            columns=table_columns(INPUT_DF ,COLUMNS_WITH_LABELS ,FORMATS),
+            data=get_page(view ,0 ,PAGE_SIZE),
+            page_action='custom',
+            page_current=0,
+            page_size=PAGE_SIZE,
+            page_count=_page_count(view ,PAGE_SIZE),
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[],
+            filter_action='custom' if FILTER else 'none',
+            filter_query='',
+            **DATATABLE_ARGS
+        ),
+        html.Div(id={'type':EXPIRED_TYPE ,'index':TABLE_ID} ,style={'font-style':'italic' ,'color':'#a94442'}),
+        dcc.Store(id={'type':KEY_TYPE ,'index':TABLE_ID} ,data=key),
+    ])
+
+#%% Registering with an app
+
+# To add the paging callback and the export route to an app
+def register_paging(APP):
+    global _export_path
+    if getattr(APP ,'_paged_tables' ,False):
+        return APP
+    _export_path = APP.get_relative_path('/' + ROUTE)
+
+    @APP.callback(
+        Output({'type':TABLE_TYPE ,'index':MATCH} ,'data'),
+        Output({'type':TABLE_TYPE ,'index':MATCH} ,'page_count'),
+        Output({'type':EXPORT_TYPE ,'index':MATCH} ,'href'),
+        Output({'type':EXPIRED_TYPE ,'index':MATCH} ,'children'),
+        Input({'type':TABLE_TYPE ,'index':MATCH} ,'page_current'),
+        Input({'type':TABLE_TYPE ,'index':MATCH} ,'page_size'),
+        Input({'type':TABLE_TYPE ,'index':MATCH} ,'sort_by'),
+        Input({'type':TABLE_TYPE ,'index':MATCH} ,'filter_query'),
+        State({'type':KEY_TYPE ,'index':MATCH} ,'data'),
+        prevent_initial_call=True,      # First page is sent with the table
+        )
+    def update_paged_table(page_current ,page_size ,sort_by ,filter_query ,table_key):
+        view = get_view(table_key ,filter_query ,sort_by)
+        if view is None:        # No longer stored. Rather than keep showing a page that no longer matches the paging, sort and filter, say so.
+            return [] ,1 ,no_update ,EXPIRED_MESSAGE
+        page_size = page_size or PAGE_SIZE
+        return get_page(view ,page_current ,page_size) ,_page_count(view ,page_size) ,_export_href(table_key ,filter_query ,sort_by) ,None
+
+    @APP.server.route(f"{APP.config.routes_pathname_prefix}{ROUTE}/<key>.<fmt>")
+    def _export_paged_table(key ,fmt):
+        filter_query = flask.request.args.get('filter_query')
+        sort_by = json.loads(flask.request.args.get('sort_by') or '[]')
+        view = get_view(key ,filter_query ,sort_by)
+        if view is None:
+            flask.abort(404)
+        return exp.export_response(
+            view['data'].rename(columns=view['labels'])
+            ,fmt
+            ,key
+            ,ETAG=exp.make_etag(key ,filter_query ,sort_by ,fmt)    # Key identifies the table contents
+        )
+
+    APP._paged_tables = True
+    return APP
@@ -0,0 +1,62 @@
+#%% About
+'''
+This defines an indexed store for looking up slices of a table by key columns.
+
+Callbacks that filter a large table on the same few columns (e.g. species,
+production system, age/sex scenario, region, year) repeat a full-table boolean
+mask on every call. The store partitions the table once: for each combination
+of key columns it holds the row positions of every group, so getting a slice is
+a dictionary lookup.
+
+Usage:
+    store = build_slice_store(df ,KEY_SETS=[['species' ,'production_system'] ,['species' ,'year']])
+    cattle_2021 = get_slice(store ,species='Cattle' ,year=2021)
+'''
+#%% Imports
+
+import numpy as np
+import pandas as pd
+
+#%% Define functions
+
+def _build_index(INPUT_DF ,KEYS):
+    positions = INPUT_DF.groupby(list(KEYS) ,sort=False ,dropna=False).indices
+    if len(KEYS) == 1:      # Single keys come back as scalars. Store everything as tuples.
+        positions = {(key if isinstance(key ,tuple) else (key ,)):pos for key ,pos in positions.items()}
+    return positions
+
+# To create a store from a table
+def build_slice_store(
+        INPUT_DF
+        ,KEY_SETS=[]        # List of lists: combinations of key columns to index up front. Others are indexed on first use.
+    ):
+    data = INPUT_DF.reset_index(drop=True)
+    store = {'data':data ,'indexes':{}}
+    for KEYS in KEY_SETS:
+        keys = tuple(sorted(KEYS))
+        store['indexes'][keys] = _build_index(data ,keys)
+    return store
+
+# To get the rows matching all criteria, given as column=value
+# Returns a new dataframe, so callers can add or change columns without affecting the store.
+def get_slice(STORE ,**CRITERIA):
+    data = STORE['data']
+    if not CRITERIA:
+        return data.copy()
+    keys = tuple(sorted(CRITERIA))
+    if keys not in STORE['indexes']:
+        STORE['indexes'][keys] = _build_index(data ,keys)
+    positions = STORE['indexes'][keys].get(tuple(CRITERIA[KEY] for KEY in keys))
+    if positions is None:
+        return data.iloc[0:0].copy()
+    return data.take(np.sort(positions))
+
+# To get the unique values of a column within a slice, without building the slice
+def get_slice_values(STORE ,COLUMN ,**CRITERIA):
+    if not CRITERIA:
+        return pd.unique(STORE['data'][COLUMN].to_numpy())
+    keys = tuple(sorted(CRITERIA))
+    if keys not in STORE['indexes']:
+        STORE['indexes'][keys] = _build_index(STORE['data'] ,keys)
+    positions = STORE['indexes'][keys].get(tuple(CRITERIA[KEY] for KEY in keys) ,[])
+    return pd.unique(STORE['data'][COLUMN].to_numpy()[positions])
@@ -0,0 +1,331 @@
+#%% About
+'''
+This defines warming up a Dash app when its server starts, so the default views
+are computed before the first visitor asks for them.
+
+warm_up() loads the page as a browser does, through the app's own server
+(Flask's test client, so no port or network is needed):
+    - the layout and callback definitions
+    - the initial callbacks, with the default values in the layout, and the
+      callbacks that follow from their outputs, in the order the Dash renderer
+      runs them. Background callbacks are polled until their job has finished.
+    - then each of SELECTIONS in turn, starting from the page as loaded: a
+      dictionary of {'<component id>.<property>': value}, e.g. a popular country,
+      and the callbacks it triggers.
+Clientside and pattern-matching callbacks are not run.
+
+The responses are kept. A browser sending the same request (the same callback
+with the same inputs, state and triggering inputs) gets the kept response
+without the callback running; for a background callback this is the finished
+result, without a job. Any other request runs the callback as usual. Running the
+callbacks also fills the caches beneath them, e.g. aggregations and slices, and
+loads code that would otherwise be loaded by the first visitor.
+
+Kept responses belong to the data they were computed from: clear_responses()
+drops them, and warm_again() repeats the last warm-up. With data reloading
+(data_snapshots) pass them as CLEAR and AFTER_SWAP.
+
+The time taken, in total and for the slowest callbacks, is printed and is at
+/metrics/warmup (local requests only).
+
+Usage, right after creating the app and before adding a login:
+    warm.register_warm_up(gbadsDash)
+In returnApp(), i.e. once in each server process before it takes requests, or in
+a post-fork hook of the server:
+    warm.warm_up(gbadsDash ,SELECTIONS=[{'select-species-ecs.value':'Goat'}])
+'''
+#%% Imports
+
+import os
+import json
+import time
+import inspect
+import hashlib
+import functools
+import threading
+import traceback
+import collections
+
+import flask
+
+#%% Settings
+
+WARM_UP_HEADER = 'X-Dash-Warm-Up'   # Marks the warm-up's own requests, which always run the callback
+TIMEOUT_S = 600                     # Seconds: stop warming up after this long
+MAX_REQUESTS_PER_CHANGE = 200       # Stop following a chain of callbacks after this many requests
+RESPONSES_MAXSIZE = 512             # Responses kept
+
+#%% Kept responses
+
+_lock = threading.Lock()
+_responses = {}                     # {request key: response body}
+_generation = 0                     # Changed by clear_responses(), so a warm-up running at the time does not keep old responses
+_counts = collections.Counter()
+_last_warm_up = None                # (APP, keyword arguments) of the last warm_up(), for warm_again()
+_summary = {}
+
+def clear_responses():
+    global _generation
+    with _lock:
+        _responses.clear()
+        _generation += 1
+    return None
+
+# Identifies a callback request. Dash leaves out state when a callback has none.
+def _request_key(PAYLOAD):
+    key = json.dumps(
+        [PAYLOAD.get('output') ,PAYLOAD.get('inputs') ,PAYLOAD.get('state') or [] ,sorted(PAYLOAD.get('changedPropIds') or [])]
+        ,sort_keys=True
+        ,separators=(',' ,':')
+    )
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+#%% Page state
+
+# Collect the properties of every component with an id in a layout tree
+def _collect_props(NODE ,PROPS):
+    if isinstance(NODE ,list):
+        for CHILD in NODE:
+            _collect_props(CHILD ,PROPS)
+    elif isinstance(NODE ,dict) and 'props' in NODE:
+        props = NODE['props']
+        if isinstance(props.get('id') ,str):
+            for PROP ,VALUE in props.items():
+                if PROP != 'id':
+                    PROPS[f"{props['id']}.{PROP}"] = VALUE
+        for VALUE in props.values():
+            if isinstance(VALUE ,(list ,dict)):
+                _collect_props(VALUE ,PROPS)
+    return PROPS
+
+def _split_prop(PROP_ID):
+    component_id ,prop = PROP_ID.rsplit('.' ,1)
+    return component_id ,prop
+
+# Callback definitions from _dash-dependencies, keeping those that run on the server with plain ids
+def _parse_callbacks(DEPENDENCIES):
+    callbacks = []
+    for DEP in DEPENDENCIES:
+        if DEP.get('clientside_function'):
+            continue
+        ids = [ITEM['id'] for ITEM in DEP['inputs'] + DEP.get('state' ,[])]
+        if not all(isinstance(ID ,str) for ID in ids) or DEP['output'].startswith('{'):
+            continue
+        multi = DEP['output'].startswith('..')
+        callbacks.append({
+            'output':DEP['output']
+            ,'multi':multi
+            ,'outputs':DEP['output'].strip('.').split('...') if multi else [DEP['output']]
+            ,'inputs':[f"{ITEM['id']}.{ITEM['property']}" for ITEM in DEP['inputs']]
+            ,'state':[f"{ITEM['id']}.{ITEM['property']}" for ITEM in DEP.get('state' ,[])]
+            ,'prevent_initial_call':DEP.get('prevent_initial_call' ,False)
+            ,'poll_ms':(DEP.get('long') or {}).get('interval')
+        })
+    return callbacks
+
+#%% Warm-up
+
+class _PageWarmer:
+    def __init__(self ,APP ,HEADERS ,DEADLINE):
+        self.client = APP.server.test_client()
+        self.url = f'{APP.config.routes_pathname_prefix}_dash-update-component'
+        self.headers = {**HEADERS ,WARM_UP_HEADER:'1'}
+        self.deadline = DEADLINE
+        layout = self.client.get(f'{APP.config.routes_pathname_prefix}_dash-layout' ,headers=self.headers).get_json()
+        dependencies = self.client.get(f'{APP.config.routes_pathname_prefix}_dash-dependencies' ,headers=self.headers).get_json()
+        self.props = _collect_props(layout ,{})
+        self.callbacks = _parse_callbacks(dependencies)
+        self.by_input = collections.defaultdict(list)
+        for CALLBACK in self.callbacks:
+            for PROP_ID in CALLBACK['inputs']:
+                self.by_input[PROP_ID].append(CALLBACK)
+        self.run_ms = collections.defaultdict(list)
+        self.n_errors = 0
+
+    # The request the Dash renderer sends. Values not set in the page are left out, as the renderer does.
+    def _payload(self ,CALLBACK ,CHANGED):
+        def _item(PROP_ID):
+            component_id ,prop = _split_prop(PROP_ID)
+            item = {'id':component_id ,'property':prop}
+            if PROP_ID in self.props:
+                item['value'] = self.props[PROP_ID]
+            return item
+        outputs = [dict(zip(('id' ,'property') ,_split_prop(PROP_ID))) for PROP_ID in CALLBACK['outputs']]
+        payload = {
+            'output':CALLBACK['output']
+            ,'outputs':outputs if CALLBACK['multi'] else outputs[0]
+            ,'inputs':[_item(PROP_ID) for PROP_ID in CALLBACK['inputs']]
+            ,'changedPropIds':[PROP_ID for PROP_ID in CALLBACK['inputs'] if PROP_ID in CHANGED]
+        }
+        if CALLBACK['state']:
+            payload['state'] = [_item(PROP_ID) for PROP_ID in CALLBACK['state']]
+        return payload
+
+    # Run a callback and keep its response. Returns the properties it updated.
+    def _fire(self ,CALLBACK ,CHANGED):
+        payload = self._payload(CALLBACK ,CHANGED)
+        generation = _generation
+        timer_start = time.perf_counter()
+        response = self.client.post(self.url ,json=payload ,headers=self.headers)
+        data = response.get_json(silent=True) if response.status_code == 200 else None
+
+        # Background callback: poll for the job's result as the renderer does
+        if CALLBACK['poll_ms'] and data is not None and 'response' not in data and 'job' in data:
+            query = {'cacheKey':data['cacheKey'] ,'job':data['job']}
+            while time.time() < self.deadline:
+                time.sleep(CALLBACK['poll_ms'] / 1000)
+                response = self.client.post(self.url ,query_string=query ,json=payload ,headers=self.headers)
+                data = response.get_json(silent=True) if response.status_code == 200 else None
+                if data is None or 'response' in data:
+                    break
+        self.run_ms[CALLBACK['output']].append(1000 * (time.perf_counter() - timer_start))
+
+        if response.status_code not in (200 ,204):
+            self.n_errors += 1
+        if data is None or 'response' not in data:
+            return set()
+        with _lock:
+            if generation == _generation and len(_responses) < RESPONSES_MAXSIZE:
+                _responses[_request_key(payload)] = json.dumps(data ,separators=(',' ,':'))
+
+        updated = set()
+        for component_id ,props in data['response'].items():
+            for PROP ,VALUE in props.items():
+                self.props[f'{component_id}.{PROP}'] = VALUE
+                updated.add(f'{component_id}.{PROP}')
+                if PROP == 'children':
+                    _collect_props(VALUE ,self.props)
+        return updated
+
+    # Fire callbacks for a set of changed properties and everything downstream of them
+    # A callback waits while any other pending callback will update one of its inputs, as in the Dash renderer.
+    def settle(self ,CHANGED ,PENDING=None):
+        pending = list(PENDING or [])
+        changed_for = collections.defaultdict(set)
+        def _queue(PROPS):
+            for PROP_ID in PROPS:
+                for CALLBACK in self.by_input.get(PROP_ID ,[]):
+                    if CALLBACK not in pending:
+                        pending.append(CALLBACK)
+                    changed_for[CALLBACK['output']].add(PROP_ID)
+        _queue(CHANGED)
+
+        n_requests = 0
+        while pending and n_requests < MAX_REQUESTS_PER_CHANGE and time.time() < self.deadline:
+            pending_outputs = {PROP_ID for CALLBACK in pending for PROP_ID in CALLBACK['outputs']}
+            ready = [CALLBACK for CALLBACK in pending if not (set(CALLBACK['inputs']) & (pending_outputs - set(CALLBACK['outputs'])))]
+            CALLBACK = (ready or pending)[0]
+            pending.remove(CALLBACK)
+            _queue(self._fire(CALLBACK ,changed_for.pop(CALLBACK['output'] ,set())))
+            n_requests += 1
+        return n_requests
+
+    def load_page(self):
+        return self.settle(set() ,[CALLBACK for CALLBACK in self.callbacks if not CALLBACK['prevent_initial_call']])
+
+    def apply_selection(self ,SELECTION):
+        self.props.update(SELECTION)
+        return self.settle(set(SELECTION))
+
+# Selections from a JSON file holding a list of {'<component id>.<property>': value}
+def read_selections(FILE):
+    with open(FILE ,encoding='utf-8') as f:
+        return json.load(f)
+
+# Compute and keep the app's default views and SELECTIONS. Returns a summary.
+# Errors are printed rather than raised, so a failed warm-up does not stop the server starting.
+def warm_up(
+        APP                             # Dash app, registered with register_warm_up()
+        ,SELECTIONS=[]                  # List of dictionaries {'<component id>.<property>': value}, each applied to the page as loaded
+        ,HEADERS={}                     # Dictionary: headers for every request, e.g. Authorization when the app has a login
+        ,TIMEOUT_S=TIMEOUT_S
+    ):
+    global _last_warm_up ,_summary
+    funcname = inspect.currentframe().f_code.co_name
+    _last_warm_up = (APP ,{'SELECTIONS':SELECTIONS ,'HEADERS':HEADERS ,'TIMEOUT_S':TIMEOUT_S})
+    timer_start = time.perf_counter()
+    n_requests = 0
+    warmer = None
+    try:
+        warmer = _PageWarmer(APP ,HEADERS ,time.time() + TIMEOUT_S)
+        n_requests += warmer.load_page()
+        loaded = dict(warmer.props)
+        for SELECTION in SELECTIONS:
+            warmer.props = dict(loaded)
+            n_requests += warmer.apply_selection(SELECTION)
+    except Exception:
+        print(f"<{funcname}> Warm-up stopped by an error. Requests not warmed run as usual.")
+        traceback.print_exc()
+
+    warm_s = time.perf_counter() - timer_start
+    run_ms = {OUTPUT:sum(TIMES) for OUTPUT ,TIMES in warmer.run_ms.items()} if warmer else {}
+    slowest = sorted(run_ms.items() ,key=lambda ITEM: -ITEM[1])[:10]
+    _summary = {
+        'pid':os.getpid()
+        ,'finished':time.strftime('%Y-%m-%dT%H:%M:%S')
+        ,'warm_up_s':round(warm_s ,3)
+        ,'selections':len(SELECTIONS)
+        ,'requests':n_requests
+        ,'errors':warmer.n_errors if warmer else None
+        ,'responses_kept':len(_responses)
+        ,'slowest_ms':{OUTPUT:round(MS ,1) for OUTPUT ,MS in slowest}
+    }
+    print(f"<{funcname}> Warmed up the default view and {len(SELECTIONS)} selections in {warm_s :,.1f}s ({n_requests} callback requests, {_summary['responses_kept']} responses kept).")
+    for OUTPUT ,MS in slowest[:3]:
+        print(f"<{funcname}>     {MS :,.0f} ms  {OUTPUT}")
+    return _summary
+
+# Repeat the last warm_up(), e.g. after the data has been reloaded. Does nothing if there was none.
+def warm_again():
+    if _last_warm_up is None:
+        return None
+    APP ,kwargs = _last_warm_up
+    return warm_up(APP ,**kwargs)
+
+#%% Registering with an app
+
+# To answer requests from the kept responses, and report the warm-up
+def register_warm_up(
+        APP                             # Dash app
+        ,ENDPOINT='/metrics/warmup'     # String: route on the app's server for the warm-up summary. None to skip.
+        ,LOCAL_ONLY=True                # True: only answer summary requests from this machine
+    ):
+    if getattr(APP ,'_warm_start' ,False):
+        return APP
+    server = APP.server
+
+    # Answer from the kept responses in Dash's view for callback requests, so anything
+    # guarding the view (e.g. a login added afterwards) guards these too.
+    # Only a browser's first request for a callback is answered here. Polls for background jobs,
+    # and requests replacing a job still running, go to Dash as usual.
+    endpoint = f'{APP.config.routes_pathname_prefix}_dash-update-component'
+    dispatch = server.view_functions[endpoint]
+
+    @functools.wraps(dispatch)
+    def _answer_warmed(*args ,**kwargs):
+        request = flask.request
+        if not _responses or WARM_UP_HEADER in request.headers or any(ARG in request.args for ARG in ('cacheKey' ,'job' ,'oldJob')):
+            return dispatch(*args ,**kwargs)
+        payload = request.get_json(silent=True)
+        if not isinstance(payload ,dict):
+            return dispatch(*args ,**kwargs)
+        with _lock:
+            body = _responses.get(_request_key(payload))
+            _counts['hits' if body is not None else 'misses'] += 1
+        if body is None:
+            return dispatch(*args ,**kwargs)
+        return flask.Response(body ,mimetype='application/json')
+
+    server.view_functions[endpoint] = _answer_warmed
+
+    if ENDPOINT:
+        @server.route(ENDPOINT)
+        def _warm_up_metrics():
+            if LOCAL_ONLY and flask.request.remote_addr not in ('127.0.0.1' ,'::1' ,'localhost'):
+                flask.abort(403)
+            with _lock:
+                counts = dict(_counts)
+            return flask.jsonify({**_summary ,'responses_kept':len(_responses) ,'counts':counts})
+
+    APP._warm_start = True
+    return APP
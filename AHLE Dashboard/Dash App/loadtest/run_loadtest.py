@@ -0,0 +1,408 @@
+#%% About
+'''
+Load test and benchmark for the Dash apps.
+
+Drives the Dash callback endpoint (_dash-update-component) directly with HTTP
+requests, without a browser. Each simulated user:
+    - loads the layout and callback definitions, as the browser does on page load
+    - fires the initial callbacks
+    - replays the interaction sequences in scenarios.json
+
+After each change, callbacks that use the changed property are fired. Their
+outputs are applied to the user's copy of the page, which fires any callbacks
+that depend on those outputs, as the Dash renderer would. Clientside and
+pattern-matching callbacks are not run. Background callbacks are polled until
+their job finishes, and their latency is the time to the result.
+
+Reports per callback: request count, p50/p95/p99 latency, and mean response size.
+Reports overall: throughput and time for each interaction to settle.
+
+Results can be saved as a baseline and later runs compared against it.
+A callback whose p95 latency is more than TOLERANCE above its baseline counts
+as a regression, and the script exits with status 1.
+
+Baselines are kept in loadtest/baselines and committed with the code, one file
+per app, scenarios and number of users, e.g. gbadsDash_all_4users.json.
+Latencies depend on the machine, so the committed baselines are recorded on the
+CI runner: the load test workflow (.github/workflows/loadtest.yml) compares
+each pull request against them. To update one, run the workflow by hand with
+save_baseline, then download the baseline from the run's artifacts and commit
+it. To keep baselines for your own machine, pass --baseline-folder
+loadtest/baselines/local, which git ignores.
+
+Scenario steps (see scenarios.json):
+    {"set": {"component-id.property": value, ...}}       Change one or more properties at once
+    {"sweep": "component-id.property", "values": [...]}  Change a property to each value in turn
+A value of {"option": n} picks the n-th of the component's current options, for
+dropdowns whose options depend on data or on other selections. n wraps around
+if there are fewer options.
+
+Example usage, from the Dash App folder:
+    python loadtest/run_loadtest.py --app gbadsDash_eth_scensmry --start-server --users 8 --repeat 3
+    python loadtest/run_loadtest.py --url http://localhost:8050 --scenario ethiopia-toggles --save-baseline --baseline-folder loadtest/baselines/local
+'''
+#%% Imports
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import collections
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+import requests
+
+LOADTEST_FOLDER = os.path.dirname(os.path.abspath(__file__))
+DASH_APP_FOLDER = os.path.dirname(LOADTEST_FOLDER)
+BASELINE_FOLDER = os.path.join(LOADTEST_FOLDER ,'baselines')
+
+MAX_REQUESTS_PER_CHANGE = 200   # Stop following a chain of callbacks after this many requests
+
+#%% Page state
+
+# Collect the properties of every component with an id in a layout tree
+def _collect_props(NODE ,PROPS):
+    if isinstance(NODE ,list):
+        for CHILD in NODE:
+            _collect_props(CHILD ,PROPS)
+    elif isinstance(NODE ,dict) and 'props' in NODE:
+        props = NODE['props']
+        if isinstance(props.get('id') ,str):
+            for PROP ,VALUE in props.items():
+                if PROP != 'id':
+                    PROPS[f"{props['id']}.{PROP}"] = VALUE
+        for VALUE in props.values():
+            if isinstance(VALUE ,(list ,dict)):
+                _collect_props(VALUE ,PROPS)
+    return PROPS
+
+def _split_prop(PROP_ID):
+    component_id ,prop = PROP_ID.rsplit('.' ,1)
+    return component_id ,prop
+
+# Callback definitions from _dash-dependencies, keeping those that can be run over HTTP
+def _parse_callbacks(DEPENDENCIES):
+    callbacks = []
+    for DEP in DEPENDENCIES:
+        if DEP.get('clientside_function'):
+            continue
+        ids = [ITEM['id'] for ITEM in DEP['inputs'] + DEP.get('state' ,[])]
+        if not all(isinstance(ID ,str) for ID in ids) or DEP['output'].startswith('{'):
+            continue
+        multi = DEP['output'].startswith('..')
+        outputs = DEP['output'].strip('.').split('...') if multi else [DEP['output']]
+        callbacks.append({
+            'output':DEP['output']
+            ,'multi':multi
+            ,'outputs':outputs
+            ,'inputs':[f"{ITEM['id']}.{ITEM['property']}" for ITEM in DEP['inputs']]
+            ,'state':[f"{ITEM['id']}.{ITEM['property']}" for ITEM in DEP.get('state' ,[])]
+            ,'prevent_initial_call':DEP.get('prevent_initial_call' ,False)
+            ,'poll_ms':(DEP.get('long') or {}).get('interval')
+        })
+    return callbacks
+
+def _option_value(OPTIONS ,INDEX):
+    options = list(OPTIONS or [])
+    option = options[INDEX % len(options)]
+    return option['value'] if isinstance(option ,dict) else option
+
+#%% Simulated user
+
+class SimulatedUser:
+    def __init__(self ,BASE_URL ,LAYOUT ,CALLBACKS ,RECORDER):
+        self.base_url = BASE_URL.rstrip('/')
+        self.session = requests.Session()
+        self.props = _collect_props(LAYOUT ,{})
+        self.callbacks = CALLBACKS
+        self.recorder = RECORDER
+        self.by_input = collections.defaultdict(list)
+        for CALLBACK in CALLBACKS:
+            for PROP_ID in CALLBACK['inputs']:
+                self.by_input[PROP_ID].append(CALLBACK)
+
+    def _fire(self ,CALLBACK ,CHANGED):
+        def _item(PROP_ID):
+            component_id ,prop = _split_prop(PROP_ID)
+            return {'id':component_id ,'property':prop ,'value':self.props.get(PROP_ID)}
+        outputs = [dict(zip(('id' ,'property') ,_split_prop(PROP_ID))) for PROP_ID in CALLBACK['outputs']]
+        payload = {
+            'output':CALLBACK['output']
+            ,'outputs':outputs if CALLBACK['multi'] else outputs[0]
+            ,'inputs':[_item(PROP_ID) for PROP_ID in CALLBACK['inputs']]
+            ,'state':[_item(PROP_ID) for PROP_ID in CALLBACK['state']]
+            ,'changedPropIds':[PROP_ID for PROP_ID in CALLBACK['inputs'] if PROP_ID in CHANGED]
+        }
+        timer_start = time.perf_counter()
+        response = self.session.post(f'{self.base_url}/_dash-update-component' ,json=payload)
+
+        # Background callback: poll for the job's result as the renderer does
+        if CALLBACK['poll_ms'] and response.status_code == 200 and 'job' in response.json():
+            job = response.json()
+            query = {'cacheKey':job['cacheKey'] ,'job':job['job']}
+            while True:
+                time.sleep(CALLBACK['poll_ms'] / 1000)
+                response = self.session.post(f'{self.base_url}/_dash-update-component' ,params=query ,json=payload)
+                if response.status_code != 200 or 'response' in response.json():
+                    break
+        latency_ms = 1000 * (time.perf_counter() - timer_start)
+        self.recorder.add_request(CALLBACK['output'] ,latency_ms ,len(response.content) ,response.status_code)
+
+        updated = set()
+        if response.status_code == 200:
+            for component_id ,props in response.json().get('response' ,{}).items():
+                for PROP ,VALUE in props.items():
+                    self.props[f'{component_id}.{PROP}'] = VALUE
+                    updated.add(f'{component_id}.{PROP}')
+                    if PROP == 'children':
+                        _collect_props(VALUE ,self.props)
+        return updated
+
+    # Fire callbacks for a set of changed properties and everything downstream of them
+    # A callback waits while any other pending callback will update one of its inputs, as in the Dash renderer.
+    def _settle(self ,CHANGED ,PENDING=None):
+        pending = list(PENDING or [])
+        changed_for = collections.defaultdict(set)
+        for CALLBACK in pending:
+            changed_for[CALLBACK['output']].update(CHANGED)
+        def _queue(PROPS):
+            for PROP_ID in PROPS:
+                for CALLBACK in self.by_input.get(PROP_ID ,[]):
+                    if CALLBACK not in pending:
+                        pending.append(CALLBACK)
+                    changed_for[CALLBACK['output']].add(PROP_ID)
+        _queue(CHANGED)
+
+        n_requests = 0
+        while pending and n_requests < MAX_REQUESTS_PER_CHANGE:
+            pending_outputs = {PROP_ID for CALLBACK in pending for PROP_ID in CALLBACK['outputs']}
+            ready = [CALLBACK for CALLBACK in pending if not (set(CALLBACK['inputs']) & (pending_outputs - set(CALLBACK['outputs'])))]
+            CALLBACK = (ready or pending)[0]
+            pending.remove(CALLBACK)
+            updated = self._fire(CALLBACK ,changed_for.pop(CALLBACK['output'] ,set()))
+            n_requests += 1
+            _queue(updated)
+        return n_requests
+
+    def load_page(self):
+        initial = [CALLBACK for CALLBACK in self.callbacks if not CALLBACK['prevent_initial_call']]
+        timer_start = time.perf_counter()
+        n_requests = self._settle(set() ,initial)
+        self.recorder.add_interaction('page load' ,1000 * (time.perf_counter() - timer_start) ,n_requests)
+        return None
+
+    def apply_step(self ,SCENARIO ,CHANGES):
+        changed = set()
+        for PROP_ID ,VALUE in CHANGES.items():
+            if isinstance(VALUE ,dict) and 'option' in VALUE:
+                VALUE = _option_value(self.props.get(f'{_split_prop(PROP_ID)[0]}.options') ,VALUE['option'])
+            self.props[PROP_ID] = VALUE
+            changed.add(PROP_ID)
+        timer_start = time.perf_counter()
+        n_requests = self._settle(changed)
+        self.recorder.add_interaction(SCENARIO ,1000 * (time.perf_counter() - timer_start) ,n_requests)
+        return None
+
+def _expand_steps(STEPS):
+    for STEP in STEPS:
+        if 'sweep' in STEP:
+            for VALUE in STEP['values']:
+                yield {STEP['sweep']:VALUE}
+        else:
+            yield STEP['set']
+
+#%% Recording results
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []
+        self.interactions = []
+
+    def add_request(self ,CALLBACK ,LATENCY_MS ,RESPONSE_BYTES ,STATUS):
+        with self.lock:
+            self.requests.append((CALLBACK ,LATENCY_MS ,RESPONSE_BYTES ,STATUS))
+
+    def add_interaction(self ,SCENARIO ,LATENCY_MS ,N_REQUESTS):
+        with self.lock:
+            self.interactions.append((SCENARIO ,LATENCY_MS ,N_REQUESTS))
+
+def _summarize(INPUT_DF ,GROUP_VAR ,LATENCY_VAR='latency_ms'):
+    summary = INPUT_DF.groupby(GROUP_VAR)[LATENCY_VAR].agg(
+        count='count'
+        ,p50_ms=lambda x: np.percentile(x ,50)
+        ,p95_ms=lambda x: np.percentile(x ,95)
+        ,p99_ms=lambda x: np.percentile(x ,99)
+        ,max_ms='max'
+    )
+    return summary.sort_values('p95_ms' ,ascending=False)
+
+def summarize_results(RECORDER ,WALL_S):
+    requests_df = pd.DataFrame(RECORDER.requests ,columns=['callback' ,'latency_ms' ,'response_bytes' ,'status'])
+    interactions_df = pd.DataFrame(RECORDER.interactions ,columns=['scenario' ,'latency_ms' ,'n_requests'])
+    by_callback = _summarize(requests_df ,'callback')
+    by_callback['mean_kb'] = requests_df.groupby('callback')['response_bytes'].mean() / 1024
+    by_callback['errors'] = requests_df.loc[requests_df['status'] >= 500].groupby('callback').size()
+    by_callback['errors'] = by_callback['errors'].fillna(0).astype(int)
+    return {
+        'wall_s':WALL_S
+        ,'n_requests':len(requests_df)
+        ,'throughput_rps':len(requests_df) / WALL_S if WALL_S else 0.0
+        ,'by_callback':by_callback
+        ,'by_scenario':_summarize(interactions_df ,'scenario')
+    }
+
+#%% Baselines
+
+def _baseline_file(APP ,SCENARIOS ,USERS ,FOLDER=BASELINE_FOLDER):
+    scenario_label = '+'.join(sorted(SCENARIOS)) if len(SCENARIOS) <= 3 else 'all'
+    return os.path.join(FOLDER ,f'{APP}_{scenario_label}_{USERS}users.json')
+
+def save_baseline(SUMMARY ,BASELINE_FILE):
+    os.makedirs(os.path.dirname(BASELINE_FILE) ,exist_ok=True)
+    baseline = {
+        'created':time.strftime('%Y-%m-%d %X')
+        ,'throughput_rps':SUMMARY['throughput_rps']
+        ,'by_callback':SUMMARY['by_callback'].to_dict(orient='index')
+        ,'by_scenario':SUMMARY['by_scenario'].to_dict(orient='index')
+    }
+    with open(BASELINE_FILE ,'w' ,encoding='utf-8') as f:
+        json.dump(baseline ,f ,indent=2)
+    return None
+
+# Returns a dataframe of callbacks and scenarios whose p95 latency is more than TOLERANCE above baseline
+def compare_baseline(SUMMARY ,BASELINE_FILE ,TOLERANCE=0.2 ,MIN_DIFF_MS=50):
+    with open(BASELINE_FILE ,'r' ,encoding='utf-8') as f:
+        baseline = json.load(f)
+    comparisons = []
+    for KIND in ('by_callback' ,'by_scenario'):
+        current = SUMMARY[KIND]['p95_ms']
+        previous = pd.Series({name:row['p95_ms'] for name ,row in baseline[KIND].items()} ,dtype=float)
+        compare = pd.DataFrame({'baseline_p95_ms':previous ,'current_p95_ms':current}).dropna()
+        compare['kind'] = KIND.replace('by_' ,'')
+        comparisons.append(compare)
+    compare = pd.concat(comparisons)
+    compare['change_pct'] = 100 * (compare['current_p95_ms'] / compare['baseline_p95_ms'] - 1)
+    regressed = (compare['current_p95_ms'] > compare['baseline_p95_ms'] * (1 + TOLERANCE)) \
+        & (compare['current_p95_ms'] - compare['baseline_p95_ms'] > MIN_DIFF_MS)
+    return compare.loc[regressed].sort_values('change_pct' ,ascending=False)
+
+#%% Server
+
+# Start the app under waitress, as in the docker image, and wait until it answers
+def start_server(APP ,PORT ,THREADS ,TIMEOUT_S=900):
+    command = [
+        sys.executable ,'-m' ,'waitress'
+        ,f'--port={PORT}' ,f'--threads={THREADS}'
+        ,'--call' ,f'{APP}:returnApp'
+    ]
+    env = dict(os.environ)
+    env.pop('BASE_URL' ,None)
+    server = subprocess.Popen(command ,cwd=DASH_APP_FOLDER ,env=env)
+    url = f'http://localhost:{PORT}'
+    timer_start = time.perf_counter()
+    while time.perf_counter() - timer_start < TIMEOUT_S:
+        if server.poll() is not None:
+            raise RuntimeError(f'Server exited with code {server.returncode} before it was ready')
+        try:
+            if requests.get(f'{url}/_dash-layout' ,timeout=5).status_code == 200:
+                print(f'Server ready at {url} after {time.perf_counter() - timer_start :,.0f}s')
+                return server ,url
+        except requests.ConnectionError:
+            pass
+        time.sleep(2)
+    server.terminate()
+    raise RuntimeError(f'Server not ready after {TIMEOUT_S}s')
+
+#%% Run
+
+def run_loadtest(
+        BASE_URL
+        ,SCENARIOS            # Dictionary {name: list of steps}
+        ,USERS=4              # Number of concurrent simulated users
+        ,REPEAT=1             # Number of times each user replays the scenarios
+        ,LOAD_PAGE=True       # True: each user fires the initial callbacks first, as on page load
+    ):
+    layout = requests.get(f'{BASE_URL}/_dash-layout').json()
+    callbacks = _parse_callbacks(requests.get(f'{BASE_URL}/_dash-dependencies').json())
+    recorder = Recorder()
+
+    def _user_session(USER_NUM):
+        user = SimulatedUser(BASE_URL ,layout ,callbacks ,recorder)
+        if LOAD_PAGE:
+            user.load_page()
+        for REP in range(REPEAT):
+            for NAME ,STEPS in SCENARIOS.items():
+                for CHANGES in _expand_steps(STEPS):
+                    user.apply_step(NAME ,CHANGES)
+        return USER_NUM
+
+    timer_start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=USERS) as executor:
+        for future in concurrent.futures.as_completed([executor.submit(_user_session ,i) for i in range(USERS)]):
+            future.result()
+    return summarize_results(recorder ,time.perf_counter() - timer_start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Dash apps through their callback endpoint')
+    parser.add_argument('--app' ,default='gbadsDash' ,help='App module (used to start the server and select scenarios)')
+    parser.add_argument('--url' ,default=None ,help='URL of a running app. Default: start one with --start-server.')
+    parser.add_argument('--start-server' ,action='store_true' ,help='Start the app under waitress on --port')
+    parser.add_argument('--port' ,type=int ,default=8070)
+    parser.add_argument('--threads' ,type=int ,default=4 ,help='waitress worker threads')
+    parser.add_argument('--scenarios-file' ,default=os.path.join(LOADTEST_FOLDER ,'scenarios.json'))
+    parser.add_argument('--scenario' ,action='append' ,help='Scenario to run. Repeat for several. Default: all scenarios for the app.')
+    parser.add_argument('--users' ,type=int ,default=4)
+    parser.add_argument('--repeat' ,type=int ,default=1)
+    parser.add_argument('--no-page-load' ,action='store_true' ,help='Skip the initial callbacks')
+    parser.add_argument('--save-baseline' ,action='store_true')
+    parser.add_argument('--baseline-folder' ,default=BASELINE_FOLDER ,help='Default: loadtest/baselines, the baselines recorded on the CI runner')
+    parser.add_argument('--tolerance' ,type=float ,default=0.2 ,help='Allowed p95 increase over baseline, as a fraction')
+    args = parser.parse_args()
+
+    with open(args.scenarios_file ,'r' ,encoding='utf-8') as f:
+        all_scenarios = json.load(f)
+    scenarios = {
+        name:scenario['steps'] for name ,scenario in all_scenarios.items()
+        if (args.scenario and name in args.scenario) or (not args.scenario and args.app in scenario['apps'])
+    }
+    if not scenarios:
+        parser.error(f'No scenarios to run for {args.app}')
+
+    server = None
+    url = args.url
+    if args.start_server or not url:
+        server ,url = start_server(args.app ,args.port ,args.threads)
+    try:
+        summary = run_loadtest(url ,scenarios ,USERS=args.users ,REPEAT=args.repeat ,LOAD_PAGE=not args.no_page_load)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(f"\n{summary['n_requests']:,} requests in {summary['wall_s'] :,.1f}s with {args.users} users: {summary['throughput_rps'] :,.1f} requests/s")
+    print('\nLatency by callback:')
+    print(summary['by_callback'].to_string(float_format=lambda x: f'{x :,.1f}'))
+    print('\nTime to settle by interaction:')
+    print(summary['by_scenario'].to_string(float_format=lambda x: f'{x :,.1f}'))
+
+    baseline_file = _baseline_file(args.app ,list(scenarios) ,args.users ,FOLDER=args.baseline_folder)
+    if args.save_baseline:
+        save_baseline(summary ,baseline_file)
+        print(f'\nSaved baseline {baseline_file}')
+    elif os.path.exists(baseline_file):
+        regressions = compare_baseline(summary ,baseline_file ,TOLERANCE=args.tolerance)
+        if len(regressions):
+            print(f'\nRegressions against {os.path.basename(baseline_file)}:')
+            print(regressions.to_string(float_format=lambda x: f'{x :,.1f}'))
+            return 1
+        print(f'\nNo regressions against {os.path.basename(baseline_file)}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
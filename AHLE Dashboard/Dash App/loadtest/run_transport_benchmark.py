@@ -0,0 +1,189 @@
+#%% About
+'''
+Bandwidth and time-to-interactive benchmark for page loads of the Dash apps.
+
+Loads the page as a browser does, without rendering it:
+    - the page HTML
+    - the JS and CSS it links to, and the favicon
+    - the layout and callback definitions
+    - files in assets/ referenced by the layout, e.g. images
+    - the initial callbacks, and the callbacks that follow from their outputs
+      (with SimulatedUser from run_loadtest.py)
+Time to interactive is taken as the time until the last initial callback has
+answered.
+
+Each load is run four ways:
+    uncompressed, first visit     Accept-Encoding: identity and an empty browser cache. As before compression and cache headers.
+    compressed, first visit       Accept-Encoding: br, gzip and an empty browser cache
+    uncompressed, repeat visit    as a browser reloading the page: files still fresh in
+    compressed, repeat visit      its cache are not requested, others are revalidated
+
+Reports bytes received (response bodies as sent, i.e. compressed where they
+were), number of requests, time to interactive on this connection, and an
+estimate for a slower link of --mbps megabits per second.
+
+Example usage, from the Dash App folder:
+    python loadtest/run_transport_benchmark.py --app gbadsDash --start-server
+    python loadtest/run_transport_benchmark.py --url http://localhost:8050 --mbps 5
+'''
+#%% Imports
+
+import re
+import sys
+import json
+import time
+import argparse
+import urllib.parse
+
+import pandas as pd
+import requests
+
+from run_loadtest import SimulatedUser ,Recorder ,_parse_callbacks ,_collect_props ,start_server
+
+#%% Browser cache
+
+# Keeps each response with its validators and freshness, as a browser cache does
+class BrowserCache:
+    def __init__(self):
+        self.entries = {}
+
+    def fresh(self ,URL):
+        entry = self.entries.get(URL)
+        return entry is not None and entry['expires'] > time.time()
+
+    def conditional_headers(self ,URL):
+        entry = self.entries.get(URL ,{})
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def body(self ,URL):
+        return self.entries[URL]['body']
+
+    def store(self ,URL ,RESPONSE ,BODY):
+        cache_control = RESPONSE.headers.get('Cache-Control' ,'')
+        if 'no-store' in cache_control:
+            return None
+        max_age = re.search(r'max-age=(\d+)' ,cache_control)
+        fresh_s = 0 if ('no-cache' in cache_control or max_age is None) else int(max_age.group(1))
+        previous = self.entries.get(URL ,{})
+        self.entries[URL] = {
+            'etag':RESPONSE.headers.get('ETag' ,previous.get('etag'))
+            ,'last_modified':RESPONSE.headers.get('Last-Modified' ,previous.get('last_modified'))
+            ,'expires':time.time() + fresh_s
+            ,'body':BODY
+        }
+        return None
+
+#%% Page load
+
+class PageLoad:
+    def __init__(self ,BASE_URL ,COMPRESSED ,CACHE):
+        self.base_url = BASE_URL.rstrip('/')
+        self.cache = CACHE
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'br, gzip' if COMPRESSED else 'identity'
+        self.session.hooks['response'].append(self._count)
+        self.n_requests = 0
+        self.n_not_modified = 0
+        self.n_from_cache = 0
+        self.bytes_received = 0
+
+    def _count(self ,RESPONSE ,*args ,**kwargs):
+        self.n_requests += 1
+        self.n_not_modified += RESPONSE.status_code == 304
+        # Bytes of the body as sent, before requests decompresses it
+        content_length = RESPONSE.headers.get('Content-Length')
+        self.bytes_received += int(content_length) if content_length is not None else len(RESPONSE.content)
+        return RESPONSE
+
+    # GET through the browser cache. Returns the body, from the server or the cache.
+    def get(self ,PATH):
+        url = urllib.parse.urljoin(self.base_url + '/' ,PATH)
+        if self.cache.fresh(url):
+            self.n_from_cache += 1
+            return self.cache.body(url)
+        response = self.session.get(url ,headers=self.cache.conditional_headers(url))
+        body = self.cache.body(url) if response.status_code == 304 else response.content
+        self.cache.store(url ,response ,body)
+        return body
+
+    def run(self):
+        timer_start = time.perf_counter()
+        index_html = self.get('/').decode('utf-8')
+        resources = re.findall(r'<script[^>]+src="([^"]+)"' ,index_html) \
+            + re.findall(r'<link[^>]+href="([^"]+)"' ,index_html)
+        for PATH in resources:
+            if PATH.startswith('/') or PATH.startswith(self.base_url):
+                self.get(PATH)
+
+        layout = json.loads(self.get('_dash-layout'))
+        dependencies = json.loads(self.get('_dash-dependencies'))
+
+        # Files in assets/ referenced by the layout
+        props = _collect_props(layout ,{})
+        for PROP_ID ,VALUE in props.items():
+            if PROP_ID.endswith('.src') and isinstance(VALUE ,str) and '/assets/' in VALUE:
+                self.get(VALUE)
+
+        user = SimulatedUser(self.base_url ,layout ,_parse_callbacks(dependencies) ,Recorder())
+        user.session = self.session
+        user.load_page()
+        return {
+            'requests':self.n_requests
+            ,'not_modified':self.n_not_modified
+            ,'from_cache':self.n_from_cache
+            ,'kb_received':self.bytes_received / 1024
+            ,'time_to_interactive_s':time.perf_counter() - timer_start
+        }
+
+#%% Run
+
+def run_benchmark(BASE_URL ,MBPS=10.0):
+    results = []
+    for COMPRESSED in (False ,True):
+        cache = BrowserCache()
+        for VISIT in ('first visit' ,'repeat visit'):
+            result = PageLoad(BASE_URL ,COMPRESSED ,cache).run()
+            result['load'] = f"{'compressed' if COMPRESSED else 'uncompressed'}, {VISIT}"
+            result[f'tti_at_{MBPS:g}mbps_s'] = result['time_to_interactive_s'] + result['kb_received'] * 1024 * 8 / (MBPS * 1e6)
+            results.append(result)
+    return pd.DataFrame(results).set_index('load')
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure bandwidth and time to interactive for a page load')
+    parser.add_argument('--app' ,default='gbadsDash' ,help='App module, used to start the server')
+    parser.add_argument('--url' ,default=None ,help='URL of a running app. Default: start one with --start-server.')
+    parser.add_argument('--start-server' ,action='store_true' ,help='Start the app under waitress on --port')
+    parser.add_argument('--port' ,type=int ,default=8071)
+    parser.add_argument('--threads' ,type=int ,default=4 ,help='waitress worker threads')
+    parser.add_argument('--mbps' ,type=float ,default=10.0 ,help='Link speed for the time to interactive estimate')
+    parser.add_argument('--output' ,default=None ,help='File to save the results as JSON')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if args.start_server or not url:
+        server ,url = start_server(args.app ,args.port ,args.threads)
+    try:
+        results = run_benchmark(url ,MBPS=args.mbps)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(results.to_string(float_format=lambda x: f'{x :,.2f}'))
+    before = results.loc['uncompressed, first visit' ,'kb_received']
+    for LOAD in results.index[1:]:
+        print(f"{LOAD}: {100 * (1 - results.loc[LOAD ,'kb_received'] / before) :,.0f}% fewer bytes than an uncompressed first visit")
+    if args.output:
+        with open(args.output ,'w' ,encoding='utf-8') as f:
+            json.dump(results.reset_index().to_dict(orient='records') ,f ,indent=2)
+        print(f'Saved {args.output}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
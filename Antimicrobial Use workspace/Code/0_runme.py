@@ -16,3 +16,71 @@ PROGRAM_OUTPUT_FOLDER = os.path.join(PARENT_FOLDER ,'Program outputs')
 GLBL_RAWDATA_FOLDER = os.path.join(GRANDPARENT_FOLDER, 'Global Aggregate workspace', 'Data', 'Downloaded')
 GLBL_PRODATA_FOLDER = os.path.join(GRANDPARENT_FOLDER, 'Global Aggregate workspace', 'Data', 'Intermediate')
 DASH_DATA_FOLDER = os.path.join(GRANDPARENT_FOLDER, 'AHLE Dashboard' ,'Dash App' ,'data')
+
+#%% Run pipeline
+
+# Each step declares the raw files it reads and the files it writes, plus the outputs of earlier
+# steps it depends on. Steps whose script and inputs are unchanged since their last run are skipped.
+# 1_import_data.py also reads outputs of the Global Aggregate pipeline, so run that first.
+import _extract_cache as excache
+imp.reload(excache)
+
+def _raw(*PATH):
+   return os.path.join(RAWDATA_FOLDER ,*PATH)
+def _pro(*PATH):
+   return os.path.join(PRODATA_FOLDER ,*PATH)
+def _dash(*PATH):
+   return os.path.join(DASH_DATA_FOLDER ,*PATH)
+
+pipeline_steps = [
+   {'script':'1_import_data.py'
+     ,'inputs':[
+        _raw('AMU_2018_6th report_GBADs.xlsx') ,_raw('Classification of AM per priority.xlsx') ,_raw('Burden - slider inputs.xlsx')
+        ,_raw('UsebyCountry_Code_GBADs.csv') ,_raw('SBM_JSA_AMR_livestock.csv') ,_raw('livestock_AMR_raw_data.csv')
+        ,os.path.join(GLBL_RAWDATA_FOLDER ,'WOAH regions and countries.csv')
+        ,os.path.join(GLBL_PRODATA_FOLDER ,'wb_infl_exchg.pkl.gz')
+        ,os.path.join(GLBL_PRODATA_FOLDER ,'livestock_countries_biomass.pkl.gz')
+        ,os.path.join(GLBL_PRODATA_FOLDER ,'biomass_live_weight_fao.pkl.gz')
+        ]
+     ,'outputs':[
+        _pro('amu2018.pkl.gz') ,_pro('amu2018_tall.pkl.gz') ,_pro('amu2018_species_dtl.pkl.gz') ,_pro('amu2018_species_grp.pkl.gz')
+        ,_pro('amu2018_biomass.pkl.gz') ,_pro('amu_importance.pkl.gz') ,_pro('amu_prices.pkl.gz') ,_pro('amu_mulch_withrgn.pkl.gz')
+        ,_pro('amr.pkl.gz') ,_pro('amr_full.pkl.gz') ,_dash('amr.csv') ,_dash('amr_full.csv')
+        ]
+     }
+   ,{'script':'2_combine_and_process.py'
+     ,'inputs':[
+        _pro('amu2018.pkl.gz') ,_pro('amu2018_tall.pkl.gz') ,_pro('amu2018_biomass.pkl.gz') ,_pro('amu_importance.pkl.gz')
+        ,_pro('amu_prices.pkl.gz') ,_pro('amu_mulch_withrgn.pkl.gz') ,_pro('amr.pkl.gz') ,_pro('amr_full.pkl.gz')
+        ,os.path.join(PIPELINE_COMMON_FOLDER ,'_pert_uncertainty.py')
+        ]
+     ,'outputs':[
+        _pro('amu2018_combined_tall.csv') ,_pro('amu_combined_regional.csv') ,_pro('amr_withsmry.csv')
+        ,_pro('amu2018_display.csv') ,_pro('amu2018_display_byregion.csv') ,_pro('amu2018_display_bycategory.csv')
+        ,_dash('amu2018_combined_tall.csv') ,_dash('amu_combined_regional.csv') ,_dash('amr_withsmry.csv') ,_dash('amu_uncertainty_data.csv')
+        ,_dash('amu2018_display.csv') ,_dash('amu2018_display_byregion.csv') ,_dash('amu2018_display_bycategory.csv')
+        ]
+     }
+]
+
+# Steps run in parallel worker processes as soon as the steps they depend on have finished.
+# Each worker sets up its own namespace from the control files and the folder constants below.
+# Add names of scripts to FORCE_STEPS to rerun them regardless of the cache.
+import _pipeline_runner as runner
+imp.reload(runner)
+
+if __name__ == '__main__':    # Required for worker processes on Windows
+   pipeline_timings = runner.run_steps_parallel(
+      pipeline_steps
+      ,CACHE_FOLDER=os.path.join(PRODATA_FOLDER ,'extract_cache')
+      ,CONSTANTS={key:value for key ,value in globals().items() if key.endswith('_FOLDER')}
+      ,SHARED_INPUTS=['_libraries.py' ,'_functions.py' ,'_constants.py']
+      ,FORCE_STEPS=[]
+      ,PROFILE_FOLDER=os.path.join(PRODATA_FOLDER ,'profiling')     # Time and memory by step, compared to the previous run. None to turn off.
+   )
+
+   # Publish the dashboard files as a new data snapshot. Running dashboards switch to it without a restart.
+   subprocess.run(
+      [sys.executable ,os.path.join(DASH_DATA_FOLDER ,os.pardir ,'lib' ,'data_snapshots.py') ,'publish' ,DASH_DATA_FOLDER]
+      ,check=True
+   )
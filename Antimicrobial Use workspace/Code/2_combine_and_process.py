@@ -139,6 +139,69 @@ datainfo(amu2018_combined_tall)
 amu2018_combined_tall.to_csv(os.path.join(PRODATA_FOLDER ,'amu2018_combined_tall.csv') ,index=False)
 amu2018_combined_tall.to_csv(os.path.join(DASH_DATA_FOLDER ,'amu2018_combined_tall.csv') ,index=False)
 
+# =============================================================================
+#### Display tables for the dashboard
+# =============================================================================
+# The AMU map, treemap, stacked bar and donut chart select from these tables rather than
+# cleaning and summing amu2018_combined_tall on every render.
+
+# Display ready: scope All, cleaned class names, region labels
+amu_class_display_names = {
+    'aggregated_class_data':'aggregated class data'
+    ,'other_important':'other (important)'
+    ,'sulfonamides__including_trimethoprim':'sulfonamides (with trimethoprim)'
+    ,'cephalosporins__all_generations':'cephalosporins (all gens)'
+    ,'1_2_gen__cephalosporins':'cephalosporins (1 & 2 gen)'
+    ,'3_4_gen_cephalosporins':'cephalosporins (3 & 4 gen)'
+    ,'other_quinolones':'other quinolones'
+    }
+amu2018_display = amu2018_combined_tall.query("scope == 'All'").copy()
+for COL in ['antimicrobial_class' ,'antimicrobial_class_group' ,'antimicrobial_class_group2']:
+    amu2018_display[COL] = amu2018_display[COL].replace(amu_class_display_names).str.title()
+
+# Region labels with number of countries reporting and proportion of biomass represented
+region_label_suffix = " (" + round(amu2018_display['number_of_countries'] ,0).astype(int).astype(str) \
+    + " | " + round(amu2018_display['biomass_prpn_reporting'] * 100 ,1).astype(str) + "%)"
+amu2018_display['region_with_countries_reporting'] = amu2018_display['region'] + region_label_suffix
+amu2018_display['region_with_countries_reporting_br'] = amu2018_display['region'] + '<br>' + region_label_suffix
+
+datainfo(amu2018_display)
+amu2018_display.to_csv(os.path.join(PRODATA_FOLDER ,'amu2018_display.csv') ,index=False)
+amu2018_display.to_csv(os.path.join(DASH_DATA_FOLDER ,'amu2018_display.csv') ,index=False)
+
+# One row per region: totals for the map
+amu2018_display_byregion = amu2018_display.groupby('region' ,sort=False ,as_index=False).agg(
+    number_of_countries=('number_of_countries' ,'first')
+    ,biomass_total_kg_reporting=('biomass_total_kg_reporting' ,'first')
+    ,amu_tonnes_by_region=('amu_tonnes' ,'sum')
+    ,amu_mg_perkgbiomass_by_region=('amu_mg_perkgbiomass' ,'sum')
+)
+datainfo(amu2018_display_byregion)
+amu2018_display_byregion.to_csv(os.path.join(PRODATA_FOLDER ,'amu2018_display_byregion.csv') ,index=False)
+amu2018_display_byregion.to_csv(os.path.join(DASH_DATA_FOLDER ,'amu2018_display_byregion.csv') ,index=False)
+
+# One row per region, classification, and category: totals for the stacked bar and donut chart
+# Categories keep their order of first appearance, which sets the order of colors in the stacked bar.
+amu_classification_vars = {
+    'Individual Classes':'antimicrobial_class_group'
+    ,'Top Global Classes':'antimicrobial_class_group2'
+    ,'WHO Importance Categories':'who_importance_ctg'
+    ,'WOAH Importance Categories':'woah_importance_ctg'
+    ,'OneHealth Importance Categories':'onehealth_importance_ctg'
+    }
+amu2018_display_bycategory_list = []
+for CLASSIFICATION ,VAR in amu_classification_vars.items():
+    amu2018_display_bycategory_list.append(
+        amu2018_display.groupby(['region' ,'region_with_countries_reporting_br' ,VAR] ,sort=False ,as_index=False)[
+            ['amu_tonnes' ,'amu_mg_perkgbiomass' ,'biomass_total_kg_reporting']
+        ].sum().rename(columns={VAR:'category'}).assign(classification=CLASSIFICATION)
+    )
+amu2018_display_bycategory = pd.concat(amu2018_display_bycategory_list ,ignore_index=True)
+
+datainfo(amu2018_display_bycategory)
+amu2018_display_bycategory.to_csv(os.path.join(PRODATA_FOLDER ,'amu2018_display_bycategory.csv') ,index=False)
+amu2018_display_bycategory.to_csv(os.path.join(DASH_DATA_FOLDER ,'amu2018_display_bycategory.csv') ,index=False)
+
 #%% Structure: one row per region
 
 amu2018 = pd.read_pickle(os.path.join(PRODATA_FOLDER ,'amu2018.pkl.gz'))
@@ -551,24 +614,25 @@ amr_withsmry.to_csv(os.path.join(DASH_DATA_FOLDER ,'amr_withsmry.csv') ,index=Fa
 # =============================================================================
 #### Functions
 # =============================================================================
-# Translate a PERT distribution to the equivalent Beta
-# Output a dataframe with samples generated from the distribution and a histogram
+# PERT distributions are handled by the uncertainty module in pipeline_common, which the dashboard
+# also imports, so it can recalculate intervals interactively with the same code.
+# Every region's distribution is converted to Beta parameters at once and sampled in a single seeded call.
+import _pert_uncertainty as pert
+imp.reload(pert)
+
+# Output a dataframe with samples generated from a PERT distribution and a histogram
 # Usage: pert_samples = generate_pert(10000, 1, 8, 10)
 def generate_pert(N_SAMPLES ,MIN ,MODE ,MAX ,LAMBDA=4):
     funcname = inspect.currentframe().f_code.co_name
-
-    mean = (MIN + (LAMBDA * MODE) + MAX) / (LAMBDA + 2)
-    alpha = (mean - MIN) * (2*MODE - MIN - MAX) / ((MODE - mean) * (MAX - MIN))
-    beta = alpha * (MAX - mean) / (mean - MIN)
+    params = pert.pert_params(MIN ,MODE ,MAX ,LAMBDA=LAMBDA)
+    alpha = params['alpha'][0]
+    beta = params['beta'][0]
 
     print(f"<{funcname}> PERT distribution: ({MIN}, {MODE}, {MAX}) with lambda={LAMBDA}")
     print(f"<{funcname}> Equivalent Beta distribution: {alpha=:.3f}, {beta=:.3f}")
 
     # Generate samples
-    beta_distr = sps.beta(alpha ,beta)
-    generated_df = pd.DataFrame(index=range(N_SAMPLES))
-    generated_df['rand_beta'] = beta_distr.rvs(size=generated_df.shape[0])      # Generate random numbers from Beta distribution (on scale 0,1)
-    generated_df['rand_pert'] = (generated_df['rand_beta'] * (MAX - MIN)) + MIN   # Translate from (0,1) to scale of PERT
+    generated_df = pd.DataFrame({'rand_pert':pert.draw_samples(params ,N_SAMPLES)[0]})
 
     # Plot
     snplt = sns.displot(
@@ -584,27 +648,8 @@ def generate_pert(N_SAMPLES ,MIN ,MODE ,MAX ,LAMBDA=4):
 
 pert_samples = generate_pert(10000, 1, 8, 10)
 
-# Translate a PERT distribution to the equivalent Beta
-# Output the beta distribution object for further processing
-def pert_to_beta(MIN ,MODE ,MAX ,LAMBDA=4):
-    funcname = inspect.currentframe().f_code.co_name
-
-    mean = (MIN + (LAMBDA * MODE) + MAX) / (LAMBDA + 2)
-    alpha = (mean - MIN) * (2*MODE - MIN - MAX) / ((MODE - mean) * (MAX - MIN))
-    beta = alpha * (MAX - mean) / (mean - MIN)
-    beta_distr = sps.beta(alpha ,beta)
-
-    print(f"<{funcname}> PERT distribution: ({MIN}, {MODE}, {MAX}) with lambda={LAMBDA}")
-    print(f"<{funcname}> Equivalent Beta distribution: {alpha=:.3f}, {beta=:.3f}")
-
-    return beta_distr
-
-beta_distr = pert_to_beta(1, 8, 10)
-
-# Endpoints of the range that contains alpha percent of the distribution
-beta_distr_ci95 = beta_distr.interval(0.95)
-pert_distr_ci95_low = (beta_distr_ci95[0] * (10 - 1)) + 1   # Translate from (0,1) to scale of PERT
-pert_distr_ci95_high = (beta_distr_ci95[1] * (10 - 1)) + 1   # Translate from (0,1) to scale of PERT
+# Endpoints of the range that contains 95 percent of the distribution
+pert_distr_ci95_low ,pert_distr_ci95_high = pert.pert_quantiles(pert.pert_params(1, 8, 10) ,[0.025 ,0.975])[0]
 
 # =============================================================================
 #### Create data based on spreadsheet from Sara
@@ -651,70 +696,37 @@ amu_uncertainty_data_toplot = pd.concat([amu_uncertainty_data_toplot_usage ,amu_
 amu_uncertainty_data_toplot = amu_uncertainty_data_toplot.sort_values(by='region')
 
 # =============================================================================
-#### Add confidence intervals for usage
-# =============================================================================
-def add_ci(INPUT_ROW):
-    # Usage
-    if 'PERT' in INPUT_ROW['amu_terrestrial_tonnes_distr'].upper():
-        # Get Beta distribution and calculate CI
-        if pd.notnull(INPUT_ROW['amu_terrestrial_tonnes_distr_lambda']):
-            beta_distr_tonnes = pert_to_beta(
-                INPUT_ROW['amu_terrestrial_tonnes_min']
-                ,INPUT_ROW['amu_terrestrial_tonnes_mostlikely']
-                ,INPUT_ROW['amu_terrestrial_tonnes_max']
-                ,INPUT_ROW['amu_terrestrial_tonnes_distr_lambda']
-            )
-        else:
-            beta_distr_tonnes = pert_to_beta(
-                INPUT_ROW['amu_terrestrial_tonnes_min']
-                ,INPUT_ROW['amu_terrestrial_tonnes_mostlikely']
-                ,INPUT_ROW['amu_terrestrial_tonnes_max']
-            )
-
-        beta_distr_tonnes_ci95 = beta_distr_tonnes.interval(0.95)
-
-        # Rescale CI to match original Pert
-        tonnes_ci95_low = (beta_distr_tonnes_ci95[0] * (INPUT_ROW['amu_terrestrial_tonnes_max'] - INPUT_ROW['amu_terrestrial_tonnes_min'])) + INPUT_ROW['amu_terrestrial_tonnes_min']   # Translate from (0,1) to scale of PERT
-        tonnes_ci95_high = (beta_distr_tonnes_ci95[1] * (INPUT_ROW['amu_terrestrial_tonnes_max'] - INPUT_ROW['amu_terrestrial_tonnes_min'])) + INPUT_ROW['amu_terrestrial_tonnes_min']   # Translate from (0,1) to scale of PERT
-    elif INPUT_ROW['amu_terrestrial_tonnes_distr'].upper() == 'UNIFORM':
-        tonnes_ci95_low = 0.025*(INPUT_ROW['amu_terrestrial_tonnes_max'] - INPUT_ROW['amu_terrestrial_tonnes_min']) + INPUT_ROW['amu_terrestrial_tonnes_min']
-        tonnes_ci95_high = 0.975*(INPUT_ROW['amu_terrestrial_tonnes_max'] - INPUT_ROW['amu_terrestrial_tonnes_min']) + INPUT_ROW['amu_terrestrial_tonnes_min']
-    else:
-        tonnes_ci95_low = None
-        tonnes_ci95_high = None
-
-    # Price
-    if 'PERT' in INPUT_ROW['amu_eurospertonne_distr'].upper():
-        # Get Beta distribution and calculate CI
-        if pd.notnull(INPUT_ROW['amu_eurospertonne_distr_lambda']):
-            beta_distr_price = pert_to_beta(
-                INPUT_ROW['amu_eurospertonne_min']
-                ,INPUT_ROW['amu_eurospertonne_mostlikely']
-                ,INPUT_ROW['amu_eurospertonne_max']
-                ,INPUT_ROW['amu_eurospertonne_distr_lambda']
-            )
-        else:
-            beta_distr_price = pert_to_beta(
-                INPUT_ROW['amu_eurospertonne_min']
-                ,INPUT_ROW['amu_eurospertonne_mostlikely']
-                ,INPUT_ROW['amu_eurospertonne_max']
-            )
-
-        beta_distr_price_ci95 = beta_distr_price.interval(0.95)
-
-        # Rescale CI to match original Pert
-        price_ci95_low = (beta_distr_price_ci95[0] * (INPUT_ROW['amu_eurospertonne_max'] - INPUT_ROW['amu_eurospertonne_min'])) + INPUT_ROW['amu_eurospertonne_min']   # Translate from (0,1) to scale of PERT
-        price_ci95_high = (beta_distr_price_ci95[1] * (INPUT_ROW['amu_eurospertonne_max'] - INPUT_ROW['amu_eurospertonne_min'])) + INPUT_ROW['amu_eurospertonne_min']   # Translate from (0,1) to scale of PERT
-    elif INPUT_ROW['amu_eurospertonne_distr'].upper() == 'UNIFORM':
-        price_ci95_low = 0.025*(INPUT_ROW['amu_eurospertonne_max'] - INPUT_ROW['amu_eurospertonne_min']) + INPUT_ROW['amu_eurospertonne_min']
-        price_ci95_high = 0.975*(INPUT_ROW['amu_eurospertonne_max'] - INPUT_ROW['amu_eurospertonne_min']) + INPUT_ROW['amu_eurospertonne_min']
-    else:
-        price_ci95_low = None
-        price_ci95_high = None
+#### Add confidence intervals and distribution of total expenditure
+# =============================================================================
+# For each region, sample from Usage and Price distributions and multiply to get expenditure
+# Usage and price intervals are exact quantiles of their distributions. Expenditure intervals are percentiles of the samples.
+# Europe has a single price estimate, so its price is fixed at the most likely value.
+resample_n = 10000
 
-    return pd.Series([tonnes_ci95_low ,tonnes_ci95_high ,price_ci95_low ,price_ci95_high])
+amu_uncertainty_data = pert.expenditure_uncertainty(
+    amu_uncertainty_data
+    ,USAGE_COLS=usage_cols
+    ,PRICE_COLS=price_cols
+    ,USAGE_DISTR='amu_terrestrial_tonnes_distr'
+    ,PRICE_DISTR='amu_eurospertonne_distr'
+    ,USAGE_LAMBDA='amu_terrestrial_tonnes_distr_lambda'
+    ,PRICE_LAMBDA='amu_eurospertonne_distr_lambda'
+    ,QUANTILES=[0.025 ,0.5 ,0.975]
+    ,N_SAMPLES=resample_n
+)
+amu_uncertainty_data = amu_uncertainty_data.rename(columns={
+    'usage_q2.5':'tonnes_ci95_low'
+    ,'usage_q97.5':'tonnes_ci95_high'
+    ,'price_q2.5':'price_ci95_low'
+    ,'price_q97.5':'price_ci95_high'
+    ,'expenditure_q2.5':'expenditure_ci95_low'
+    ,'expenditure_q50':'expenditure_ci95_mid'
+    ,'expenditure_q97.5':'expenditure_ci95_high'
+    }
+).drop(columns=['usage_q50' ,'price_q50'])
 
-amu_uncertainty_data[['tonnes_ci95_low' ,'tonnes_ci95_high' ,'price_ci95_low' ,'price_ci95_high']] = amu_uncertainty_data.apply(add_ci ,axis=1)
+# Regions without a distribution have no interval
+amu_uncertainty_data.loc[amu_uncertainty_data['amu_eurospertonne_min'].isnull() ,['price_ci95_low' ,'price_ci95_high']] = np.nan
 
 #??? Should intervals be centered on the MOST LIKELY value or the MEAN?
 amu_uncertainty_data = amu_uncertainty_data.eval(
@@ -724,85 +736,7 @@ amu_uncertainty_data = amu_uncertainty_data.eval(
 
     amu_eurospertonne_errorlow = amu_eurospertonne_mostlikely - price_ci95_low
     amu_eurospertonne_errorhigh = price_ci95_high - amu_eurospertonne_mostlikely
-    '''
-)
-
-# =============================================================================
-#### Generate distribution of total expenditure
-# =============================================================================
-# For each region, resample from Usage and Price distributions and multiply to get expenditure
-resample_n = 10000
-
-expenditure_africa = pd.DataFrame(index=range(resample_n))
-expenditure_africa['resampled_usage'] = generate_pert(resample_n, 1403, 2806, 3086)['rand_pert']
-expenditure_africa['resampled_price'] = generate_pert(resample_n, 20476, 176992, 206007 ,2.5)['rand_pert']
-expenditure_africa['resampled_expenditure'] = expenditure_africa['resampled_usage'] * expenditure_africa['resampled_price']
-expenditure_africa['expenditure_pctile'] = expenditure_africa['resampled_expenditure'].rank(pct=True)
-
-expenditure_americas = pd.DataFrame(index=range(resample_n))
-expenditure_americas['resampled_usage'] = generate_pert(resample_n, 18753, 29000, 31900)['rand_pert']
-expenditure_americas['resampled_price'] = sps.uniform.rvs(loc=20476 ,scale=145075 ,size=resample_n)
-expenditure_americas['resampled_expenditure'] = expenditure_americas['resampled_usage'] * expenditure_americas['resampled_price']
-expenditure_americas['expenditure_pctile'] = expenditure_americas['resampled_expenditure'].rank(pct=True)
-
-expenditure_asia = pd.DataFrame(index=range(resample_n))
-expenditure_asia['resampled_usage'] = generate_pert(resample_n, 33387, 50080, 55088)['rand_pert']
-expenditure_asia['resampled_price'] = generate_pert(resample_n, 20476, 108806, 123314 ,2.5)['rand_pert']
-expenditure_asia['resampled_expenditure'] = expenditure_asia['resampled_usage'] * expenditure_asia['resampled_price']
-expenditure_asia['expenditure_pctile'] = expenditure_asia['resampled_expenditure'].rank(pct=True)
-
-expenditure_europe = pd.DataFrame(index=range(resample_n))
-expenditure_europe['resampled_usage'] = sps.uniform.rvs(loc=7314 ,scale=8045 ,size=resample_n)
-expenditure_europe['resampled_price'] = 145075
-expenditure_europe['resampled_expenditure'] = expenditure_europe['resampled_usage'] * expenditure_europe['resampled_price']
-expenditure_europe['expenditure_pctile'] = expenditure_europe['resampled_expenditure'].rank(pct=True)
-
-expenditure_mideast = pd.DataFrame(index=range(resample_n))
-expenditure_mideast['resampled_usage'] = generate_pert(resample_n, 34, 198, 218)['rand_pert']
-expenditure_mideast['resampled_price'] = generate_pert(resample_n, 20476, 108806, 123314 ,2.5)['rand_pert']
-expenditure_mideast['resampled_expenditure'] = expenditure_mideast['resampled_usage'] * expenditure_mideast['resampled_price']
-expenditure_mideast['expenditure_pctile'] = expenditure_mideast['resampled_expenditure'].rank(pct=True)
-
-# Plot
-snplt = sns.displot(
-	data=expenditure_mideast
-	,x='resampled_expenditure'
-	,kind='hist'
-    ,stat='probability'
-    ,bins=20
-)
 
-# Get CI for expenditure from percentiles of the resampled distribution
-def add_expenditure_ci(REGION):
-    if REGION.upper() == 'AFRICA':
-        ci_low = expenditure_africa.query("expenditure_pctile == 0.025")['resampled_expenditure'].values[0]
-        ci_mid = expenditure_africa.query("expenditure_pctile == 0.5")['resampled_expenditure'].values[0]
-        ci_high = expenditure_africa.query("expenditure_pctile == 0.975")['resampled_expenditure'].values[0]
-    elif REGION.upper() == 'AMERICAS':
-        ci_low = expenditure_americas.query("expenditure_pctile == 0.025")['resampled_expenditure'].values[0]
-        ci_mid = expenditure_americas.query("expenditure_pctile == 0.5")['resampled_expenditure'].values[0]
-        ci_high = expenditure_americas.query("expenditure_pctile == 0.975")['resampled_expenditure'].values[0]
-    elif 'ASIA' in REGION.upper():
-        ci_low = expenditure_asia.query("expenditure_pctile == 0.025")['resampled_expenditure'].values[0]
-        ci_mid = expenditure_asia.query("expenditure_pctile == 0.5")['resampled_expenditure'].values[0]
-        ci_high = expenditure_asia.query("expenditure_pctile == 0.975")['resampled_expenditure'].values[0]
-    elif REGION.upper() == 'EUROPE':
-        ci_low = expenditure_europe.query("expenditure_pctile == 0.025")['resampled_expenditure'].values[0]
-        ci_mid = expenditure_europe.query("expenditure_pctile == 0.5")['resampled_expenditure'].values[0]
-        ci_high = expenditure_europe.query("expenditure_pctile == 0.975")['resampled_expenditure'].values[0]
-    elif REGION.upper() == 'MIDDLE EAST':
-        ci_low = expenditure_mideast.query("expenditure_pctile == 0.025")['resampled_expenditure'].values[0]
-        ci_mid = expenditure_mideast.query("expenditure_pctile == 0.5")['resampled_expenditure'].values[0]
-        ci_high = expenditure_mideast.query("expenditure_pctile == 0.975")['resampled_expenditure'].values[0]
-    else:
-        ci_low = np.nan
-        ci_mid = np.nan
-        ci_high = np.nan
-    return pd.Series([ci_low ,ci_mid ,ci_high])
-amu_uncertainty_data[['expenditure_ci95_low' ,'expenditure_ci95_mid' ,'expenditure_ci95_high']] = amu_uncertainty_data['region'].apply(add_expenditure_ci)
-
-amu_uncertainty_data = amu_uncertainty_data.eval(
-    '''
     amu_terrestrial_expenditure_midpoint = expenditure_ci95_mid
     amu_terrestrial_expenditure_errorlow = amu_terrestrial_expenditure_midpoint - expenditure_ci95_low
     amu_terrestrial_expenditure_errorhigh = expenditure_ci95_high - amu_terrestrial_expenditure_midpoint
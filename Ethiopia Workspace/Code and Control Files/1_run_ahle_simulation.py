@@ -19,6 +19,9 @@ import subprocess                # For running command prompt or other programs
 import inspect                   # For inspecting objects
 import datetime as dt            # Date and time functions
 
+import _pipeline_common_path     # Adds pipeline_common, with the modules shared by all workspaces, to sys.path
+import _profiling as prof        # Timing, data info and profiling shared across workspaces
+
 # Run a command on the command line using subprocess package
 # Example usage: run_cmd(['dir' ,'c:\\users'] ,SHELL=True ,SHOW_MAXLINES=10)
 # To run an R program:
@@ -58,34 +61,8 @@ def run_cmd(
    return cmd_status.returncode    # If you want to use something that is returned, add it here. Assign it when you call the function e.g. returned_object = run_cmd().
 
 # To time a piece of code
-def timerstart(LABEL=None):      # String (opt): add a label to the printed timer messages
-   global _timerstart ,_timerstart_label
-   funcname = inspect.currentframe().f_code.co_name
-   _timerstart_label = LABEL
-   _timerstart = dt.datetime.now()
-   if _timerstart_label:
-      print(f"\n<{funcname}> {_timerstart_label} {_timerstart :%I:%M:%S %p} \n")
-   else:
-      print(f"\n<{funcname}> {_timerstart :%I:%M:%S %p} \n")
-   return None
-
-def timerstop():
-   global _timerstop
-   funcname = inspect.currentframe().f_code.co_name
-   if '_timerstart' in globals():
-      _timerstop = dt.datetime.now()
-      elapsed = _timerstop - _timerstart
-      hours = (elapsed.days * 24) + (elapsed.seconds // 3600)
-      minutes = (elapsed.seconds % 3600) // 60
-      seconds = (elapsed.seconds % 60) + (elapsed.microseconds / 1e6)
-      print(f"\n<{funcname}> {_timerstop :%I:%M:%S %p}")
-      if _timerstart_label:
-         print(f"<{funcname}> {_timerstart_label} Elapsed {hours}h: {minutes}m: {seconds :.1f}s \n")
-      else:
-         print(f"<{funcname}> Elapsed {hours}h: {minutes}m: {seconds :.1f}s \n")
-   else:
-      print(f"<{funcname}> Error: no start time defined. Call timerstart() first.")
-   return None
+timerstart = prof.timerstart
+timerstop = prof.timerstop
 
 #%% Paths and variables
 
@@ -107,6 +84,12 @@ r_executable = 'C:\\Program Files\\R\\R-4.3.1\\bin\\x64\\Rscript.exe'
 
 N_RUNS = '10000'   # String: number of simulation runs for each scenario
 
+# Profiling: True to record time and memory for each timerstart()/timerstop() pair and each dataframe
+# passed to datainfo(). The report is written to Program outputs/profiling and compared to the previous run.
+PROFILE_RUN = False
+if PROFILE_RUN:
+   prof.start_run('1_run_ahle_simulation' ,REPORT_FOLDER=os.path.join(ETHIOPIA_OUTPUT_FOLDER ,'profiling'))
+
 #%% Small ruminants
 
 # Full path to the AHLE function in R
@@ -407,3 +390,7 @@ r_args = [
 timerstart()
 returncode_poultry = run_cmd([r_executable ,r_script] + r_args ,SHOW_MAXLINES=999)
 timerstop()
+
+#%% Profiling report
+
+prof.finish_run()     # Does nothing unless PROFILE_RUN is True
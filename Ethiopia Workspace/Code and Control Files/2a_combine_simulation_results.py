@@ -25,6 +25,9 @@ import numpy as np
 import pandas as pd
 import pickle            # To save objects to disk
 
+import _pipeline_common_path     # Adds pipeline_common, with the modules shared by all workspaces, to sys.path
+import _profiling as prof        # Timing, data info and profiling shared across workspaces
+
 # To clean up column names in a dataframe
 def cleancolnames(INPUT_DF):
    # Comments inside the statement create errors. Putting all comments at the top.
@@ -54,34 +57,7 @@ def cleancolnames(INPUT_DF):
    return None
 
 # To print df.info() with header for readability, and optionally write data info to text file
-def datainfo(
-      INPUT_DF
-      ,MAX_COLS=100
-      ,OUTFOLDER=None     # String (opt): folder to output {dataname}_info.txt. If None, no file will be created.
-   ):
-   funcname = inspect.currentframe().f_code.co_name
-   dataname = [x for x in globals() if globals()[x] is INPUT_DF][0]
-   rowcount = INPUT_DF.shape[0]
-   colcount = INPUT_DF.shape[1]
-   idxcols = str(list(INPUT_DF.index.names))
-   header = f"Data name: {dataname :>26s}\nRows:      {rowcount :>26,}\nColumns:   {colcount :>26,}\nIndex:     {idxcols :>26s}\n"
-   divider = ('-'*26) + ('-'*11) + '\n'
-   bigdivider = ('='*26) + ('='*11) + '\n'
-   print(bigdivider + header + divider)
-   INPUT_DF.info(max_cols=MAX_COLS)
-   print(divider + f"End:       {dataname:>26s}\n" + bigdivider)
-
-   if OUTFOLDER:     # If something has been passed to OUTFOLDER parameter
-      filename = f"{dataname}_info"
-      print(f"\n<{funcname}> Creating file {OUTFOLDER}\{filename}.txt")
-      datetimestamp = 'Created on ' + time.strftime('%Y-%m-%d %X', time.gmtime()) + ' UTC' + '\n'
-      buffer = io.StringIO()
-      INPUT_DF.info(buf=buffer, max_cols=colcount)
-      filecontents = header + divider + datetimestamp + buffer.getvalue()
-      tofile = os.path.join(OUTFOLDER, f"{filename}.txt")
-      with open(tofile, 'w', encoding='utf-8') as f: f.write(filecontents)
-      print(f"<{funcname}> ...done.")
-   return None
+datainfo = prof.datainfo
 
 # To turn column indexes into names. Will remove multi-indexing.
 # Must assign the output to a dataframe e.g. df = colnames_from_index(df).
@@ -117,6 +93,12 @@ MURDOCH_OUTPUT_FOLDER = os.path.join(MURDOCH_BASE_FOLDER ,'output')
 
 DASH_DATA_FOLDER = os.path.join(GRANDPARENT_FOLDER, 'AHLE Dashboard' ,'Dash App' ,'data')
 
+# Profiling: True to record time and memory for each timerstart()/timerstop() pair and each dataframe
+# passed to datainfo(). The report is written to Program outputs/profiling and compared to the previous run.
+PROFILE_RUN = False
+if PROFILE_RUN:
+   prof.start_run('2a_combine_simulation_results' ,REPORT_FOLDER=os.path.join(ETHIOPIA_OUTPUT_FOLDER ,'profiling'))
+
 #%% COMBINE SCENARIO RESULT FILES
 '''
 This imports CSV files that are output from the compartmental model.
@@ -979,3 +961,7 @@ ahle_combo_adj = ahle_combo_adj.drop_duplicates(
 datainfo(ahle_combo_adj ,200)
 
 ahle_combo_adj.to_csv(os.path.join(ETHIOPIA_OUTPUT_FOLDER ,'ahle_all_stacked_adj.csv') ,index=False)
+
+#%% PROFILING REPORT
+
+prof.finish_run()     # Does nothing unless PROFILE_RUN is True
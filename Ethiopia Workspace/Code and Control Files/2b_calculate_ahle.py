@@ -12,12 +12,18 @@ import os
 import inspect
 import io
 import time
+import subprocess                # To publish the dashboard data
 import datetime as dtm
 import numpy as np
 import pandas as pd
 import pickle
 import wbdata         # To access World Bank data through API calls
 
+import sys
+import _pipeline_common_path     # Adds pipeline_common, with the modules shared by all workspaces, to sys.path
+import _ahle_partitions as ahlep     # Partition-wise aggregation across worker processes
+import _profiling as prof            # Timing, data info and profiling shared across workspaces
+
 # To clean up column names in a dataframe
 def cleancolnames(INPUT_DF):
    # Comments inside the statement create errors. Putting all comments at the top.
@@ -47,34 +53,7 @@ def cleancolnames(INPUT_DF):
    return None
 
 # To print df.info() with header for readability, and optionally write data info to text file
-def datainfo(
-      INPUT_DF
-      ,MAX_COLS=100
-      ,OUTFOLDER=None     # String (opt): folder to output {dataname}_info.txt. If None, no file will be created.
-   ):
-   funcname = inspect.currentframe().f_code.co_name
-   dataname = [x for x in globals() if globals()[x] is INPUT_DF][0]
-   rowcount = INPUT_DF.shape[0]
-   colcount = INPUT_DF.shape[1]
-   idxcols = str(list(INPUT_DF.index.names))
-   header = f"Data name: {dataname :>26s}\nRows:      {rowcount :>26,}\nColumns:   {colcount :>26,}\nIndex:     {idxcols :>26s}\n"
-   divider = ('-'*26) + ('-'*11) + '\n'
-   bigdivider = ('='*26) + ('='*11) + '\n'
-   print(bigdivider + header + divider)
-   INPUT_DF.info(max_cols=MAX_COLS)
-   print(divider + f"End:       {dataname:>26s}\n" + bigdivider)
-
-   if OUTFOLDER:     # If something has been passed to OUTFOLDER parameter
-      filename = f"{dataname}_info"
-      print(f"\n<{funcname}> Creating file {OUTFOLDER}\{filename}.txt")
-      datetimestamp = 'Created on ' + time.strftime('%Y-%m-%d %X', time.gmtime()) + ' UTC' + '\n'
-      buffer = io.StringIO()
-      INPUT_DF.info(buf=buffer, max_cols=colcount)
-      filecontents = header + divider + datetimestamp + buffer.getvalue()
-      tofile = os.path.join(OUTFOLDER, f"{filename}.txt")
-      with open(tofile, 'w', encoding='utf-8') as f: f.write(filecontents)
-      print(f"<{funcname}> ...done.")
-   return None
+datainfo = prof.datainfo
 
 # To turn column indexes into names. Will remove multi-indexing.
 # Must assign the output to a dataframe e.g. df = colnames_from_index(df).
@@ -105,6 +84,15 @@ ETHIOPIA_DATA_FOLDER = os.path.join(PARENT_FOLDER ,'Data')
 
 DASH_DATA_FOLDER = os.path.join(GRANDPARENT_FOLDER, 'AHLE Dashboard' ,'Dash App' ,'data')
 
+# Worker processes for the partition-wise aggregation. None: one per CPU. 1: run in this process.
+PARTITION_WORKERS = None
+
+# Profiling: True to record time and memory for each timerstart()/timerstop() pair and each dataframe
+# passed to datainfo(). The report is written to Program outputs/profiling and compared to the previous run.
+PROFILE_RUN = False
+if PROFILE_RUN:
+   prof.start_run('2b_calculate_ahle' ,REPORT_FOLDER=os.path.join(ETHIOPIA_OUTPUT_FOLDER ,'profiling'))
+
 #%% EXTERNAL DATA
 
 # =============================================================================
@@ -163,17 +151,14 @@ sd_cols = [i for i in list(ahle_combo_adj) if 'stdev' in i]
 # =============================================================================
 #### Drop aggregate groups
 # =============================================================================
-# Separate all existing overall or combined groups
+# Existing overall or combined groups are separated from the individual age/sex
+# groups for each partition below.
 _combined_rows = (ahle_combo_adj['group'].str.contains('OVERALL' ,case=False ,na=False))\
     | (ahle_combo_adj['group'].str.contains('COMBINED' ,case=False ,na=False))
-ahle_combo_overall = ahle_combo_adj.loc[_combined_rows].copy()
-
-# Create version without any aggregate groups
-ahle_combo_indiv = ahle_combo_adj.loc[~ _combined_rows].copy()
 
 # Get distinct values for ages and sexes without aggregates
-age_group_values = list(ahle_combo_indiv['age_group'].unique())
-sex_values = list(ahle_combo_indiv['sex'].unique())
+age_group_values = list(ahle_combo_adj.loc[~ _combined_rows ,'age_group'].unique())
+sex_values = list(ahle_combo_adj.loc[~ _combined_rows ,'sex'].unique())
 
 # =============================================================================
 #### Add placeholder items
@@ -200,190 +185,63 @@ placeholders.
 #     ahle_combo_withplaceholders[COL] = ahle_combo_withplaceholders[COL].replace(np.nan ,0)
 
 # =============================================================================
-#### Build aggregate age/sex groups
+#### Build aggregate age/sex groups and production system
 # =============================================================================
+'''
+Each species, region and year is aggregated separately, in parallel worker
+processes. See ahlep.aggregate_agesex_prodsys() for the steps:
+    - Overall age/sex group
+    - Overall sex for each age group ("<age group> Combined")
+    - Overall age group for each sex ("Overall <sex>")
+    - Overall production system. This is done after concatenating the combined
+      age/sex groups so that it is calculated for them as well.
+Only the mean and standard deviation of each item are used, as the other
+statistics cannot be summed. Standard deviations are summed as variances
+(sqrd_ columns), relying on the following properties of sums of random variables:
+   mean(aX + bY) = a*mean(X) + b*mean(Y), regardless of correlation
+   var(aX + bY) = a^2*var(X) + b^2*var(Y), assuming X and Y are uncorrelated
+'''
 # Define full set of key variables
 # Make tuple so immutable
 all_byvars = ('species' ,'region' ,'production_system' ,'item' ,'item_type_code' ,'group' ,'age_group' ,'sex' ,'year')
-
-# Only using mean and standard deviaion of each item, as the other statistics
-# cannot be summed.
-keepcols = list(all_byvars) + mean_cols + sd_cols
-ahle_combo_indiv = ahle_combo_indiv[keepcols].copy()
-datainfo(ahle_combo_indiv)
-
-# -----------------------------------------------------------------------------
-# Create variance columns
-# -----------------------------------------------------------------------------
-# Relying on the following properties of sums of random variables:
-#    mean(aX + bY) = a*mean(X) + b*mean(Y), regardless of correlation
-#    var(aX + bY) = a^2*var(X) + b^2*var(Y), assuming X and Y are uncorrelated
 var_cols = ['sqrd_' + COLNAME for COLNAME in sd_cols]
-for i ,VARCOL in enumerate(var_cols):
-   SDCOL = sd_cols[i]
-   ahle_combo_indiv[VARCOL] = ahle_combo_indiv[SDCOL]**2
 
-datainfo(ahle_combo_indiv)
-
-# -----------------------------------------------------------------------------
-# Create Overall age/sex group
-# -----------------------------------------------------------------------------
-agg_vars = ['group' ,'age_group' ,'sex']
-summarize_byvars = list(all_byvars)
-for i in agg_vars:
-    summarize_byvars.remove(i)
-
-ahle_combo_sum_groups = ahle_combo_indiv.pivot_table(
-    index=summarize_byvars
-    ,values=mean_cols + var_cols
-    ,aggfunc=lambda x: x.mean() * x.count()  # Hack: sum is equal to zero if all values are missing. This will cause all missings to produce missing.
-).reset_index()
-ahle_combo_sum_groups['group'] = 'Overall'
-ahle_combo_sum_groups['age_group'] = 'Overall'
-ahle_combo_sum_groups['sex'] = 'Overall'
-
-# -----------------------------------------------------------------------------
-# Create Overall sex for each age group
-# -----------------------------------------------------------------------------
-agg_vars = ['group' ,'sex']
-summarize_byvars = list(all_byvars)
-for i in agg_vars:
-    summarize_byvars.remove(i)
-
-ahle_combo_sum_sexes = pd.DataFrame()    # Initialize
-for AGE_GRP in age_group_values:
-    ahle_combo_sum_sexes_oneage = ahle_combo_indiv.query(f"age_group == '{AGE_GRP}'").pivot_table(
-        index=summarize_byvars
-        ,values=mean_cols + var_cols
-        ,aggfunc=lambda x: x.mean() * x.count()  # Hack: sum is equal to zero if all values are missing. This will cause all missings to produce missing.
-    ).reset_index()
-    ahle_combo_sum_sexes_oneage['group'] = f'{AGE_GRP} Combined'
-    ahle_combo_sum_sexes_oneage['sex'] = 'Overall'
-
-    # Stack
-    ahle_combo_sum_sexes = pd.concat(
-        [ahle_combo_sum_sexes ,ahle_combo_sum_sexes_oneage]
-        ,axis=0              # axis=0: concatenate rows (stack), axis=1: concatenate columns (merge)
-        ,join='outer'        # 'outer': keep all index values from all data frames
-        ,ignore_index=True   # True: do not keep index values on concatenation axis
-    )
-    del ahle_combo_sum_sexes_oneage
-
-# Oxen are a special age group which is only male. Drop "combined" sex.
-_oxen_combined = (ahle_combo_sum_sexes['group'].str.upper() == 'OXEN COMBINED')
-ahle_combo_sum_sexes = ahle_combo_sum_sexes.loc[~ _oxen_combined].reset_index(drop=True)
-
-# -----------------------------------------------------------------------------
-# Create Overall age group for each sex
-# -----------------------------------------------------------------------------
-agg_vars = ['group' ,'age_group']
-summarize_byvars = list(all_byvars)
-for i in agg_vars:
-    summarize_byvars.remove(i)
-
-ahle_combo_sum_ages = pd.DataFrame()     # Initialize
-for SEX_GRP in sex_values:
-    ahle_combo_sum_ages_onesex = ahle_combo_indiv.query(f"sex == '{SEX_GRP}'").pivot_table(
-        index=summarize_byvars
-        ,values=mean_cols + var_cols
-        ,aggfunc=lambda x: x.mean() * x.count()  # Hack: sum is equal to zero if all values are missing. This will cause all missings to produce missing.
-    ).reset_index()
-    ahle_combo_sum_ages_onesex['group'] = f'Overall {SEX_GRP}'
-    ahle_combo_sum_ages_onesex['age_group'] = 'Overall'
-
-    # Stack
-    ahle_combo_sum_ages = pd.concat(
-        [ahle_combo_sum_ages ,ahle_combo_sum_ages_onesex]
-        ,axis=0              # axis=0: concatenate rows (stack), axis=1: concatenate columns (merge)
-        ,join='outer'        # 'outer': keep all index values from all data frames
-        ,ignore_index=True   # True: do not keep index values on concatenation axis
-    )
-    del ahle_combo_sum_ages_onesex
-
-# -----------------------------------------------------------------------------
-# Concatenate all and de-dup
-# -----------------------------------------------------------------------------
-concat_dataframes = [
-    ahle_combo_indiv
-    ,ahle_combo_sum_groups
-    ,ahle_combo_sum_sexes
-    ,ahle_combo_sum_ages
-
-    # Original overall group rows
-    ,ahle_combo_overall     # Set at end so de-dup keeps newer groups if they exist
-]
-ahle_combo_withagg = pd.concat(
-   concat_dataframes
-   ,axis=0              # axis=0: concatenate rows (stack), axis=1: concatenate columns (merge)
-   ,join='outer'        # 'outer': keep all columns
-   ,ignore_index=True   # True: do not keep index values on concatenation axis
+timerstart('Aggregate groups and species')
+ahle_combo_withagg = ahlep.map_partitions(
+    ahlep.aggregate_agesex_prodsys
+    ,ahle_combo_adj
+    ,BY=['species' ,'region' ,'year']
+    ,ARGS=(all_byvars ,mean_cols ,sd_cols ,age_group_values ,sex_values)
+    ,MAX_WORKERS=PARTITION_WORKERS
 )
-del ahle_combo_indiv ,ahle_combo_sum_groups ,ahle_combo_sum_sexes ,ahle_combo_sum_ages ,ahle_combo_overall
-
-# De-Dup
-ahle_combo_withagg = ahle_combo_withagg.drop_duplicates(subset=all_byvars ,keep='first')
+datainfo(ahle_combo_withagg)
 
 # =============================================================================
-#### Build aggregate species and production system groups
+#### Build aggregate species groups
 # =============================================================================
 '''
-These must be done after concatenating combined age/sex groups so that they are
-calculated for the combined groups as well.
+These must be done after the combined age/sex groups and production systems so
+that they are calculated for the combined groups as well. Each region and year
+is combined separately, in parallel, and the rollups are stacked after the
+individual species. See ahlep.SPECIES_ROLLUPS for the species combined.
 '''
-# -----------------------------------------------------------------------------
-# Create overall production system
-# -----------------------------------------------------------------------------
-agg_vars = ['production_system']
-summarize_byvars = list(all_byvars)
-for i in agg_vars:
-    summarize_byvars.remove(i)
-
-ahle_combo_sum_prodsys = ahle_combo_withagg.pivot_table(
-   index=summarize_byvars
-   ,values=mean_cols + var_cols
-   ,aggfunc=lambda x: x.mean() * x.count()  # Hack: sum is equal to zero if all values are missing. This will cause all missings to produce missing.
-).reset_index()
-ahle_combo_sum_prodsys['production_system'] = 'Overall'
-
-ahle_combo_withagg = pd.concat(
-    [ahle_combo_withagg ,ahle_combo_sum_prodsys]
-    ,axis=0              # axis=0: concatenate rows (stack), axis=1: concatenate columns (merge)
-    ,join='outer'        # 'outer': keep all index values from all data frames
-    ,ignore_index=True   # True: do not keep index values on concatenation axis
+summarize_byvars = [i for i in all_byvars if i != 'species']
+ahle_combo_sum_species = ahlep.map_partitions(
+    ahlep.rollup_species
+    ,ahle_combo_withagg
+    ,BY=['region' ,'year']
+    ,ARGS=(summarize_byvars ,mean_cols + var_cols)
+    ,MAX_WORKERS=PARTITION_WORKERS
 )
-del ahle_combo_sum_prodsys
-
-# -----------------------------------------------------------------------------
-# Create combined species
-# -----------------------------------------------------------------------------
-agg_vars = ['species']
-summarize_byvars = list(all_byvars)
-for i in agg_vars:
-    summarize_byvars.remove(i)
-
-# All Small Ruminants
-ahle_combo_sum_species = ahle_combo_withagg.query("species.str.upper().isin(['SHEEP' ,'GOAT'])").pivot_table(
-   index=summarize_byvars
-   ,values=mean_cols + var_cols
-   ,aggfunc=lambda x: x.mean() * x.count()  # Hack: sum is equal to zero if all values are missing. This will cause all missings to produce missing.
-).reset_index()
-ahle_combo_sum_species['species'] = 'All Small Ruminants'
-
-# All poultry
-ahle_combo_sum_species2 = ahle_combo_withagg.query("species.str.contains('poultry' ,case=False ,na=False)").pivot_table(
-   index=summarize_byvars
-   ,values=mean_cols + var_cols
-   ,aggfunc=lambda x: x.mean() * x.count()  # Hack: sum is equal to zero if all values are missing. This will cause all missings to produce missing.
-).reset_index()
-ahle_combo_sum_species2['species'] = 'All Poultry'
 
 ahle_combo_withagg = pd.concat(
-    [ahle_combo_withagg ,ahle_combo_sum_species ,ahle_combo_sum_species2]
+    [ahle_combo_withagg ,ahle_combo_sum_species]
     ,axis=0              # axis=0: concatenate rows (stack), axis=1: concatenate columns (merge)
     ,join='outer'        # 'outer': keep all columns
     ,ignore_index=True   # True: do not keep index values on concatenation axis
 )
-del ahle_combo_sum_species ,ahle_combo_sum_species2
+del ahle_combo_sum_species
+timerstop()
 
 # =============================================================================
 #### Calculate standard deviations
@@ -955,3 +813,15 @@ print(check_ahle_combo_withahle.query("ahle_dueto_bruc_total_mean.notnull()")[['
 
 print('\n> Checking the AHLE for FMD against the overall')
 print(check_ahle_combo_withahle.query("ahle_dueto_fmd_total_mean.notnull()")[['species' ,'production_system' ,'year' ,'ahle_dueto_fmd_vs_total']])
+
+#%% PUBLISH TO DASHBOARD
+
+# Publish the dashboard files as a new data snapshot. Running dashboards switch to it without a restart.
+subprocess.run(
+    [sys.executable ,os.path.join(DASH_DATA_FOLDER ,os.pardir ,'lib' ,'data_snapshots.py') ,'publish' ,DASH_DATA_FOLDER]
+    ,check=True
+)
+
+#%% PROFILING REPORT
+
+prof.finish_run()     # Does nothing unless PROFILE_RUN is True
@@ -19,10 +19,16 @@ import os                        # Operating system functions
 import inspect
 import io
 import time
+import subprocess                # To publish the dashboard data
 import numpy as np
 import pandas as pd
 import pickle                             # To save objects to disk
 
+import sys
+import _pipeline_common_path     # Adds pipeline_common, with the modules shared by all workspaces, to sys.path
+import _ahle_partitions as ahlep          # Partition-wise aggregation across worker processes
+import _profiling as prof                 # Timing, data info and profiling shared across workspaces
+
 # To clean up column names in a dataframe
 def cleancolnames(INPUT_DF):
    # Comments inside the statement create errors. Putting all comments at the top.
@@ -52,34 +58,7 @@ def cleancolnames(INPUT_DF):
    return None
 
 # To print df.info() with header for readability, and optionally write data info to text file
-def datainfo(
-      INPUT_DF
-      ,MAX_COLS=100
-      ,OUTFOLDER=None     # String (opt): folder to output {dataname}_info.txt. If None, no file will be created.
-   ):
-   funcname = inspect.currentframe().f_code.co_name
-   dataname = [x for x in globals() if globals()[x] is INPUT_DF][0]
-   rowcount = INPUT_DF.shape[0]
-   colcount = INPUT_DF.shape[1]
-   idxcols = str(list(INPUT_DF.index.names))
-   header = f"Data name: {dataname :>26s}\nRows:      {rowcount :>26,}\nColumns:   {colcount :>26,}\nIndex:     {idxcols :>26s}\n"
-   divider = ('-'*26) + ('-'*11) + '\n'
-   bigdivider = ('='*26) + ('='*11) + '\n'
-   print(bigdivider + header + divider)
-   INPUT_DF.info(max_cols=MAX_COLS)
-   print(divider + f"End:       {dataname:>26s}\n" + bigdivider)
-
-   if OUTFOLDER:     # If something has been passed to OUTFOLDER parameter
-      filename = f"{dataname}_info"
-      print(f"\n<{funcname}> Creating file {OUTFOLDER}\{filename}.txt")
-      datetimestamp = 'Created on ' + time.strftime('%Y-%m-%d %X', time.gmtime()) + ' UTC' + '\n'
-      buffer = io.StringIO()
-      INPUT_DF.info(buf=buffer, max_cols=colcount)
-      filecontents = header + divider + datetimestamp + buffer.getvalue()
-      tofile = os.path.join(OUTFOLDER, f"{filename}.txt")
-      with open(tofile, 'w', encoding='utf-8') as f: f.write(filecontents)
-      print(f"<{funcname}> ...done.")
-   return None
+datainfo = prof.datainfo
 
 # To turn column indexes into names. Will remove multi-indexing.
 # Must assign the output to a dataframe e.g. df = colnames_from_index(df).
@@ -136,6 +115,15 @@ ETHIOPIA_DATA_FOLDER = os.path.join(PARENT_FOLDER ,'Data')
 
 DASH_DATA_FOLDER = os.path.join(GRANDPARENT_FOLDER, 'AHLE Dashboard' ,'Dash App' ,'data')
 
+# Worker processes for the partition-wise aggregation. None: one per CPU. 1: run in this process.
+PARTITION_WORKERS = None
+
+# Profiling: True to record time and memory for each timerstart()/timerstop() pair and each dataframe
+# passed to datainfo(). The report is written to Program outputs/profiling and compared to the previous run.
+PROFILE_RUN = False
+if PROFILE_RUN:
+   prof.start_run('2c_create_scenario_summary' ,REPORT_FOLDER=os.path.join(ETHIOPIA_OUTPUT_FOLDER ,'profiling'))
+
 #%% READ DATA
 
 # =============================================================================
@@ -153,7 +141,8 @@ exchg_data_tomerge = pd.read_pickle(os.path.join(ETHIOPIA_DATA_FOLDER ,'wb_exchg
 Plan to minimize changes needed in Dash:
     Columns will retain names of system total scenarios, e.g:
         mean_ideal, mean_mortality_zero, etc.
-        mean_ideal_usd, mean_mortality_zero_usd, etc.
+    Values are in Birr only, with the exchange rate for each year in exchg_rate_lcuperusdol.
+    Dash converts the rows it displays to USD, rather than this table carrying a USD copy of every column.
     agesex_scenario column will signify the scope of each scenario, e.g.:
         Where agesex_scenario == 'Overall', entry is result of system total scenario
         Where agesex_scenario == 'Adult Female', entry is result of AF-specific scenario
@@ -687,48 +676,38 @@ for i ,VARCOL in enumerate(var_cols):
 # -----------------------------------------------------------------------------
 # Create overall production system
 # -----------------------------------------------------------------------------
-ahle_combo_scensmry_sumprod = ahle_combo_scensmry.pivot_table(
-   index=['region' ,'species' ,'item' ,'item_type_code' ,'agesex_scenario' ,'year']
-   ,values=mean_cols_scensmry + var_cols
-   ,aggfunc=lambda x: x.mean() * x.count()  # Hack: sum is equal to zero if all values are missing. This will cause all missings to produce missing.
-).reset_index()
-ahle_combo_scensmry_sumprod['production_system'] = 'Overall'
-
-ahle_combo_scensmry = pd.concat(
-   [ahle_combo_scensmry ,ahle_combo_scensmry_sumprod]
-   ,axis=0              # axis=0: concatenate rows (stack), axis=1: concatenate columns (merge)
-   ,join='outer'        # 'outer': keep all index values from all data frames
-   ,ignore_index=True   # True: do not keep index values on concatenation axis
+# Each species, region and year is summed separately, in parallel worker processes
+timerstart('Aggregate production systems and species')
+ahle_combo_scensmry = ahlep.map_partitions(
+   ahlep.add_overall_prodsys
+   ,ahle_combo_scensmry
+   ,BY=['species' ,'region' ,'year']
+   ,ARGS=(['region' ,'species' ,'item' ,'item_type_code' ,'agesex_scenario' ,'year'] ,mean_cols_scensmry + var_cols)
+   ,MAX_WORKERS=PARTITION_WORKERS
 )
-del ahle_combo_scensmry_sumprod
 
 # -----------------------------------------------------------------------------
 # Create combined species
 # -----------------------------------------------------------------------------
-# "All Small Ruminants" for Sheep and Goats
-ahle_combo_scensmry_sumspec1 = ahle_combo_scensmry.query("species.str.upper().isin(['SHEEP' ,'GOAT'])").pivot_table(
-   index=['region' ,'production_system' ,'item' ,'item_type_code' ,'agesex_scenario' ,'year']
-   ,values=mean_cols_scensmry + var_cols
-   ,aggfunc=lambda x: x.mean() * x.count()  # Hack: sum is equal to zero if all values are missing. This will cause all missings to produce missing.
-).reset_index()
-ahle_combo_scensmry_sumspec1['species'] = 'All Small Ruminants'
-
-# "All poultry"
-ahle_combo_scensmry_sumspec2 = ahle_combo_scensmry.query("species.str.contains('poultry' ,case=False ,na=False)").pivot_table(
-   index=['region' ,'production_system' ,'item' ,'item_type_code' ,'agesex_scenario' ,'year']
-   ,values=mean_cols_scensmry + var_cols
-   ,aggfunc=lambda x: x.mean() * x.count()  # Hack: sum is equal to zero if all values are missing. This will cause all missings to produce missing.
-).reset_index()
-ahle_combo_scensmry_sumspec2['species'] = 'All Poultry'
+# "All Small Ruminants" for Sheep and Goats, and "All Poultry". See ahlep.SPECIES_ROLLUPS.
+# Each region and year is combined separately, in parallel, and the rollups are stacked after the individual species.
+ahle_combo_scensmry_sumspec = ahlep.map_partitions(
+   ahlep.rollup_species
+   ,ahle_combo_scensmry
+   ,BY=['region' ,'year']
+   ,ARGS=(['region' ,'production_system' ,'item' ,'item_type_code' ,'agesex_scenario' ,'year'] ,mean_cols_scensmry + var_cols)
+   ,MAX_WORKERS=PARTITION_WORKERS
+)
 
 # Concatenate
 ahle_combo_scensmry = pd.concat(
-   [ahle_combo_scensmry ,ahle_combo_scensmry_sumspec1 ,ahle_combo_scensmry_sumspec2]
+   [ahle_combo_scensmry ,ahle_combo_scensmry_sumspec]
    ,axis=0              # axis=0: concatenate rows (stack), axis=1: concatenate columns (merge)
    ,join='outer'        # 'outer': keep all index values from all data frames
    ,ignore_index=True   # True: do not keep index values on concatenation axis
 )
-del ahle_combo_scensmry_sumspec1 ,ahle_combo_scensmry_sumspec2
+del ahle_combo_scensmry_sumspec
+timerstop()
 
 # -----------------------------------------------------------------------------
 # Calculate standard deviations
@@ -822,22 +801,9 @@ ahle_combo_scensmry_diffs = pd.merge(
     )
 del ahle_combo_scensmry_diffs['country_name']
 
-# Create column lists to include AHLE cols
-mean_cols_scensmry_diffs = [i for i in list(ahle_combo_scensmry_diffs) if 'mean' in i]
-sd_cols_scensmry_diffs = [i for i in list(ahle_combo_scensmry_diffs) if 'stdev' in i]
-
-# Add columns in USD for currency items
-for MEANCOL in mean_cols_scensmry_diffs:
-    MEANCOL_USD = MEANCOL + '_usd'
-    ahle_combo_scensmry_diffs.loc[ahle_combo_scensmry_diffs['item_type_code'].isin(['mv' ,'mc']) ,MEANCOL_USD] = \
-        ahle_combo_scensmry_diffs[MEANCOL] / ahle_combo_scensmry_diffs['exchg_rate_lcuperusdol']
-
-# For standard deviations, convert to variances then scale by the squared denominator
-# VAR(aX) = a^2 * VAR(X). a = 1/exchange rate.
-for SDCOL in sd_cols_scensmry_diffs:
-    SDCOL_USD = SDCOL + '_usd'
-    ahle_combo_scensmry_diffs.loc[ahle_combo_scensmry_diffs['item_type_code'].isin(['mv' ,'mc']) ,SDCOL_USD] = \
-        np.sqrt(ahle_combo_scensmry_diffs[SDCOL]**2 / ahle_combo_scensmry_diffs['exchg_rate_lcuperusdol']**2)
+# USD columns are not added here. Means and standard deviations of currency items (item_type_code
+# 'mv' or 'mc') both convert by dividing by the exchange rate, as SD(aX) = a * SD(X) for a > 0,
+# so Dash applies the conversion to the rows it displays.
 
 # =============================================================================
 #### Add columns per kg biomass
@@ -860,18 +826,18 @@ ahle_combo_scensmry_diffs = pd.merge(
     ,how='left'
 )
 
-# Recreate column lists to include USD columns
-mean_cols_scensmry_diffs_usd = [i for i in list(ahle_combo_scensmry_diffs) if 'mean' in i]
-sd_cols_scensmry_diffs_usd = [i for i in list(ahle_combo_scensmry_diffs) if 'stdev' in i]
+# Create column lists to include AHLE cols
+mean_cols_scensmry_diffs = [i for i in list(ahle_combo_scensmry_diffs) if 'mean' in i]
+sd_cols_scensmry_diffs = [i for i in list(ahle_combo_scensmry_diffs) if 'stdev' in i]
 
 # Calculate value columns per kg liveweight
-for MEANCOL in mean_cols_scensmry_diffs_usd:
+for MEANCOL in mean_cols_scensmry_diffs:
     NEWCOL_NAME = MEANCOL + '_perkgbiomass'
     ahle_combo_scensmry_diffs[NEWCOL_NAME] = ahle_combo_scensmry_diffs[MEANCOL] / ahle_combo_scensmry_diffs['population_liveweight__kg_']
 
 # For standard deviations, convert to variances then scale by the squared denominator
 # VAR(aX) = a^2 * VAR(X). a = 1/exchange rate.
-for SDCOL in sd_cols_scensmry_diffs_usd:
+for SDCOL in sd_cols_scensmry_diffs:
     NEWCOL_NAME = SDCOL + '_perkgbiomass'
     ahle_combo_scensmry_diffs[NEWCOL_NAME] = np.sqrt(ahle_combo_scensmry_diffs[SDCOL]**2 / ahle_combo_scensmry_diffs['population_liveweight__kg_']**2)
 
@@ -952,14 +918,6 @@ ahle_combo_scensmry_diffs_p = ahle_combo_scensmry_diffs_p.eval(
     ahle_dueto_healthcost_mean = mean_diff_ideal_health_cost
     ahle_dueto_healthcost_stdev = stdev_diff_ideal_health_cost
     ahle_dueto_productionloss_mean = ahle_total_mean - ahle_dueto_mortality_mean - ahle_dueto_healthcost_mean
-
-    ahle_total_mean_usd = mean_diff_ideal_usd_gross_margin
-    ahle_total_stdev_usd = stdev_diff_ideal_usd_gross_margin
-    ahle_dueto_mortality_mean_usd = mean_diff_mortzero_usd_gross_margin
-    ahle_dueto_mortality_stdev_usd = stdev_diff_mortzero_usd_gross_margin
-    ahle_dueto_healthcost_mean_usd = mean_diff_ideal_usd_health_cost
-    ahle_dueto_healthcost_stdev_usd = stdev_diff_ideal_usd_health_cost
-    ahle_dueto_productionloss_mean_usd = ahle_total_mean_usd - ahle_dueto_mortality_mean_usd - ahle_dueto_healthcost_mean_usd
     '''
     # Disease-specific
     '''
@@ -971,14 +929,6 @@ ahle_combo_scensmry_diffs_p = ahle_combo_scensmry_diffs_p.eval(
     ahle_dueto_ppr_healthcost_stdev = stdev_diff_ppr_health_cost
     ahle_dueto_ppr_productionloss_mean = ahle_dueto_ppr_total_mean - ahle_dueto_ppr_mortality_mean - ahle_dueto_ppr_healthcost_mean
 
-    ahle_dueto_ppr_total_mean_usd = mean_diff_ppr_usd_gross_margin
-    ahle_dueto_ppr_total_stdev_usd = stdev_diff_ppr_usd_gross_margin
-    ahle_dueto_ppr_mortality_mean_usd = mean_diff_ppr_usd_value_of_total_mortality * -1
-    ahle_dueto_ppr_mortality_stdev_usd = stdev_diff_ppr_usd_value_of_total_mortality * -1
-    ahle_dueto_ppr_healthcost_mean_usd = mean_diff_ppr_usd_health_cost
-    ahle_dueto_ppr_healthcost_stdev_usd = stdev_diff_ppr_usd_health_cost
-    ahle_dueto_ppr_productionloss_mean_usd = ahle_dueto_ppr_total_mean_usd - ahle_dueto_ppr_mortality_mean_usd - ahle_dueto_ppr_healthcost_mean_usd
-
     ahle_dueto_bruc_total_mean = mean_diff_bruc_gross_margin
     ahle_dueto_bruc_total_stdev = stdev_diff_bruc_gross_margin
     ahle_dueto_bruc_mortality_mean = mean_diff_bruc_value_of_total_mortality * -1
@@ -986,14 +936,6 @@ ahle_combo_scensmry_diffs_p = ahle_combo_scensmry_diffs_p.eval(
     ahle_dueto_bruc_healthcost_mean = mean_diff_bruc_health_cost
     ahle_dueto_bruc_healthcost_stdev = stdev_diff_bruc_health_cost
     ahle_dueto_bruc_productionloss_mean = ahle_dueto_bruc_total_mean - ahle_dueto_bruc_mortality_mean - ahle_dueto_bruc_healthcost_mean
-
-    ahle_dueto_bruc_total_mean_usd = mean_diff_bruc_usd_gross_margin
-    ahle_dueto_bruc_total_stdev_usd = stdev_diff_bruc_usd_gross_margin
-    ahle_dueto_bruc_mortality_mean_usd = mean_diff_bruc_usd_value_of_total_mortality * -1
-    ahle_dueto_bruc_mortality_stdev_usd = stdev_diff_bruc_usd_value_of_total_mortality * -1
-    ahle_dueto_bruc_healthcost_mean_usd = mean_diff_bruc_usd_health_cost
-    ahle_dueto_bruc_healthcost_stdev_usd = stdev_diff_bruc_usd_health_cost
-    ahle_dueto_bruc_productionloss_mean_usd = ahle_dueto_bruc_total_mean_usd - ahle_dueto_bruc_mortality_mean_usd - ahle_dueto_bruc_healthcost_mean_usd
     '''
     # Marginal improvement
     # '''
@@ -1066,23 +1008,6 @@ ahle_combo_scensmry_diffs_p['ahle_dueto_bruc_productionloss_stdev'] = np.sqrt(
             + ahle_combo_scensmry_diffs_p['ahle_dueto_bruc_healthcost_stdev']**2
     )
 
-# In USD
-ahle_combo_scensmry_diffs_p['ahle_dueto_productionloss_stdev_usd'] = np.sqrt(
-    ahle_combo_scensmry_diffs_p['ahle_total_stdev_usd']**2 \
-        + ahle_combo_scensmry_diffs_p['ahle_dueto_mortality_stdev_usd']**2 \
-            + ahle_combo_scensmry_diffs_p['ahle_dueto_healthcost_stdev_usd']**2
-    )
-ahle_combo_scensmry_diffs_p['ahle_dueto_ppr_productionloss_stdev_usd'] = np.sqrt(
-    ahle_combo_scensmry_diffs_p['ahle_dueto_ppr_total_stdev_usd']**2 \
-        + ahle_combo_scensmry_diffs_p['ahle_dueto_ppr_mortality_stdev_usd']**2 \
-            + ahle_combo_scensmry_diffs_p['ahle_dueto_ppr_healthcost_stdev_usd']**2
-    )
-ahle_combo_scensmry_diffs_p['ahle_dueto_bruc_productionloss_stdev_usd'] = np.sqrt(
-    ahle_combo_scensmry_diffs_p['ahle_dueto_bruc_total_stdev_usd']**2 \
-        + ahle_combo_scensmry_diffs_p['ahle_dueto_bruc_mortality_stdev_usd']**2 \
-            + ahle_combo_scensmry_diffs_p['ahle_dueto_bruc_healthcost_stdev_usd']**2
-    )
-
 # -----------------------------------------------------------------------------
 # Fill missing values of disease-specific AHLE with zero for species where they do not apply
 # -----------------------------------------------------------------------------
@@ -1115,11 +1040,6 @@ ahle_combo_scensmry_diffs_p = ahle_combo_scensmry_diffs_p.eval(
     ahle_dueto_otherdisease_mortality_mean = ahle_dueto_mortality_mean - ahle_dueto_ppr_mortality_mean - ahle_dueto_bruc_mortality_mean
     ahle_dueto_otherdisease_healthcost_mean = ahle_dueto_healthcost_mean - ahle_dueto_ppr_healthcost_mean - ahle_dueto_bruc_healthcost_mean
     ahle_dueto_otherdisease_productionloss_mean = ahle_dueto_otherdisease_total_mean - ahle_dueto_otherdisease_mortality_mean - ahle_dueto_otherdisease_healthcost_mean
-
-    ahle_dueto_otherdisease_total_mean_usd = ahle_total_mean_usd - ahle_dueto_ppr_total_mean_usd - ahle_dueto_bruc_total_mean_usd
-    ahle_dueto_otherdisease_mortality_mean_usd = ahle_dueto_mortality_mean_usd - ahle_dueto_ppr_mortality_mean_usd - ahle_dueto_bruc_mortality_mean_usd
-    ahle_dueto_otherdisease_healthcost_mean_usd = ahle_dueto_healthcost_mean_usd - ahle_dueto_ppr_healthcost_mean_usd - ahle_dueto_bruc_healthcost_mean_usd
-    ahle_dueto_otherdisease_productionloss_mean_usd = ahle_dueto_otherdisease_total_mean_usd - ahle_dueto_otherdisease_mortality_mean_usd - ahle_dueto_otherdisease_healthcost_mean_usd
     '''
 )
 
@@ -1145,27 +1065,21 @@ ahle_combo_scensmry_diffs_p['ahle_dueto_otherdisease_productionloss_stdev'] = np
             + ahle_combo_scensmry_diffs_p['ahle_dueto_otherdisease_healthcost_stdev']**2
     )
 
-# In USD
-ahle_combo_scensmry_diffs_p['ahle_dueto_otherdisease_total_stdev_usd'] = np.sqrt(
-    ahle_combo_scensmry_diffs_p['ahle_total_stdev_usd']**2 \
-        + ahle_combo_scensmry_diffs_p['ahle_dueto_ppr_total_stdev_usd']**2 \
-            + ahle_combo_scensmry_diffs_p['ahle_dueto_bruc_total_stdev_usd']**2
-    )
-ahle_combo_scensmry_diffs_p['ahle_dueto_otherdisease_mortality_stdev_usd'] = np.sqrt(
-    ahle_combo_scensmry_diffs_p['ahle_dueto_mortality_stdev_usd']**2 \
-        + ahle_combo_scensmry_diffs_p['ahle_dueto_ppr_mortality_stdev_usd']**2 \
-            + ahle_combo_scensmry_diffs_p['ahle_dueto_bruc_mortality_stdev_usd']**2
-    )
-ahle_combo_scensmry_diffs_p['ahle_dueto_otherdisease_healthcost_stdev_usd'] = np.sqrt(
-    ahle_combo_scensmry_diffs_p['ahle_dueto_healthcost_stdev_usd']**2 \
-        + ahle_combo_scensmry_diffs_p['ahle_dueto_ppr_healthcost_stdev_usd']**2 \
-            + ahle_combo_scensmry_diffs_p['ahle_dueto_bruc_healthcost_stdev_usd']**2
-    )
-ahle_combo_scensmry_diffs_p['ahle_dueto_otherdisease_productionloss_stdev_usd'] = np.sqrt(
-    ahle_combo_scensmry_diffs_p['ahle_dueto_otherdisease_total_stdev_usd']**2 \
-        + ahle_combo_scensmry_diffs_p['ahle_dueto_otherdisease_mortality_stdev_usd']**2 \
-            + ahle_combo_scensmry_diffs_p['ahle_dueto_otherdisease_healthcost_stdev_usd']**2
+# -----------------------------------------------------------------------------
+# Add columns in USD
+# -----------------------------------------------------------------------------
+# All AHLE components are currency values. Means and standard deviations both convert by
+# dividing by the exchange rate, as SD(aX) = a * SD(X) for a > 0.
+ahle_combo_scensmry_diffs_p = pd.merge(
+    left=ahle_combo_scensmry_diffs_p
+    ,right=exchg_data_tomerge[['year' ,'exchg_rate_lcuperusdol']]
+    ,on='year'
+    ,how='left'
     )
+_ahle_cols = [i for i in list(ahle_combo_scensmry_diffs_p) if 'ahle' in i]
+for COL in _ahle_cols:
+    ahle_combo_scensmry_diffs_p[COL + '_usd'] = \
+        ahle_combo_scensmry_diffs_p[COL] / ahle_combo_scensmry_diffs_p['exchg_rate_lcuperusdol']
 
 # =============================================================================
 #### Cleanup and export
@@ -1194,3 +1108,15 @@ check_ahle_combo_scensmry_diffs_p = ahle_combo_scensmry_diffs_p.copy()
 # =============================================================================
 print('\n> Checking the change in Gross Margin for ideal overall vs. individual ideal scenarios')
 print(check_ahle_combo_scensmry_diffs_p[['region' ,'species' ,'production_system' ,'year' ,'agesex_scenario' ,'ahle_total_mean']])
+
+#%% PUBLISH TO DASHBOARD
+
+# Publish the dashboard files as a new data snapshot. Running dashboards switch to it without a restart.
+subprocess.run(
+    [sys.executable ,os.path.join(DASH_DATA_FOLDER ,os.pardir ,'lib' ,'data_snapshots.py') ,'publish' ,DASH_DATA_FOLDER]
+    ,check=True
+)
+
+#%% PROFILING REPORT
+
+prof.finish_run()     # Does nothing unless PROFILE_RUN is True
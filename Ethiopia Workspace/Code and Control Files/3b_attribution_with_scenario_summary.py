@@ -33,6 +33,10 @@ import numpy as np
 import pandas as pd
 import pickle                    # To save objects to disk
 
+import sys
+import _pipeline_common_path     # Adds pipeline_common, with the modules shared by all workspaces, to sys.path
+import _profiling as prof        # Timing, data info and profiling shared across workspaces
+
 # Run a command on the command line using subprocess package
 # Example usage: run_cmd(['dir' ,'c:\\users'] ,SHELL=True ,SHOW_MAXLINES=10)
 # To run an R program:
@@ -72,63 +76,11 @@ def run_cmd(
    return cmd_status.returncode    # If you want to use something that is returned, add it here. Assign it when you call the function e.g. returned_object = run_cmd().
 
 # To time a piece of code
-def timerstart(LABEL=None):      # String (opt): add a label to the printed timer messages
-   global _timerstart ,_timerstart_label
-   funcname = inspect.currentframe().f_code.co_name
-   _timerstart_label = LABEL
-   _timerstart = dt.datetime.now()
-   if _timerstart_label:
-      print(f"\n<{funcname}> {_timerstart_label} {_timerstart :%I:%M:%S %p} \n")
-   else:
-      print(f"\n<{funcname}> {_timerstart :%I:%M:%S %p} \n")
-   return None
-
-def timerstop():
-   global _timerstop
-   funcname = inspect.currentframe().f_code.co_name
-   if '_timerstart' in globals():
-      _timerstop = dt.datetime.now()
-      elapsed = _timerstop - _timerstart
-      hours = (elapsed.days * 24) + (elapsed.seconds // 3600)
-      minutes = (elapsed.seconds % 3600) // 60
-      seconds = (elapsed.seconds % 60) + (elapsed.microseconds / 1e6)
-      print(f"\n<{funcname}> {_timerstop :%I:%M:%S %p}")
-      if _timerstart_label:
-         print(f"<{funcname}> {_timerstart_label} Elapsed {hours}h: {minutes}m: {seconds :.1f}s \n")
-      else:
-         print(f"<{funcname}> Elapsed {hours}h: {minutes}m: {seconds :.1f}s \n")
-   else:
-      print(f"<{funcname}> Error: no start time defined. Call timerstart() first.")
-   return None
+timerstart = prof.timerstart
+timerstop = prof.timerstop
 
 # To print df.info() with header for readability, and optionally write data info to text file
-def datainfo(
-      INPUT_DF
-      ,OUTFOLDER=None     # String (opt): folder to output {dataname}_info.txt. If None, no file will be created.
-   ):
-   funcname = inspect.currentframe().f_code.co_name
-   dataname = [x for x in globals() if globals()[x] is INPUT_DF][0]
-   rowcount = INPUT_DF.shape[0]
-   colcount = INPUT_DF.shape[1]
-   idxcols = str(list(INPUT_DF.index.names))
-   header = f"Data name: {dataname :>26s}\nRows:      {rowcount :>26,}\nColumns:   {colcount :>26,}\nIndex:     {idxcols :>26s}\n"
-   divider = ('-'*26) + ('-'*11) + '\n'
-   bigdivider = ('='*26) + ('='*11) + '\n'
-   print(bigdivider + header + divider)
-   INPUT_DF.info()
-   print(divider + f"End:       {dataname:>26s}\n" + bigdivider)
-
-   if OUTFOLDER:     # If something has been passed to OUTFOLDER parameter
-      filename = f"{dataname}_info"
-      print(f"\n<{funcname}> Creating file {OUTFOLDER}\{filename}.txt")
-      datetimestamp = 'Created on ' + time.strftime('%Y-%m-%d %X', time.gmtime()) + ' UTC' + '\n'
-      buffer = io.StringIO()
-      INPUT_DF.info(buf=buffer, max_cols=colcount)
-      filecontents = header + divider + datetimestamp + buffer.getvalue()
-      tofile = os.path.join(OUTFOLDER, f"{filename}.txt")
-      with open(tofile, 'w', encoding='utf-8') as f: f.write(filecontents)
-      print(f"<{funcname}> ...done.")
-   return None
+datainfo = prof.datainfo
 
 # To clean up column names in a dataframe
 def cleancolnames(INPUT_DF):
@@ -239,6 +191,12 @@ DASH_DATA_FOLDER = os.path.join(GRANDPARENT_FOLDER, 'AHLE Dashboard' ,'Dash App'
 # Full path to rscript.exe
 r_executable = 'C:\\Program Files\\R\\R-4.3.1\\bin\\x64\\Rscript.exe'
 
+# Profiling: True to record time and memory for each timerstart()/timerstop() pair and each dataframe
+# passed to datainfo(). The report is written to Program outputs/profiling and compared to the previous run.
+PROFILE_RUN = False
+if PROFILE_RUN:
+   prof.start_run('3b_attribution_with_scenario_summary' ,REPORT_FOLDER=os.path.join(ETHIOPIA_OUTPUT_FOLDER ,'profiling'))
+
 #%% EXTERNAL DATA
 
 # =============================================================================
@@ -1509,3 +1467,15 @@ datainfo(ahle_combo_withattr_diseases)
 # Write CSV
 ahle_combo_withattr_diseases.to_csv(os.path.join(ETHIOPIA_OUTPUT_FOLDER ,'ahle_all_withattr_disease.csv') ,index=False)
 ahle_combo_withattr_diseases.to_csv(os.path.join(DASH_DATA_FOLDER ,'ahle_all_withattr_disease.csv') ,index=False)
+
+#%% PUBLISH TO DASHBOARD
+
+# Publish the dashboard files as a new data snapshot. Running dashboards switch to it without a restart.
+subprocess.run(
+    [sys.executable ,os.path.join(DASH_DATA_FOLDER ,os.pardir ,'lib' ,'data_snapshots.py') ,'publish' ,DASH_DATA_FOLDER]
+    ,check=True
+)
+
+#%% PROFILING REPORT
+
+prof.finish_run()     # Does nothing unless PROFILE_RUN is True
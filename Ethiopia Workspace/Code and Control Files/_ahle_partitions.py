@@ -0,0 +1,213 @@
+# Partition-wise aggregation of the compartmental model results, run across worker processes
+#
+# The results for each species, region and year are independent of each other until the
+# "All Small Ruminants" and "All Poultry" rollups. The age/sex and production system groups
+# (2b_calculate_ahle.py, 2c_create_scenario_summary.py) are therefore built for each
+# species * region * year partition separately, in parallel. The rollups are then built for
+# each region * year from the combined partitions, also in parallel.
+#
+# Partitions are processed in sorted order of their keys and their results concatenated in
+# that order, whatever order the workers finish in, so the output does not depend on the
+# number of workers. With MAX_WORKERS=1 everything runs in this process, e.g. for debugging.
+#
+# The functions run in worker processes are defined here rather than in the calling script so
+# they can be sent to the workers. Workers do not re-run the calling script when they start
+# (see _hide_main_script()).
+#
+# Example usage (from 2b_calculate_ahle.py):
+   # import _ahle_partitions as ahlep
+   # ahle_combo_withagg = ahlep.map_partitions(
+   #    ahlep.aggregate_agesex_prodsys ,ahle_combo_adj ,BY=['species' ,'region' ,'year']
+   #    ,ARGS=(all_byvars ,mean_cols ,sd_cols ,age_group_values ,sex_values)
+   # )
+   # ahle_combo_rollups = ahlep.map_partitions(
+   #    ahlep.rollup_species ,ahle_combo_withagg ,BY=['region' ,'year']
+   #    ,ARGS=(summarize_byvars ,mean_cols + var_cols ,ahlep.SPECIES_ROLLUPS)
+   # )
+
+import os
+import sys
+import time
+import inspect
+import contextlib
+import multiprocessing
+import concurrent.futures
+
+import pandas as pd
+
+# Combined species: {species name: query selecting the species it combines}
+SPECIES_ROLLUPS = {
+   'All Small Ruminants':"species.str.upper().isin(['SHEEP' ,'GOAT'])"
+   ,'All Poultry':"species.str.contains('poultry' ,case=False ,na=False)"
+}
+
+#%% Running partitions
+
+# While worker processes start with 'spawn' (Windows, macOS), hide the calling script so they
+# do not run it again on startup. The workers only need the functions in this module.
+@contextlib.contextmanager
+def _hide_main_script():
+   main_module = sys.modules['__main__']
+   if multiprocessing.get_start_method() == 'fork':
+      yield
+      return
+   main_spec = getattr(main_module ,'__spec__' ,None)
+   main_file = main_module.__dict__.pop('__file__' ,None)
+   main_module.__spec__ = None
+   try:
+      yield
+   finally:
+      main_module.__spec__ = main_spec
+      if main_file is not None:
+         main_module.__file__ = main_file
+
+# To run FUNC(partition, *ARGS) on each partition of INPUT_DF and stack the results
+def map_partitions(
+      FUNC                    # Function defined in this module, taking a dataframe and returning a dataframe
+      ,INPUT_DF
+      ,BY                     # List of columns defining the partitions
+      ,ARGS=()                # Tuple: further arguments to FUNC, the same for every partition
+      ,MAX_WORKERS=None       # Integer (opt): number of worker processes. Default uses one per partition up to the number of CPUs.
+   ):
+   funcname = inspect.currentframe().f_code.co_name
+   timer_start = time.perf_counter()
+   partitions = [PART for _KEY ,PART in INPUT_DF.groupby(BY ,sort=True ,dropna=False)]
+   if MAX_WORKERS is None:
+      MAX_WORKERS = min(len(partitions) ,os.cpu_count() or 1)
+
+   if MAX_WORKERS <= 1 or len(partitions) <= 1:
+      results = [FUNC(PART ,*ARGS) for PART in partitions]
+   else:
+      with _hide_main_script() ,concurrent.futures.ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+         futures = [executor.submit(FUNC ,PART ,*ARGS) for PART in partitions]
+         results = [FUTURE.result() for FUTURE in futures]      # In partition order
+
+   results = [RESULT for RESULT in results if not RESULT.empty]
+   output_df = pd.concat(results ,axis=0 ,join='outer' ,ignore_index=True) if results else pd.DataFrame()
+   print(f"<{funcname}> {FUNC.__name__}: {len(partitions)} partitions by {BY} on {max(MAX_WORKERS ,1)} workers in {time.perf_counter() - timer_start :,.1f}s.")
+   return output_df
+
+#%% Partition functions
+
+# Sum of each column by group. Sum is missing if all values are missing (rather than zero, as with sum()).
+def sum_by_groups(INPUT_DF ,BYVARS ,VALUES):
+   return INPUT_DF.pivot_table(
+      index=BYVARS
+      ,values=VALUES
+      ,aggfunc=lambda x: x.mean() * x.count()  # Hack: sum is equal to zero if all values are missing. This will cause all missings to produce missing.
+   ).reset_index()
+
+def _stack(DATAFRAMES):
+   DATAFRAMES = [DF for DF in DATAFRAMES if not DF.empty]
+   if not DATAFRAMES:
+      return pd.DataFrame()
+   return pd.concat(
+      DATAFRAMES
+      ,axis=0              # axis=0: concatenate rows (stack), axis=1: concatenate columns (merge)
+      ,join='outer'        # 'outer': keep all columns
+      ,ignore_index=True   # True: do not keep index values on concatenation axis
+   )
+
+# 2b_calculate_ahle.py: build the Overall and Combined age/sex groups and the Overall production
+# system for one species, region and year.
+# Returns individual and aggregate groups, with variance columns (sqrd_<stdev column>) for the
+# species rollups. Standard deviations are recalculated from these after the rollups.
+def aggregate_agesex_prodsys(
+      PARTITION_DF            # Combined simulation results for one species, region and year
+      ,ALL_BYVARS             # Tuple of key variables
+      ,MEAN_COLS
+      ,SD_COLS
+      ,AGE_GROUP_VALUES       # List: age groups across all partitions, without aggregates
+      ,SEX_VALUES             # List: sexes across all partitions, without aggregates
+   ):
+   # Separate all existing overall or combined groups
+   _combined_rows = (PARTITION_DF['group'].str.contains('OVERALL' ,case=False ,na=False))\
+      | (PARTITION_DF['group'].str.contains('COMBINED' ,case=False ,na=False))
+   combo_overall = PARTITION_DF.loc[_combined_rows].copy()
+   combo_indiv = PARTITION_DF.loc[~ _combined_rows ,list(ALL_BYVARS) + MEAN_COLS + SD_COLS].copy()
+
+   # Variance columns, relying on the following properties of sums of random variables:
+   #    mean(aX + bY) = a*mean(X) + b*mean(Y), regardless of correlation
+   #    var(aX + bY) = a^2*var(X) + b^2*var(Y), assuming X and Y are uncorrelated
+   var_cols = ['sqrd_' + COLNAME for COLNAME in SD_COLS]
+   for i ,VARCOL in enumerate(var_cols):
+      combo_indiv[VARCOL] = combo_indiv[SD_COLS[i]]**2
+
+   def _byvars_without(AGG_VARS):
+      return [i for i in ALL_BYVARS if i not in AGG_VARS]
+
+   # Overall age/sex group
+   sum_groups = pd.DataFrame()
+   if not combo_indiv.empty:
+      sum_groups = sum_by_groups(combo_indiv ,_byvars_without(['group' ,'age_group' ,'sex']) ,MEAN_COLS + var_cols)
+      sum_groups['group'] = 'Overall'
+      sum_groups['age_group'] = 'Overall'
+      sum_groups['sex'] = 'Overall'
+
+   # Overall sex for each age group
+   sum_sexes = []
+   for AGE_GRP in AGE_GROUP_VALUES:
+      oneage = combo_indiv.loc[combo_indiv['age_group'] == AGE_GRP]
+      if oneage.empty:
+         continue
+      oneage = sum_by_groups(oneage ,_byvars_without(['group' ,'sex']) ,MEAN_COLS + var_cols)
+      oneage['group'] = f'{AGE_GRP} Combined'
+      oneage['sex'] = 'Overall'
+      sum_sexes.append(oneage)
+   sum_sexes = _stack(sum_sexes)
+
+   # Oxen are a special age group which is only male. Drop "combined" sex.
+   if not sum_sexes.empty:
+      sum_sexes = sum_sexes.loc[sum_sexes['group'].str.upper() != 'OXEN COMBINED']
+
+   # Overall age group for each sex
+   sum_ages = []
+   for SEX_GRP in SEX_VALUES:
+      onesex = combo_indiv.loc[combo_indiv['sex'] == SEX_GRP]
+      if onesex.empty:
+         continue
+      onesex = sum_by_groups(onesex ,_byvars_without(['group' ,'age_group']) ,MEAN_COLS + var_cols)
+      onesex['group'] = f'Overall {SEX_GRP}'
+      onesex['age_group'] = 'Overall'
+      sum_ages.append(onesex)
+   sum_ages = _stack(sum_ages)
+
+   # Concatenate all and de-dup. Original overall group rows are last so de-dup keeps newer groups if they exist.
+   combo_withagg = _stack([combo_indiv ,sum_groups ,sum_sexes ,sum_ages ,combo_overall])
+   if combo_withagg.empty:
+      return combo_withagg
+   combo_withagg = combo_withagg.drop_duplicates(subset=list(ALL_BYVARS) ,keep='first')
+
+   # Overall production system. Done after the combined age/sex groups so it is calculated for them as well.
+   sum_prodsys = sum_by_groups(combo_withagg ,_byvars_without(['production_system']) ,MEAN_COLS + var_cols)
+   sum_prodsys['production_system'] = 'Overall'
+   return _stack([combo_withagg ,sum_prodsys])
+
+# 2c_create_scenario_summary.py: build the Overall production system for one species, region and year
+# Returns the partition with the Overall rows added.
+def add_overall_prodsys(
+      PARTITION_DF            # Scenario summary for one species, region and year
+      ,BYVARS                 # List of key variables without production_system
+      ,VALUES                 # List of columns to sum: means and variances
+   ):
+   sum_prodsys = sum_by_groups(PARTITION_DF ,BYVARS ,VALUES)
+   sum_prodsys['production_system'] = 'Overall'
+   return _stack([PARTITION_DF ,sum_prodsys])
+
+# Build the combined species in SPECIES_ROLLUPS for one region and year
+# Returns only the rollup rows. These are stacked after all partitions by the caller.
+def rollup_species(
+      PARTITION_DF            # Results for all species for one region and year
+      ,BYVARS                 # List of key variables without species
+      ,VALUES                 # List of columns to sum: means and variances
+      ,ROLLUPS=SPECIES_ROLLUPS
+   ):
+   rollups = []
+   for SPECIES ,QUERY in ROLLUPS.items():
+      species_df = PARTITION_DF.query(QUERY)
+      if species_df.empty:
+         continue
+      rollup = sum_by_groups(species_df ,BYVARS ,VALUES)
+      rollup['species'] = SPECIES
+      rollups.append(rollup)
+   return _stack(rollups)
@@ -0,0 +1,16 @@
+# Adds pipeline_common, the folder of modules shared by all workspaces (e.g. _profiling), to sys.path
+#
+# The other workspaces do this in their _functions.py. The Ethiopia scripts import this module
+# once, before any shared module:
+   # import _pipeline_common_path
+   # import _profiling as prof
+#
+# The folder is found from the location of this file, at the top of the repository, so it does
+# not depend on the working directory.
+
+import os
+import sys
+
+PIPELINE_COMMON_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) ,'pipeline_common')
+if PIPELINE_COMMON_FOLDER not in sys.path:
+   sys.path.insert(0 ,PIPELINE_COMMON_FOLDER)
@@ -15,3 +15,80 @@ FINDATA_FOLDER = os.path.join(PARENT_FOLDER, 'Data')
 PROGRAM_OUTPUT_FOLDER = os.path.join(PARENT_FOLDER ,'Program outputs')
 
 DASH_DATA_FOLDER = os.path.join(GRANDPARENT_FOLDER, 'AHLE Dashboard' ,'Dash App' ,'data')
+
+#%% Run pipeline
+
+# Each step declares the raw files it reads and the files it writes, plus the outputs of earlier
+# steps it depends on. Steps whose script and inputs are unchanged since their last run are skipped.
+import _extract_cache as excache
+imp.reload(excache)
+
+def _raw(*PATH):
+   return os.path.join(RAWDATA_FOLDER ,*PATH)
+def _pro(*PATH):
+   return os.path.join(PRODATA_FOLDER ,*PATH)
+def _fin(*PATH):
+   return os.path.join(FINDATA_FOLDER ,*PATH)
+
+pipeline_steps = [
+   # Queries the GBADs API. Its inputs only cover local files, so add it to FORCE_STEPS to refresh from the API.
+   {'script':'1a_extract_from_gbadske_api.py'
+    ,'inputs':[_raw('20230116_biomass_live_weight_fao.csv')]
+    ,'outputs':[_pro('livestock_countries_biomass.pkl.gz') ,_pro('biomass_live_weight_fao.pkl.gz') ,_pro('wb_income.pkl.gz') ,_pro('wb_region.pkl.gz') ,_pro('un_geo_codes.pkl.gz')]
+    }
+   ,{'script':'1b_extract_from_fao.py'
+     ,'inputs':[_raw('FAOSTAT_livestock_products_stocks_slaughter_2000_2020.csv') ,_raw('FAOSTAT_liveanimals_import_export_2000_2020.csv') ,_raw('FAOSTAT_producer_prices_2000_2021.csv')]
+     ,'outputs':[_pro('fao_production.pkl.gz') ,_pro('fao_impexp_p.pkl.gz') ,_pro('fao_producerprice.pkl.gz')]
+     }
+   ,{'script':'1c_extract_from_worldbank.py'
+     ,'inputs':[_raw('worldbank_cpi_exchg_2000_2021')]
+     ,'outputs':[_pro('wb_infl_exchg.pkl.gz')]
+     }
+   ,{'script':'2a_combine_data.py'
+     ,'inputs':[
+        _pro('biomass_live_weight_fao.pkl.gz') ,_pro('un_geo_codes.pkl.gz') ,_pro('fao_production.pkl.gz') ,_pro('fao_producerprice.pkl.gz')
+        ,_pro('fao_impexp_p.pkl.gz') ,_pro('wb_income.pkl.gz') ,_pro('wb_region.pkl.gz') ,_pro('wb_infl_exchg.pkl.gz')
+        ]
+     ,'outputs':[_pro('world_ahle_1_combined.pkl.gz')]
+     }
+   ,{'script':'2b_intermediate_calcs_and_imputation.py'
+     ,'inputs':[_pro('world_ahle_1_combined.pkl.gz')]
+     ,'outputs':[_pro('world_ahle_2_imputed.pkl.gz')]
+     }
+   ,{'script':'2c_ahle_calcs_prep_for_dash.py'
+     ,'inputs':[_pro('world_ahle_2_imputed.pkl.gz') ,os.path.join(DASH_DATA_FOLDER ,'amu_combined_regional.csv')]
+     ,'outputs':[_fin('world_ahle_abt.pkl.gz') ,_fin('world_ahle_abt_fordash.pkl.gz') ,_fin('world_ahle_abt_withcalcs.pkl.gz') ,os.path.join(DASH_DATA_FOLDER ,'world_ahle_abt_fordash.pkl.gz')]
+     }
+]
+
+# Steps run in parallel worker processes as soon as the steps they depend on have finished.
+# Each worker sets up its own namespace from the control files and the folder constants below.
+# Add names of scripts to FORCE_STEPS to rerun them regardless of the cache.
+import _pipeline_runner as runner
+imp.reload(runner)
+
+if __name__ == '__main__':    # Required for worker processes on Windows
+   pipeline_timings = runner.run_steps_parallel(
+      pipeline_steps
+      ,CACHE_FOLDER=os.path.join(PRODATA_FOLDER ,'extract_cache')
+      ,CONSTANTS={key:value for key ,value in globals().items() if key.endswith('_FOLDER')}
+      ,MODULES={'uc':'_constants'}
+      ,SHARED_INPUTS=['_libraries.py' ,'_functions.py' ,'_constants.py']
+      ,FORCE_STEPS=[]
+      ,PROFILE_FOLDER=os.path.join(PRODATA_FOLDER ,'profiling')     # Time and memory by step, compared to the previous run. None to turn off.
+   )
+
+   # Publish the dashboard files as a new data snapshot. Running dashboards switch to it without a restart.
+   subprocess.run(
+      [sys.executable ,os.path.join(DASH_DATA_FOLDER ,os.pardir ,'lib' ,'data_snapshots.py') ,'publish' ,DASH_DATA_FOLDER]
+      ,check=True
+   )
+
+# To run the steps one at a time in this namespace instead:
+# pipeline_timings = excache.run_steps(
+#    pipeline_steps
+#    ,NAMESPACE=globals()
+#    ,CACHE_FOLDER=os.path.join(PRODATA_FOLDER ,'extract_cache')
+#    ,SHARED_INPUTS=['_functions.py' ,'_constants.py']
+#    ,FORCE_STEPS=[]
+# )
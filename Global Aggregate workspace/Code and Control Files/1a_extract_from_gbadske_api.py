@@ -11,62 +11,9 @@ import inspect
 import io
 import pandas as pd
 
-# To clean up column names in a dataframe
-def cleancolnames(INPUT_DF):
-   # Comments inside the statement create errors. Putting all comments at the top.
-   # Convert to lowercase
-   # Strip leading and trailing spaces, then replace spaces with underscore
-   # Replace slashes, parenthesis, and brackets with underscore
-   # Replace some special characters with underscore
-   # Replace other special characters with words
-   INPUT_DF.columns = INPUT_DF.columns.str.lower() \
-      .str.strip().str.replace(' ' ,'_' ,regex=False) \
-      .str.replace('/' ,'_' ,regex=False).str.replace('\\' ,'_' ,regex=False) \
-      .str.replace('(' ,'_' ,regex=False).str.replace(')' ,'_' ,regex=False) \
-      .str.replace('[' ,'_' ,regex=False).str.replace(']' ,'_' ,regex=False) \
-      .str.replace('{' ,'_' ,regex=False).str.replace('}' ,'_' ,regex=False) \
-      .str.replace('!' ,'_' ,regex=False).str.replace('?' ,'_' ,regex=False) \
-      .str.replace('-' ,'_' ,regex=False).str.replace('+' ,'_' ,regex=False) \
-      .str.replace('^' ,'_' ,regex=False).str.replace('*' ,'_' ,regex=False) \
-      .str.replace('.' ,'_' ,regex=False).str.replace(',' ,'_' ,regex=False) \
-      .str.replace('|' ,'_' ,regex=False).str.replace('#' ,'_' ,regex=False) \
-      .str.replace('>' ,'_gt_' ,regex=False) \
-      .str.replace('<' ,'_lt_' ,regex=False) \
-      .str.replace('=' ,'_eq_' ,regex=False) \
-      .str.replace('@' ,'_at_' ,regex=False) \
-      .str.replace('$' ,'_dol_' ,regex=False) \
-      .str.replace('%' ,'_pct_' ,regex=False) \
-      .str.replace('&' ,'_and_' ,regex=False)
-   return None
-
-# To print df.info() with header for readability, and optionally write data info to text file
-def datainfo(
-      INPUT_DF
-      ,OUTFOLDER=None     # String (opt): folder to output {dataname}_info.txt. If None, no file will be created.
-   ):
-   funcname = inspect.currentframe().f_code.co_name
-   dataname = [x for x in globals() if globals()[x] is INPUT_DF][0]
-   rowcount = INPUT_DF.shape[0]
-   colcount = INPUT_DF.shape[1]
-   idxcols = str(list(INPUT_DF.index.names))
-   header = f"Data name: {dataname :>26s}\nRows:      {rowcount :>26,}\nColumns:   {colcount :>26,}\nIndex:     {idxcols :>26s}\n"
-   divider = ('-'*26) + ('-'*11) + '\n'
-   bigdivider = ('='*26) + ('='*11) + '\n'
-   print(bigdivider + header + divider)
-   INPUT_DF.info()
-   print(divider + f"End:       {dataname:>26s}\n" + bigdivider)
-
-   if OUTFOLDER:     # If something has been passed to OUTFOLDER parameter
-      filename = f"{dataname}_info"
-      print(f"\n<{funcname}> Creating file {OUTFOLDER}\{filename}.txt")
-      datetimestamp = 'Created on ' + time.strftime('%Y-%m-%d %X', time.gmtime()) + ' UTC' + '\n'
-      buffer = io.StringIO()
-      INPUT_DF.info(buf=buffer, max_cols=colcount)
-      filecontents = header + divider + datetimestamp + buffer.getvalue()
-      tofile = os.path.join(OUTFOLDER, f"{filename}.txt")
-      with open(tofile, 'w', encoding='utf-8') as f: f.write(filecontents)
-      print(f"<{funcname}> ...done.")
-   return None
+import os
+import sys
+exec(open('_functions.py').read())    # Execute _functions file: adds pipeline_common to sys.path and defines cleancolnames() and datainfo()
 
 #%% View tables and field names
 
@@ -1,37 +1,22 @@
+# Modules shared by all workspaces (_extract_cache, _pipeline_runner, _profiling) are in pipeline_common at the top of the
+# repository. Scripts run with this code folder as the working directory.
+PIPELINE_COMMON_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())) ,'pipeline_common')
+if PIPELINE_COMMON_FOLDER not in sys.path:
+   sys.path.insert(0 ,PIPELINE_COMMON_FOLDER)
+
 # To get the name of an object, as a string
 def getobjectname(OBJECT):
     objectname = [x for x in globals() if globals()[x] is OBJECT][0]
     return objectname
 
-# To time a piece of code
-def timerstart(LABEL=None):      # String (opt): add a label to the printed timer messages
-   global _timerstart ,_timerstart_label
-   funcname = inspect.currentframe().f_code.co_name
-   _timerstart_label = LABEL
-   _timerstart = dt.datetime.now()
-   if _timerstart_label:
-      print(f"\n<{funcname}> {_timerstart_label} {_timerstart :%I:%M:%S %p} \n")
-   else:
-      print(f"\n<{funcname}> {_timerstart :%I:%M:%S %p} \n")
-   return None
+# Timing, data info and profiling are shared across workspaces in pipeline_common/_profiling.py.
+# Call prof.start_run() to also record time and memory for each timerstart()/timerstop() pair and
+# the shape and memory of each dataframe passed to datainfo().
+import _profiling as prof
 
-def timerstop():
-   global _timerstop
-   funcname = inspect.currentframe().f_code.co_name
-   if '_timerstart' in globals():
-      _timerstop = dt.datetime.now()
-      elapsed = _timerstop - _timerstart
-      hours = (elapsed.days * 24) + (elapsed.seconds // 3600)
-      minutes = (elapsed.seconds % 3600) // 60
-      seconds = (elapsed.seconds % 60) + (elapsed.microseconds / 1000000)
-      print(f"\n<{funcname}> {_timerstop :%I:%M:%S %p}")
-      if _timerstart_label:
-         print(f"<{funcname}> {_timerstart_label} Elapsed {hours}h: {minutes}m: {seconds :.1f}s \n")
-      else:
-         print(f"<{funcname}> Elapsed {hours}h: {minutes}m: {seconds :.1f}s \n")
-   else:
-      print(f"<{funcname}> Error: no start time defined. Call timerstart() first.")
-   return None
+# To time a piece of code
+timerstart = prof.timerstart
+timerstop = prof.timerstop
 
 # To get index(es) of a dataframe as regular columns
 # Must assign the output to a dataframe e.g. df = indextocolumns(df).
@@ -89,33 +74,8 @@ def cleancolnames(INPUT_DF):
    return None
 
 # To print df.info() with header for readability, and optionally write data info to text file
-def datainfo(
-      INPUT_DF
-      ,OUTFOLDER=None     # String (opt): folder to output {dataname}_info.txt. If None, no file will be created.
-   ):
-   funcname = inspect.currentframe().f_code.co_name
-   dataname = [x for x in globals() if globals()[x] is INPUT_DF][0]
-   rowcount = INPUT_DF.shape[0]
-   colcount = INPUT_DF.shape[1]
-   idxcols = str(list(INPUT_DF.index.names))
-   header = f"Data name: {dataname :>26s}\nRows:      {rowcount :>26,}\nColumns:   {colcount :>26,}\nIndex:     {idxcols :>26s}\n"
-   divider = ('-'*26) + ('-'*11) + '\n'
-   bigdivider = ('='*26) + ('='*11) + '\n'
-   print(bigdivider + header + divider)
-   INPUT_DF.info()
-   print(divider + f"End:       {dataname:>26s}\n" + bigdivider)
-
-   if OUTFOLDER:     # If something has been passed to OUTFOLDER parameter
-      filename = f"{dataname}_info"
-      print(f"\n<{funcname}> Creating file {OUTFOLDER}\{filename}.txt")
-      datetimestamp = 'Created on ' + time.strftime('%Y-%m-%d %X', time.gmtime()) + ' UTC' + '\n'
-      buffer = io.StringIO()
-      INPUT_DF.info(buf=buffer, max_cols=colcount)
-      filecontents = header + divider + datetimestamp + buffer.getvalue()
-      tofile = os.path.join(OUTFOLDER, f"{filename}.txt")
-      with open(tofile, 'w', encoding='utf-8') as f: f.write(filecontents)
-      print(f"<{funcname}> ...done.")
-   return None
+# Arguments: INPUT_DF ,MAX_COLS=None ,OUTFOLDER=None
+datainfo = prof.datainfo
 
 # To create output files for a basic description of data
 # {dataname}_desc_numeric.csv: mean, SD, min, max, and quartiles for each numeric column (the output of df.describe, transposed)
@@ -3,6 +3,8 @@ exec(open('_libraries.py').read())    # Execute _libraries file. This contains I
 exec(open('_functions.py').read())    # Execute _functions file so that functions are defined in main namespace.
 import _constants as uc               # User-defined constants
 imp.reload(uc)                        # Reload, in case module has been updated in middle of session
+import _pdf_tables as pdft            # Cached extraction of tables from PDF files
+imp.reload(pdft)
 
 # Make these all-uppercase to clean up Spyder variable explorer
 CURRENT_FOLDER = os.getcwd()
@@ -17,3 +19,192 @@ CHARACTERIZE_FOLDER = os.path.join(CURRENT_FOLDER, 'CHARACTERIZE')
 
 # Folder for Dash data
 DASH_DATA_FOLDER = os.path.join(GRANDPARENT_FOLDER, 'Dash App' ,'data')
+
+#%% Run pipeline
+
+# Each step declares the raw files it reads and the files it writes, plus the outputs of earlier
+# steps it depends on. Steps whose script and inputs are unchanged since their last run are skipped.
+# Scripts with no outputs (1j, 1r, 1u, 1z) are exploratory and not included.
+import _extract_cache as excache
+imp.reload(excache)
+
+def _raw(*PATH):
+   return os.path.join(RAWDATA_FOLDER ,*PATH)
+def _pro(*PATH):
+   return os.path.join(PRODATA_FOLDER ,*PATH)
+def _dash(*PATH):
+   return os.path.join(DASH_DATA_FOLDER ,*PATH)
+
+pipeline_steps = [
+   {'script':'1a_extract_faostat.py'
+    ,'inputs':[_raw('FAOSTAT_chickens_meatchicken_2011_2020.csv') ,_raw('FAOSTAT_chickens_pigs_producerprices_2011_2020.csv') ,_raw('FAOSTAT_pigs_meatpigs_2011_2020.csv')]
+    ,'outputs':[_pro('fao_producerprice_p.pkl.gz') ,_pro('fao_chickens_meat_p.pkl.gz') ,_pro('fao_pigs_meat_p.pkl.gz') ,_pro('fao_chickencombo.pkl.gz') ,_pro('fao_pigcombo.pkl.gz')]
+    }
+   ,{'script':'1b_extract_eurostat.py'
+     ,'inputs':[
+        _raw('EUROSTAT_slaughtered_poultry_pig_2011_2021.csv.gz')
+        ,_raw('EUROSTAT_animalproducts_sellingprices_2011_2020.csv.gz')
+        ,_raw('EUROSTAT_prices_meansofproduction_2011_2020.csv.gz')
+        ,_raw('EUROSTAT_chickshatched_layers_broilers_2011_2021.csv.gz')
+        ,_raw('EUROSTAT_pigpopulation_2011_2021.csv.gz')
+        ]
+     ,'outputs':[_pro('euro_chickencombo.pkl.gz') ,_pro('euro_pigcombo.pkl.gz')]
+     }
+   ,{'script':'1c_extract_ukgov_poultry.py'
+     ,'inputs':[_raw('uk-poultry-placings-20jan22.ods') ,_raw('uk-poultry-slaughter-20jan22.ods')]
+     ,'outputs':[_pro('uk_broilercombo.pkl.gz')]
+     }
+   ,{'script':'1d_extract_usda_quickstats.py'
+     ,'inputs':[_raw('USDA_broilers_2011_2021.csv') ,_raw('USDA_chickens_condemns_2011_2021.csv') ,_raw('usda_swine_allmetrics_2011_2021.csv') ,_raw('usda_swine_inventory_2011_2022.csv')]
+     ,'outputs':[_pro('usda_broilers_p.pkl.gz') ,_pro('usda_swine_inventory_p2.pkl.gz') ,_pro('usda_swine_othermetrics_p.pkl.gz')]
+     }
+   ,{'script':'1e_extract_wahis_disease.py'
+     ,'inputs':[_raw('wahis_birds_2011_2021.xlsx') ,_raw('wahis_swine_2011_2021.xlsx')]
+     ,'outputs':[_pro('wahis_birds_agg.pkl.gz') ,_pro('wahis_birds_agg2_p.pkl.gz') ,_pro('wahis_swine_agg.pkl.gz') ,_pro('wahis_swine_agg2_p.pkl.gz')]
+     }
+   ,{'script':'1f_extract_uk_feedprice.py'
+     ,'inputs':[_raw('uk-commodityprices-compounds-03feb22.ods') ,_raw('uk-commodityprices-straights-20jan22.ods')]
+     ,'outputs':[_pro('uk_feedcmdtyprice_imp_m.pkl.gz') ,_pro('uk_feedprice.pkl.gz')]
+     }
+   ,{'script':'1g_extract_uk_feedproduction.py'
+     ,'inputs':[_raw('GB_AFproduction_Dec21.xlsx')]
+     ,'outputs':[_pro('uk_feedproduction_selectpig_m_p.pkl.gz') ,_pro('uk_feedproduction_selectpoultry_m_p.pkl.gz')]
+     }
+   ,{'script':'1h_extract_ukfsa_condemns.py'
+     ,'inputs':[_raw('UK FSA Poultry Conditions') ,_raw('UK FSA Pig Conditions')]
+     ,'outputs':[_pro('ukfsa_poultry_sum_p.pkl.gz')]
+     }
+   ,{'script':'1i_extract_brazil_poultry.py'
+     ,'inputs':[_raw('Brazil_AviSite_ChicksPlaced.xlsx')]
+     ,'outputs':[_pro('brazil_chicksplaced_m.pkl.gz')]
+     }
+   ,{'script':'1k_extract_india_poultry.py'           # Data entered in script
+     ,'outputs':[_pro('india_poultry.pkl.gz')]
+     }
+   ,{'script':'1l_extract_uk_misc.py'                 # Data entered in script
+     ,'outputs':[_pro('ukmisc_poultry.pkl.gz')]
+     }
+   ,{'script':'1m_extract_worldbank.py'
+     ,'inputs':[_raw('worldbank_inflation_exchangerate_gdp_2010_2021')]
+     ,'outputs':[_pro('wb_infl_exchg_gdp.pkl.gz')]
+     }
+   ,{'script':'1n_extract_pig333.py'
+     ,'inputs':[_raw('pig333_production_brazil_china_russia_2010_2021.xlsx') ,_raw('pig333_producerprice_brazil_china_russia_2010_2021.xlsx')]
+     ,'outputs':[_pro('pig333_production_price.pkl.gz')]
+     }
+   ,{'script':'1o_extract_oecd_ag.py'
+     ,'inputs':[_raw('FAO_OECD_Ag_2010_2021.csv')]
+     ,'outputs':[_pro('oecd_ag_imp.pkl.gz') ,_pro('oecd_ag_p.pkl.gz') ,_pro('oecd_ag_pigandpoultry.pkl.gz')]
+     }
+   ,{'script':'1p_extract_interpig.py'
+     ,'inputs':[_raw('interPIG') ,'_pdf_tables.py']
+     ,'outputs':[_pro('interpig_combo.pkl.gz')]
+     }
+   ,{'script':'1q_extract_williams_poultry_costs.py'  # Data entered in script
+     ,'outputs':[_pro('poultry_costs_fromwill.pkl.gz')]
+     }
+   ,{'script':'1s_extract_poultry_breedstd_or_models.py'
+     ,'inputs':[_raw('Poultry Standards')]
+     ,'outputs':[
+        _pro('poultrybreedstd_ross308.pkl.gz') ,_pro('poultrybreedstd_ross708.pkl.gz') ,_pro('poultrybreedstd_cobb500.pkl.gz')
+        ,_pro('poultrybreedstd_vencobb400.pkl.gz') ,_pro('poultrybreedstd_liverpool_model.pkl.gz')
+        ,_dash('poultrybreedstd_ross308.pkl.gz') ,_dash('poultrybreedstd_ross708.pkl.gz') ,_dash('poultrybreedstd_cobb500.pkl.gz')
+        ,_dash('poultrybreedstd_vencobb400.pkl.gz') ,_dash('poultrybreedstd_liverpool_model.pkl.gz')
+        ]
+     }
+   ,{'script':'1t_extract_swine_breedstd_or_models.py'
+     ,'inputs':[_raw('Swine standards')]
+     ,'outputs':[
+        _pro('swinebreedstd_pic_growthandfeed.pkl.gz') ,_pro('swinebreedstd_pic_barntype1.pkl.gz') ,_pro('swinebreedstd_pic_barntype2.pkl.gz')
+        ,_pro('swinebreedstd_pic_barntype3.pkl.gz') ,_pro('swinebreedstd_liverpool_model.pkl.gz') ,_pro('swinebreedstd_liverpool_model2.pkl.gz')
+        ,_pro('swinebreedstd_liverpool_model3.pkl.gz')
+        ,_dash('swinebreedstd_pic_growthandfeed.pkl.gz') ,_dash('swinebreedstd_pic_barntype1.pkl.gz') ,_dash('swinebreedstd_pic_barntype2.pkl.gz')
+        ,_dash('swinebreedstd_pic_barntype3.pkl.gz') ,_dash('swinebreedstd_liverpool_model.pkl.gz') ,_dash('swinebreedstd_liverpool_model2.pkl.gz')
+        ,_dash('swinebreedstd_liverpool_model3.pkl.gz')
+        ]
+     }
+   ,{'script':'1v_extract_eu_importexport.py'
+     ,'inputs':[_raw('eurostat_impexp_poultry_2011_2021') ,_raw('eurostat_impexp_swine_2011_2021')]
+     ,'outputs':[_pro('euro_impexp_p.pkl.gz') ,_pro('euro_impexp_p_reporter_perspective.pkl.gz') ,_pro('euro_impexp_p_reporter_perspective_checkpartner.pkl.gz') ,_pro('euro_impexp_swine_p.pkl.gz')]
+     }
+   ,{'script':'1w_extract_uncomtrade.py'
+     ,'inputs':[_raw('uncomtrade_impexp_swine_poultry_2009_2011.csv') ,_raw('uncomtrade_impexp_swine_poultry_2012_2016.csv') ,_raw('uncomtrade_impexp_swine_poultry_2017_2021.csv')]
+     ,'outputs':[_pro('uncomtrade_stack_p_nz.pkl.gz')]
+     }
+   ,{'script':'1x_extract_usda_fas_psd.py'
+     ,'inputs':[_raw('usda_fas_psd_chickenmeat_2010_2021.csv') ,_raw('usda_fas_psd_swinemeat_animalnumbers_2010_2021.csv')]
+     ,'outputs':[_pro('usda_psd_chickenmeat_p.pkl.gz') ,_pro('usda_psd_swinemeat_p.pkl.gz')]
+     }
+   ,{'script':'1y_extract_usda_gats.py'
+     ,'inputs':[
+        _raw('usda_gats_us_exports_chickens_2011_2021_corrected.csv') ,_raw('usda_gats_us_exports_swine_2011_2021_corrected.csv')
+        ,_raw('usda_gats_us_imports_chickens_2011_2021_corrected.csv') ,_raw('usda_gats_us_imports_swine_2011_2021_corrected.csv')
+        ]
+     ,'outputs':[_pro('us_exports_chickens_m_p.pkl.gz') ,_pro('us_exports_swine_m_p.pkl.gz') ,_pro('us_imports_chickens_m_p.pkl.gz') ,_pro('us_imports_swine_m_p.pkl.gz')]
+     }
+   ,{'script':'2a_assemble_poultry.py'
+     ,'inputs':[
+        _pro('fao_chickencombo.pkl.gz') ,_pro('euro_chickencombo.pkl.gz') ,_pro('uk_broilercombo.pkl.gz') ,_pro('usda_broilers_p.pkl.gz')
+        ,_pro('euro_impexp_p.pkl.gz') ,_pro('euro_impexp_p_reporter_perspective_checkpartner.pkl.gz') ,_pro('uncomtrade_stack_p_nz.pkl.gz')
+        ,_pro('uk_feedprice.pkl.gz') ,_pro('uk_feedproduction_selectpoultry_m_p.pkl.gz') ,_pro('wb_infl_exchg_gdp.pkl.gz')
+        ,_pro('wahis_birds_agg2_p.pkl.gz') ,_pro('brazil_chicksplaced_m.pkl.gz') ,_pro('ukfsa_poultry_sum_p.pkl.gz')
+        ,_pro('ukmisc_poultry.pkl.gz') ,_pro('india_poultry.pkl.gz') ,_pro('oecd_ag_p.pkl.gz') ,_pro('poultry_costs_fromwill.pkl.gz')
+        ]
+     ,'outputs':[_pro('chickens_fao_euro.pkl.gz') ,_pro('gbads_chickens_merged.pkl.gz') ,_dash('gbads_chickens_merged_fordash.pkl.gz')]
+     }
+   ,{'script':'2b_assemble_swine.py'
+     ,'inputs':[
+        _pro('fao_pigcombo.pkl.gz') ,_pro('euro_pigcombo.pkl.gz') ,_pro('usda_psd_swinemeat_p.pkl.gz') ,_pro('usda_swine_inventory_p2.pkl.gz')
+        ,_pro('usda_swine_othermetrics_p.pkl.gz') ,_pro('pig333_production_price.pkl.gz') ,_pro('euro_impexp_swine_p.pkl.gz')
+        ,_pro('uncomtrade_stack_p_nz.pkl.gz') ,_pro('uk_feedprice.pkl.gz') ,_pro('uk_feedproduction_selectpig_m_p.pkl.gz')
+        ,_pro('wb_infl_exchg_gdp.pkl.gz') ,_pro('interpig_combo.pkl.gz')
+        ]
+     ,'outputs':[_pro('gbads_pigs_merged.pkl.gz') ,_dash('gbads_pigs_merged_fordash.pkl.gz')]
+     }
+   ,{'script':'3a_burdenofdisease_poultry.py'
+     ,'inputs':[
+        _dash('gbads_chickens_merged_fordash.pkl.gz') ,_dash('poultrybreedstd_ross308.pkl.gz') ,_dash('poultrybreedstd_ross708.pkl.gz')
+        ,_dash('poultrybreedstd_cobb500.pkl.gz') ,_dash('poultrybreedstd_vencobb400.pkl.gz')
+        ,os.path.join(PIPELINE_COMMON_FOLDER ,'_breed_standards.py')
+        ]
+     ,'outputs':[os.path.join(EXPDATA_FOLDER ,'gbads_chickens_bod.csv')]
+     }
+   ,{'script':'3b_burdenofdisease_swine.py'
+     ,'inputs':[
+        _dash('gbads_pigs_merged_fordash.pkl.gz') ,_dash('swinebreedstd_pic_growthandfeed.pkl.gz') ,_dash('swinebreedstd_liverpool_model.pkl.gz')
+        ,_dash('swinebreedstd_liverpool_model2.pkl.gz') ,os.path.join(PIPELINE_COMMON_FOLDER ,'_breed_standards.py')
+        ]
+     }
+]
+
+# Steps run in parallel worker processes as soon as the steps they depend on have finished.
+# Each worker sets up its own namespace from the control files and the folder constants below.
+# Add names of scripts to FORCE_STEPS to rerun them regardless of the cache.
+import _pipeline_runner as runner
+imp.reload(runner)
+
+if __name__ == '__main__':    # Required for worker processes on Windows
+   pipeline_timings = runner.run_steps_parallel(
+      pipeline_steps
+      ,CACHE_FOLDER=os.path.join(PRODATA_FOLDER ,'extract_cache')
+      ,CONSTANTS={key:value for key ,value in globals().items() if key.endswith('_FOLDER')}
+      ,MODULES={'uc':'_constants' ,'pdft':'_pdf_tables'}
+      ,SHARED_INPUTS=['_libraries.py' ,'_functions.py' ,'_constants.py']
+      ,FORCE_STEPS=[]
+      ,PROFILE_FOLDER=os.path.join(PRODATA_FOLDER ,'profiling')     # Time and memory by step, compared to the previous run. None to turn off.
+   )
+
+   # Publish the dashboard files as a new data snapshot. Running dashboards switch to it without a restart.
+   subprocess.run(
+      [sys.executable ,os.path.join(DASH_DATA_FOLDER ,os.pardir ,'lib' ,'data_snapshots.py') ,'publish' ,DASH_DATA_FOLDER]
+      ,check=True
+   )
+
+# To run the steps one at a time in this namespace instead:
+# pipeline_timings = excache.run_steps(
+#    pipeline_steps
+#    ,NAMESPACE=globals()
+#    ,CACHE_FOLDER=os.path.join(PRODATA_FOLDER ,'extract_cache')
+#    ,SHARED_INPUTS=['_functions.py' ,'_constants.py']
+#    ,FORCE_STEPS=[]
+# )
@@ -24,15 +24,20 @@
 # ----------------------------------------------------------------------------
 # Import and intitial prep
 # ----------------------------------------------------------------------------
-euro_slaughter = pd.read_csv(os.path.join(RAWDATA_FOLDER ,'EUROSTAT_slaughtered_poultry_pig_2011_2021.csv.gz'))
-cleancolnames(euro_slaughter)
-
 # Replace codes with names
 recode_meat = {
    'B3100':'sl_pigmeat'
    ,'B7000':'sl_poultrymeat'
    ,'B7100':'sl_chicken'
 }
+
+# Read in chunks, keeping only the meats and columns used below
+euro_slaughter = read_csv_filtered(
+   os.path.join(RAWDATA_FOLDER ,'EUROSTAT_slaughtered_poultry_pig_2011_2021.csv.gz')
+   ,USECOLS=['geo' ,'time_period' ,'meat' ,'meatitem' ,'unit' ,'obs_value']
+   ,FILTERS={'meat':list(recode_meat)}
+   ,NUMERIC_COLS=['obs_value']
+)
 euro_slaughter['meat'].replace(to_replace=recode_meat ,inplace=True)
 
 recode_unit = {
@@ -36,6 +36,27 @@ interpig_pdf_2018 = os.path.join(interpig_pdf_location ,'CostofPigProduction2018
 interpig_pdf_2019 = os.path.join(interpig_pdf_location ,'CostOfPigProduction_20193995-WEB2.pdf')
 interpig_pdf_2020 = os.path.join(interpig_pdf_location ,'CostOfPigProduction_2020_4568_161121_WEB.pdf')
 
+#%% Extract tables from PDFs
+
+# Raw tables are cached by file contents, page, and options, so changes to the parsing
+# below can be re-run without invoking tabula again.
+interpig_pdf_cache = os.path.join(PRODATA_FOLDER ,'pdf_table_cache')
+interpig_tabula_options = {
+   'lattice':True                         # True: use lattice mode (if there are ruling lines separating cells)
+   ,'pandas_options':{'header':None}
+}
+
+# Pages used from each file. Each file is read in one pass, with files processed in parallel.
+interpig_pages = {
+   interpig_pdf_2015:[10 ,13 ,21]
+   ,interpig_pdf_2016:[7 ,8 ,16]
+   ,interpig_pdf_2017:[8 ,9 ,13 ,14 ,17]
+   ,interpig_pdf_2018:[8 ,10 ,21]
+   ,interpig_pdf_2019:[9 ,11 ,22]
+   ,interpig_pdf_2020:[9 ,11 ,17 ,18 ,19 ,20 ,22]
+}
+pdft.extract_pdf_tables(interpig_pages ,CACHE_FOLDER=interpig_pdf_cache ,OPTIONS=interpig_tabula_options)
+
 #%% Define functions
 
 def read_interpig_singleyear(
@@ -49,11 +70,7 @@ def read_interpig_singleyear(
       ):
    funcname = inspect.currentframe().f_code.co_name
 
-   df_list = tabula.read_pdf(PDF_FILE
-                             ,pages=PDF_PAGE
-                             ,pandas_options={'header':None}
-                             ,lattice=True 	    # True: use lattice mode (if there are ruling lines separating cells)
-                             )
+   df_list = pdft.get_pdf_tables(PDF_FILE ,PDF_PAGE ,CACHE_FOLDER=interpig_pdf_cache ,OPTIONS=interpig_tabula_options)
    df = df_list[PDF_TABLENUM]
 
    # Get rows for first table
@@ -119,69 +136,33 @@ def read_interpig_multiyear(
       ):
    funcname = inspect.currentframe().f_code.co_name
 
-   df_list = tabula.read_pdf(PDF_FILE
-                             ,pages=PDF_PAGE
-                             ,pandas_options={'header':None}
-                             ,lattice=True 	    # True: use lattice mode (if there are ruling lines separating cells)
-                             )
+   df_list = pdft.get_pdf_tables(PDF_FILE ,PDF_PAGE ,CACHE_FOLDER=interpig_pdf_cache ,OPTIONS=interpig_tabula_options)
    df = df_list[PDF_TABLENUM]
 
-   # Get rows for first table
-   df_a = df.iloc[FIRST_TABLE_STARTROW:FIRST_TABLE_ENDROW + 1]
-
-   # Get country list
-   countrylist_a = list(df_a.iloc[0])
-   countrylist_a = [item for item in countrylist_a if isinstance(item, str)]  # Drop nan
-   print(f"\n<{funcname}> Country list from first section: {countrylist_a}")
+   # Each section has a row of country names followed by one row per variable, with a column for each of 3 years
+   sections = [(FIRST_TABLE_STARTROW ,FIRST_TABLE_ENDROW)]
+   if SECOND_TABLE_STARTROW:
+      sections.append((SECOND_TABLE_STARTROW ,SECOND_TABLE_ENDROW))
+      if THIRD_TABLE_STARTROW:
+         sections.append((THIRD_TABLE_STARTROW ,THIRD_TABLE_ENDROW))
 
-   # Create list with each country repeated for the number of years
    countrylist = []
-   for country in countrylist_a:
-      countrylist = countrylist + [country, country, country]
-
-   # Drop duplicate rows, using the first column as key
-   df_a = df_a.drop_duplicates(subset=[0] ,keep='last')  # Keep='last' to keep year row, drop country row
-
-   if SECOND_TABLE_STARTROW:
-      # Get rows for second table
-      df_b = df.iloc[SECOND_TABLE_STARTROW:SECOND_TABLE_ENDROW + 1]
+   section_dfs = []
+   for i ,(STARTROW ,ENDROW) in enumerate(sections):
+      df_section = df.iloc[STARTROW:ENDROW + 1]
 
       # Get country list
-      countrylist_b = list(df_b.iloc[0])
-      countrylist_b = [item for item in countrylist_b if isinstance(item, str)]  # Drop nan
-      print(f"\n<{funcname}> Country list from second section: {countrylist_b}")
+      countrylist_section = [item for item in df_section.iloc[0] if isinstance(item, str)]  # Drop nan
+      print(f"\n<{funcname}> Country list from section {i + 1}: {countrylist_section}")
 
-      # Add to combined country list
-      for country in countrylist_b:
-         countrylist = countrylist + [country, country, country]
+      # Add to combined country list, with each country repeated for the number of years
+      countrylist.extend(country for country in countrylist_section for _ in range(3))
 
       # Drop duplicate rows, using the first column as key
-      df_b = df_b.drop_duplicates(subset=[0] ,keep='last')  # Keep='last' to keep year row, drop country row
-
-      # Merge pieces, using the first column as key
-      df_merged = pd.merge(left=df_a ,right=df_b ,on=0 ,how='outer')
-
-      if THIRD_TABLE_STARTROW:
-         # Get rows for second table
-         df_c = df.iloc[THIRD_TABLE_STARTROW:THIRD_TABLE_ENDROW + 1]
+      section_dfs.append(df_section.drop_duplicates(subset=[0] ,keep='last'))  # Keep='last' to keep year row, drop country row
 
-         # Get country list
-         countrylist_c = list(df_c.iloc[0])
-         countrylist_c = [item for item in countrylist_c if isinstance(item, str)]  # Drop nan
-         print(f"\n<{funcname}> Country list from third section: {countrylist_c}")
-
-         # Add to combined country list
-         for country in countrylist_c:
-            countrylist = countrylist + [country, country, country]
-
-         # Drop duplicate rows, using the first column as key
-         df_c = df_c.drop_duplicates(subset=[0] ,keep='last')  # Keep='last' to keep year row, drop country row
-
-         # Merge pieces, using the first column as key
-         df_merged = pd.merge(left=df_merged ,right=df_c ,on=0 ,how='outer')
-
-   else:
-      df_merged = df_a
+   # Merge pieces, using the first column as key
+   df_merged = functools.reduce(lambda left ,right: pd.merge(left=left ,right=right ,on=0 ,how='outer') ,section_dfs)
 
    # Drop empty columns
    df_merged = df_merged.dropna(axis=1 ,how='all')
@@ -216,11 +197,7 @@ def read_interpig_multiyear(
 # =============================================================================
 #### DEV Read 2020
 # =============================================================================
-interpig_fps_2020_list = tabula.read_pdf(interpig_pdf_2020
-                                          ,pages=9
-                                          ,pandas_options={'header':None}
-                                          ,lattice=True 	    # True: use lattice mode (if there are ruling lines separating cells)
-                                          )
+interpig_fps_2020_list = pdft.get_pdf_tables(interpig_pdf_2020 ,9 ,CACHE_FOLDER=interpig_pdf_cache ,OPTIONS=interpig_tabula_options)
 interpig_fps_2020 = interpig_fps_2020_list[0]
 
 # Split table and merge
@@ -328,11 +305,7 @@ interpig_fps_2015 = read_interpig_singleyear(
 #### Read 3-year table from 2015
 # =============================================================================
 # From 2015 file, read alternate table that includes data back to 2013
-interpig_fps_2013to2015_list = tabula.read_pdf(interpig_pdf_2015
-                                                ,pages=13
-                                                ,pandas_options={'header':None}
-                                                ,lattice=True 	    # True: use lattice mode (if there are ruling lines separating cells)
-                                                )
+interpig_fps_2013to2015_list = pdft.get_pdf_tables(interpig_pdf_2015 ,13 ,CACHE_FOLDER=interpig_pdf_cache ,OPTIONS=interpig_tabula_options)
 
 # =============================================================================
 #### Stack
@@ -413,11 +386,7 @@ datainfo(interpig_financial_2015to2020)
 # =============================================================================
 #### DEV Read single file
 # =============================================================================
-interpig_feedprice_2016_list = tabula.read_pdf(interpig_pdf_2016
-                                               ,pages=8
-                                               ,pandas_options={'header':None}
-                                               ,lattice=True 	    # True: use lattice mode (if there are ruling lines separating cells)
-                                               )
+interpig_feedprice_2016_list = pdft.get_pdf_tables(interpig_pdf_2016 ,8 ,CACHE_FOLDER=interpig_pdf_cache ,OPTIONS=interpig_tabula_options)
 
 # =============================================================================
 #### Read 2016-2020 tables in GBP
@@ -642,11 +611,7 @@ datainfo(interpig_feedprice_2016to2020)
 # =============================================================================
 #### DEV Read single file
 # =============================================================================
-interpig_physical_2015to2017_list = tabula.read_pdf(interpig_pdf_2017
-                                                    ,pages=13
-                                                    ,pandas_options={'header':None}
-                                                    ,lattice=True 	    # True: use lattice mode (if there are ruling lines separating cells)
-                                                    )
+interpig_physical_2015to2017_list = pdft.get_pdf_tables(interpig_pdf_2017 ,13 ,CACHE_FOLDER=interpig_pdf_cache ,OPTIONS=interpig_tabula_options)
 
 # =============================================================================
 #### Read 2017 and 2020 files with function
@@ -794,11 +759,7 @@ datainfo(interpig_physical_2015to2020)
 # =============================================================================
 #### DEV Read single file
 # =============================================================================
-interpig_industrytrends_2020_list = tabula.read_pdf(interpig_pdf_2020
-                                                    ,pages=22
-                                                    ,pandas_options={'header':None}
-                                                    ,lattice=True 	    # True: use lattice mode (if there are ruling lines separating cells)
-                                                    )
+interpig_industrytrends_2020_list = pdft.get_pdf_tables(interpig_pdf_2020 ,22 ,CACHE_FOLDER=interpig_pdf_cache ,OPTIONS=interpig_tabula_options)
 
 # =============================================================================
 #### Read 2015-2020
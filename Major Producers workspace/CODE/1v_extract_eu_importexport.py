@@ -27,11 +27,30 @@
 # Import and intitial prep
 # ----------------------------------------------------------------------------
 # Poultry
-euro_impexp = pd.read_csv(
+# Recode Product Description
+#!!! Note this data only contains the 8-digit commodity code, which does not distinguish breeders from fattening birds!
+recode_productid = {
+   '01051199':'live_gallusdom_lte185g'
+   ,'01059400':'live_gallusdom_gt185g'
+}
+
+# Read in chunks, keeping only the products and columns used below
+euro_impexp = read_csv_filtered(
    os.path.join(RAWDATA_FOLDER ,'eurostat_impexp_poultry_2011_2021' ,'DS-645593_1_Data.csv')
+   ,USECOLS=[
+      'period_label'
+      ,'reporter' ,'reporter_label'
+      ,'partner' ,'partner_label'
+      ,'product' ,'product_label'
+      ,'flow_label'
+      ,'indicators'
+      ,'value'
+      ]
+   ,FILTERS={'product':list(recode_productid)}
+   ,NUMERIC_COLS=['value']         # Removes commas and handles remaining values like ':'
+   ,DTYPES={'product':'str'}       # Keep leading zeros on product codes
    ,encoding='ansi'       # Default gave encoding error. 'ansi' worked after using Notepad++ to convert file to ANSI.
 )
-cleancolnames(euro_impexp)
 datainfo(euro_impexp)
 
 products = list(euro_impexp['product_label'].unique())
@@ -46,19 +65,9 @@ periods = list(euro_impexp['period_label'].unique())
 euro_impexp[['month_range' ,'year']] = euro_impexp['period_label'].str.split(' ' ,expand=True)
 euro_impexp['year'] = euro_impexp['year'].astype('int')
 
-# Change values to numeric
-euro_impexp['value'] = euro_impexp['value'].str.replace(',' ,'')  # First remove commas
-euro_impexp['value'] = pd.to_numeric(euro_impexp['value'] ,errors='coerce')    # Use to_numeric to handle remaining values like ':'
-
 # Get Product ID lookup
 product_desc = euro_impexp[['product' ,'product_label']].drop_duplicates()
 
-# Recode Product Description
-#!!! Note this data only contains the 8-digit commodity code, which does not distinguish breeders from fattening birds!
-recode_productid = {
-   '01051199':'live_gallusdom_lte185g'
-   ,'01059400':'live_gallusdom_gt185g'
-}
 euro_impexp['product_shortname'] = euro_impexp['product'].replace(recode_productid)
 
 # Recode indicators
@@ -371,11 +380,37 @@ plot_histogram_withinset(
 # ----------------------------------------------------------------------------
 # Import
 # ----------------------------------------------------------------------------
-euro_impexp_swine = pd.read_csv(
+# Recode Product Description
+recode_productid = {
+   103:'live_swine'
+   ,10310:'live_swine_purebred_breeding'
+   ,1031000:'live_swine_purebred_breeding'
+   ,10391:'live_swine_purebred_lt50kg'
+   ,1039110:'live_swine_dom_lt50kg'
+   ,1039190:'live_swine_nondom_lt50kg'
+   ,10392:'live_swine_purebred_gte50kg'
+   ,1039211:'live_sows_dom_nongilt_gte160kg'
+   ,1039219:'live_swine_dom_gte50kg'
+   ,1039290:'live_swine_nondom_gte50kg'
+}
+
+# Read in chunks, keeping only the products and columns used below
+# Dropping redundant product 10310 (same as 10310000)
+euro_impexp_swine = read_csv_filtered(
     os.path.join(RAWDATA_FOLDER ,'eurostat_impexp_swine_2011_2021' ,'DS-645593_1_Data.csv')
+    ,USECOLS=[
+       'period'
+       ,'reporter'
+       ,'partner'
+       ,'product' ,'product_label'
+       ,'flow'
+       ,'indicators'
+       ,'value'
+       ]
+    ,FILTERS={'product':[code for code in recode_productid if code != 10310]}
+    ,NUMERIC_COLS=['value']         # Removes commas and handles remaining values like ':'
     ,encoding='ansi'       # Default gave encoding error. 'ansi' worked.
 )
-cleancolnames(euro_impexp_swine)
 datainfo(euro_impexp_swine)
 
 # ----------------------------------------------------------------------------
@@ -385,33 +420,11 @@ datainfo(euro_impexp_swine)
 euro_impexp_swine[['month_range' ,'year']] = euro_impexp_swine['period'].str.split(' ' ,expand=True)
 euro_impexp_swine['year'] = euro_impexp_swine['year'].astype('int')
 
-# Change values to numeric
-euro_impexp_swine['value'] = euro_impexp_swine['value'].str.replace(',' ,'')  # First remove commas
-euro_impexp_swine['value'] = pd.to_numeric(euro_impexp_swine['value'] ,errors='coerce')    # Use to_numeric to handle remaining values like ':'
-
 # Get Product ID lookup
 product_desc_swine = euro_impexp_swine[['product' ,'product_label']].drop_duplicates()
 
-# Recode Product Description
-recode_productid = {
-   103:'live_swine'
-   ,10310:'live_swine_purebred_breeding'
-   ,1031000:'live_swine_purebred_breeding'
-   ,10391:'live_swine_purebred_lt50kg'
-   ,1039110:'live_swine_dom_lt50kg'
-   ,1039190:'live_swine_nondom_lt50kg'
-   ,10392:'live_swine_purebred_gte50kg'
-   ,1039211:'live_sows_dom_nongilt_gte160kg'
-   ,1039219:'live_swine_dom_gte50kg'
-   ,1039290:'live_swine_nondom_gte50kg'
-}
 euro_impexp_swine['product_shortname'] = euro_impexp_swine['product'].replace(recode_productid)
 
-# Drop redundant products: 10310 (same as 10310000)
-_droprows = (euro_impexp_swine['product'] == 10310)
-print(f"> Dropping {_droprows.sum() :,} rows.")
-euro_impexp_swine = euro_impexp_swine.drop(euro_impexp_swine.loc[_droprows].index).reset_index(drop=True)
-
 # Recode indicators
 recode_indicators = {
    'QUANTITY_IN_100KG':'100KG'
@@ -34,19 +34,25 @@ describe_hscode = {
 
 #%% Import and stack
 
-uncomtrade_2009_2011 = pd.read_csv(os.path.join(RAWDATA_FOLDER ,'uncomtrade_impexp_swine_poultry_2009_2011.csv'))
-uncomtrade_2012_2016 = pd.read_csv(os.path.join(RAWDATA_FOLDER ,'uncomtrade_impexp_swine_poultry_2012_2016.csv'))
-uncomtrade_2017_2021 = pd.read_csv(os.path.join(RAWDATA_FOLDER ,'uncomtrade_impexp_swine_poultry_2017_2021.csv'))
-
+# Read each file in chunks, keeping only the HS codes and columns used below
+uncomtrade_files = [
+   'uncomtrade_impexp_swine_poultry_2009_2011.csv'
+   ,'uncomtrade_impexp_swine_poultry_2012_2016.csv'
+   ,'uncomtrade_impexp_swine_poultry_2017_2021.csv'
+]
 uncomtrade_stack = pd.concat(
-   [uncomtrade_2009_2011 ,uncomtrade_2012_2016 ,uncomtrade_2017_2021]      # List of dataframes to concatenate
+   [read_csv_filtered(
+      os.path.join(RAWDATA_FOLDER ,FILE)
+      ,USECOLS=['reporter' ,'year' ,'trade_flow' ,'commodity_code' ,'qty_unit' ,'qty']
+      ,FILTERS={'commodity_code':list(describe_hscode)}
+      ,DTYPES={'qty':'float64'}
+   ) for FILE in uncomtrade_files]      # List of dataframes to concatenate
    ,axis=0              # Axis=0: concatenate rows, axis=1: concatenate columns (merge)
    ,ignore_index=True   # True: do not keep index values on concatenation axis
 )
 
 #%% Cleanup
 
-cleancolnames(uncomtrade_stack)
 datainfo(uncomtrade_stack)
 
 list_codes = list(uncomtrade_stack['commodity_code'].unique())
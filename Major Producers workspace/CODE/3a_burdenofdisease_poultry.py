@@ -15,7 +15,8 @@ poultrybreedstd_vencobb400 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'poul
 
 dfdev = gbads_chickens_merged_fordash.copy()
 
-DASH_LIB_FOLDER = os.path.join(PARENT_FOLDER, 'Dashboard' ,'Dev' ,'lib')
+DASH_LIB_FOLDER = os.path.join(os.path.dirname(DASH_DATA_FOLDER) ,'lib')
+import _breed_standards as brd     # Interpolated breed standard curves in pipeline_common, shared with the dashboard
 exec(open(os.path.join(DASH_LIB_FOLDER ,'bod_calcs.py')).read())
 
 #%% DEV Burden of disease calcs
@@ -93,8 +94,7 @@ def calc_bod_idealproduction_tonnes(
       print(f"<{funcname}> Invalid breed specified. Using default COBB500.")
       breed_lookup = poultrybreedstd_cobb500
 
-   _select_dof = (breed_lookup['dayonfeed'] == AVG_DOF)
-   breedstdwt_kg = breed_lookup.loc[_select_dof ,'bodyweight_g'] / 1000
+   breedstdwt_kg = brd.weight_kg_at_day(breed_lookup ,AVG_DOF)
 
    OUTPUT = INPUT_ROW['acc_headplaced'] * breedstdwt_kg * AVG_CARC_YIELD / 1000
    return OUTPUT
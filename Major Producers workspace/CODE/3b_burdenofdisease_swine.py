@@ -14,7 +14,8 @@ swinebreedstd_liverpool_model2 = pd.read_pickle(os.path.join(DASH_DATA_FOLDER ,'
 
 dfdev = gbads_pigs_merged_fordash.copy()
 
-DASH_LIB_FOLDER = os.path.join(PARENT_FOLDER, 'Dashboard' ,'Dev' ,'lib')
+DASH_LIB_FOLDER = os.path.join(os.path.dirname(DASH_DATA_FOLDER) ,'lib')
+import _breed_standards as brd     # Interpolated breed standard curves in pipeline_common, shared with the dashboard
 exec(open(os.path.join(DASH_LIB_FOLDER ,'bod_calcs.py')).read())
 
 #%% DEV Breed standard growth based on feed intake
@@ -47,16 +48,11 @@ def calc_bod_breedstdwt_fromfeed_kg(
       INPUT_ROW
       ,BREED_DF       # Data frame with breed reference information. Must contain columns 'dayonfeed', 'bodyweight_kg', and 'cml_feedintake_kg'.
       ):
-   # Create interpolator
-   interp_weight_from_feed = sp.interpolate.interp1d(
-      BREED_DF['cml_feedintake_kg']
-      ,BREED_DF['bodyweight_kg']
-   )
-   # Apply interpolator
-   OUTPUT = interp_weight_from_feed(INPUT_ROW['acc_avgfeedintake_kgperhd']) * 1   # Multiply by one: trick to convert array to number
+   OUTPUT = brd.weight_kg_at_feed(BREED_DF ,INPUT_ROW['acc_avgfeedintake_kgperhd'])
    return OUTPUT
 
-dfdev['bod_breedstdwt_kg'] = dfdev.apply(calc_bod_breedstdwt_fromfeed_kg ,'swinebreedstd_pic_growthandfeed' ,axis=1)
+# Vectorized: look up all rows at once
+dfdev['bod_breedstdwt_kg'] = brd.weight_kg_at_feed(swinebreedstd_pic_growthandfeed ,dfdev['acc_avgfeedintake_kgperhd'])
 
 #%% DEV BOD for given animal weight
 # Burden measured in actual vs. optimal inputs (translated to $ cost)
@@ -1,37 +1,22 @@
+# Modules shared by all workspaces (_extract_cache, _pipeline_runner, _profiling) are in pipeline_common at the top of the
+# repository. Scripts run with this code folder as the working directory.
+PIPELINE_COMMON_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())) ,'pipeline_common')
+if PIPELINE_COMMON_FOLDER not in sys.path:
+   sys.path.insert(0 ,PIPELINE_COMMON_FOLDER)
+
 # To get the name of an object, as a string
 def getobjectname(OBJECT):
     objectname = [x for x in globals() if globals()[x] is OBJECT][0]
     return objectname
 
-# To time a piece of code
-def timerstart(LABEL=None):      # String (opt): add a label to the printed timer messages
-   global _timerstart ,_timerstart_label
-   funcname = inspect.currentframe().f_code.co_name
-   _timerstart_label = LABEL
-   _timerstart = dt.datetime.now()
-   if _timerstart_label:
-      print(f"\n<{funcname}> {_timerstart_label} {_timerstart :%I:%M:%S %p} \n")
-   else:
-      print(f"\n<{funcname}> {_timerstart :%I:%M:%S %p} \n")
-   return None
+# Timing, data info and profiling are shared across workspaces in pipeline_common/_profiling.py.
+# Call prof.start_run() to also record time and memory for each timerstart()/timerstop() pair and
+# the shape and memory of each dataframe passed to datainfo().
+import _profiling as prof
 
-def timerstop():
-   global _timerstop
-   funcname = inspect.currentframe().f_code.co_name
-   if '_timerstart' in globals():
-      _timerstop = dt.datetime.now()
-      elapsed = _timerstop - _timerstart
-      hours = (elapsed.days * 24) + (elapsed.seconds // 3600)
-      minutes = (elapsed.seconds % 3600) // 60
-      seconds = (elapsed.seconds % 60) + (elapsed.microseconds / 1000000)
-      print(f"\n<{funcname}> {_timerstop :%I:%M:%S %p}")
-      if _timerstart_label:
-         print(f"<{funcname}> {_timerstart_label} Elapsed {hours}h: {minutes}m: {seconds :.1f}s \n")
-      else:
-         print(f"<{funcname}> Elapsed {hours}h: {minutes}m: {seconds :.1f}s \n")
-   else:
-      print(f"<{funcname}> Error: no start time defined. Call timerstart() first.")
-   return None
+# To time a piece of code
+timerstart = prof.timerstart
+timerstop = prof.timerstop
 
 # To get index(es) of a dataframe as regular columns
 # Must assign the output to a dataframe e.g. df = indextocolumns(df).
@@ -88,34 +73,70 @@ def cleancolnames(INPUT_DF):
       .str.replace('&' ,'_and_')
    return None
 
-# To print df.info() with header for readability, and optionally write data info to text file
-def datainfo(
-      INPUT_DF
-      ,OUTFOLDER=None     # String (opt): folder to output {dataname}_info.txt. If None, no file will be created.
+# To read a large CSV in chunks, keeping only the rows and columns needed
+# Filters and numeric conversion are applied to each chunk before it is kept, so peak memory
+# is bounded by CHUNKSIZE plus the size of the filtered result, regardless of the size of the file.
+# Column names in all arguments and in the result are cleaned as by cleancolnames().
+# Example usage:
+   # df = read_csv_filtered(file ,USECOLS=['reporter' ,'year' ,'qty'] ,FILTERS={'commodity_code':[10511 ,10591]} ,NUMERIC_COLS=['qty'])
+def read_csv_filtered(
+      FILE                  # String: path to CSV file. Can be compressed (.gz, .zip).
+      ,USECOLS=None         # List of strings (opt): columns to keep. If None, keep all columns.
+      ,FILTERS={}           # Dictionary (opt): {column: list of values}. Keep only rows where column is in the list of values.
+      ,NUMERIC_COLS=[]      # List of strings (opt): columns to convert to float. Commas are removed first, and remaining non-numeric values such as ':' become missing.
+      ,DTYPES={}            # Dictionary (opt): {column: dtype} for other columns, e.g. {'product':'str'} to keep leading zeros
+      ,CHUNKSIZE=200000     # Integer: number of rows to read at a time
+      ,**READ_CSV_KWARGS    # Other arguments passed to pd.read_csv(), e.g. encoding
    ):
    funcname = inspect.currentframe().f_code.co_name
-   dataname = [x for x in globals() if globals()[x] is INPUT_DF][0]
-   rowcount = INPUT_DF.shape[0]
-   colcount = INPUT_DF.shape[1]
-   idxcols = str(list(INPUT_DF.index.names))
-   header = f"Data name: {dataname :>26s}\nRows:      {rowcount :>26,}\nColumns:   {colcount :>26,}\nIndex:     {idxcols :>26s}\n"
-   divider = ('-'*26) + ('-'*11) + '\n'
-   bigdivider = ('='*26) + ('='*11) + '\n'
-   print(bigdivider + header + divider)
-   INPUT_DF.info()
-   print(divider + f"End:       {dataname:>26s}\n" + bigdivider)
-
-   if OUTFOLDER:     # If something has been passed to OUTFOLDER parameter
-      filename = f"{dataname}_info"
-      print(f"\n<{funcname}> Creating file {OUTFOLDER}\{filename}.txt")
-      datetimestamp = 'Created on ' + time.strftime('%Y-%m-%d %X', time.gmtime()) + ' UTC' + '\n'
-      buffer = io.StringIO()
-      INPUT_DF.info(buf=buffer, max_cols=colcount)
-      filecontents = header + divider + datetimestamp + buffer.getvalue()
-      tofile = os.path.join(OUTFOLDER, f"{filename}.txt")
-      with open(tofile, 'w', encoding='utf-8') as f: f.write(filecontents)
-      print(f"<{funcname}> ...done.")
-   return None
+
+   # Map raw column names to clean names by reading the header only
+   header = pd.read_csv(FILE ,nrows=0 ,**READ_CSV_KWARGS)
+   rawcols = list(header)
+   cleancolnames(header)
+   clean_from_raw = dict(zip(rawcols ,list(header)))
+   raw_from_clean = {clean:raw for raw ,clean in clean_from_raw.items()}
+
+   if USECOLS is None:
+      USECOLS = list(header)
+   needcols = set(USECOLS) | set(FILTERS) | set(NUMERIC_COLS)
+   missingcols = needcols - set(raw_from_clean)
+   if missingcols:
+      raise KeyError(f"<{funcname}> Columns not found in {FILE}: {sorted(missingcols)}")
+   usecols_raw = [raw for raw ,clean in clean_from_raw.items() if clean in needcols]
+
+   # Numeric columns are read as strings and converted after filtering
+   dtypes_raw = {raw_from_clean[COL]:DTYPE for COL ,DTYPE in DTYPES.items()}
+   for COL in NUMERIC_COLS:
+      dtypes_raw[raw_from_clean[COL]] = 'str'
+
+   chunks = []
+   rows_read = 0
+   reader = pd.read_csv(FILE ,usecols=usecols_raw ,dtype=dtypes_raw ,chunksize=CHUNKSIZE ,**READ_CSV_KWARGS)
+   for chunk in reader:
+      rows_read += chunk.shape[0]
+      chunk = chunk.rename(columns=clean_from_raw)
+
+      _keep = np.ones(chunk.shape[0] ,dtype=bool)
+      for COL ,VALUES in FILTERS.items():
+         _keep &= chunk[COL].isin(VALUES).to_numpy()
+      chunk = chunk.loc[_keep ,USECOLS].copy()
+
+      for COL in NUMERIC_COLS:
+         if COL in USECOLS:
+            chunk[COL] = pd.to_numeric(chunk[COL].str.replace(',' ,'' ,regex=False) ,errors='coerce')
+      chunks.append(chunk)
+
+   if chunks:
+      OUTPUT_DF = pd.concat(chunks ,axis=0 ,ignore_index=True)
+   else:
+      OUTPUT_DF = pd.DataFrame(columns=USECOLS)
+   print(f"<{funcname}> Read {rows_read :,} rows from {os.path.basename(FILE)}, kept {OUTPUT_DF.shape[0] :,} rows and {OUTPUT_DF.shape[1]} columns.")
+   return OUTPUT_DF
+
+# To print df.info() with header for readability, and optionally write data info to text file
+# Arguments: INPUT_DF ,MAX_COLS=None ,OUTFOLDER=None
+datainfo = prof.datainfo
 
 # To create output files for a basic description of data
 # {dataname}_desc_numeric.csv: mean, SD, min, max, and quartiles for each numeric column (the output of df.describe, transposed)
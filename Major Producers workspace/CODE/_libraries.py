@@ -11,6 +11,7 @@ import imp                       # Import tools e.g. reload()
 import time                      # Time functions
 import datetime as dt            # Date and time functions
 import itertools                 # Iterator building blocks
+import functools                 # Higher-order functions e.g. reduce()
 import re                        # For handling regular expressions
 
 # =============================================================================
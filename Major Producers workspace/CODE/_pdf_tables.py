@@ -0,0 +1,185 @@
+# Cached, batched extraction of tables from PDF files using tabula
+#
+# tabula launches a Java process for every call to read_pdf() or convert_into().
+# This module reads all requested pages of a document in a single call, and runs
+# independent documents in parallel worker processes.
+#
+# The raw tables for each page are cached on disk, keyed on the file contents,
+# page number, and tabula options. Re-running the parsing logic in the extract
+# scripts reads from the cache and never re-invokes the PDF engine.
+#
+# Example usage:
+   # import _pdf_tables as pdft
+   # pdft.extract_pdf_tables({pdf_a:[9 ,11] ,pdf_b:[8]} ,CACHE_FOLDER=cache_folder ,OPTIONS={'lattice':True})
+   # tables_on_page9 = pdft.get_pdf_tables(pdf_a ,9 ,CACHE_FOLDER=cache_folder ,OPTIONS={'lattice':True})
+
+import os
+import json
+import pickle
+import hashlib
+import collections
+import inspect
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+import tabula
+
+# Hashes of files already read in this session, keyed on (path, size, modified time)
+_file_hashes = {}
+
+# To get the hash of a file's contents. Reads in blocks so large files are not held in memory.
+def file_hash(FILE):
+   stat = os.stat(FILE)
+   key = (os.path.abspath(FILE) ,stat.st_size ,stat.st_mtime_ns)
+   if key not in _file_hashes:
+      hasher = hashlib.sha256()
+      with open(FILE ,'rb') as f:
+         for block in iter(lambda: f.read(1024 * 1024) ,b''):
+            hasher.update(block)
+      _file_hashes[key] = hasher.hexdigest()
+   return _file_hashes[key]
+
+def _cache_file(CACHE_FOLDER ,FILE_HASH ,PAGE ,OPTIONS):
+   options_hash = hashlib.sha256(json.dumps(OPTIONS ,sort_keys=True ,default=str).encode()).hexdigest()
+   return os.path.join(CACHE_FOLDER ,f'{FILE_HASH[:20]}_p{PAGE}_{options_hash[:12]}.pkl')
+
+def _write_cache(CACHE_FILE ,TABLES):
+   # Write to a temporary file and rename so an interrupted run never leaves a partial cache entry
+   tmpfile = f'{CACHE_FILE}.{os.getpid()}.tmp'
+   with open(tmpfile ,'wb') as f:
+      pickle.dump(TABLES ,f ,protocol=pickle.HIGHEST_PROTOCOL)
+   os.replace(tmpfile ,CACHE_FILE)
+   return None
+
+def _read_cache(CACHE_FILE):
+   with open(CACHE_FILE ,'rb') as f:
+      return pickle.load(f)
+
+# Convert tabula's JSON output into dataframes
+# Follows the conversion tabula.read_pdf() does itself (tabula-py 2.2, tabula.io._extract_from), so cached
+# tables are identical to a direct read:
+#    Tables with no rows are dropped
+#    Blank header cells are named "Unnamed: 0", "Unnamed: 1", ... and repeated names get suffixes ".1", ".2", ...
+#    Each column is converted to numeric where all its values allow it, unless pandas_options sets a dtype
+def _tables_from_json(RAW_JSON ,PANDAS_OPTIONS):
+   pandas_options = dict(PANDAS_OPTIONS)
+   columns = pandas_options.pop('names' ,pandas_options.pop('columns' ,None))
+   header = pandas_options.pop('header' ,'infer')
+   pandas_options.pop('encoding' ,None)
+   if header == 'infer':
+      header = None if columns else 0
+
+   tables = []
+   for table in RAW_JSON:
+      if not table['data']:
+         continue
+      rows = [[np.nan if not cell['text'] else cell['text'] for cell in row] for row in table['data']]
+      table_columns = columns
+      if isinstance(header ,int) and not columns:
+         table_columns = rows.pop(header)
+         unnamed = 0
+         for i ,COLNAME in enumerate(table_columns):
+            if COLNAME is np.nan:
+               table_columns[i] = f'Unnamed: {unnamed}'
+               unnamed += 1
+         counts = collections.defaultdict(int)
+         for i ,COLNAME in enumerate(table_columns):
+            count = counts[COLNAME]
+            while count > 0:
+               counts[COLNAME] = count + 1
+               COLNAME = f'{COLNAME}.{count}'
+               count = counts[COLNAME]
+            table_columns[i] = COLNAME
+            counts[COLNAME] = count + 1
+
+      table_df = pd.DataFrame(data=rows ,columns=table_columns ,**pandas_options)
+      if not pandas_options.get('dtype'):
+         for COLNAME in table_df.columns:
+            try:
+               table_df[COLNAME] = pd.to_numeric(table_df[COLNAME])
+            except (ValueError ,TypeError):     # Leave the column unchanged, as pd.to_numeric(errors='ignore')
+               pass
+      tables.append(table_df)
+   return tables
+
+# Read raw tables for a list of pages from one document
+# Returns a dictionary {page: list of dataframes}
+def _read_pages(PDF_FILE ,PAGES ,OPTIONS):
+   options = dict(OPTIONS)
+   pandas_options = options.pop('pandas_options' ,{})
+   raw_json = tabula.read_pdf(PDF_FILE ,pages=list(PAGES) ,output_format='json' ,**options)
+
+   tables_by_page = {page:[] for page in PAGES}
+   if PAGES and all('page_number' in table for table in raw_json):
+      for table in raw_json:
+         tables_by_page[table['page_number']].append(table)
+      return {page:_tables_from_json(tables ,pandas_options) for page ,tables in tables_by_page.items()}
+
+   # Older versions of tabula-java do not report page numbers. Fall back to one read per page.
+   for page in PAGES:
+      raw_json = tabula.read_pdf(PDF_FILE ,pages=page ,output_format='json' ,**options)
+      tables_by_page[page] = _tables_from_json(raw_json ,pandas_options)
+   return tables_by_page
+
+# Worker: extract all uncached pages of a single document and write them to the cache
+def _extract_document(PDF_FILE ,PAGES ,OPTIONS ,CACHE_FOLDER):
+   filehash = file_hash(PDF_FILE)
+   pages_todo = [page for page in PAGES if not os.path.exists(_cache_file(CACHE_FOLDER ,filehash ,page ,OPTIONS))]
+   if pages_todo:
+      tables_by_page = _read_pages(PDF_FILE ,pages_todo ,OPTIONS)
+      for page ,tables in tables_by_page.items():
+         _write_cache(_cache_file(CACHE_FOLDER ,filehash ,page ,OPTIONS) ,tables)
+   return pages_todo
+
+# To extract and cache tables from several documents at once
+# Each document is read in a single tabula session; documents are processed in parallel.
+def extract_pdf_tables(
+      PAGES_BY_FILE           # Dictionary {pdf file path: list of page numbers}
+      ,CACHE_FOLDER           # Folder to store cached tables
+      ,OPTIONS={}             # Dictionary: options passed to tabula.read_pdf(), e.g. {'lattice':True ,'pandas_options':{'header':None}}
+      ,MAX_WORKERS=None       # Integer (opt): number of worker processes. Default uses one per document up to the number of CPUs.
+   ):
+   funcname = inspect.currentframe().f_code.co_name
+   os.makedirs(CACHE_FOLDER ,exist_ok=True)
+
+   # Only send documents with uncached pages to the workers
+   jobs = {}
+   for pdf_file ,pages in PAGES_BY_FILE.items():
+      pages = sorted(set(pages))
+      filehash = file_hash(pdf_file)
+      if any(not os.path.exists(_cache_file(CACHE_FOLDER ,filehash ,page ,OPTIONS)) for page in pages):
+         jobs[pdf_file] = pages
+   print(f"\n<{funcname}> {len(PAGES_BY_FILE)} documents requested, {len(jobs)} need extraction.")
+   if not jobs:
+      return None
+
+   if MAX_WORKERS is None:
+      MAX_WORKERS = min(len(jobs) ,os.cpu_count() or 1)
+   if MAX_WORKERS <= 1:
+      for pdf_file ,pages in jobs.items():
+         pages_done = _extract_document(pdf_file ,pages ,OPTIONS ,CACHE_FOLDER)
+         print(f"<{funcname}> Extracted pages {pages_done} from {os.path.basename(pdf_file)}")
+   else:
+      with concurrent.futures.ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+         futures = {
+            executor.submit(_extract_document ,pdf_file ,pages ,OPTIONS ,CACHE_FOLDER):pdf_file
+            for pdf_file ,pages in jobs.items()
+         }
+         for future in concurrent.futures.as_completed(futures):
+            pages_done = future.result()
+            print(f"<{funcname}> Extracted pages {pages_done} from {os.path.basename(futures[future])}")
+   return None
+
+# To get the list of raw tables on a page, reading from the cache if available
+def get_pdf_tables(
+      PDF_FILE
+      ,PAGE                   # Integer: page number (one-indexed, as in tabula)
+      ,CACHE_FOLDER           # Folder to store cached tables
+      ,OPTIONS={}             # Dictionary: options passed to tabula.read_pdf(). Must match those used for extract_pdf_tables() to hit the cache.
+   ):
+   os.makedirs(CACHE_FOLDER ,exist_ok=True)
+   cache_file = _cache_file(CACHE_FOLDER ,file_hash(PDF_FILE) ,PAGE ,OPTIONS)
+   if not os.path.exists(cache_file):
+      _extract_document(PDF_FILE ,[PAGE] ,OPTIONS ,CACHE_FOLDER)
+   return _read_cache(cache_file)
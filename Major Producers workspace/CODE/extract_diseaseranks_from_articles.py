@@ -7,10 +7,23 @@
 # Define folder path to article. Will export CSVs to same place.
 article_pdf = os.path.join(RAWDATA_FOLDER ,'An_assessment_of_opportunities_to_dissct_host_gene.pdf')
 
-tabula.convert_into(article_pdf ,os.path.join(RAWDATA_FOLDER ,'disease_ranks_poultry.csv') ,pages=9)
-tabula.convert_into(article_pdf ,os.path.join(RAWDATA_FOLDER ,'disease_ranks_cattle.csv') ,pages=12)
-tabula.convert_into(article_pdf ,os.path.join(RAWDATA_FOLDER ,'disease_ranks_swine.csv') ,pages=15)
-tabula.convert_into(article_pdf ,os.path.join(RAWDATA_FOLDER ,'disease_ranks_salmon.csv') ,pages=18)
+# Read all pages in one tabula session. Raw tables are cached so re-running does not invoke tabula again.
+article_pages = {'poultry':9 ,'cattle':12 ,'swine':15 ,'salmon':18}
+article_pdf_cache = os.path.join(PRODATA_FOLDER ,'pdf_table_cache')
+article_tabula_options = {'pandas_options':{'header':None}}
+pdft.extract_pdf_tables({article_pdf:list(article_pages.values())} ,CACHE_FOLDER=article_pdf_cache ,OPTIONS=article_tabula_options)
+
+for species ,page in article_pages.items():
+   # Stack all tables on the page into one CSV, as tabula.convert_into() does
+   article_tables = pdft.get_pdf_tables(article_pdf ,page ,CACHE_FOLDER=article_pdf_cache ,OPTIONS=article_tabula_options)
+   if not article_tables:
+      print(f"> No tables found on page {page} for {species}. Not writing disease_ranks_{species}.csv.")
+      continue
+   pd.concat(article_tables ,ignore_index=True).to_csv(
+      os.path.join(RAWDATA_FOLDER ,f'disease_ranks_{species}.csv')
+      ,header=False
+      ,index=False
+   )
 
 # ----------------------------------------------------------------------------
 # Import to dataframe
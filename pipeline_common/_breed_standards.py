@@ -0,0 +1,139 @@
+#%% About
+'''
+This defines a service for breed standard growth curves.
+
+Each breed standard table (Cobb 500, Ross 308/708, Vencobb 400, the Liverpool
+models, PIC) is turned into curves once:
+    weight by day on feed
+    carcass yield by day on feed
+    weight by cumulative feed intake
+Each curve is a monotone piecewise cubic (PCHIP) interpolant through the table
+values, evaluated once on a dense grid and stored as arrays. Queries interpolate
+in the stored arrays, so they take any fractional input and are vectorized:
+pass a number to get a number or an array to get an array. At the days or feed
+amounts listed in the table they return the table values.
+
+Inputs outside the range of the table, and curves a table has no data for,
+give missing values (NaN), so callers can treat both the same way.
+
+Curves are cached by table contents, so they are shared by every caller that
+passes the same breed standard data frame, whether the dashboard or the
+Major Producers burden of disease scripts, which both import this file from
+pipeline_common.
+
+Usage:
+    breedstd = load_breed_standards(DASH_DATA_FOLDER)
+    weight_kg_at_day(breedstd['Cobb 500'] ,[35 ,35.5 ,42])
+'''
+#%% Imports
+
+import os
+import numpy as np
+import pandas as pd
+import scipy.interpolate
+
+#%% Breed standard files
+
+# Label: (species, file in Dash data folder)
+BREED_STANDARD_FILES = {
+   'Cobb 500':('poultry' ,'poultrybreedstd_cobb500.pkl.gz')
+   ,'Ross 308':('poultry' ,'poultrybreedstd_ross308.pkl.gz')
+   ,'Ross 708':('poultry' ,'poultrybreedstd_ross708.pkl.gz')
+   ,'Venncobb 400':('poultry' ,'poultrybreedstd_vencobb400.pkl.gz')
+   ,'Liverpool model (poultry)':('poultry' ,'poultrybreedstd_liverpool_model.pkl.gz')
+   ,'PIC':('swine' ,'swinebreedstd_pic_growthandfeed.pkl.gz')
+   ,'Liverpool model 3 (swine)':('swine' ,'swinebreedstd_liverpool_model3.pkl.gz')
+}
+
+# To read the breed standard tables and build their curves
+# Returns a dictionary {label: data frame}. Files that do not exist are skipped.
+def load_breed_standards(DATA_FOLDER ,LABELS=None):
+   breedstd = {}
+   for LABEL in (LABELS or BREED_STANDARD_FILES):
+      filename = os.path.join(DATA_FOLDER ,BREED_STANDARD_FILES[LABEL][1])
+      if os.path.exists(filename):
+         breedstd[LABEL] = pd.read_pickle(filename)
+         get_curves(breedstd[LABEL])
+   return breedstd
+
+#%% Curves
+
+# Points per unit of input on the dense grid, e.g. 20 points per day on feed
+DENSE_POINTS_PER_UNIT = 20
+
+# Columns to use for each curve, in order of preference, with a multiplier to get kg or proportion
+# Tables have one of these, e.g. poultry weight is in g and swine weight is in kg.
+_WEIGHT_COLS = [('bodyweight_kg' ,1) ,('bodyweight_g' ,1 / 1000)]
+_YIELD_COLS = [('pct_yield' ,1 / 100)]
+_FEED_COLS = [('cml_feedintake_kg' ,1) ,('cmlfeedintake_g' ,1 / 1000) ,('pred_cmlfeedintake_max_kg' ,1)]
+
+_curves = {}
+
+def clear_curves():
+   _curves.clear()
+   return None
+
+def _first_column(BREED_DF ,CANDIDATES):
+   for COL ,MULTIPLIER in CANDIDATES:
+      if COL in BREED_DF.columns:
+         return BREED_DF[COL].to_numpy(dtype=float) * MULTIPLIER
+   return None
+
+# To build a dense table for one curve from points (x, y)
+# Returns a tuple (x grid, y on grid), or None if there are fewer than 2 usable points.
+def _dense_curve(X ,Y):
+   if X is None or Y is None:
+      return None
+   _keep = ~(np.isnan(X) | np.isnan(Y))
+   points = pd.DataFrame({'x':X[_keep] ,'y':Y[_keep]}).drop_duplicates(subset='x').sort_values(by='x')
+   if len(points) < 2:
+      return None
+   x = points['x'].to_numpy()
+   y = points['y'].to_numpy()
+   n_dense = int(np.ceil((x[-1] - x[0]) * DENSE_POINTS_PER_UNIT)) + 1
+   x_dense = np.union1d(np.linspace(x[0] ,x[-1] ,max(n_dense ,2)) ,x)  # Keep table points so they are returned exactly
+   y_dense = scipy.interpolate.PchipInterpolator(x ,y)(x_dense)
+   y_dense[np.searchsorted(x_dense ,x)] = y
+   return (x_dense ,y_dense)
+
+# Identify a breed standard table by its contents
+def _breedstd_key(BREED_DF):
+   hashed = pd.util.hash_pandas_object(BREED_DF ,index=False).to_numpy()
+   return (tuple(BREED_DF.columns) ,hash(hashed.tobytes()))
+
+# To get all curves for a breed standard table, building them on first use
+# Returns a dictionary {'weight_by_day' ,'yield_by_day' ,'weight_by_feed'}, each a dense table or None
+def get_curves(BREED_DF):
+   key = _breedstd_key(BREED_DF)
+   if key not in _curves:
+      days = _first_column(BREED_DF ,[('dayonfeed' ,1)])
+      weight_kg = _first_column(BREED_DF ,_WEIGHT_COLS)
+      _curves[key] = {
+         'weight_by_day':_dense_curve(days ,weight_kg)
+         ,'yield_by_day':_dense_curve(days ,_first_column(BREED_DF ,_YIELD_COLS))
+         ,'weight_by_feed':_dense_curve(_first_column(BREED_DF ,_FEED_COLS) ,weight_kg)
+      }
+   return _curves[key]
+
+def _query(BREED_DF ,CURVE ,VALUES):
+   curve = get_curves(BREED_DF)[CURVE]
+   values = np.asarray(VALUES ,dtype=float)
+   if curve is None:
+      OUTPUT = np.full(values.shape ,np.nan)     # No data for this curve, e.g. a table without carcass yield
+   else:
+      OUTPUT = np.interp(values ,curve[0] ,curve[1] ,left=np.nan ,right=np.nan)
+   return OUTPUT if OUTPUT.ndim else float(OUTPUT)
+
+#%% Queries
+
+# Live weight (kg) at days on feed
+def weight_kg_at_day(BREED_DF ,DAYS):
+   return _query(BREED_DF ,'weight_by_day' ,DAYS)
+
+# Carcass yield (proportion of live weight) at days on feed
+def yield_prpn_at_day(BREED_DF ,DAYS):
+   return _query(BREED_DF ,'yield_by_day' ,DAYS)
+
+# Live weight (kg) at cumulative feed intake (kg per head)
+def weight_kg_at_feed(BREED_DF ,FEED_KG):
+   return _query(BREED_DF ,'weight_by_feed' ,FEED_KG)
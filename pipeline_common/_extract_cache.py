@@ -0,0 +1,270 @@
+# Cache for the raw-to-intermediate steps run from each workspace's 0_runme.py
+#
+# Each step is a script with declared input and output files:
+   # {'script':'1a_extract_faostat.py'
+   #  ,'inputs':[raw files or folders, and outputs of earlier steps]
+   #  ,'outputs':[files written by the script]
+   # }
+# A step is skipped when the script, the shared control files, and all of its inputs are unchanged
+# since its last successful run and its outputs still exist. Changing one raw file therefore reruns
+# only the step that reads it and the steps that depend on its outputs.
+#
+# Output tables (.pkl.gz and .csv) are also stored in typed columnar format (parquet) in the cache
+# folder, partitioned by step. Each table is fingerprinted from its data rather than its file bytes,
+# so a step that reruns but produces identical data does not force its dependents to rerun.
+#
+# This folder (pipeline_common) is added to sys.path by each workspace's _functions.py.
+#
+# Example usage (from 0_runme.py, after defining folders):
+   # import _extract_cache as excache
+   # excache.run_steps(pipeline_steps ,NAMESPACE=globals() ,CACHE_FOLDER=os.path.join(PRODATA_FOLDER ,'extract_cache'))
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import inspect
+
+import pandas as pd
+
+MANIFEST_FILENAME = 'manifest.json'
+TABLE_EXTENSIONS = ('.pkl.gz' ,'.pkl' ,'.csv')
+
+# =============================================================================
+#### Hashing
+# =============================================================================
+# Hashes of files already read in this session, keyed on (path, size, modified time)
+_file_hashes = {}
+
+def file_hash(FILE):
+   stat = os.stat(FILE)
+   key = (os.path.abspath(FILE) ,stat.st_size ,stat.st_mtime_ns)
+   if key not in _file_hashes:
+      hasher = hashlib.sha256()
+      with open(FILE ,'rb') as f:
+         for block in iter(lambda: f.read(1024 * 1024) ,b''):
+            hasher.update(block)
+      _file_hashes[key] = hasher.hexdigest()
+   return _file_hashes[key]
+
+# Hash a file, or every file in a folder (including file names, so added or removed files are detected)
+def path_hash(PATH):
+   if not os.path.exists(PATH):
+      return 'missing'
+   if os.path.isfile(PATH):
+      return file_hash(PATH)
+   hasher = hashlib.sha256()
+   for root ,_dirs ,files in sorted(os.walk(PATH)):
+      for FILE in sorted(files):
+         fullpath = os.path.join(root ,FILE)
+         hasher.update(os.path.relpath(fullpath ,PATH).encode())
+         hasher.update(file_hash(fullpath).encode())
+   return hasher.hexdigest()
+
+# Fingerprint of a table's contents: column names, dtypes, index and values
+def table_fingerprint(INPUT_DF):
+   hasher = hashlib.sha256()
+   hasher.update(repr([(str(col) ,str(dtype)) for col ,dtype in INPUT_DF.dtypes.items()]).encode())
+   try:
+      hasher.update(pd.util.hash_pandas_object(INPUT_DF ,index=True).to_numpy().tobytes())
+   except TypeError:    # Unhashable values such as lists. Fall back to the pickled bytes.
+      hasher.update(pickle.dumps(INPUT_DF ,protocol=4))
+   return hasher.hexdigest()
+
+def _is_table(PATH):
+   return PATH.lower().endswith(TABLE_EXTENSIONS)
+
+def _read_table(PATH):
+   if PATH.lower().endswith('.csv'):
+      return pd.read_csv(PATH)
+   return pd.read_pickle(PATH)
+
+# =============================================================================
+#### Manifest
+# =============================================================================
+def read_manifest(CACHE_FOLDER):
+   manifest_file = os.path.join(CACHE_FOLDER ,MANIFEST_FILENAME)
+   if os.path.exists(manifest_file):
+      with open(manifest_file ,'r' ,encoding='utf-8') as f:
+         return json.load(f)
+   return {'steps':{}}
+
+def write_manifest(MANIFEST ,CACHE_FOLDER):
+   os.makedirs(CACHE_FOLDER ,exist_ok=True)
+   manifest_file = os.path.join(CACHE_FOLDER ,MANIFEST_FILENAME)
+   tmpfile = f'{manifest_file}.{os.getpid()}.tmp'
+   with open(tmpfile ,'w' ,encoding='utf-8') as f:
+      json.dump(MANIFEST ,f ,indent=2 ,sort_keys=True)
+   os.replace(tmpfile ,manifest_file)    # Atomic, so an interrupted run never leaves a partial manifest
+   return None
+
+# If PATH is an output recorded by an earlier step and is unchanged on disk, use its data fingerprint
+def _recorded_output(MANIFEST ,PATH):
+   path = os.path.abspath(PATH)
+   for record in MANIFEST['steps'].values():
+      output = record.get('outputs' ,{}).get(path)
+      if output:
+         return output
+   return None
+
+def _input_hash(MANIFEST ,PATH):
+   output = _recorded_output(MANIFEST ,PATH)
+   if output and os.path.isfile(PATH):
+      stat = os.stat(PATH)
+      if (stat.st_size ,stat.st_mtime_ns) == (output['size'] ,output['mtime_ns']):
+         return output['fingerprint']
+   return path_hash(PATH)
+
+# Key identifying one version of a step: script contents plus the hash of every input
+def step_key(STEP ,MANIFEST ,SHARED_INPUTS=[]):
+   hasher = hashlib.sha256()
+   hasher.update(file_hash(STEP['script']).encode())
+   for PATH in list(SHARED_INPUTS) + list(STEP.get('inputs' ,[])):
+      hasher.update(os.path.abspath(PATH).encode())
+      hasher.update(_input_hash(MANIFEST ,PATH).encode())
+   return hasher.hexdigest()
+
+# =============================================================================
+#### Storing outputs
+# =============================================================================
+def _step_partition(CACHE_FOLDER ,SCRIPT):
+   return os.path.join(CACHE_FOLDER ,os.path.splitext(os.path.basename(SCRIPT))[0])
+
+# Store a table in parquet, falling back to pickle for columns parquet cannot type (e.g. mixed objects)
+def _store_table(INPUT_DF ,PARTITION_FOLDER ,NAME):
+   os.makedirs(PARTITION_FOLDER ,exist_ok=True)
+   stored_file = os.path.join(PARTITION_FOLDER ,f'{NAME}.parquet')
+   try:
+      INPUT_DF.to_parquet(stored_file)
+   except Exception:
+      if os.path.exists(stored_file):
+         os.remove(stored_file)
+      stored_file = os.path.join(PARTITION_FOLDER ,f'{NAME}.pkl')
+      INPUT_DF.to_pickle(stored_file)
+   return stored_file
+
+# Name for the stored copy of an output. Includes a hash of the full path, as the same file name can
+# be written to more than one folder.
+def _table_name(PATH):
+   name = os.path.basename(PATH)
+   for ext in TABLE_EXTENSIONS:
+      if name.lower().endswith(ext):
+         name = name[:-len(ext)]
+         break
+   return f"{name}_{hashlib.sha256(os.path.abspath(PATH).encode()).hexdigest()[:8]}"
+
+# Record each output's fingerprint and store tables in the cache partition for this step
+def record_outputs(STEP ,CACHE_FOLDER):
+   partition_folder = _step_partition(CACHE_FOLDER ,STEP['script'])
+   outputs = {}
+   for PATH in STEP.get('outputs' ,[]):
+      if not os.path.isfile(PATH):
+         continue
+      stat = os.stat(PATH)
+      record = {'size':stat.st_size ,'mtime_ns':stat.st_mtime_ns ,'stored':None}
+      if _is_table(PATH):
+         df = _read_table(PATH)
+         record['fingerprint'] = table_fingerprint(df)
+         record['stored'] = _store_table(df ,partition_folder ,_table_name(PATH))
+         record['shape'] = list(df.shape)
+      else:
+         record['fingerprint'] = file_hash(PATH)
+      outputs[os.path.abspath(PATH)] = record
+   return outputs
+
+# Restore a missing pickle output from its stored copy
+def _restore_output(PATH ,RECORD):
+   stored_file = RECORD.get('stored')
+   if not stored_file or not os.path.exists(stored_file) or not PATH.lower().endswith(('.pkl.gz' ,'.pkl')):
+      return False
+   if stored_file.endswith('.parquet'):
+      df = pd.read_parquet(stored_file)
+   else:
+      df = pd.read_pickle(stored_file)
+   os.makedirs(os.path.dirname(os.path.abspath(PATH)) ,exist_ok=True)
+   df.to_pickle(PATH)
+   stat = os.stat(PATH)
+   RECORD['size'] ,RECORD['mtime_ns'] = stat.st_size ,stat.st_mtime_ns
+   return True
+
+# =============================================================================
+#### Running steps
+# =============================================================================
+# Check whether a step can be skipped. Restores missing pickle outputs from the cache where possible.
+def is_current(STEP ,MANIFEST ,KEY):
+   record = MANIFEST['steps'].get(os.path.basename(STEP['script']))
+   if not record or record.get('key') != KEY:
+      return False
+   for PATH in STEP.get('outputs' ,[]):
+      if os.path.exists(PATH):
+         continue
+      output = record.get('outputs' ,{}).get(os.path.abspath(PATH))
+      if not output or not _restore_output(PATH ,output):
+         return False
+   return True
+
+# Save the result of a successful run to the manifest
+def record_step(CACHE_FOLDER ,SCRIPT ,KEY ,OUTPUTS ,ELAPSED_S):
+   manifest = read_manifest(CACHE_FOLDER)       # Re-read in case the script took a while
+   manifest['steps'][os.path.basename(SCRIPT)] = {
+      'key':KEY
+      ,'outputs':OUTPUTS
+      ,'elapsed_s':round(ELAPSED_S ,3)
+      ,'finished':time.strftime('%Y-%m-%d %X')
+   }
+   write_manifest(manifest ,CACHE_FOLDER)
+   return None
+
+def exec_script(SCRIPT ,NAMESPACE):
+   with open(SCRIPT ,'r' ,encoding='utf-8') as f:
+      code = compile(f.read() ,SCRIPT ,'exec')
+   exec(code ,NAMESPACE)
+   return None
+
+# Run one step if it is out of date. Returns a dictionary describing what happened.
+def run_step(
+      STEP                  # Dictionary: {'script':..., 'inputs':[...], 'outputs':[...]}
+      ,NAMESPACE            # Dictionary: namespace to run the script in, usually globals() of 0_runme.py
+      ,CACHE_FOLDER         # Folder for the manifest and stored tables
+      ,SHARED_INPUTS=[]     # List of files that affect every step, e.g. _functions.py
+      ,FORCE=False          # True: run even if the step is up to date
+   ):
+   funcname = inspect.currentframe().f_code.co_name
+   script = os.path.basename(STEP['script'])
+   manifest = read_manifest(CACHE_FOLDER)
+   key = step_key(STEP ,manifest ,SHARED_INPUTS)
+
+   if not FORCE and is_current(STEP ,manifest ,key):
+      write_manifest(manifest ,CACHE_FOLDER)     # Save any restored outputs
+      print(f"<{funcname}> {script}: up to date, skipping.")
+      return {'script':script ,'status':'skipped' ,'elapsed_s':0.0}
+
+   print(f"\n<{funcname}> {script}: running...")
+   timer_start = time.perf_counter()
+   exec_script(STEP['script'] ,NAMESPACE)
+   elapsed_s = time.perf_counter() - timer_start
+
+   record_step(CACHE_FOLDER ,script ,key ,record_outputs(STEP ,CACHE_FOLDER) ,elapsed_s)
+   print(f"<{funcname}> {script}: finished in {elapsed_s :,.1f}s.")
+   return {'script':script ,'status':'ran' ,'elapsed_s':elapsed_s}
+
+# Run a list of steps in order, skipping those that are up to date. Prints and returns timing per step.
+def run_steps(
+      STEPS                 # List of step dictionaries, in run order
+      ,NAMESPACE            # Dictionary: namespace to run the scripts in, usually globals() of 0_runme.py
+      ,CACHE_FOLDER         # Folder for the manifest and stored tables
+      ,SHARED_INPUTS=[]     # List of files that affect every step, e.g. _functions.py
+      ,FORCE_STEPS=[]       # List of script names to run even if up to date, e.g. steps that query an API
+   ):
+   funcname = inspect.currentframe().f_code.co_name
+   results = []
+   for STEP in STEPS:
+      force = os.path.basename(STEP['script']) in FORCE_STEPS
+      results.append(run_step(STEP ,NAMESPACE ,CACHE_FOLDER ,SHARED_INPUTS ,FORCE=force))
+   timings = pd.DataFrame(results)
+
+   print(f"\n<{funcname}> Timing by step:")
+   print(timings.to_string(index=False ,float_format=lambda x: f'{x :,.1f}'))
+   print(f"<{funcname}> Ran {(timings['status'] == 'ran').sum()} of {len(timings)} steps in {timings['elapsed_s'].sum() :,.1f}s.")
+   return timings
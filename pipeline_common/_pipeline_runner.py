@@ -0,0 +1,187 @@
+# Dependency-aware parallel runner for the steps declared in 0_runme.py
+#
+# Uses the same step declarations as _extract_cache.run_steps():
+   # {'script':'2a_assemble_poultry.py' ,'inputs':[...] ,'outputs':[...]}
+# A step depends on every earlier step that writes one of its inputs. Independent steps run at the
+# same time in worker processes, and each step starts as soon as the steps it depends on have
+# finished. Steps that are up to date in the extract cache are skipped as before.
+#
+# Each worker runs a script in a fresh namespace, set up the same way as 0_runme.py: executing
+# _libraries.py and _functions.py, importing _constants as uc, and defining the folder constants.
+# Scripts therefore read their inputs from disk rather than from dataframes left in memory.
+#
+# With PROFILE_FOLDER, each script that runs is profiled as one step (see _profiling.py): wall and CPU
+# time, peak memory, and the dataframes it leaves in its namespace. The run report pipeline_profile.json
+# is written to PROFILE_FOLDER with a comparison to the previous run.
+#
+# This folder (pipeline_common) is added to sys.path by each workspace's _functions.py. Worker
+# processes start with the same sys.path.
+#
+# Example usage (from 0_runme.py, after defining folders):
+   # import _pipeline_runner as runner
+   # runner.run_steps_parallel(pipeline_steps ,CACHE_FOLDER=... ,CONSTANTS={k:v for k ,v in globals().items() if k.endswith('_FOLDER')})
+
+import os
+import sys
+import time
+import inspect
+import importlib
+import contextlib
+import concurrent.futures
+
+import pandas as pd
+
+import _extract_cache as excache
+import _profiling as prof
+
+def _step_name(STEP):
+   return os.path.basename(STEP['script'])
+
+# Build the dependency graph: {script: set of scripts whose outputs it reads}
+def build_graph(STEPS):
+   producers = {}
+   for STEP in STEPS:
+      for PATH in STEP.get('outputs' ,[]):
+         producers[os.path.abspath(PATH)] = _step_name(STEP)
+   graph = {}
+   for STEP in STEPS:
+      name = _step_name(STEP)
+      graph[name] = {producers[os.path.abspath(PATH)] for PATH in STEP.get('inputs' ,[]) if os.path.abspath(PATH) in producers} - {name}
+
+   # Check for cycles by repeatedly removing steps with no remaining dependencies
+   remaining = {name:set(upstream) for name ,upstream in graph.items()}
+   while remaining:
+      ready = [name for name ,upstream in remaining.items() if not upstream]
+      if not ready:
+         raise ValueError(f"Steps have circular dependencies: {sorted(remaining)}")
+      for name in ready:
+         del remaining[name]
+      for upstream in remaining.values():
+         upstream.difference_update(ready)
+   return graph
+
+# Longest chain of dependent steps, weighted by the time each step took
+# Returns the list of scripts on the chain and its total time
+def critical_path(GRAPH ,DURATIONS):
+   finish = {}
+   previous = {}
+   def _finish(name):
+      if name not in finish:
+         upstream = sorted(GRAPH[name] ,key=_finish ,reverse=True)
+         previous[name] = upstream[0] if upstream else None
+         finish[name] = DURATIONS.get(name ,0.0) + (_finish(upstream[0]) if upstream else 0.0)
+      return finish[name]
+   last = max(GRAPH ,key=_finish)
+   path = []
+   while last:
+      path.append(last)
+      last = previous[last]
+   return path[::-1] ,finish[path[0]]
+
+# Worker: run one script in a fresh namespace and record its outputs
+# Returns the profile of the step if PROFILE is True, otherwise None
+def _run_in_worker(STEP ,WORKDIR ,SETUP_FILES ,MODULES ,CONSTANTS ,CACHE_FOLDER ,PROFILE=False):
+   os.chdir(WORKDIR)
+   if WORKDIR not in sys.path:
+      sys.path.insert(0 ,WORKDIR)
+   namespace = {'__name__':'__pipeline__'}
+   for FILE in SETUP_FILES:
+      excache.exec_script(FILE ,namespace)
+   for ALIAS ,MODULE in MODULES.items():
+      namespace[ALIAS] = importlib.import_module(MODULE)
+   namespace.update(CONSTANTS)
+
+   timer_start = time.perf_counter()
+   with prof.step(_step_name(STEP) ,NAMESPACE=namespace) if PROFILE else contextlib.nullcontext() as profile:
+      excache.exec_script(STEP['script'] ,namespace)
+   elapsed_s = time.perf_counter() - timer_start
+   return excache.record_outputs(STEP ,CACHE_FOLDER) ,elapsed_s ,profile
+
+def run_steps_parallel(
+      STEPS                                        # List of step dictionaries. Order only matters for reporting.
+      ,CACHE_FOLDER                                # Folder for the extract cache manifest and stored tables
+      ,CONSTANTS={}                                # Dictionary: values to define in each script's namespace, e.g. folder paths
+      ,SETUP_FILES=['_libraries.py' ,'_functions.py']   # Files to execute in each script's namespace before the script
+      ,MODULES={'uc':'_constants'}                 # Dictionary {alias: module} to import into each script's namespace
+      ,SHARED_INPUTS=[]                            # List of files that affect every step, e.g. _functions.py
+      ,FORCE_STEPS=[]                              # List of script names to run even if up to date
+      ,MAX_WORKERS=None                            # Integer (opt): number of worker processes. Default is the number of CPUs.
+      ,PROFILE_FOLDER=None                         # String (opt): folder for the profiling report. If None, steps are not profiled.
+   ):
+   funcname = inspect.currentframe().f_code.co_name
+   workdir = os.getcwd()
+   steps = {_step_name(STEP):STEP for STEP in STEPS}
+   graph = build_graph(STEPS)
+   waiting = {name:set(upstream) for name ,upstream in graph.items()}
+   results = {}
+   run_start = time.perf_counter()
+   if PROFILE_FOLDER:
+      prof.start_run('pipeline' ,REPORT_FOLDER=PROFILE_FOLDER)
+
+   def _finish(name ,status ,elapsed_s ,started_s):
+      results[name] = {'script':name ,'status':status ,'elapsed_s':elapsed_s ,'started_s':started_s}
+      for upstream in waiting.values():
+         upstream.discard(name)
+
+   with concurrent.futures.ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+      running = {}
+      while waiting or running:
+         # Dispatch every step whose dependencies have finished. Skipped steps finish immediately,
+         # which can make more steps ready, so repeat until nothing changes.
+         dispatched = True
+         while dispatched:
+            dispatched = False
+            for name in [name for name ,upstream in waiting.items() if not upstream]:
+               del waiting[name]
+               dispatched = True
+               failed_upstream = [up for up in graph[name] if results[up]['status'] in ('failed' ,'blocked')]
+               if failed_upstream:
+                  print(f"<{funcname}> {name}: not run because {failed_upstream} did not complete.")
+                  _finish(name ,'blocked' ,0.0 ,None)
+                  continue
+               manifest = excache.read_manifest(CACHE_FOLDER)
+               key = excache.step_key(steps[name] ,manifest ,SHARED_INPUTS)
+               if name not in FORCE_STEPS and excache.is_current(steps[name] ,manifest ,key):
+                  excache.write_manifest(manifest ,CACHE_FOLDER)     # Save any restored outputs
+                  print(f"<{funcname}> {name}: up to date, skipping.")
+                  _finish(name ,'skipped' ,0.0 ,None)
+                  continue
+               print(f"<{funcname}> {name}: starting.")
+               future = executor.submit(_run_in_worker ,steps[name] ,workdir ,SETUP_FILES ,MODULES ,CONSTANTS ,CACHE_FOLDER ,PROFILE=bool(PROFILE_FOLDER))
+               running[future] = (name ,key ,time.perf_counter() - run_start)
+
+         if not running:
+            continue
+         done ,_pending = concurrent.futures.wait(running ,return_when=concurrent.futures.FIRST_COMPLETED)
+         for future in done:
+            name ,key ,started_s = running.pop(future)
+            try:
+               outputs ,elapsed_s ,profile = future.result()
+            except Exception as err:
+               print(f"<{funcname}> {name}: FAILED with {type(err).__name__}: {err}")
+               _finish(name ,'failed' ,time.perf_counter() - run_start - started_s ,started_s)
+               continue
+            excache.record_step(CACHE_FOLDER ,name ,key ,outputs ,elapsed_s)
+            if profile:
+               prof.add_step(profile)
+            print(f"<{funcname}> {name}: finished in {elapsed_s :,.1f}s.")
+            _finish(name ,'ran' ,elapsed_s ,started_s)
+
+   wall_s = time.perf_counter() - run_start
+   timings = pd.DataFrame([results[_step_name(STEP)] for STEP in STEPS])
+
+   # Report
+   path ,path_s = critical_path(graph ,dict(zip(timings['script'] ,timings['elapsed_s'])))
+   print(f"\n<{funcname}> Timing by step:")
+   print(timings.to_string(index=False ,na_rep='' ,float_format=lambda x: f'{x :,.1f}'))
+   print(f"\n<{funcname}> Critical path ({path_s :,.1f}s):")
+   for name in path:
+      print(f"    {name :<45s} {results[name]['elapsed_s'] :>8,.1f}s  {results[name]['status']}")
+   print(f"<{funcname}> Wall time {wall_s :,.1f}s. Sum of step times {timings['elapsed_s'].sum() :,.1f}s.")
+   if PROFILE_FOLDER:
+      prof.finish_run()
+
+   failed = list(timings.loc[timings['status'] == 'failed' ,'script'])
+   if failed:
+      raise RuntimeError(f"Pipeline steps failed: {failed}")
+   return timings
@@ -0,0 +1,373 @@
+# Timing and memory profiling for pipeline steps and scripts
+#
+# For each named step, records wall time, CPU time, peak resident memory (RSS) of the process, and
+# the shape and memory of dataframes. At the end of a run, writes a report in JSON and compares it
+# to the previous run of the same name, flagging steps that got slower or bigger.
+#
+# Recording is off until start_run() is called. timerstart(), timerstop() and datainfo() replace the
+# versions that were defined in each _functions.py and Ethiopia script, and print the same
+# messages whether recording or not. While recording, each timerstart()/timerstop() pair is also
+# recorded as a step, and each datainfo() call records its dataframe against the current step.
+#
+# This folder (pipeline_common) is added to sys.path by each workspace's _functions.py, or for the
+# Ethiopia scripts by importing _pipeline_common_path first.
+#
+# Example usage (standalone script):
+   # import _profiling as prof
+   # prof.start_run('2b_calculate_ahle' ,REPORT_FOLDER=os.path.join(ETHIOPIA_OUTPUT_FOLDER ,'profiling'))
+   # with prof.step('Aggregate age/sex groups'):
+   #    ...
+   # prof.datainfo(ahle_combo_withagg)      # Also records shape and memory of the dataframe
+   # prof.finish_run()                      # Writes the report and comparison
+# From 0_runme.py, _pipeline_runner.run_steps_parallel(..., PROFILE_FOLDER=...) profiles each script as a step.
+
+import os
+import io
+import sys
+import json
+import time
+import inspect
+import datetime as dt
+import threading
+import contextlib
+
+import pandas as pd
+
+RSS_SAMPLE_INTERVAL_S = 0.2      # How often to sample memory while a step runs
+REGRESSION_MIN_RATIO = 1.2       # Flag a step if wall time or peak memory grows by more than this ratio...
+REGRESSION_MIN_WALL_S = 1.0      # ...and wall time grows by more than this many seconds...
+REGRESSION_MIN_RSS_MB = 50.0     # ...or peak memory grows by more than this many MB
+
+# Current run. None when not recording.
+_run = None
+_open_steps = []                 # Stack of steps in progress, innermost last
+
+# =============================================================================
+#### Memory
+# =============================================================================
+# Current resident memory of this process in bytes, or None if it cannot be read
+def current_rss_bytes():
+   try:
+      with open('/proc/self/statm' ,'r') as f:      # Linux
+         return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+   except (OSError ,ValueError ,AttributeError):
+      pass
+   try:
+      import psutil                                 # Windows, macOS, if installed
+      return psutil.Process().memory_info().rss
+   except ImportError:
+      return None
+
+# Peak resident memory of this process since it started in bytes, or None if it cannot be read
+def lifetime_peak_rss_bytes():
+   try:
+      import resource
+   except ImportError:                              # Windows
+      try:
+         import psutil
+         return psutil.Process().memory_info().peak_wset
+      except (ImportError ,AttributeError):
+         return None
+   peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+   return peak if sys.platform == 'darwin' else peak * 1024     # Bytes on macOS, KB elsewhere
+
+# Samples current memory in a background thread to find the peak during one step.
+# A process's lifetime peak is not enough, as pipeline workers run several steps in turn.
+class _PeakSampler:
+   def __init__(self):
+      self.peak_bytes = current_rss_bytes()
+      self._stop = threading.Event()
+      self._thread = None
+      if self.peak_bytes is not None:
+         self._thread = threading.Thread(target=self._sample ,daemon=True)
+         self._thread.start()
+
+   def _sample(self):
+      while not self._stop.wait(RSS_SAMPLE_INTERVAL_S):
+         self.peak_bytes = max(self.peak_bytes ,current_rss_bytes() or 0)
+
+   def stop(self):
+      if self._thread is None:
+         return lifetime_peak_rss_bytes()
+      self._stop.set()
+      self._thread.join()
+      return max(self.peak_bytes ,current_rss_bytes() or 0)
+
+def _mb(BYTES):
+   return None if BYTES is None else round(BYTES / 1024**2 ,1)
+
+# =============================================================================
+#### Dataframes
+# =============================================================================
+# Shape and memory of a dataframe
+def frame_stats(INPUT_DF ,NAME):
+   return {
+      'name':NAME
+      ,'rows':int(INPUT_DF.shape[0])
+      ,'columns':int(INPUT_DF.shape[1])
+      ,'memory_mb':_mb(INPUT_DF.memory_usage(index=True ,deep=True).sum())
+   }
+
+# Shape and memory of all dataframes in a namespace, e.g. after running a script, largest first
+def namespace_frame_stats(NAMESPACE):
+   stats = [frame_stats(VALUE ,NAME) for NAME ,VALUE in NAMESPACE.items() if isinstance(VALUE ,pd.DataFrame) and not NAME.startswith('_')]
+   return sorted(stats ,key=lambda x: x['memory_mb'] ,reverse=True)
+
+# Name of the variable holding OBJECT in the calling script
+def _caller_name(OBJECT ,FRAME):
+   for NAMESPACE in (FRAME.f_locals ,FRAME.f_globals):
+      for NAME ,VALUE in NAMESPACE.items():
+         if VALUE is OBJECT:
+            return NAME
+   return 'dataframe'
+
+def _record_frame(STATS):
+   owner = _open_steps[-1] if _open_steps else _run
+   if owner is not None:
+      owner['frames'].append(STATS)
+   return None
+
+# To print df.info() with header for readability, and optionally write data info to text file
+def datainfo(
+      INPUT_DF
+      ,MAX_COLS=None      # Integer (opt): most columns to list. Default uses pandas option display.max_info_columns.
+      ,OUTFOLDER=None     # String (opt): folder to output {dataname}_info.txt. If None, no file will be created.
+   ):
+   funcname = inspect.currentframe().f_code.co_name
+   dataname = _caller_name(INPUT_DF ,inspect.currentframe().f_back)
+   rowcount = INPUT_DF.shape[0]
+   colcount = INPUT_DF.shape[1]
+   idxcols = str(list(INPUT_DF.index.names))
+   header = f"Data name: {dataname :>26s}\nRows:      {rowcount :>26,}\nColumns:   {colcount :>26,}\nIndex:     {idxcols :>26s}\n"
+   divider = ('-'*26) + ('-'*11) + '\n'
+   bigdivider = ('='*26) + ('='*11) + '\n'
+   print(bigdivider + header + divider)
+   INPUT_DF.info(max_cols=MAX_COLS)
+   print(divider + f"End:       {dataname:>26s}\n" + bigdivider)
+   _record_frame(frame_stats(INPUT_DF ,dataname))
+
+   if OUTFOLDER:     # If something has been passed to OUTFOLDER parameter
+      filename = f"{dataname}_info"
+      print(f"\n<{funcname}> Creating file {os.path.join(OUTFOLDER ,filename)}.txt")
+      datetimestamp = 'Created on ' + time.strftime('%Y-%m-%d %X', time.gmtime()) + ' UTC' + '\n'
+      buffer = io.StringIO()
+      INPUT_DF.info(buf=buffer, max_cols=colcount)
+      filecontents = header + divider + datetimestamp + buffer.getvalue()
+      tofile = os.path.join(OUTFOLDER, f"{filename}.txt")
+      with open(tofile, 'w', encoding='utf-8') as f: f.write(filecontents)
+      print(f"<{funcname}> ...done.")
+   return None
+
+# =============================================================================
+#### Steps
+# =============================================================================
+def _open_step(NAME):
+   record = {
+      'name':NAME
+      ,'started':dt.datetime.now().isoformat(timespec='seconds')
+      ,'frames':[]
+      ,'steps':[]
+      ,'_wall_start':time.perf_counter()
+      ,'_cpu_start':time.process_time()
+      ,'_sampler':_PeakSampler()
+   }
+   _open_steps.append(record)
+   return record
+
+def _close_step(RECORD ,NAMESPACE=None):
+   peak_bytes = RECORD.pop('_sampler').stop()
+   RECORD['wall_s'] = round(time.perf_counter() - RECORD.pop('_wall_start') ,3)
+   RECORD['cpu_s'] = round(time.process_time() - RECORD.pop('_cpu_start') ,3)    # This process only, not worker processes it starts
+   RECORD['peak_rss_mb'] = _mb(peak_bytes)
+   if NAMESPACE is not None:      # Dataframes left at the end of the step, unless already recorded with the same shape by datainfo()
+      recorded = {(FRAME['name'] ,FRAME['rows'] ,FRAME['columns']) for FRAME in RECORD['frames']}
+      RECORD['frames'] += [FRAME for FRAME in namespace_frame_stats(NAMESPACE) if (FRAME['name'] ,FRAME['rows'] ,FRAME['columns']) not in recorded]
+   _open_steps.remove(RECORD)
+   owner = _open_steps[-1] if _open_steps else _run
+   if owner is not None:
+      owner['steps'].append(RECORD)
+   return RECORD
+
+# Record a block of code as a step. Steps can be nested.
+# Returns the step record, complete once the block ends. Records even when no run is started,
+# so a worker process can profile a step and send the record back.
+@contextlib.contextmanager
+def step(
+      NAME
+      ,NAMESPACE=None     # Dictionary (opt): record all dataframes in this namespace at the end of the step, e.g. globals()
+   ):
+   record = _open_step(NAME)
+   try:
+      yield record
+   finally:
+      _close_step(record ,NAMESPACE)
+
+# To time a piece of code. Recorded as a step while a run is started.
+def timerstart(LABEL=None):      # String (opt): add a label to the printed timer messages
+   global _timer
+   funcname = inspect.currentframe().f_code.co_name
+   if '_timer' in globals() and _timer['record'] in _open_steps:      # Previous timer not stopped
+      _close_step(_timer['record'])
+   recording = _run is not None or _open_steps
+   _timer = {
+      'label':LABEL
+      ,'start':dt.datetime.now()
+      ,'record':_open_step(LABEL or f"Timer {_count_steps() + 1}") if recording else None
+   }
+   if LABEL:
+      print(f"\n<{funcname}> {LABEL} {_timer['start'] :%I:%M:%S %p} \n")
+   else:
+      print(f"\n<{funcname}> {_timer['start'] :%I:%M:%S %p} \n")
+   return None
+
+def timerstop():
+   funcname = inspect.currentframe().f_code.co_name
+   if '_timer' in globals():
+      stop_time = dt.datetime.now()
+      elapsed = stop_time - _timer['start']
+      hours = (elapsed.days * 24) + (elapsed.seconds // 3600)
+      minutes = (elapsed.seconds % 3600) // 60
+      seconds = (elapsed.seconds % 60) + (elapsed.microseconds / 1000000)
+      print(f"\n<{funcname}> {stop_time :%I:%M:%S %p}")
+      if _timer['label']:
+         print(f"<{funcname}> {_timer['label']} Elapsed {hours}h: {minutes}m: {seconds :.1f}s \n")
+      else:
+         print(f"<{funcname}> Elapsed {hours}h: {minutes}m: {seconds :.1f}s \n")
+      if _timer['record'] in _open_steps:
+         _close_step(_timer['record'])
+   else:
+      print(f"<{funcname}> Error: no start time defined. Call timerstart() first.")
+   return None
+
+def _count_steps():
+   owner = _open_steps[-1] if _open_steps else _run
+   return len(owner['steps']) if owner else 0
+
+# =============================================================================
+#### Runs and reports
+# =============================================================================
+# Start recording. Steps from timerstart(), step() and datainfo() are added to this run.
+def start_run(
+      RUN_NAME            # String: name of the script or pipeline. Reports are compared to the previous report of the same name.
+      ,REPORT_FOLDER      # String: folder to write {RUN_NAME}_profile.json
+   ):
+   global _run
+   funcname = inspect.currentframe().f_code.co_name
+   _run = {
+      'run':RUN_NAME
+      ,'report_folder':REPORT_FOLDER
+      ,'started':dt.datetime.now().isoformat(timespec='seconds')
+      ,'python':sys.version.split()[0]
+      ,'pandas':pd.__version__
+      ,'cpus':os.cpu_count()
+      ,'frames':[]
+      ,'steps':[]
+      ,'_wall_start':time.perf_counter()
+      ,'_cpu_start':time.process_time()
+   }
+   print(f"<{funcname}> Profiling {RUN_NAME}.")
+   return None
+
+# Add a step recorded elsewhere, e.g. in a worker process, to the current run
+def add_step(RECORD):
+   if _run is not None:
+      _run['steps'].append(RECORD)
+   return None
+
+# Flatten nested steps to one row per step, with the path of step names
+def steps_table(STEPS ,PARENT=''):
+   rows = []
+   for STEP in STEPS:
+      path = f"{PARENT} / {STEP['name']}" if PARENT else STEP['name']
+      largest = max(STEP.get('frames' ,[]) ,key=lambda x: x['memory_mb'] ,default=None)
+      rows.append({
+         'step':path
+         ,'wall_s':STEP.get('wall_s')
+         ,'cpu_s':STEP.get('cpu_s')
+         ,'peak_rss_mb':STEP.get('peak_rss_mb')
+         ,'frames':len(STEP.get('frames' ,[]))
+         ,'largest_frame':f"{largest['name']} {largest['rows']:,}x{largest['columns']:,}" if largest else None
+         ,'largest_frame_mb':largest['memory_mb'] if largest else None
+      })
+      rows += steps_table(STEP.get('steps' ,[]) ,path)
+   return rows
+
+# Compare each step to the same step in the previous report. Steps are matched by their path of names.
+def compare_reports(CURRENT ,PREVIOUS):
+   current = pd.DataFrame(steps_table(CURRENT['steps']) ,columns=['step' ,'wall_s' ,'peak_rss_mb' ,'largest_frame_mb'])
+   previous = pd.DataFrame(steps_table(PREVIOUS['steps']) ,columns=['step' ,'wall_s' ,'peak_rss_mb' ,'largest_frame_mb'])
+   compare = pd.merge(
+      left=current.drop_duplicates(subset='step')
+      ,right=previous.drop_duplicates(subset='step')
+      ,on='step'
+      ,how='outer'
+      ,suffixes=('' ,'_previous')
+      ,indicator=True
+   )
+   step_order = {}
+   for STEP in list(current['step']) + list(previous['step']):     # Current run order, then removed steps
+      step_order.setdefault(STEP ,len(step_order))
+   compare = compare.sort_values(by='step' ,key=lambda x: x.map(step_order)).reset_index(drop=True)
+   compare['status'] = compare.pop('_merge').map({'both':'' ,'left_only':'new' ,'right_only':'not run'}).astype(str)
+   wall_change = compare['wall_s'] - compare['wall_s_previous']
+   rss_change = compare['peak_rss_mb'] - compare['peak_rss_mb_previous']
+   slower = (compare['wall_s'] > compare['wall_s_previous'] * REGRESSION_MIN_RATIO) & (wall_change > REGRESSION_MIN_WALL_S)
+   bigger = (compare['peak_rss_mb'] > compare['peak_rss_mb_previous'] * REGRESSION_MIN_RATIO) & (rss_change > REGRESSION_MIN_RSS_MB)
+   compare.loc[slower ,'status'] = 'slower'
+   compare.loc[bigger & ~ slower ,'status'] = 'bigger'
+   compare.loc[bigger & slower ,'status'] = 'slower, bigger'
+   compare['wall_change_s'] = wall_change.round(3)
+   compare['peak_rss_change_mb'] = rss_change.round(1)
+   return compare[['step' ,'wall_s_previous' ,'wall_s' ,'wall_change_s' ,'peak_rss_mb_previous' ,'peak_rss_mb' ,'peak_rss_change_mb' ,'status']]
+
+# Read a report written by write_report(), or None if there is none
+def read_report(REPORT_FILE):
+   if not os.path.exists(REPORT_FILE):
+      return None
+   with open(REPORT_FILE ,'r' ,encoding='utf-8') as f:
+      return json.load(f)
+
+# Write REPORT to {run}_profile.json, keeping the report it replaces as {run}_profile_previous.json.
+# Adds the comparison to the previous report. Returns the comparison as a dataframe.
+def write_report(REPORT ,REPORT_FOLDER):
+   funcname = inspect.currentframe().f_code.co_name
+   os.makedirs(REPORT_FOLDER ,exist_ok=True)
+   report_file = os.path.join(REPORT_FOLDER ,f"{REPORT['run']}_profile.json")
+   previous_file = os.path.join(REPORT_FOLDER ,f"{REPORT['run']}_profile_previous.json")
+   previous = read_report(report_file)
+
+   compare = pd.DataFrame()
+   if previous:
+      compare = compare_reports(REPORT ,previous)
+      REPORT['previous_started'] = previous.get('started')
+      REPORT['comparison'] = json.loads(compare.to_json(orient='records'))
+      os.replace(report_file ,previous_file)
+   tmpfile = f'{report_file}.{os.getpid()}.tmp'
+   with open(tmpfile ,'w' ,encoding='utf-8') as f:
+      json.dump(REPORT ,f ,indent=2)
+   os.replace(tmpfile ,report_file)     # Atomic, so an interrupted run never leaves a partial report
+
+   print(f"\n<{funcname}> Profile by step:")
+   print(pd.DataFrame(steps_table(REPORT['steps'])).to_string(index=False ,na_rep='' ,float_format=lambda x: f'{x :,.1f}'))
+   if previous:
+      flagged = compare.loc[compare['status'].str.contains('slower|bigger')]
+      print(f"\n<{funcname}> Compared to run started {previous.get('started')}: {len(flagged)} steps slower or bigger.")
+      if not flagged.empty:
+         print(flagged.to_string(index=False ,na_rep='' ,float_format=lambda x: f'{x :,.1f}'))
+   print(f"<{funcname}> Report written to {report_file}")
+   return compare
+
+# Stop recording and write the report for the current run. Returns the comparison to the previous run.
+def finish_run():
+   global _run
+   if _run is None:
+      return pd.DataFrame()
+   while _open_steps:                   # Close steps left open, e.g. a timerstart() without timerstop()
+      _close_step(_open_steps[-1])
+   report = {KEY:VALUE for KEY ,VALUE in _run.items() if not KEY.startswith('_') and KEY != 'report_folder'}
+   report['wall_s'] = round(time.perf_counter() - _run['_wall_start'] ,3)
+   report['cpu_s'] = round(time.process_time() - _run['_cpu_start'] ,3)
+   report['peak_rss_mb'] = _mb(lifetime_peak_rss_bytes())
+   report_folder = _run['report_folder']
+   _run = None
+   return write_report(report ,report_folder)